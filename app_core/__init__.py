@@ -53,7 +53,26 @@ def create_app():
 
     # Feature flags & security
     app.config['ALLOW_UNCONFIRMED'] = _env_bool('ALLOW_UNCONFIRMED', False)
+    # /calculate-coverage enfileira no pool de workers (202 + job) em vez de calcular na requisição
     app.config['FEATURE_WORKERS'] = _env_bool('FEATURE_WORKERS', False)
+    app.config['COVERAGE_WORKERS'] = int(os.environ.get('COVERAGE_WORKERS', 2))
+    # admissão/escalonamento (app_core.admission): limites por usuário e globais
+    app.config['COVERAGE_USER_CONCURRENCY'] = int(os.environ.get('COVERAGE_USER_CONCURRENCY', 1))
+    app.config['COVERAGE_USER_MAX_PENDING'] = int(os.environ.get('COVERAGE_USER_MAX_PENDING', 4))
+    app.config['COVERAGE_MAX_QUEUE'] = int(os.environ.get('COVERAGE_MAX_QUEUE', 32))
+    app.config['COVERAGE_MEMORY_BUDGET_MB'] = float(os.environ.get('COVERAGE_MEMORY_BUDGET_MB', 4096))
+    app.config['COVERAGE_INTERACTIVE_RADIUS_KM'] = float(os.environ.get('COVERAGE_INTERACTIVE_RADIUS_KM', 30))
+    # janela de cada conexão SSE de progresso de job (o navegador reconecta)
+    app.config['COVERAGE_EVENTS_WINDOW_S'] = float(os.environ.get('COVERAGE_EVENTS_WINDOW_S', 30))
+    # cálculos síncronos pesados (perfil, relatórios, cobertura sem workers) por processo web
+    app.config['HEAVY_SYNC_CONCURRENCY'] = int(os.environ.get('HEAVY_SYNC_CONCURRENCY', 4))
+    app.config['HEAVY_SYNC_USER_CONCURRENCY'] = int(os.environ.get('HEAVY_SYNC_USER_CONCURRENCY', 2))
+    app.config['HEAVY_SYNC_WAIT_S'] = float(os.environ.get('HEAVY_SYNC_WAIT_S', 10))
+    # redes multi-TX (app_core.network): sites por projeto e tamanho máximo do grid composto
+    app.config['NETWORK_MAX_SITES'] = int(os.environ.get('NETWORK_MAX_SITES', 50))
+    app.config['NETWORK_MAX_PIXELS'] = int(os.environ.get('NETWORK_MAX_PIXELS', 4_000_000))
+    # SFN (app_core.sfn): memória por bloco de linhas na análise C/I
+    app.config['SFN_CHUNK_MB'] = float(os.environ.get('SFN_CHUNK_MB', 64))
     app.config['FEATURE_RT3D'] = _env_bool('FEATURE_RT3D', False)
     app.config['SECURITY_EMAIL_SALT'] = os.environ.get('SECURITY_EMAIL_SALT', 'atx-email-token')
     app.config['EMAIL_CONFIRM_MAX_AGE'] = int(os.environ.get('EMAIL_CONFIRM_MAX_AGE', 60 * 60 * 24))
@@ -80,9 +99,24 @@ def create_app():
     storage_root = os.environ.get('STORAGE_ROOT', os.path.join(BASE_DIR, 'storage'))
     Path(storage_root).mkdir(parents=True, exist_ok=True)
     app.config['STORAGE_ROOT'] = storage_root
+    app.config['HPROF_CACHE_MAX_BYTES'] = int(os.environ.get('HPROF_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+    # servidor de tiles SRTM no layout do viewpano (<base>/<arquivo>.zip); aceita um stand-in local
+    app.config['SRTM_TILE_SERVER'] = os.environ.get('SRTM_TILE_SERVER', 'http://viewfinderpanoramas.org/dem3/')
+    app.config['SRTM_PREFETCH_WORKERS'] = int(os.environ.get('SRTM_PREFETCH_WORKERS', 4))
+    # recortes MapBiomas: leitura por janela direto do servidor (/vsicurl/) antes de baixar o mosaico
+    app.config['LULC_REMOTE_READS'] = _env_bool('LULC_REMOTE_READS', True)
+    app.config['LULC_AOI_RADIUS_KM'] = float(os.environ.get('LULC_AOI_RADIUS_KM', 50))
+    # plano básico ANATEL (XML exportado): reimportado quando um arquivo muda
+    app.config['CHANNEL_PLAN_DIR'] = os.environ.get('CHANNEL_PLAN_DIR', os.path.join(BASE_DIR, 'docs', 'Canais'))
+    # estudo de interferência: processos por estação (0 = no próprio request) e teto do raster combinado
+    app.config['INTERFERENCE_WORKERS'] = int(os.environ.get('INTERFERENCE_WORKERS', 2))
+    app.config['INTERFERENCE_MAX_PIXELS'] = int(os.environ.get('INTERFERENCE_MAX_PIXELS', 1_000_000))
 
     db.init_app(app)
     Migrate(app, db)
+    # fila local de cobertura (pool de processos criado no primeiro job)
+    from app_core import jobs
+    jobs.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'ui.login'
     login_manager.login_message_category = 'warning'
@@ -0,0 +1,309 @@
+"""
+Admission control and scheduling of heavy computations.
+
+Queued coverage jobs are admitted at submit time and dispatched by
+next_job():
+
+- submit: a user may have at most COVERAGE_USER_MAX_PENDING jobs queued or
+  running and the global queue at most COVERAGE_MAX_QUEUE jobs; over that
+  the caller gets AdmissionError (HTTP 429 + Retry-After). A job whose
+  memory estimate alone exceeds the budget is refused outright.
+- dispatch: a queued job runs when its user has fewer than
+  COVERAGE_USER_CONCURRENCY jobs running and its memory estimate fits in
+  what is left of COVERAGE_MEMORY_BUDGET_MB. Among the eligible jobs,
+  interactive ones (small radius from the map pages) go first, then the
+  user with fewest running jobs, then the oldest.
+
+The memory estimate is grid pixels x per-pixel float64 layers of the engine.
+Limits count runs, not rows: the per-site jobs of a network run
+(app_core.network) share their parent's run, so a network counts once per
+user and its sites run in parallel within the workers and memory budget.
+
+Synchronous heavy requests (profiles, reports, coverage without workers)
+take a slot through @heavy_request: per-user and per-process limits; a
+request waits up to HEAVY_SYNC_WAIT_S for a slot and then gets 429.
+"""
+
+from __future__ import annotations
+
+import functools
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify
+from flask_login import current_user
+
+from .coverage import select_map_resolution
+from .models import CoverageJob, CoverageStatus, Project, db
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+BYTES_PER_LAYER = 8
+# float64 arrays held per grid pixel while a run is in memory (terrain cache,
+# loss components, gains, field/power maps, render buffers)
+PIXEL_LAYERS = {"p1546": 16, "itm": 16, "pycraf": 48, "rt3d": 24}
+DEFAULT_RADIUS_KM = 10.0
+PAD_FACTOR = 1.05
+KM_PER_DEGREE = 111.32
+RETRY_AFTER_MIN_S = 5
+RETRY_AFTER_MAX_S = 600
+DEFAULT_RUN_SECONDS = 30.0
+WAIT_STATS_WINDOW = timedelta(hours=1)
+
+_sync_lock = threading.Lock()
+_sync_freed = threading.Condition(_sync_lock)
+_sync_active: Counter = Counter()
+_rejections: Counter = Counter()
+
+
+class AdmissionError(Exception):
+    """Over budget; retry_after is the suggested wait in seconds (None: never fits)."""
+
+    def __init__(self, message: str, retry_after: int | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _config(name: str, default):
+    return type(default)(current_app.config.get(name, default))
+
+
+def _radius_km(inputs: dict) -> float:
+    try:
+        radius = float(inputs.get("radius") or DEFAULT_RADIUS_KM)
+    except (TypeError, ValueError):
+        radius = DEFAULT_RADIUS_KM
+    return radius if radius > 0 else DEFAULT_RADIUS_KM
+
+
+def grid_pixels(inputs: dict) -> int:
+    """Pixels (or radial samples) a coverage request computes."""
+    if str(inputs.get("coverageMode") or "grid").strip().lower() == "polar":
+        radials = int(min(max(float(inputs.get("radials") or 360), 8), 1440))
+        steps = int(min(max(float(inputs.get("steps") or 250), 16), 4000))
+        return radials * steps
+    radius = _radius_km(inputs)
+    resolution_arcsec = select_map_resolution(radius).value
+    side = (2.0 * radius / KM_PER_DEGREE) * 3600.0 * PAD_FACTOR / resolution_arcsec
+    return int(math.ceil(side)) ** 2
+
+
+def estimate_memory_mb(engine: str, inputs: dict) -> float:
+    layers = PIXEL_LAYERS.get(engine, PIXEL_LAYERS["pycraf"])
+    return round(grid_pixels(inputs) * layers * BYTES_PER_LAYER / 2 ** 20, 1)
+
+
+def priority_for(engine: str, inputs: dict, interactive: bool) -> int:
+    small = _radius_km(inputs) <= _config("COVERAGE_INTERACTIVE_RADIUS_KM", 30.0)
+    if interactive and small and engine != "rt3d":
+        return PRIORITY_INTERACTIVE
+    return PRIORITY_BATCH
+
+
+def _user_of(query):
+    return query.join(Project, Project.id == CoverageJob.project_id)
+
+
+def _run_key():
+    return db.func.coalesce(CoverageJob.parent_id, CoverageJob.id)
+
+
+def _count_runs(query) -> int:
+    return query.with_entities(db.func.count(db.distinct(_run_key()))).scalar() or 0
+
+
+def _average_run_seconds(limit: int = 20) -> float:
+    recent = (
+        CoverageJob.query.filter(
+            CoverageJob.status == CoverageStatus.succeeded,
+            CoverageJob.started_at.isnot(None),
+            CoverageJob.finished_at.isnot(None),
+        )
+        .order_by(CoverageJob.finished_at.desc())
+        .limit(limit)
+        .all()
+    )
+    durations = [(job.finished_at - job.started_at).total_seconds() for job in recent]
+    durations = [value for value in durations if value > 0]
+    return sum(durations) / len(durations) if durations else DEFAULT_RUN_SECONDS
+
+
+def _retry_after(jobs_ahead: int) -> int:
+    workers = max(_config("COVERAGE_WORKERS", 2), 1)
+    estimate = _average_run_seconds() * max(math.ceil(jobs_ahead / workers), 1)
+    return int(min(max(estimate, RETRY_AFTER_MIN_S), RETRY_AFTER_MAX_S))
+
+
+def check_submission(user_uuid, memory_mb: float) -> None:
+    """Raise AdmissionError when a new job of this user must be refused."""
+    budget = _config("COVERAGE_MEMORY_BUDGET_MB", 4096.0)
+    if memory_mb > budget:
+        _rejections["memory"] += 1
+        raise AdmissionError(
+            f"Estimated memory {memory_mb:.0f} MB exceeds the budget of {budget:.0f} MB; "
+            "reduce the radius or use the polar mode.",
+        )
+    active = [CoverageStatus.queued, CoverageStatus.running]
+    pending_user = _count_runs(_user_of(CoverageJob.query).filter(
+        Project.user_uuid == user_uuid, CoverageJob.status.in_(active)
+    ))
+    if pending_user >= _config("COVERAGE_USER_MAX_PENDING", 4):
+        _rejections["user"] += 1
+        raise AdmissionError("Too many coverage jobs pending for this user.", _retry_after(1))
+    queued = _count_runs(CoverageJob.query.filter(CoverageJob.status == CoverageStatus.queued))
+    if queued >= _config("COVERAGE_MAX_QUEUE", 32):
+        _rejections["queue"] += 1
+        raise AdmissionError("Coverage queue is full.", _retry_after(queued))
+
+
+def _running_load() -> tuple[Counter, float, set]:
+    """(running runs per user, memory in use, ids of the running runs)."""
+    running = _user_of(
+        db.session.query(Project.user_uuid, CoverageJob.id, CoverageJob.parent_id, CoverageJob.memory_mb)
+    ).filter(CoverageJob.status == CoverageStatus.running)
+    runs = {}
+    memory = 0.0
+    for user_uuid, job_id, parent_id, memory_mb in running:
+        runs[parent_id or job_id] = user_uuid
+        memory += memory_mb or 0.0
+    return Counter(runs.values()), memory, set(runs)
+
+
+def next_job(limit: int = 200) -> CoverageJob | None:
+    """The queued job to start now under the limits, or None."""
+    per_user, memory, runs = _running_load()
+    budget = _config("COVERAGE_MEMORY_BUDGET_MB", 4096.0)
+    user_limit = _config("COVERAGE_USER_CONCURRENCY", 1)
+    queued = (
+        _user_of(db.session.query(CoverageJob, Project.user_uuid))
+        .filter(CoverageJob.status == CoverageStatus.queued)
+        .order_by(CoverageJob.created_at)
+        .limit(limit)
+        .all()
+    )
+    eligible = [
+        (job.priority, per_user[user_uuid], job.created_at, index, job)
+        for index, (job, user_uuid) in enumerate(queued)
+        if (per_user[user_uuid] < user_limit or job.parent_id in runs)
+        and memory + (job.memory_mb or 0.0) <= budget
+    ]
+    return min(eligible)[-1] if eligible else None
+
+
+def queue_position(job: CoverageJob) -> int | None:
+    """1-based position among queued jobs (priority, then age); None once started."""
+    if job.status != CoverageStatus.queued:
+        return None
+    ahead = CoverageJob.query.filter(
+        CoverageJob.status == CoverageStatus.queued,
+        db.or_(
+            CoverageJob.priority < job.priority,
+            db.and_(CoverageJob.priority == job.priority, CoverageJob.created_at < job.created_at),
+        ),
+    ).count()
+    return ahead + 1
+
+
+def metrics() -> dict:
+    """Queue depth, running load, wait times and rejections."""
+    per_user, memory, _ = _running_load()
+    by_priority = dict(
+        db.session.query(CoverageJob.priority, db.func.count(CoverageJob.id))
+        .filter(CoverageJob.status == CoverageStatus.queued)
+        .group_by(CoverageJob.priority)
+        .all()
+    )
+    since = datetime.utcnow() - WAIT_STATS_WINDOW
+    started = CoverageJob.query.filter(
+        CoverageJob.started_at.isnot(None), CoverageJob.started_at >= since
+    ).all()
+    waits = sorted(
+        max((job.started_at - job.created_at).total_seconds(), 0.0)
+        for job in started
+        if job.created_at is not None
+    )
+    now = datetime.utcnow()
+    oldest = (
+        CoverageJob.query.filter(CoverageJob.status == CoverageStatus.queued)
+        .order_by(CoverageJob.created_at)
+        .first()
+    )
+    with _sync_lock:
+        sync_active = sum(count for key, count in _sync_active.items() if key[0] == "*")
+    return {
+        "queue_depth": sum(by_priority.values()),
+        "queued_interactive": by_priority.get(PRIORITY_INTERACTIVE, 0),
+        "queued_batch": by_priority.get(PRIORITY_BATCH, 0),
+        "running": sum(per_user.values()),
+        "running_users": len(per_user),
+        "memory_in_use_mb": round(memory, 1),
+        "memory_budget_mb": _config("COVERAGE_MEMORY_BUDGET_MB", 4096.0),
+        "oldest_queued_s": round((now - oldest.created_at).total_seconds(), 1) if oldest else None,
+        "wait_s": {
+            "count": len(waits),
+            "mean": round(sum(waits) / len(waits), 2) if waits else None,
+            "p95": round(waits[min(int(0.95 * len(waits)), len(waits) - 1)], 2) if waits else None,
+            "max": round(waits[-1], 2) if waits else None,
+        },
+        "sync_active": sync_active,
+        "rejections": dict(_rejections),
+    }
+
+
+def _acquire_sync(user_key) -> bool:
+    """Take a slot, waiting up to HEAVY_SYNC_WAIT_S for one to free up."""
+    global_limit = _config("HEAVY_SYNC_CONCURRENCY", 4)
+    user_limit = _config("HEAVY_SYNC_USER_CONCURRENCY", 2)
+    deadline = time.monotonic() + _config("HEAVY_SYNC_WAIT_S", 10.0)
+    with _sync_freed:
+        while _sync_active[("*",)] >= global_limit or _sync_active[("user", user_key)] >= user_limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            _sync_freed.wait(remaining)
+        _sync_active[("*",)] += 1
+        _sync_active[("user", user_key)] += 1
+        return True
+
+
+def _release_sync(user_key) -> None:
+    with _sync_freed:
+        _sync_active[("*",)] -= 1
+        _sync_active[("user", user_key)] -= 1
+        _sync_freed.notify_all()
+
+
+def too_busy(message: str, retry_after: int | None):
+    response = jsonify({"error": message, "retry_after": retry_after})
+    response.status_code = 429 if retry_after is not None else 422
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def heavy_request(kind: str):
+    """Route decorator: one slot of the synchronous heavy-request budget."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            user_key = getattr(current_user, "uuid", None)
+            if not _acquire_sync(user_key):
+                _rejections[kind] += 1
+                return too_busy(f"Too many {kind} computations in progress; try again shortly.", RETRY_AFTER_MIN_S)
+            started = time.monotonic()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                _release_sync(user_key)
+                current_app.logger.info(
+                    "heavy_request.done",
+                    extra={"kind": kind, "seconds": round(time.monotonic() - started, 3)},
+                )
+
+        return wrapper
+
+    return decorator
@@ -18,6 +18,7 @@ from app_core.analytics.ibge_catalog import (
     get_or_resolve_municipality,
 )
 from app_core.integrations import ibge as ibge_api
+from app_core.signal_raster import SignalRaster
 
 LOGGER = logging.getLogger(__name__)
 
@@ -66,6 +67,19 @@ def _parse_signal_dict(signal_dict: Dict[str, float], min_dbuv: float) -> List[T
     return points
 
 
+def _raster_points(raster: SignalRaster, min_dbuv: float) -> List[Tuple[float, float, float]]:
+    lats, lons, values = raster.points("dbuv", min_value=min_dbuv)
+    return list(zip(lats.tolist(), lons.tolist(), values.tolist()))
+
+
+def _load_summary_points(summary_data: Dict[str, object], base_dir: Path, min_dbuv: float) -> List[Tuple[float, float, float]]:
+    """Pixels com campo >= min_dbuv: raster binário (.npy) ou, em resumos antigos, o signal_level_dict."""
+    raster = SignalRaster.from_payload(summary_data.get("signal_raster"), base_dir=base_dir)
+    if raster is not None:
+        return _raster_points(raster, min_dbuv)
+    return _parse_signal_dict(summary_data.get("signal_level_dict") or {}, min_dbuv)
+
+
 def _cluster_points(points: List[Tuple[float, float, float]], precision: int = 2, limit: int = 400) -> List[Tuple[float, float, float, int]]:
     clusters: Dict[Tuple[float, float], Dict[str, float]] = {}
     for lat, lon, value in points:
@@ -260,8 +274,7 @@ def summarize_coverage_demographics(
     with summary_json_path.open("r", encoding="utf-8") as handle:
         summary_data = json.load(handle)
 
-    signal_dict = summary_data.get("signal_level_dict") or {}
-    points = _parse_signal_dict(signal_dict, min_field_dbuvm)
+    points = _load_summary_points(summary_data, summary_json_path.parent, min_field_dbuvm)
     if not points:
         return {
             "threshold_dbuv": min_field_dbuvm,
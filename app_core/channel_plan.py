@@ -0,0 +1,464 @@
+"""
+ANATEL channel-plan store: the basic-plan XML exports indexed for lookups.
+
+The XML files under docs/Canais (plano_basicoAM, solicitacoesAM,
+estrangeirosAM, estrangeirosTVFM, ...) are flat <row .../> lists whose data
+lives in attributes. They are stream-parsed with iterparse (each row is
+cleared once stored, so memory does not grow with the file) into one SQLite
+database. Every file is fingerprinted (size, mtime, SHA-256): an unchanged
+file is skipped, a changed one has its rows replaced in a single
+transaction, and a removed one is dropped, so re-imports only touch what
+changed. Each change bumps the database generation (PRAGMA user_version).
+
+Queries run on NumPy arrays loaded once per generation: a frequency index
+(station positions sorted by frequency, searched with searchsorted) and a
+KD-tree of unit vectors on the sphere, where a great-circle radius maps to a
+chord length. A co-/adjacent-channel query takes the frequency window first
+and only falls back to the KD-tree when that window holds many stations.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+# channel spacing per service (MHz): AM 10 kHz, FM 200 kHz, TV 6 MHz
+SPACING_MHZ = {"OM": 0.01, "FM": 0.2, "RTV": 6.0, "TV": 6.0}
+# FM channel 200 = 87.9 MHz, 200 kHz steps
+FM_CHANNEL_BASE = (200, 87.9)
+# stations in a frequency window scanned directly before using the KD-tree
+SCAN_LIMIT = 4096
+# the source directory is checked for changes at most once per interval
+RESCAN_SECONDS = 30.0
+INSERT_BATCH = 1000
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sources ("
+    " name TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT,"
+    " generated TEXT, rows INTEGER, imported_at TEXT)",
+    "CREATE TABLE IF NOT EXISTS stations ("
+    " id INTEGER PRIMARY KEY, source TEXT NOT NULL, station_id TEXT, country TEXT, uf TEXT,"
+    " municipality TEXT, service TEXT, class TEXT, status TEXT, channel INTEGER,"
+    " frequency_mhz REAL NOT NULL, latitude REAL NOT NULL, longitude REAL NOT NULL,"
+    " erp_kw REAL, erp_night_kw REAL, height_m REAL, entity TEXT, attributes TEXT)",
+    "CREATE INDEX IF NOT EXISTS stations_source ON stations (source)",
+    "CREATE INDEX IF NOT EXISTS stations_frequency ON stations (frequency_mhz)",
+)
+_COLUMNS = (
+    "source", "station_id", "country", "uf", "municipality", "service", "class", "status", "channel",
+    "frequency_mhz", "latitude", "longitude", "erp_kw", "erp_night_kw", "height_m", "entity", "attributes",
+)
+_RECORD_COLUMNS = ("id",) + _COLUMNS[:-1]
+
+
+def _float(value) -> float | None:
+    try:
+        number = float(str(value).strip().replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _int(value) -> int | None:
+    number = _float(value)
+    return int(round(number)) if number is not None else None
+
+
+def _text(value) -> str | None:
+    value = (value or "").strip()
+    return value or None
+
+
+def service_for(frequency_mhz: float) -> str:
+    """Service implied by a frequency (OM, FM or RTV)."""
+    if frequency_mhz < 30.0:
+        return "OM"
+    if 87.4 <= frequency_mhz <= 108.0:
+        return "FM"
+    return "RTV"
+
+
+def fm_channel(frequency_mhz: float) -> int:
+    base_channel, base_mhz = FM_CHANNEL_BASE
+    return base_channel + int(round((frequency_mhz - base_mhz) / SPACING_MHZ["FM"]))
+
+
+def parse_row(attributes: dict) -> dict | None:
+    """Normalised station from the attributes of one <row>, or None when unusable."""
+    latitude = _float(attributes.get("Latitude"))
+    longitude = _float(attributes.get("Longitude"))
+    frequency = _float(attributes.get("Frequencia"))
+    if latitude is None or longitude is None or not frequency or frequency <= 0:
+        return None
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        return None
+    service = (_text(attributes.get("Servico")) or "").upper()
+    if service == "OM" or ("ERP_Dia" in attributes and service not in SPACING_MHZ):
+        # AM files give the frequency in kHz
+        service, frequency = "OM", frequency / 1000.0
+    elif service not in SPACING_MHZ:
+        service = service_for(frequency)
+    channel = _int(attributes.get("Canal"))
+    if channel is None and service == "FM":
+        channel = fm_channel(frequency)
+    erp = _float(attributes.get("ERP"))
+    if erp is None:
+        erp = _float(attributes.get("ERP_Dia"))
+    height = _float(attributes.get("Altura"))
+    if height is None:
+        height = _float(attributes.get("Altura_Diurno"))
+    return {
+        "station_id": _text(attributes.get("id")),
+        "country": _text(attributes.get("Pais")),
+        "uf": _text(attributes.get("UF")),
+        "municipality": _text(attributes.get("Municipio")),
+        "service": service,
+        "class": _text(attributes.get("Classe")),
+        "status": _text(attributes.get("Status")),
+        "channel": channel,
+        "frequency_mhz": round(frequency, 6),
+        "latitude": latitude,
+        "longitude": longitude,
+        "erp_kw": erp,
+        "erp_night_kw": _float(attributes.get("ERP_Noturno")),
+        "height_m": height,
+        "entity": _text(attributes.get("Entidade")),
+    }
+
+
+def iter_stations(path):
+    """
+    Yields (generated date, station) for every usable <row> of a plan XML.
+    Rows are cleared after use so a large file is never held in memory.
+    """
+    generated = None
+    context = ET.iterparse(str(path), events=("start", "end"))
+    root = None
+    for event, elem in context:
+        if event == "start":
+            if root is None:
+                root = elem
+                generated = elem.get("data_geracao")
+            continue
+        if elem.tag != "row":
+            continue
+        attributes = dict(elem.attrib)
+        elem.clear()
+        root.clear()
+        station = parse_row(attributes)
+        if station is not None:
+            extra = {k: v for k, v in attributes.items() if v not in ("", None)}
+            station["attributes"] = json.dumps(extra, ensure_ascii=False, sort_keys=True)
+            yield generated, station
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    hav = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0)))
+
+
+def azimuth_deg(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Initial bearing (degrees from north, clockwise) from point 1 to point(s) 2."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def _unit_vectors(lats, lons) -> np.ndarray:
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lon = np.radians(np.asarray(lons, dtype=float))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+@dataclass
+class PlanIndex:
+    """In-memory arrays of one database generation."""
+
+    generation: int
+    ids: np.ndarray
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    frequencies: np.ndarray
+    # station positions sorted by frequency, and the sorted frequencies
+    by_frequency: np.ndarray
+    sorted_frequencies: np.ndarray
+    tree: cKDTree | None
+
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+    def in_band(self, low_mhz: float, high_mhz: float) -> np.ndarray:
+        """Positions of stations with low <= frequency <= high."""
+        start = np.searchsorted(self.sorted_frequencies, low_mhz, side="left")
+        stop = np.searchsorted(self.sorted_frequencies, high_mhz, side="right")
+        return self.by_frequency[start:stop]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Positions of stations within radius_km (great circle) of a point."""
+        if self.tree is None:
+            return np.empty(0, dtype=np.intp)
+        angle = min(float(radius_km) / EARTH_RADIUS_KM, math.pi)
+        chord = 2.0 * math.sin(angle / 2.0)
+        found = self.tree.query_ball_point(_unit_vectors([lat], [lon])[0], chord * (1.0 + 1e-9))
+        return np.asarray(found, dtype=np.intp)
+
+
+class ChannelPlanStore:
+    """SQLite copy of the channel-plan XML files plus its query index."""
+
+    def __init__(self, db_path, source_dir=None):
+        self.db_path = Path(db_path)
+        self.source_dir = Path(source_dir) if source_dir else None
+        self._lock = threading.Lock()
+        self._index: PlanIndex | None = None
+        self._checked_at = -math.inf
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=60.0, isolation_level=None)
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        return conn
+
+    def generation(self) -> int:
+        conn = self._connect()
+        try:
+            return int(conn.execute("PRAGMA user_version").fetchone()[0])
+        finally:
+            conn.close()
+
+    def import_file(self, path, conn: sqlite3.Connection | None = None) -> dict:
+        """
+        Imports one XML file unless its fingerprint is unchanged. Returns
+        {"name", "status": "unchanged" | "imported", "rows"}.
+        """
+        path = Path(path)
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            stat = path.stat()
+            row = conn.execute(
+                "SELECT size, mtime_ns, sha256, rows FROM sources WHERE name = ?", (path.name,)
+            ).fetchone()
+            if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                return {"name": path.name, "status": "unchanged", "rows": row[3]}
+            sha256 = _sha256(path)
+            if row and row[2] == sha256:
+                conn.execute("UPDATE sources SET size = ?, mtime_ns = ? WHERE name = ?",
+                             (stat.st_size, stat.st_mtime_ns, path.name))
+                return {"name": path.name, "status": "unchanged", "rows": row[3]}
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = conn.execute("SELECT sha256, rows FROM sources WHERE name = ?", (path.name,)).fetchone()
+                if current and current[0] == sha256:
+                    # another process imported it meanwhile
+                    conn.execute("COMMIT")
+                    return {"name": path.name, "status": "unchanged", "rows": current[1]}
+                conn.execute("DELETE FROM stations WHERE source = ?", (path.name,))
+                count, generated = self._insert(conn, path)
+                conn.execute(
+                    "INSERT OR REPLACE INTO sources (name, size, mtime_ns, sha256, generated, rows, imported_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (path.name, stat.st_size, stat.st_mtime_ns, sha256, generated, count,
+                     time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())),
+                )
+                self._bump(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return {"name": path.name, "status": "imported", "rows": count}
+        finally:
+            if own:
+                conn.close()
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, path: Path) -> tuple[int, str | None]:
+        sql = f"INSERT INTO stations ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+        count, generated, batch = 0, None, []
+        for generated, station in iter_stations(path):
+            batch.append((path.name,) + tuple(station[c] for c in _COLUMNS[1:]))
+            if len(batch) >= INSERT_BATCH:
+                conn.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(sql, batch)
+            count += len(batch)
+        if generated is None:
+            # file without rows: the date is still on the root element
+            for _, elem in ET.iterparse(str(path), events=("start",)):
+                generated = elem.get("data_geracao")
+                break
+        return count, generated
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection) -> None:
+        version = int(conn.execute("PRAGMA user_version").fetchone()[0])
+        conn.execute(f"PRAGMA user_version = {version + 1}")
+
+    def import_directory(self, source_dir=None) -> list[dict]:
+        """Imports every *.xml of the directory and drops sources no longer there."""
+        source_dir = Path(source_dir or self.source_dir)
+        paths = sorted(source_dir.glob("*.xml")) if source_dir.is_dir() else []
+        conn = self._connect()
+        try:
+            results = [self.import_file(path, conn) for path in paths]
+            names = {path.name for path in paths}
+            stale = [name for (name,) in conn.execute("SELECT name FROM sources") if name not in names]
+            if stale:
+                conn.execute("BEGIN IMMEDIATE")
+                for name in stale:
+                    conn.execute("DELETE FROM stations WHERE source = ?", (name,))
+                    conn.execute("DELETE FROM sources WHERE name = ?", (name,))
+                self._bump(conn)
+                conn.execute("COMMIT")
+                results.extend({"name": name, "status": "removed", "rows": 0} for name in stale)
+        finally:
+            conn.close()
+        with self._lock:
+            self._checked_at = time.monotonic()
+        return results
+
+    def sources(self) -> list[dict]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT name, generated, rows, sha256, imported_at FROM sources ORDER BY name"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(zip(("name", "generated", "rows", "sha256", "imported_at"), row)) for row in rows]
+
+    def index(self) -> PlanIndex:
+        """Query arrays of the current generation (re-importing changed files first)."""
+        if self.source_dir is not None and time.monotonic() - self._checked_at >= RESCAN_SECONDS:
+            self.import_directory()
+        generation = self.generation()
+        index = self._index
+        if index is not None and index.generation == generation:
+            return index
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT id, latitude, longitude, frequency_mhz FROM stations ORDER BY id").fetchall()
+        finally:
+            conn.close()
+        table = np.asarray(rows, dtype=float).reshape(-1, 4)
+        frequencies = table[:, 3]
+        order = np.argsort(frequencies, kind="stable")
+        index = PlanIndex(
+            generation=generation,
+            ids=table[:, 0].astype(np.int64),
+            latitudes=table[:, 1],
+            longitudes=table[:, 2],
+            frequencies=frequencies,
+            by_frequency=order,
+            sorted_frequencies=frequencies[order],
+            tree=cKDTree(_unit_vectors(table[:, 1], table[:, 2])) if len(rows) else None,
+        )
+        with self._lock:
+            self._index = index
+        return index
+
+    def records(self, ids) -> dict[int, dict]:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        conn = self._connect()
+        try:
+            found = {}
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                query = (f"SELECT {', '.join(_RECORD_COLUMNS)} FROM stations"
+                         f" WHERE id IN ({', '.join('?' * len(chunk))})")
+                for row in conn.execute(query, chunk):
+                    found[row[0]] = dict(zip(_RECORD_COLUMNS, row))
+        finally:
+            conn.close()
+        return found
+
+    def nearby(self, lat: float, lon: float, radius_km: float, frequency_mhz: float,
+               service: str | None = None, adjacent: int = 1) -> list[dict]:
+        """
+        Co-channel and up to `adjacent` adjacent-channel stations within
+        radius_km, nearest first. Each record carries distance_km,
+        azimuth_deg (from the query point) and channel_offset (0 = co-channel).
+        """
+        if radius_km <= 0 or frequency_mhz <= 0 or adjacent < 0:
+            raise ValueError("radius, frequency and adjacent channels must be positive.")
+        service = (service or service_for(frequency_mhz)).upper()
+        if service not in SPACING_MHZ:
+            raise ValueError(f"unknown service: {service}")
+        spacing = SPACING_MHZ[service]
+        half = (adjacent + 0.5) * spacing
+        index = self.index()
+        candidates = index.in_band(frequency_mhz - half, frequency_mhz + half)
+        if candidates.size > SCAN_LIMIT:
+            near = index.within(lat, lon, radius_km)
+            offsets = np.abs(index.frequencies[near] - frequency_mhz)
+            candidates = near[offsets <= half]
+        distances = haversine_km(lat, lon, index.latitudes[candidates], index.longitudes[candidates])
+        keep = distances <= radius_km
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        candidates, distances = candidates[order], distances[order]
+        azimuths = azimuth_deg(lat, lon, index.latitudes[candidates], index.longitudes[candidates])
+        records = self.records(index.ids[candidates])
+        stations = []
+        for position, distance, azimuth in zip(candidates, distances, azimuths):
+            record = records.get(int(index.ids[position]))
+            if record is None:
+                continue
+            record["distance_km"] = round(float(distance), 3)
+            record["azimuth_deg"] = round(float(azimuth), 2)
+            record["channel_offset"] = int(round((record["frequency_mhz"] - frequency_mhz) / spacing))
+            stations.append(record)
+        return stations
+
+
+_stores: dict[str, ChannelPlanStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(db_path, source_dir=None) -> ChannelPlanStore:
+    key = str(Path(db_path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ChannelPlanStore(key, source_dir)
+        elif source_dir is not None:
+            store.source_dir = Path(source_dir)
+        return store
+
+
+def default_store() -> ChannelPlanStore:
+    """Store of the running app: shared/channel_plan, fed from CHANNEL_PLAN_DIR."""
+    from flask import current_app
+
+    from app_core.storage import shared_storage_path
+
+    return get_store(shared_storage_path("channel_plan") / "channel_plan.sqlite",
+                     current_app.config.get("CHANNEL_PLAN_DIR"))
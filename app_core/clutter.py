@@ -0,0 +1,194 @@
+"""
+Receiver clutter and path zones from a MapBiomas land-use raster.
+
+MapBiomas classes are mapped to the P.452 clutter categories of pycraf
+(pathprof.CLUTTER) and to a sea flag through 256-entry lookup arrays, so a
+whole coverage grid (or radial x distance grid) is classified with a single
+gather. The per-point clutter category then gives:
+
+- the receiver clutter loss of P.452-16 Eq. (57), per pixel;
+- the representative clutter height R2 / area of P.1546 Annex 5 Par 9;
+- the cumulative sea fraction of every radial path, used for the mixed
+  land/sea paths of P.1546 (Step 11).
+
+The project LULC crop is loaded once per file (decimated through its
+overviews when it is larger than MAX_RASTER_SIDE) and cached.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from pycraf import pathprof
+
+CLUTTER = pathprof.CLUTTER
+MAX_RASTER_SIDE = 4096
+# P.1546 only has warm and cold sea curves; tropical/temperate waters use the warm ones
+WARM_SEA_MAX_ABS_LAT = 40.0
+
+# MapBiomas Collection 10 legend -> P.452 clutter category
+MAPBIOMAS_CLUTTER = {
+    3: CLUTTER.TROPICAL_FOREST,  # forest formation
+    4: CLUTTER.DECIDIOUS_TREES,  # savanna formation
+    5: CLUTTER.TROPICAL_FOREST,  # mangrove
+    6: CLUTTER.TROPICAL_FOREST,  # floodable forest
+    49: CLUTTER.TROPICAL_FOREST,  # wooded sandbank vegetation
+    9: CLUTTER.CONIFEROUS_TREES,  # forest plantation
+    11: CLUTTER.SPARSE,  # wetland
+    12: CLUTTER.SPARSE,  # grassland
+    32: CLUTTER.SPARSE,  # hypersaline tidal flat
+    29: CLUTTER.SPARSE,  # rocky outcrop
+    50: CLUTTER.SPARSE,  # herbaceous sandbank vegetation
+    13: CLUTTER.SPARSE,  # other non-forest formations
+    15: CLUTTER.SPARSE,  # pasture
+    18: CLUTTER.SPARSE,  # agriculture
+    19: CLUTTER.SPARSE,  # temporary crop
+    39: CLUTTER.SPARSE,  # soybean
+    20: CLUTTER.SPARSE,  # sugar cane
+    40: CLUTTER.SPARSE,  # rice
+    62: CLUTTER.SPARSE,  # cotton
+    41: CLUTTER.SPARSE,  # other temporary crops
+    36: CLUTTER.SPARSE,  # perennial crop
+    46: CLUTTER.SPARSE,  # coffee
+    47: CLUTTER.SPARSE,  # citrus
+    35: CLUTTER.DECIDIOUS_TREES,  # palm oil
+    48: CLUTTER.SPARSE,  # other perennial crops
+    21: CLUTTER.VILLAGE,  # mosaic of uses
+    23: CLUTTER.SPARSE,  # beach, dune and sand spot
+    24: CLUTTER.URBAN,  # urban area
+    30: CLUTTER.INDUSTRIAL_ZONE,  # mining
+    75: CLUTTER.INDUSTRIAL_ZONE,  # photovoltaic power plant
+    25: CLUTTER.SPARSE,  # other non-vegetated areas
+}
+# river, lake and ocean / aquaculture / water: sea zone for P.1546, no receiver clutter
+MAPBIOMAS_SEA = (26, 31, 33)
+
+ZONE_LUT = np.full(256, int(CLUTTER.UNKNOWN), dtype=np.int8)
+for _code, _zone in MAPBIOMAS_CLUTTER.items():
+    ZONE_LUT[_code] = int(_zone)
+SEA_LUT = np.zeros(256, dtype=bool)
+SEA_LUT[list(MAPBIOMAS_SEA)] = True
+
+# nominal clutter height h_a (m) and distance d_k (km) of P.452 Table 4,
+# indexed by zone + 1 (first row: UNKNOWN, no clutter)
+_ZONE_DATA = np.vstack([[np.nan, np.nan], np.asarray(pathprof.CLUTTER_DATA, dtype=float)])
+NOMINAL_HEIGHT_M = _ZONE_DATA[:, 0]
+NOMINAL_DISTANCE_KM = _ZONE_DATA[:, 1]
+
+
+class LulcRaster:
+    """Class raster of a north-up lon/lat GeoTIFF held in memory."""
+
+    def __init__(self, path, max_side: int = MAX_RASTER_SIDE):
+        with rasterio.open(path) as src:
+            if src.crs is not None and not src.crs.is_geographic:
+                raise ValueError(f"{path}: LULC raster must be in geographic coordinates")
+            t = src.transform
+            if t.b or t.d:
+                raise ValueError(f"{path}: rotated LULC rasters are not supported")
+            scale = max(src.width, src.height) / float(max_side)
+            if scale > 1.0:
+                # overviews of the COG crop are mode-resampled, like this read
+                shape = (max(int(math.ceil(src.height / scale)), 1), max(int(math.ceil(src.width / scale)), 1))
+                data = src.read(1, out_shape=shape, resampling=Resampling.mode)
+            else:
+                data = src.read(1)
+            nodata = src.nodata
+            self.west = float(t.c)
+            self.north = float(t.f)
+            self.dlon = float(t.a) * src.width / data.shape[1]
+            self.dlat = float(t.e) * src.height / data.shape[0]
+        data = data.astype(np.uint8, copy=False)
+        if nodata is not None and 0 <= nodata < 256:
+            data = np.where(data == int(nodata), 0, data).astype(np.uint8)
+        self.data = data
+
+    @property
+    def bounds(self) -> dict:
+        rows, cols = self.data.shape
+        return {
+            "west": self.west,
+            "south": self.north + rows * self.dlat,
+            "east": self.west + cols * self.dlon,
+            "north": self.north,
+        }
+
+    def classes(self, lats, lons) -> np.ndarray:
+        """MapBiomas class (0 outside the raster) at each point, nearest pixel."""
+        lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+        rows_n, cols_n = self.data.shape
+        with np.errstate(invalid="ignore"):
+            rows = np.floor((lats - self.north) / self.dlat)
+            cols = np.floor((lons - self.west) / self.dlon)
+        inside = (rows >= 0) & (rows < rows_n) & (cols >= 0) & (cols < cols_n)
+        rows = np.where(inside, rows, 0).astype(np.intp)
+        cols = np.where(inside, cols, 0).astype(np.intp)
+        return np.where(inside, self.data[rows, cols], 0).astype(np.uint8)
+
+
+@lru_cache(maxsize=4)
+def _load(path: str, mtime_ns: int, max_side: int) -> LulcRaster:
+    return LulcRaster(path, max_side=max_side)
+
+
+def load_raster(path, max_side: int = MAX_RASTER_SIDE) -> LulcRaster:
+    """Cached LulcRaster of a file (reloaded when the file changes)."""
+    path = os.fspath(path)
+    return _load(path, os.stat(path).st_mtime_ns, int(max_side))
+
+
+def classify(classes) -> tuple[np.ndarray, np.ndarray]:
+    """(zone, is_sea) arrays for an array of MapBiomas classes."""
+    classes = np.asarray(classes, dtype=np.uint8)
+    return ZONE_LUT[classes], SEA_LUT[classes]
+
+
+def receiver_clutter_loss(zones, h_rg_m, freq_ghz) -> np.ndarray:
+    """
+    Clutter loss A_h (dB) of P.452-16 Eq. (57) for a receiver h_rg_m above
+    ground in each zone; 0 for UNKNOWN. Matches pathprof.clutter_correction.
+    """
+    idx = np.asarray(zones, dtype=np.intp) + 1
+    h_a = NOMINAL_HEIGHT_M[idx]
+    d_k = NOMINAL_DISTANCE_KM[idx]
+    f_fc = 0.25 + 0.375 * (1.0 + math.tanh(7.5 * (float(freq_ghz) - 0.5)))
+    with np.errstate(invalid="ignore"):
+        loss = 10.25 * f_fc * np.exp(-d_k) * (1.0 - np.tanh(6.0 * (float(h_rg_m) / h_a - 0.625))) - 0.33
+    return np.where(idx > 0, loss, 0.0)
+
+
+def p1546_receiver_environment(zones) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (R2, area) per point for P.1546 Step 14: open/unknown points are 'Rural'
+    (R2 = 10 m), the others 'Urban' with R2 the nominal clutter height.
+    """
+    idx = np.asarray(zones, dtype=np.intp) + 1
+    built = idx > int(CLUTTER.SPARSE) + 1
+    r2 = np.where(built, NOMINAL_HEIGHT_M[idx], 10.0)
+    area = np.where(built, "Urban", "Rural")
+    return r2, area
+
+
+def sea_fractions(is_sea, distances_km) -> np.ndarray:
+    """
+    Fraction of each radial path (transmitter to the i-th distance) over sea;
+    is_sea is (n_radials, n_distances), each point standing for the segment
+    that ends at it.
+    """
+    distances = np.asarray(distances_km, dtype=float)
+    segments = np.diff(distances, prepend=0.0)
+    sea_km = np.cumsum(np.asarray(is_sea, dtype=float) * segments, axis=-1)
+    return sea_km / distances
+
+
+def sea_path_type(lat_deg: float) -> str:
+    return "Warm" if abs(float(lat_deg)) <= WARM_SEA_MAX_ABS_LAT else "Cold"
+
+
+def zone_names(zones) -> list[str]:
+    return [CLUTTER(int(zone)).name for zone in np.atleast_1d(zones)]
@@ -0,0 +1,244 @@
+"""
+Field-strength contours solved on the P.1546 curves.
+
+The distance at which a transmitter's field falls to a given level is found
+for a whole array of radials (or stations) at once: E(d) from
+p1546.bt_loss_batch decreases with distance, so every element is bracketed
+in [MIN_DISTANCE_KM, MAX_DISTANCE_KM] and bisected on log(d) in lockstep,
+one bt_loss_batch call per step. A field that is below the target already at
+MIN_DISTANCE_KM gives 0 km; one still above it at MAX_DISTANCE_KM gives
+MAX_DISTANCE_KM.
+
+radial_contours() applies this to the ANATEL protected and interfering
+contours of one station on every radial (1 degree by default): heff is the
+per-radial height above the mean terrain level (HNMT, 3-16 km) and the ERP
+is the maximum ERP weighted by the horizontal pattern in that direction.
+The protected contour uses the service's protected field at wanted_time_pct;
+each interfering contour (one per channel offset with a protection ratio) is
+where the field at interfering_time_pct falls to protected field minus
+protection ratio. All radials x contours of one time percentage are solved
+in a single bisection.
+
+The protected contour is solved on its own: if its P.1546 figures are not
+tabulated, p1546.CurvesUnavailable is raised. Interfering contours whose
+figures are missing are returned with status "unavailable", no geometry and
+no distances, instead of failing the whole call.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+from app_core import p1546
+
+MIN_DISTANCE_KM = 1.0
+MAX_DISTANCE_KM = 1000.0
+# 26 halvings of log(1000) leave ~0.1 ppm of the distance
+BISECTION_STEPS = 26
+RECEIVER_HEIGHT_M = 10.0
+RECEIVER_CLUTTER_M = 10.0
+DEFAULT_RADIALS = 360
+# protected field (dBuV/m) of FM stations
+FM_PROTECTED_DBUV = 66.0
+# analog TV plan entries: (first channel, last channel, protected field dBuV/m)
+TV_PROTECTED_DBUV = ((2, 6, 58.0), (7, 13, 64.0), (14, 83, 70.0))
+# digital TV (ISDB-Tb) entries, same layout
+DIGITAL_TV_PROTECTED_DBUV = ((7, 13, 43.0), (14, 69, 51.0))
+# required D/U (dB) of the victim service by |channel offset|
+PROTECTION_RATIOS_DB = {
+    "FM": (37.0, 7.0, -20.0, -30.0),
+    "RTV": (45.0, -6.0),
+    "TVD": (19.0, -24.0),
+}
+
+
+def field_dbuv(f_mhz, t_pct, heff_m, distances_km, erp_kw, rx_height_m=RECEIVER_HEIGHT_M,
+               R2=RECEIVER_CLUTTER_M, area="Rural") -> np.ndarray:
+    """
+    P.1546 land field strength (dB(uV/m)) for erp_kw e.r.p. at the given
+    distances; heff_m, distances_km and erp_kw broadcast against each other.
+    Distances are clamped to the range of the curves.
+    """
+    d = np.clip(np.asarray(distances_km, dtype=float), MIN_DISTANCE_KM, MAX_DISTANCE_KM)
+    E, _ = p1546.bt_loss_batch(f_mhz, t_pct, np.asarray(heff_m, dtype=float), rx_height_m, R2, area, d, "Land", 1)
+    with np.errstate(divide="ignore"):
+        return E + 10.0 * np.log10(np.asarray(erp_kw, dtype=float))
+
+
+def contour_distance_km(f_mhz, t_pct, heff_m, erp_kw, target_dbuv, **field_kwargs) -> np.ndarray:
+    """
+    Distance (km) where the field falls to target_dbuv, for broadcastable
+    arrays of heff_m, erp_kw and target_dbuv (one element per radial or
+    station).
+    """
+    heff, erp, target = np.broadcast_arrays(
+        np.asarray(heff_m, dtype=float), np.asarray(erp_kw, dtype=float), np.asarray(target_dbuv, dtype=float)
+    )
+
+    def above(distance):
+        return field_dbuv(f_mhz, t_pct, heff, distance, erp, **field_kwargs) >= target
+
+    lo = np.full(heff.shape, math.log(MIN_DISTANCE_KM))
+    hi = np.full(heff.shape, math.log(MAX_DISTANCE_KM))
+    reaches_min = above(np.exp(lo))
+    beyond_max = above(np.exp(hi))
+    for _ in range(BISECTION_STEPS):
+        mid = (lo + hi) / 2.0
+        inside = above(np.exp(mid))
+        lo = np.where(inside, mid, lo)
+        hi = np.where(inside, hi, mid)
+    distance = np.exp((lo + hi) / 2.0)
+    distance = np.where(beyond_max, MAX_DISTANCE_KM, distance)
+    return np.where(reaches_min, distance, 0.0)
+
+
+def destination(lat_deg, lon_deg, bearings_deg, distances_km, earth_radius_km=6371.0088):
+    """Lat/lon (deg) reached from a point along bearings for distances (spherical Earth)."""
+    lat1 = math.radians(float(lat_deg))
+    lon1 = math.radians(float(lon_deg))
+    bearing = np.radians(np.asarray(bearings_deg, dtype=float))
+    angle = np.asarray(distances_km, dtype=float) / earth_radius_km
+    lat2 = np.arcsin(math.sin(lat1) * np.cos(angle) + math.cos(lat1) * np.sin(angle) * np.cos(bearing))
+    lon2 = lon1 + np.arctan2(
+        np.sin(bearing) * np.sin(angle) * math.cos(lat1), np.cos(angle) - math.sin(lat1) * np.sin(lat2)
+    )
+    return np.degrees(lat2), (np.degrees(lon2) + 540.0) % 360.0 - 180.0
+
+
+def periodic_interp(values, bearings_deg) -> np.ndarray:
+    """Values given on evenly spaced bearings from north, interpolated at bearings_deg (deg)."""
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    bearings = np.asarray(bearings_deg, dtype=float) % 360.0
+    if values.size == 1:
+        return np.full(bearings.shape, values[0])
+    step = 360.0 / values.size
+    return np.interp(bearings, np.arange(values.size) * step, values, period=360.0)
+
+
+def protected_field_dbuv(service: str, frequency_mhz: float, channel: int | None = None) -> float | None:
+    """Protected field (dBuV/m) of an FM, analog TV (RTV) or digital TV (TVD) station."""
+    if service == "FM":
+        return FM_PROTECTED_DBUV
+    table = {"RTV": TV_PROTECTED_DBUV, "TVD": DIGITAL_TV_PROTECTED_DBUV}.get(service)
+    if table is None:
+        return None
+    if channel is None:
+        frequency = float(frequency_mhz)
+        channel = 2 if frequency < 88.0 else 7 if frequency < 216.0 else 14
+    for first, last, level in table:
+        if first <= int(channel) <= last:
+            return level
+    return None
+
+
+def radial_contours(latitude, longitude, frequency_mhz, erp_kw, heff_m, service="FM", *, hnmt_m=None,
+                    pattern_db=None, direction_deg=0.0, protected_dbuv=None, channel=None,
+                    wanted_time_pct=50.0, interfering_time_pct=10.0, protection_ratios_db=None,
+                    n_radials=DEFAULT_RADIALS) -> dict:
+    """
+    Protected and interfering contours of a station on n_radials radials.
+
+    heff_m and hnmt_m are per-radial values on evenly spaced bearings from
+    north (any count, interpolated; a scalar is omnidirectional). pattern_db
+    is the horizontal pattern in dB on evenly spaced azimuths relative to
+    direction_deg, normalised here to a 0 dB maximum; erp_kw is the ERP of
+    the main lobe. Returns the per-radial table, the contour levels, a
+    summary and a GeoJSON FeatureCollection with one polygon per contour
+    (a null geometry for an "unavailable" interfering contour). Raises
+    p1546.CurvesUnavailable when the protected contour's figures are missing.
+    """
+    service = str(service).upper()
+    n_radials = int(n_radials)
+    if not 4 <= n_radials <= 3600:
+        raise ValueError("Radials must be between 4 and 3600.")
+    if float(erp_kw) <= 0:
+        raise ValueError("ERP must be positive.")
+    if protected_dbuv is None:
+        protected_dbuv = protected_field_dbuv(service, frequency_mhz, channel)
+        if protected_dbuv is None:
+            raise ValueError(f"No protected field for service {service}; pass protected_dbuv.")
+    protected_dbuv = float(protected_dbuv)
+    ratios = (protection_ratios_db or {}).get(service) or PROTECTION_RATIOS_DB.get(service) or ()
+
+    bearings = np.arange(n_radials) * (360.0 / n_radials)
+    heff = periodic_interp(heff_m, bearings)
+    gain_db = np.zeros(n_radials)
+    if pattern_db is not None:
+        pattern = np.asarray(pattern_db, dtype=float)
+        if pattern.size == 0 or not np.isfinite(pattern).all():
+            raise ValueError("Antenna pattern must be a list of finite dB values.")
+        gain_db = periodic_interp(pattern - pattern.max(), bearings - float(direction_deg))
+    erp = float(erp_kw) * 10.0 ** (gain_db / 10.0)
+
+    p1546.require_figures([(frequency_mhz, wanted_time_pct)])
+    protected_km = contour_distance_km(frequency_mhz, wanted_time_pct, heff, erp, protected_dbuv)
+    levels = protected_dbuv - np.asarray(ratios, dtype=float)
+    interfering_missing = p1546.missing_figures(frequency_mhz, interfering_time_pct) if levels.size else []
+    interfering_km = np.full((n_radials, levels.size), np.nan)
+    if levels.size and not interfering_missing:
+        interfering_km = contour_distance_km(frequency_mhz, interfering_time_pct, heff[:, None], erp[:, None], levels)
+
+    hnmt = periodic_interp(hnmt_m, bearings) if hnmt_m is not None else None
+    step_rad = math.radians(360.0 / n_radials)
+    rows = []
+    for index, bearing in enumerate(bearings):
+        rows.append({
+            "bearing_deg": round(float(bearing), 3),
+            "hnmt_m": round(float(hnmt[index]), 1) if hnmt is not None else None,
+            "heff_m": round(float(heff[index]), 1),
+            "pattern_db": round(float(gain_db[index]), 2),
+            "erp_kw": round(float(erp[index]), 4),
+            "protected_km": round(float(protected_km[index]), 2),
+            "interfering_km": [round(float(d), 2) if np.isfinite(d) else None for d in interfering_km[index]],
+        })
+
+    contour_set = [("protected", None, protected_dbuv, wanted_time_pct, protected_km)]
+    contour_set += [
+        ("interfering", offset, float(levels[offset]), interfering_time_pct, interfering_km[:, offset])
+        for offset in range(levels.size)
+    ]
+    features = []
+    for kind, offset, level, t_pct, distances in contour_set:
+        properties = {
+            "kind": kind,
+            "status": "ok",
+            "channel_offset": offset,
+            "protection_ratio_db": None if offset is None else float(ratios[offset]),
+            "level_dbuv": level,
+            "time_pct": float(t_pct),
+            "max_km": None,
+            "area_km2": None,
+        }
+        geometry = None
+        if kind == "interfering" and interfering_missing:
+            properties.update(status="unavailable", missing_figures=interfering_missing)
+        else:
+            lats, lons = destination(latitude, longitude, bearings, distances)
+            ring = [[round(float(lon), 6), round(float(lat), 6)] for lat, lon in zip(lats, lons)]
+            geometry = {"type": "Polygon", "coordinates": [ring + ring[:1]]}
+            properties["max_km"] = round(float(distances.max()), 2)
+            # radial sectors: sum of r^2 * dtheta / 2
+            properties["area_km2"] = round(float(0.5 * step_rad * np.sum(distances ** 2)), 1)
+        features.append({"type": "Feature", "geometry": geometry, "properties": properties})
+
+    return {
+        "service": service,
+        "frequency_mhz": float(frequency_mhz),
+        "erp_kw": float(erp_kw),
+        "direction_deg": float(direction_deg),
+        "protected_dbuv": protected_dbuv,
+        "contours": [feature["properties"] for feature in features],
+        "radials": rows,
+        "summary": {
+            "radials": n_radials,
+            "hnmt_mean_m": round(float(hnmt.mean()), 1) if hnmt is not None else None,
+            "heff_mean_m": round(float(heff.mean()), 1),
+            "protected_min_km": round(float(protected_km.min()), 2),
+            "protected_max_km": round(float(protected_km.max()), 2),
+            "protected_mean_km": round(float(protected_km.mean()), 2),
+            "protected_area_km2": features[0]["properties"]["area_km2"],
+        },
+        "geojson": {"type": "FeatureCollection", "features": features},
+    }
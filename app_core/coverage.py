@@ -1,69 +1,417 @@
 
-from flask import current_app
-from .models import db, CoverageJob, Asset, CoverageStatus
-import rasterio
-from rasterio.windows import Window
 import numpy as np
-from geopy.distance import geodesic
-from geopy.point import Point
 import math
-from . import p1546
+from astropy import units as u
+from pycraf import pathprof
+from . import clutter, dem_store, p1546
+from .storage import storage_root
 
-def run_p1546_coverage(job: CoverageJob):
+
+def get_path_type(tx_lat, tx_lon, rx_lat, rx_lon, lulc_asset, n_samples=256):
+    """
+    P.1546 zone of a point-to-point path from the project LULC raster: the
+    sea curve ('Warm'/'Cold') when most of the path is over water, else 'Land'.
+    """
+    raster = clutter.load_raster(storage_root() / lulc_asset.path)
+    fractions = np.linspace(0.0, 1.0, int(n_samples))
+    lats = tx_lat + (rx_lat - tx_lat) * fractions
+    lons = tx_lon + (rx_lon - tx_lon) * fractions
+    _, is_sea = clutter.classify(raster.classes(lats, lons))
+    return clutter.sea_path_type(tx_lat) if is_sea.mean() > 0.5 else 'Land'
+
+
+# ---------------------------------------------------------------------------
+# Raster P.1546 engine (radial x distance grid resampled to the map grid)
+# ---------------------------------------------------------------------------
+
+P1546_HEFF_RANGE_KM = (3.0, 15.0)
+P1546_TCA_RANGE_KM = 16.0
+# averaging window of the HAAT/HNMT used by the ANATEL station classes
+HAAT_RANGE_KM = (3.0, 16.0)
+POLAR_STEP_EXPONENT = 1.5
+
+
+def pycraf_map_coords(lon_c, lat_c, map_size_lon, map_size_lat, map_resolution):
+    """
+    Pixel centres (deg) of the grid built by pathprof.height_map_data, so the
+    P.1546 raster lines up with the P.452 one for the same request.
+    """
+    cosdelta = 1.0 / np.cos(np.radians(lat_c))
+    xcoords = np.arange(
+        lon_c - cosdelta * map_size_lon / 2,
+        lon_c + cosdelta * map_size_lon / 2 + 1.e-6,
+        cosdelta * map_resolution,
+    )
+    ycoords = np.arange(
+        lat_c - map_size_lat / 2,
+        lat_c + map_size_lat / 2 + 1.e-6,
+        map_resolution,
+    )
+    return xcoords, ycoords
+
+
+def select_map_resolution(radius_km, min_arcsec=0.5, max_arcsec=20.0):
+    """Grid resolution (astropy arcsec) for a coverage map of the given radius."""
+    radius_km = max(float(radius_km), 0.5)
+    if radius_km <= 25:
+        target_pixels = 640.0
+    elif radius_km <= 80:
+        target_pixels = 512.0
+    else:
+        target_pixels = 384.0
+
+    km_per_degree = 111.32
+    diameter_deg = max((2.0 * radius_km) / km_per_degree, 0.01)
+    resolution_arcsec = (diameter_deg * 3600.0) / max(target_pixels, 256.0)
+    resolution_arcsec = float(np.clip(resolution_arcsec, min_arcsec, max_arcsec))
+    return resolution_arcsec * u.arcsec
+
+
+def srtm_terrain_sampler(lons_deg, lats_deg):
+    """
+    Terrain heights (m) from the SRTM tiles configured in pathprof.SrtmConf,
+    read through the memory-mapped DEM store. Points whose tile is not on disk
+    go through pycraf, which downloads it (or fills zeros) per SrtmConf.
+    """
+    lons = np.asarray(lons_deg, dtype=float)
+    lats = np.asarray(lats_deg, dtype=float)
+    store = dem_store.get_store(pathprof.SrtmConf.srtm_dir)
+    heights = store.sample(lats, lons)
+    missing = ~np.isfinite(heights)
+    if missing.any():
+        fallback = pathprof.srtm_height_data(lons[missing] * u.deg, lats[missing] * u.deg)
+        heights[missing] = np.asarray(fallback.to(u.m).value, dtype=float)
+        store.refresh()
+    return heights
+
+
+def radial_points(lon_t, lat_t, bearings_deg, distances_km):
+    """Lon/lat (deg) of every radial x distance point, each (n_radials, n_steps)."""
+    bearings = (np.asarray(bearings_deg, dtype=float) + 180.0) % 360.0 - 180.0
+    distances = np.asarray(distances_km, dtype=float)
+    lons, lats, _ = pathprof.geoid_direct(
+        lon_t * u.deg,
+        lat_t * u.deg,
+        bearings[:, None] * u.deg,
+        distances[None, :] * u.km,
+    )
+    shape = (bearings.size, distances.size)
+    return (
+        np.broadcast_to(lons.to(u.deg).value, shape),
+        np.broadcast_to(lats.to(u.deg).value, shape),
+    )
+
+
+def sample_radial_terrain(lon_t, lat_t, bearings_deg, distances_km, terrain_sampler=srtm_terrain_sampler,
+                          points=None):
+    """
+    Terrain profile for every radial: returns an (n_radials, 1 + n_steps)
+    array whose first column is the transmitter site elevation. points are
+    the radial_points() of the same axes, when already computed.
+    """
+    bearings = np.asarray(bearings_deg, dtype=float)
+    distances = np.asarray(distances_km, dtype=float)
+    lons, lats = points if points is not None else radial_points(lon_t, lat_t, bearings, distances)
+    heights = terrain_sampler(lons, lats)
+    site = terrain_sampler(np.array([lon_t]), np.array([lat_t]))
+    site_column = np.full((bearings.size, 1), float(np.ravel(site)[0]))
+    return np.hstack([site_column, np.reshape(heights, (bearings.size, distances.size))])
+
+
+def radial_terrain_parameters(terrain_m, distances_km, tx_height_m, rx_height_m):
+    """
+    Terrain inputs of P.1546 for every radial.
+
+    terrain_m is the output of sample_radial_terrain and distances_km its
+    distance axis without the site column. Returns a dict with:
+
+    heff:         m    antenna height over the mean terrain from 3 to 15 km (n_radials,)
+    avg_terrain:  m    mean terrain used for heff (n_radials,)
+    hb:           m    antenna height over the mean terrain from 0.2d to d (n_radials, n_steps)
+    tca:          deg  terrain clearance angle at the receiver over 16 km (n_radials, n_steps)
+    htter, hrter: m    terrain height at the transmitter (n_radials, 1) and receiver (n_radials, n_steps)
+    """
+    terrain = np.nan_to_num(np.asarray(terrain_m, dtype=float))
+    d = np.concatenate([[0.0], np.asarray(distances_km, dtype=float)])
+    htter = terrain[:, :1]
+    tx_asl = htter + float(tx_height_m)
+
+    # Effective height (Annex 5, Par 3): shorter radials use what is available.
+    lo, hi = P1546_HEFF_RANGE_KM
+    mask = (d >= min(lo, d[-1])) & (d <= hi) & (d > 0)
+    avg_terrain = terrain[:, mask].mean(axis=1)
+    heff = tx_asl[:, 0] - avg_terrain
+
+    # Height over the terrain averaged between 0.2d and d (equ'n 6).
+    csum = np.hstack([np.zeros((terrain.shape[0], 1)), np.cumsum(terrain, axis=1)])
+    start = np.searchsorted(d, 0.2 * d[1:], side='left')
+    stop = np.arange(2, d.size + 1)
+    hb = tx_asl - (csum[:, stop] - csum[:, start]) / (stop - start)
+
+    # Terrain clearance angle (Annex 5, Par 4.5), without Earth curvature.
+    hr = terrain + float(rx_height_m)
+    tca = np.full(terrain.shape, -90.0)
+    for lag in range(1, d.size):
+        sep = d[lag:] - d[:-lag]
+        valid = sep <= P1546_TCA_RANGE_KM
+        if not np.any(valid):
+            break
+        angle = np.degrees(np.arctan((terrain[:, :-lag] - hr[:, lag:]) / (sep * 1000.0)))
+        tca[:, lag:] = np.where(valid, np.maximum(tca[:, lag:], angle), tca[:, lag:])
+
+    return {
+        'heff': heff,
+        'avg_terrain': avg_terrain,
+        'hb': hb,
+        'tca': tca[:, 1:],
+        'htter': htter,
+        'hrter': terrain[:, 1:],
+    }
+
+
+def haat_statistics(terrain_m, tower_height_m, site_elevation_m):
+    """
+    HAAT inputs for every radial from the terrain inside the averaging window.
+
+    terrain_m is (n_radials, n_points) sampled within HAAT_RANGE_KM (NaN
+    samples are ignored). Returns a dict of (n_radials,) arrays:
+
+    hnmt:        m  mean terrain level over the window
+    haat:        m  antenna height above hnmt
+    min, max:    m  terrain extremes over the window
+    delta_h:     m  terrain irregularity, 10 % minus 90 % exceeded height
+    """
+    terrain = np.asarray(terrain_m, dtype=float)
+    hnmt = np.nanmean(terrain, axis=1)
+    h10, h90 = np.nanpercentile(terrain, [90.0, 10.0], axis=1)
+    return {
+        'hnmt': hnmt,
+        'haat': float(site_elevation_m) + float(tower_height_m) - hnmt,
+        'min': np.nanmin(terrain, axis=1),
+        'max': np.nanmax(terrain, axis=1),
+        'delta_h': h10 - h90,
+    }
+
+
+def site_haat(lon_t, lat_t, tower_height_m, site_elevation_m=None, n_radials=24,
+              inner_km=HAAT_RANGE_KM[0], outer_km=HAAT_RANGE_KM[1], step_km=0.2,
+              terrain_sampler=srtm_terrain_sampler):
+    """
+    HAAT/HNMT of a site for n_radials radials in one pass: every sample point
+    is placed with a single vectorised geoid_direct call and the terrain is
+    read with one terrain_sampler call. Returns (bearings_deg, stats, site_m)
+    with stats as in haat_statistics.
+    """
+    bearings = radial_bearings(n_radials)
+    n_steps = max(int(round((outer_km - inner_km) / float(step_km))), 1)
+    distances = np.linspace(inner_km, outer_km, n_steps + 1)
+    terrain = sample_radial_terrain(lon_t, lat_t, bearings, distances, terrain_sampler)
+    site_m = float(terrain[0, 0]) if site_elevation_m is None else float(site_elevation_m)
+    return bearings, haat_statistics(terrain[:, 1:], tower_height_m, site_m), site_m
+
+
+def polar_to_grid(values, bearings_deg, distances_km, bearing_map_deg, dist_map_km):
+    """
+    Bilinear resampling of a radial x distance grid onto map pixels.
+
+    Bearings must be evenly spaced from 0 deg; pixels beyond the last distance
+    are NaN and pixels closer than the first one take the first value.
+    """
+    values = np.asarray(values, dtype=float)
+    distances = np.asarray(distances_km, dtype=float)
+    n_radials = values.shape[0]
+    step = 360.0 / n_radials
+
+    pos = (np.asarray(bearing_map_deg, dtype=float) % 360.0) / step
+    b0 = np.floor(pos).astype(int) % n_radials
+    b1 = (b0 + 1) % n_radials
+    wb = pos - np.floor(pos)
+
+    dist = np.asarray(dist_map_km, dtype=float)
+    if distances.size == 1:
+        j0 = j1 = np.zeros(dist.shape, dtype=int)
+        wd = np.zeros(dist.shape)
+    else:
+        j0 = np.clip(np.searchsorted(distances, dist, side='right') - 1, 0, distances.size - 2)
+        j1 = j0 + 1
+        wd = np.clip((dist - distances[j0]) / (distances[j1] - distances[j0]), 0.0, 1.0)
+
+    out = (
+        (1.0 - wb) * ((1.0 - wd) * values[b0, j0] + wd * values[b0, j1])
+        + wb * ((1.0 - wd) * values[b1, j0] + wd * values[b1, j1])
+    )
+    return np.where(dist <= distances[-1] + 1e-9, out, np.nan)
+
+
+def radial_bearings(n_radials):
+    """Evenly spaced bearings (deg) starting at north."""
+    n_radials = int(n_radials)
+    return np.arange(n_radials) * (360.0 / n_radials)
+
+
+def radial_distance_axis(radius_km, n_steps, exponent=POLAR_STEP_EXPONENT):
     """
-    Runs a coverage analysis using the ITU-R P.1546 model.
+    n_steps distances (km) in (0, radius_km] with d_i ~ i**exponent, so the
+    step is fine next to the transmitter and widens towards the edge.
     """
-    current_app.logger.info(f"Running P.1546 coverage job {job.id} for project {job.project_id}")
+    index = np.arange(1, int(n_steps) + 1, dtype=float)
+    return float(radius_km) * (index / int(n_steps)) ** exponent
+
 
-    try:
-        # Mark job as running
-        job.status = CoverageStatus.running
-        db.session.commit()
+def grid_geometry(lon_t, lat_t, xcoords, ycoords):
+    """Distance (km) and bearing (rad, 0 to 2 pi) from the transmitter to every map pixel."""
+    lon_grid, lat_grid = np.meshgrid(np.asarray(xcoords, dtype=float), np.asarray(ycoords, dtype=float))
+    dist_q, bearing_q, _ = pathprof.geoid_inverse(
+        lon_t * u.deg, lat_t * u.deg, lon_grid * u.deg, lat_grid * u.deg
+    )
+    dist_map = np.asarray(dist_q.to(u.km).value, dtype=float)
+    bearing_map = np.asarray(bearing_q.to(u.rad).value, dtype=float) % (2.0 * np.pi)
+    return dist_map, bearing_map
 
-        # Get inputs from job.inputs
-        inputs = job.inputs
-        f = inputs.get('frequency')
-        t = inputs.get('time_percentage', 50)
-        h2 = inputs.get('receiver_height', 1.5)
-        R2 = inputs.get('clutter_height', 10)
-        area = inputs.get('area_type', 'Rural')
-        pathinfo = inputs.get('pathinfo', 1)
-        tx_lat = inputs.get('tx_lat')
-        tx_lon = inputs.get('tx_lon')
-        rx_lat = inputs.get('rx_lat')
-        rx_lon = inputs.get('rx_lon')
-        antenna_height_agl = inputs.get('antenna_height_agl')
 
-        # Get DEM and LULC assets
-        dem_asset = Asset.query.filter_by(project_id=job.project_id, type='dem').first()
-        lulc_asset = Asset.query.filter_by(project_id=job.project_id, type='lulc').first()
+def point_geometry(lon_t, lat_t, lons_deg, lats_deg):
+    """Distance (km) and bearing (deg, 0 to 360) from the transmitter to arbitrary points."""
+    dist_q, bearing_q, _ = pathprof.geoid_inverse(
+        lon_t * u.deg, lat_t * u.deg,
+        np.asarray(lons_deg, dtype=float) * u.deg, np.asarray(lats_deg, dtype=float) * u.deg,
+    )
+    return (
+        np.asarray(dist_q.to(u.km).value, dtype=float),
+        np.asarray(bearing_q.to(u.deg).value, dtype=float) % 360.0,
+    )
 
-        if not dem_asset or not lulc_asset:
-            raise Exception("DEM and LULC assets not found for this project.")
 
-        # Calculate effective antenna height (h1)
-        heff = calculate_effective_antenna_height(tx_lat, tx_lon, rx_lat, rx_lon, dem_asset, antenna_height_agl)
+def p452_polar_losses(lon_t, lat_t, n_radials, radius_km, step_km, atten_kwargs,
+                      zone_t=pathprof.CLUTTER.UNKNOWN, zone_r=pathprof.CLUTTER.UNKNOWN):
+    """
+    P.452 losses along radials with pathprof.height_path_data and
+    atten_path_fast, one terrain path per radial instead of one per pixel.
+
+    atten_kwargs holds the atten_path_fast arguments other than hprof_data.
+    Returns the bearings (deg), the distance axis (km) and a dict with the
+    (n_radials, n_distances) loss arrays (dB) keyed like atten_map_fast.
+    """
+    bearings = radial_bearings(n_radials)
+    ends_lon, ends_lat, _ = pathprof.geoid_direct(
+        lon_t * u.deg,
+        lat_t * u.deg,
+        ((bearings + 180.0) % 360.0 - 180.0) * u.deg,
+        float(radius_km) * u.km,
+    )
+    distances = None
+    losses = {}
+    for idx in range(bearings.size):
+        hprof = pathprof.height_path_data(
+            lon_t * u.deg,
+            lat_t * u.deg,
+            ends_lon[idx].to(u.deg),
+            ends_lat[idx].to(u.deg),
+            float(step_km) * u.km,
+            zone_t=zone_t,
+            zone_r=zone_r,
+        )
+        path_dist = np.asarray(hprof['distances'], dtype=float)  # km
+        result = pathprof.atten_path_fast(hprof_data=hprof, **atten_kwargs)
+        if distances is None:
+            distances = path_dist[1:]
+        for key in ('L_b0p', 'L_bd', 'L_bs', 'L_ba', 'L_b', 'L_b_corr'):
+            if result.get(key) is None:
+                continue
+            values = np.asarray(u.Quantity(result[key], u.dB).value, dtype=float)
+            finite = np.isfinite(values) & (values > 0)
+            if not np.any(finite):
+                continue
+            # pycraf returns 0 dB for the first few (too short) paths: hold the nearest valid loss
+            row = np.interp(distances, path_dist[finite], values[finite])
+            losses.setdefault(key, np.full((bearings.size, distances.size), np.nan))[idx] = row
+    return bearings, distances, losses
+
 
-        # Determine path type
-        path_type = get_path_type(tx_lat, tx_lon, rx_lat, rx_lon, lulc_asset)
+def p1546_coverage_grid(lon_t, lat_t, xcoords, ycoords, f_mhz, t_pct, tx_height_m, rx_height_m,
+                        area='Rural', R2=10.0, n_radials=360, step_km=None, distances_km=None,
+                        terrain_sampler=srtm_terrain_sampler, lulc=None):
+    """
+    P.1546 field strength and basic transmission loss over a lon/lat grid.
+
+    The terrain is sampled along n_radials radials, every step_km out to the
+    farthest pixel or at the given distances_km (see radial_distance_axis).
+    P.1546 is evaluated on the radial x distance grid with per-radial heff and
+    per-point terrain clearance angle, and the result is resampled to the
+    (len(ycoords), len(xcoords)) map; pixels beyond the last distance are NaN.
 
-        # Get distance
-        distance_km = geodesic(Point(tx_lat, tx_lon), Point(rx_lat, rx_lon)).km
+    With a clutter.LulcRaster as lulc, every radial point is classified in
+    one gather: the receiver environment (R2/area) comes from its clutter
+    category instead of the area/R2 arguments, and paths crossing water are
+    mixed land/sea paths weighted by their cumulative sea fraction.
+
+    Returns a dict with 'loss_map' (dB), 'field_map' (dB(uV/m) for 1 kW
+    e.r.p.), 'dist_map' (km), 'bearing_map' (rad, as in pathprof) and the
+    per-radial 'radials' summary (bearing, mean terrain, heff and, with
+    lulc, the land/sea fractions of the whole radial). 'mixed_path' tells
+    whether the sea curves were available to weight the water crossings.
+    """
+    dist_map, bearing_map = grid_geometry(lon_t, lat_t, xcoords, ycoords)
 
-        # Run the P.1546 calculation
-        E, L = p1546.bt_loss(f, t, heff, h2, R2, area, [distance_km], [path_type], pathinfo)
+    if distances_km is None:
+        outer_km = min(max(float(np.nanmax(dist_map)), 0.1), 1000.0)
+        if step_km is None:
+            step_km = max(outer_km / 500.0, 0.05)
+        n_steps = max(int(math.ceil(outer_km / float(step_km))), 1)
+        distances = np.linspace(outer_km / n_steps, outer_km, n_steps)
+    else:
+        distances = np.asarray(distances_km, dtype=float)
+    bearings = radial_bearings(n_radials)
 
-        # TODO: Generate output artifacts (GeoTIFF, PNG, etc.)
-        # TODO: Create Asset records for the outputs
+    points = radial_points(lon_t, lat_t, bearings, distances)
+    terrain = sample_radial_terrain(lon_t, lat_t, bearings, distances, terrain_sampler, points=points)
+    params = radial_terrain_parameters(terrain, distances, tx_height_m, rx_height_m)
 
-        job.status = CoverageStatus.succeeded
-        job.metrics = {"field_strength": E, "transmission_loss": L}
-        db.session.commit()
+    sea_fraction = None
+    if lulc is not None:
+        zones, is_sea = clutter.classify(lulc.classes(points[1], points[0]))
+        R2, area = clutter.p1546_receiver_environment(zones)
+        sea_fraction = clutter.sea_fractions(is_sea, distances)
 
-        current_app.logger.info(f"P.1546 coverage job {job.id} completed successfully.")
+    terrain_kwargs = dict(ha=tx_height_m, hb=params['hb'], tca=params['tca'],
+                          htter=params['htter'], hrter=params['hrter'])
+    E, L = p1546.bt_loss_batch(
+        f_mhz, t_pct, params['heff'][:, None], rx_height_m, R2, area, distances[None, :],
+        'Land', 1, **terrain_kwargs,
+    )
+    mixed_path = False
+    if sea_fraction is not None and np.any(sea_fraction > 0):
+        try:
+            E_sea, _ = p1546.bt_loss_batch(
+                f_mhz, t_pct, params['heff'][:, None], rx_height_m, R2, area, distances[None, :],
+                clutter.sea_path_type(lat_t), 1, **terrain_kwargs,
+            )
+        except ValueError:
+            # sea curves not tabulated for this f/t: the paths stay all-land
+            pass
+        else:
+            E = p1546.step_11a_batch(E, E_sea, sea_fraction)
+            L = p1546.step_20a(f_mhz, E)
+            mixed_path = True
 
-    except Exception as e:
-        current_app.logger.error(f"P.1546 coverage job {job.id} failed: {e}")
-        job.status = CoverageStatus.failed
-        job.metrics = {"error": str(e)}
-        db.session.commit()
+    bearing_map_deg = np.degrees(bearing_map)
+    radials = [
+        {
+            'bearing_deg': float(bearing),
+            'avg_terrain_m': round(float(avg), 2),
+            'haat_m': round(float(heff), 2),
+        }
+        for bearing, avg, heff in zip(bearings, params['avg_terrain'], params['heff'])
+    ]
+    if sea_fraction is not None:
+        for item, fraction in zip(radials, sea_fraction[:, -1]):
+            item['sea_fraction'] = round(float(fraction), 4)
+            item['land_fraction'] = round(1.0 - float(fraction), 4)
+    return {
+        'loss_map': polar_to_grid(L, bearings, distances, bearing_map_deg, dist_map),
+        'field_map': polar_to_grid(E, bearings, distances, bearing_map_deg, dist_map),
+        'dist_map': dist_map,
+        'bearing_map': bearing_map,
+        'radials': radials,
+        'haat_average_m': round(float(np.mean(params['heff'])), 2),
+        'mixed_path': mixed_path,
+    }
@@ -0,0 +1,193 @@
+"""
+Web-Mercator tile pyramids for coverage heatmaps, stored as MBTiles.
+
+The heatmap PNG is an equirectangular (plate carrée) raster north up over
+the coverage bounds. For every zoom level the tiles that intersect the
+bounds are reprojected with nearest-neighbour sampling (longitude depends
+only on the tile column and latitude only on the row, so each level is one
+separable gather) and written to an MBTiles SQLite file. Fully transparent
+tiles are not stored.
+"""
+
+from __future__ import annotations
+
+import io
+import math
+import os
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from app_core.overlay_render import TURBO_LUT, colorize
+from app_core.signal_raster import SignalRaster, decode
+
+TILE_SIZE = 256
+MAX_LATITUDE = 85.05112878
+PNG_COMPRESS_LEVEL = 6
+
+_SCHEMA = (
+    "CREATE TABLE metadata (name TEXT, value TEXT)",
+    "CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)",
+    "CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)",
+)
+
+
+def _lon_to_x(lon, zoom):
+    return (np.asarray(lon, dtype=float) + 180.0) / 360.0 * (1 << zoom)
+
+
+def _lat_to_y(lat, zoom):
+    lat_rad = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    return (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * (1 << zoom)
+
+
+def _y_to_lat(y, zoom):
+    n = np.pi * (1.0 - 2.0 * np.asarray(y, dtype=float) / (1 << zoom))
+    return np.degrees(np.arctan(np.sinh(n)))
+
+
+def tile_range(bounds: dict, zoom: int) -> tuple[int, int, int, int]:
+    """Inclusive XYZ tile range (x0, x1, y0, y1) covering the bounds."""
+    scale = 1 << zoom
+    x0 = int(np.clip(math.floor(_lon_to_x(bounds["west"], zoom)), 0, scale - 1))
+    x1 = int(np.clip(math.floor(_lon_to_x(bounds["east"], zoom)), 0, scale - 1))
+    y0 = int(np.clip(math.floor(_lat_to_y(bounds["north"], zoom)), 0, scale - 1))
+    y1 = int(np.clip(math.floor(_lat_to_y(bounds["south"], zoom)), 0, scale - 1))
+    return x0, x1, y0, y1
+
+
+def tile_lonlat(zoom: int, x: int, y: int) -> tuple[np.ndarray, np.ndarray]:
+    """Pixel-centre longitudes and latitudes (TILE_SIZE each) of one XYZ tile."""
+    world = TILE_SIZE * (1 << zoom)
+    offsets = np.arange(TILE_SIZE) + 0.5
+    lons = (x * TILE_SIZE + offsets) / world * 360.0 - 180.0
+    lats = _y_to_lat(y + offsets / TILE_SIZE, zoom)
+    return lons, lats
+
+
+def _encode(tile: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(tile, mode="RGBA").save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+def iter_tiles(rgba: np.ndarray, bounds: dict, zoom: int):
+    """Yields (x, y, png_bytes) for the non-empty tiles of one zoom level."""
+    height, width = rgba.shape[:2]
+    north, south = float(bounds["north"]), float(bounds["south"])
+    west, east = float(bounds["west"]), float(bounds["east"])
+    x0, x1, y0, y1 = tile_range(bounds, zoom)
+
+    world = TILE_SIZE * (1 << zoom)
+    px = np.arange(x0 * TILE_SIZE, (x1 + 1) * TILE_SIZE) + 0.5
+    py = np.arange(y0 * TILE_SIZE, (y1 + 1) * TILE_SIZE) + 0.5
+    lons = px / world * 360.0 - 180.0
+    lats = _y_to_lat(py / TILE_SIZE, zoom)
+    cols = np.floor((lons - west) / (east - west) * width).astype(np.intp)
+    rows = np.floor((north - lats) / (north - south) * height).astype(np.intp)
+    col_ok = (cols >= 0) & (cols < width)
+    row_ok = (rows >= 0) & (rows < height)
+
+    mosaic = rgba[np.clip(rows, 0, height - 1)][:, np.clip(cols, 0, width - 1)]
+    mosaic[~row_ok] = 0
+    mosaic[:, ~col_ok] = 0
+
+    for ty in range(y1 - y0 + 1):
+        for tx in range(x1 - x0 + 1):
+            tile = mosaic[ty * TILE_SIZE:(ty + 1) * TILE_SIZE, tx * TILE_SIZE:(tx + 1) * TILE_SIZE]
+            if not tile[..., 3].any():
+                continue
+            yield x0 + tx, y0 + ty, _encode(np.ascontiguousarray(tile))
+
+
+def build_mbtiles(png_bytes: bytes, bounds: dict, min_zoom: int, max_zoom: int, path, name: str = "coverage") -> int:
+    """Writes the pyramid to path (replacing it atomically) and returns the tile count."""
+    with Image.open(io.BytesIO(png_bytes)) as img:
+        rgba = np.asarray(img.convert("RGBA"))
+
+    path = Path(path)
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    tmp.unlink(missing_ok=True)
+    count = 0
+    conn = sqlite3.connect(tmp)
+    try:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.executemany(
+            "INSERT INTO metadata (name, value) VALUES (?, ?)",
+            [
+                ("name", name),
+                ("format", "png"),
+                ("type", "overlay"),
+                ("minzoom", str(int(min_zoom))),
+                ("maxzoom", str(int(max_zoom))),
+                ("bounds", f"{bounds['west']},{bounds['south']},{bounds['east']},{bounds['north']}"),
+            ],
+        )
+        for zoom in range(int(min_zoom), int(max_zoom) + 1):
+            flip = (1 << zoom) - 1  # MBTiles rows are TMS (origin at the south)
+            rows = [(zoom, x, flip - y, sqlite3.Binary(data)) for x, y, data in iter_tiles(rgba, bounds, zoom)]
+            conn.executemany(
+                "INSERT INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            count += len(rows)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return count
+
+
+def read_tile(path, zoom: int, x: int, y: int) -> bytes | None:
+    """XYZ tile from an MBTiles file, or None when the tile is empty/outside the coverage."""
+    conn = sqlite3.connect(f"file:{Path(path)}?mode=ro", uri=True)
+    try:
+        row = conn.execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (int(zoom), int(x), (1 << int(zoom)) - 1 - int(y)),
+        ).fetchone()
+    finally:
+        conn.close()
+    return bytes(row[0]) if row else None
+
+
+def sample_raster_tile(raster: SignalRaster, band: str, zoom: int, x: int, y: int) -> np.ndarray | None:
+    """
+    Float32 values (dB, NaN where empty) of one XYZ tile read from the signal
+    raster, nearest-neighbour; None when the tile holds no data.
+    """
+    lons, lats = tile_lonlat(zoom, x, y)
+    lon0, dlon, _, lat0, _, dlat = raster.transform
+    rows_n, cols_n = raster.shape
+    cols = np.floor((lons - lon0) / dlon).astype(np.intp)
+    rows = np.floor((lats - lat0) / dlat).astype(np.intp)
+    col_ok = (cols >= 0) & (cols < cols_n)
+    row_ok = (rows >= 0) & (rows < rows_n)
+    if not col_ok.any() or not row_ok.any():
+        return None
+    counts = np.asarray(raster.bands[band])[np.clip(rows, 0, rows_n - 1)][:, np.clip(cols, 0, cols_n - 1)]
+    values = decode(counts)
+    values[~row_ok] = np.nan
+    values[:, ~col_ok] = np.nan
+    if not np.isfinite(values).any():
+        return None
+    return values
+
+
+def band_thresholds(values: np.ndarray, thresholds) -> np.ndarray:
+    """Snaps values to the service threshold below them; NaN under the lowest one."""
+    levels = np.sort(np.asarray(thresholds, dtype=float))
+    with np.errstate(invalid="ignore"):
+        idx = np.searchsorted(levels, values, side="right") - 1
+    banded = np.where(idx >= 0, levels[np.clip(idx, 0, levels.size - 1)], np.nan)
+    banded[~np.isfinite(values)] = np.nan
+    return banded
+
+
+def render_data_tile(values: np.ndarray, vmin: float, vmax: float, lut=TURBO_LUT, thresholds=None) -> bytes:
+    if thresholds:
+        values = band_thresholds(values, thresholds)
+    return _encode(colorize(values, vmin, vmax, lut=lut))
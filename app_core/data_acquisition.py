@@ -9,13 +9,20 @@ from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import requests
-from astropy import units as u
 from flask import current_app
-from pycraf import pathprof
+from rasterio.errors import RasterioError
 from shapely.geometry import Polygon
 
+from . import dem_prefetch, dem_store, lulc_store
 from .models import Asset, AssetType, DatasetSource, DatasetSourceKind, db
-from .storage import ensure_project_path_exists, get_project_asset_path, storage_root
+from .storage import (
+    ensure_project_path_exists,
+    get_project_asset_path,
+    ingest_file,
+    shared_storage_path,
+    storage_root,
+    store_bytes,
+)
 
 MAPBIOMAS_AVAILABLE_YEARS = list(range(1985, 2024))
 _MAPBIOMAS_DEFAULT_YEAR = MAPBIOMAS_AVAILABLE_YEARS[-1]
@@ -58,7 +65,6 @@ def _rehydrate_asset(
     source_kind,
     notes,
     meta,
-    size=None,
     locator=None,
     mime_type='application/octet-stream',
 ):
@@ -78,12 +84,14 @@ def _rehydrate_asset(
         return None
 
     rel_path = get_project_asset_path(project, asset_type, filename)
+    checksum, size = ingest_file(storage_root() / rel_path)
     asset = Asset(
         project_id=project.id,
         type=asset_type,
         path=rel_path,
         mime_type=mime_type,
         byte_size=size,
+        checksum_sha256=checksum,
         meta=meta,
         source_id=source.id,
     )
@@ -92,43 +100,34 @@ def _rehydrate_asset(
     return asset
 
 
-def _hgt_tile_name(lat: float, lon: float) -> str:
-    lat_floor = math.floor(lat)
-    lon_floor = math.floor(lon)
-    ns = "N" if lat_floor >= 0 else "S"
-    ew = "E" if lon_floor >= 0 else "W"
-    return f"{ns}{abs(lat_floor):02d}{ew}{abs(lon_floor):03d}"
+def prefetch_srtm_tiles(tile_names):
+    """
+    Baixa em paralelo (pool limitado) e valida os tiles SRTM indicados no
+    diretório global; retorna o relatório por tile de dem_prefetch.
+    """
+    return dem_prefetch.prefetch_tiles(
+        global_srtm_dir(),
+        tile_names,
+        base_url=current_app.config.get('SRTM_TILE_SERVER') or dem_prefetch.VIEWPANO_BASE_URL,
+        max_workers=current_app.config.get('SRTM_PREFETCH_WORKERS', dem_prefetch.DEFAULT_WORKERS),
+    )
 
 
 def download_srtm_tile(project, lat, lon):
     """
     Garante a presença do tile SRTM1 (.hgt) baixado via viewpano (servidor usado pelo pycraf).
     """
-    tile_name = _hgt_tile_name(lat, lon)
+    tile_name = dem_store.tile_name(lat, lon)
     global_dir = global_srtm_dir()
-    tile_pattern = f"{tile_name}.hgt"
-
-    try:
-        matches = list(global_dir.rglob(tile_pattern))
-        if not matches:
-            with pathprof.SrtmConf.set(srtm_dir=str(global_dir), download='missing', server='viewpano'):
-                pathprof.srtm_height_map(
-                    lon * u.deg,
-                    lat * u.deg,
-                    0.02 * u.deg,
-                    0.02 * u.deg,
-                    map_resolution=1 * u.arcsec,
-                )
-            matches = list(global_dir.rglob(tile_pattern))
-    except Exception as exc:
-        current_app.logger.error("Falha ao baixar SRTM via viewpano: %s", exc)
-        return None
 
-    if not matches:
-        current_app.logger.error("Tile %s não foi encontrado em %s após o download.", tile_name, global_dir)
+    entry = prefetch_srtm_tiles([tile_name]).get(tile_name) or {}
+    if not entry.get('path') or entry.get('status') not in {'ready', 'downloaded'}:
+        current_app.logger.error(
+            "Tile %s indisponível em %s: %s", tile_name, global_dir, entry.get('error') or entry.get('status'),
+        )
         return None
+    local_path = Path(entry['path'])
 
-    local_path = matches[0]
     rel_path = os.path.relpath(local_path, storage_root())
 
     existing = Asset.query.filter_by(project_id=project.id, path=rel_path).order_by(Asset.created_at.desc()).first()
@@ -151,6 +150,7 @@ def download_srtm_tile(project, lat, lon):
         path=rel_path,
         mime_type='application/octet-stream',
         byte_size=file_size,
+        checksum_sha256=entry.get('sha256'),
         meta={'source': 'SRTM1 viewpano', 'tile': tile_name, 'resolution': '1 arc-second'},
         source_id=source.id,
     )
@@ -158,28 +158,50 @@ def download_srtm_tile(project, lat, lon):
     db.session.commit()
     return asset
 
-def download_mapbiomas_tile(project, year):
+def _project_lulc_bounds(project, radius_km=None):
+    """AOI padrão do projeto (posição salva nas configurações), ou None."""
+    settings = getattr(project, 'settings', None) or {}
+    lat = _coerce_float(settings.get('latitude'))
+    lon = _coerce_float(settings.get('longitude'))
+    if lat is None or lon is None:
+        return None
+    radius = radius_km or current_app.config.get('LULC_AOI_RADIUS_KM', 50.0)
+    return lulc_store.aoi_bounds(lat, lon, radius)
+
+
+def download_mapbiomas_tile(project, year, bounds=None):
     """
-    Downloads a MapBiomas Collection 10 tile for a given year.
+    Recorta o mosaico MapBiomas Collection 10 do ano para a AOI do projeto.
+
+    O mosaico nacional fica uma única vez no object store (ligado por
+    shared/lulc/<ano>.tif, download retomável); o projeto recebe apenas um COG da AOI
+    (bounds em lon/lat, padrão: posição do projeto + LULC_AOI_RADIUS_KM).
     """
     year = _normalize_mapbiomas_year(year)
     if year is None:
         return None
+    if bounds is None:
+        bounds = _project_lulc_bounds(project)
+    if bounds is None:
+        current_app.logger.warning(
+            "MapBiomas: projeto %s sem localização para definir a AOI do recorte.", project.slug
+        )
+        return None
     tile_name = f"brazil_coverage_{year}.tif"
     url = f"{MAPBIOMAS_BASE_URL}/{tile_name}"
 
-    asset_filename = f"mapbiomas_collection10_{year}.tif"
+    aoi = lulc_store.aoi_key(bounds)
+    asset_filename = f"mapbiomas_collection10_{year}_{aoi}.tif"
     asset_folder = ensure_project_path_exists(project, 'assets', 'lulc')
     local_path = os.path.join(asset_folder, asset_filename)
     rel_path = get_project_asset_path(project, 'lulc', asset_filename)
 
     if os.path.exists(local_path):
-        current_app.logger.info(f"MapBiomas tile {asset_filename} already exists for project {project.slug}.")
+        current_app.logger.info(f"MapBiomas crop {asset_filename} already exists for project {project.slug}.")
         existing = Asset.query.filter_by(project_id=project.id, path=rel_path).order_by(Asset.created_at.desc()).first()
         if existing:
             return existing
-        size = os.path.getsize(local_path)
-        meta = {'source': 'MapBiomas Collection 10', 'year': year, 'rehydrated': True}
+        meta = {'source': 'MapBiomas Collection 10', 'year': year, 'aoi': aoi, 'bounds': bounds, 'rehydrated': True}
         return _rehydrate_asset(
             project,
             'lulc',
@@ -187,28 +209,28 @@ def download_mapbiomas_tile(project, year):
             DatasetSourceKind.MAPBIOMAS,
             f"MapBiomas Collection 10 tile {year} (rehydratado).",
             meta,
-            size=size,
             locator={'url': url},
             mime_type='image/tiff',
         )
 
-    current_app.logger.info(f"Downloading MapBiomas tile from {url} to {local_path}")
+    current_app.logger.info(f"Cropping MapBiomas {year} to AOI {aoi} into {local_path}")
 
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-
-        with open(local_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        file_size = os.path.getsize(local_path)
+        store = lulc_store.get_store(shared_storage_path('lulc'))
+        crop = store.crop(
+            year,
+            url,
+            bounds,
+            local_path,
+            remote=current_app.config.get('LULC_REMOTE_READS', True),
+        )
+        checksum, file_size = ingest_file(local_path)
 
         source = DatasetSource(
             project_id=project.id,
             kind=DatasetSourceKind.MAPBIOMAS,
-            locator={'url': url},
-            notes=f"MapBiomas Collection 10 tile for year {year}."
+            locator={'url': url, 'mosaic_sha256': crop['mosaic_sha256']},
+            notes=f"MapBiomas Collection 10 tile for year {year}, cropped to AOI {aoi}."
         )
         db.session.add(source)
         db.session.flush()
@@ -219,36 +241,64 @@ def download_mapbiomas_tile(project, year):
             path=rel_path,
             mime_type='image/tiff',
             byte_size=file_size,
-            meta={'source': 'MapBiomas Collection 10', 'year': year},
+            checksum_sha256=checksum,
+            meta={
+                'source': 'MapBiomas Collection 10',
+                'year': year,
+                'aoi': aoi,
+                'bounds': bounds,
+                'raster_bounds': crop['bounds'],
+                'width': crop['width'],
+                'height': crop['height'],
+                'format': 'COG',
+                'read_from': crop['read_from'],
+            },
             source_id=source.id
         )
         db.session.add(asset)
         db.session.commit()
 
-        current_app.logger.info(f"Successfully downloaded and created asset for {asset_filename}.")
+        current_app.logger.info(f"Successfully cropped and created asset for {asset_filename}.")
         return asset
 
-    except requests.exceptions.RequestException as e:
-        current_app.logger.error(f"Failed to download MapBiomas tile: {e}")
+    except (requests.exceptions.RequestException, OSError, ValueError, RasterioError) as e:
+        current_app.logger.error(f"Failed to acquire MapBiomas crop: {e}")
         db.session.rollback()
         return None
 
 
-def ensure_geodata_availability(project, latitude=None, longitude=None, lulc_year=None, fetch_lulc=True):
+def ensure_geodata_availability(project, latitude=None, longitude=None, lulc_year=None, fetch_lulc=True,
+                                radius_km=None):
     """
     Garante que os dados básicos (DEM + LULC) estejam disponíveis para o projeto.
 
+    Com radius_km, todos os tiles SRTM que cobrem o raio são baixados e
+    validados antes do cálculo (summary['dem_tiles']), para que o pycraf
+    não precise baixar nada no meio da propagação.
+
     Retorna um dicionário com os assets e metadados utilizados.
     """
     summary = {
         'dem_asset': None,
         'dem_dir': str(global_srtm_dir()),
+        'dem_tiles': None,
         'lulc_asset': None,
         'lulc_year': None,
     }
     if project is None:
         return summary
 
+    if latitude is not None and longitude is not None and radius_km:
+        try:
+            summary['dem_tiles'] = prefetch_srtm_tiles(
+                dem_prefetch.covering_tiles(float(latitude), float(longitude), float(radius_km))
+            )
+        except Exception as exc:
+            current_app.logger.warning(
+                "geodata.dem.prefetch_failed",
+                extra={"project": getattr(project, "slug", None), "error": str(exc)},
+            )
+
     def _latest_asset(asset_type):
         return (
             Asset.query
@@ -287,13 +337,25 @@ def ensure_geodata_availability(project, latitude=None, longitude=None, lulc_yea
                 target_year = _normalize_mapbiomas_year(current_year)
 
         if target_year is not None:
+            lulc_bounds = None
+            if latitude is not None and longitude is not None:
+                lulc_bounds = lulc_store.aoi_bounds(
+                    float(latitude),
+                    float(longitude),
+                    max(float(radius_km or 0.0), current_app.config.get('LULC_AOI_RADIUS_KM', 50.0)),
+                )
             needs_download = (
                 summary['lulc_asset'] is None
                 or summary.get('lulc_year') != target_year
+                # recortes antigos (ou de outra AOI) que não cobrem a área pedida
+                or (
+                    lulc_bounds is not None
+                    and not lulc_store.covers((summary['lulc_asset'].meta or {}).get('bounds'), lulc_bounds)
+                )
             )
             if needs_download:
                 try:
-                    lulc_asset = download_mapbiomas_tile(project, target_year)
+                    lulc_asset = download_mapbiomas_tile(project, target_year, bounds=lulc_bounds)
                 except Exception as exc:
                     current_app.logger.warning(
                         "geodata.lulc.download_failed",
@@ -470,10 +532,8 @@ def _write_scene_asset(project, scene_data: Dict, radius_km: float):
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     filename = f"rt3d_scene_{timestamp}.geojson"
     local_path = os.path.join(asset_folder, filename)
-    with open(local_path, "w", encoding="utf-8") as fh:
-        json.dump(scene_data, fh)
+    checksum, size_bytes = store_bytes(local_path, json.dumps(scene_data).encode("utf-8"))
     rel_path = get_project_asset_path(project, "buildings", filename)
-    size_bytes = os.path.getsize(local_path)
 
     source = DatasetSource(
         project_id=project.id,
@@ -490,6 +550,7 @@ def _write_scene_asset(project, scene_data: Dict, radius_km: float):
         path=rel_path,
         mime_type="application/geo+json",
         byte_size=size_bytes,
+        checksum_sha256=checksum,
         meta={
             "radius_km": radius_km,
             "source": "osm-overpass",
@@ -0,0 +1,213 @@
+"""
+Up-front download and validation of the SRTM tiles covering a coverage area.
+
+The covering tile set is computed from the study radius, tiles already on
+disk are validated (size of an SRTM1/SRTM3 tile and, once recorded, their
+SHA-256 in the directory manifest) and the missing ones are fetched
+concurrently, one request per viewpano archive, with a bounded thread pool.
+Archives are CRC-checked before the .hgt members are moved into place
+atomically, so the propagation run later finds every tile on disk and never
+blocks on network I/O inside pycraf.
+
+The server only needs viewpano's layout (<base_url>/<archive>.zip holding
+<supertile>/<tile>.hgt), so a local HTTP stand-in can replace it.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from app_core import dem_store
+from app_core.terrain_cache import file_checksum
+
+VIEWPANO_BASE_URL = "http://viewfinderpanoramas.org/dem3/"
+MANIFEST_NAME = "manifest.json"
+# SRTM3 (1201 x 1201) and SRTM1 (3601 x 3601) big-endian int16 tiles
+VALID_TILE_SIZES = frozenset(2 * side * side for side in (1201, 3601))
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 60.0
+KM_PER_DEGREE = 111.32
+
+_manifest_lock = threading.Lock()
+
+
+def covering_tiles(lat: float, lon: float, radius_km: float) -> list[str]:
+    """Names of the 1 deg tiles intersecting the box around (lat, lon)."""
+    dlat = float(radius_km) / KM_PER_DEGREE
+    dlon = float(radius_km) / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return dem_store.tiles_covering(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+
+
+def archive_for_tile(name: str) -> tuple[str, str] | None:
+    """(archive, supertile) of a tile on viewpano, or None for ocean/absent tiles."""
+    try:
+        from pycraf.pathprof.srtm import VIEWPANO_TILES
+    except ImportError:
+        return None
+    matches = VIEWPANO_TILES[VIEWPANO_TILES["tile"] == f"{name}.hgt"]
+    if matches.size == 0:
+        return None
+    return str(matches["zipfile"][0]), str(matches["supertile"][0])
+
+
+def _manifest_path(srtm_dir) -> Path:
+    return Path(srtm_dir) / MANIFEST_NAME
+
+
+def load_manifest(srtm_dir) -> dict:
+    path = _manifest_path(srtm_dir)
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _record(srtm_dir, entries: dict) -> None:
+    if not entries:
+        return
+    with _manifest_lock:
+        manifest = load_manifest(srtm_dir)
+        manifest.update(entries)
+        path = _manifest_path(srtm_dir)
+        tmp = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def validate_tile(path: Path, expected_sha256: str | None = None) -> tuple[bool, str | None, str | None]:
+    """(ok, sha256, error) for a tile file."""
+    size = path.stat().st_size
+    if size not in VALID_TILE_SIZES:
+        return False, None, f"unexpected size {size}"
+    digest = file_checksum(path)
+    if expected_sha256 and digest != expected_sha256:
+        return False, digest, "checksum mismatch"
+    return True, digest, None
+
+
+def _fetch_archive(archive: str, supertile: str, names: set[str], srtm_dir: Path,
+                   base_url: str, timeout: float) -> dict[str, dict]:
+    url = base_url.rstrip("/") + "/" + archive
+    results = {}
+    fd, tmp_name = tempfile.mkstemp(prefix=".download-", suffix=".zip", dir=srtm_dir)
+    try:
+        with os.fdopen(fd, "wb") as fh, requests.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                fh.write(chunk)
+        with zipfile.ZipFile(tmp_name) as archive_file:
+            broken = archive_file.testzip()
+            if broken is not None:
+                raise zipfile.BadZipFile(f"CRC error in {broken}")
+            members = {Path(info.filename).stem.upper(): info for info in archive_file.infolist()
+                       if info.filename.lower().endswith(".hgt")}
+            target_dir = srtm_dir / supertile
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for name in sorted(names):
+                info = members.get(name)
+                if info is None:
+                    results[name] = {"status": "failed", "error": f"{name}.hgt not in {archive}"}
+                    continue
+                target = target_dir / f"{name}.hgt"
+                staging = target.with_name(f"{target.name}.tmp{os.getpid()}-{threading.get_ident()}")
+                with archive_file.open(info) as src, staging.open("wb") as dst:
+                    while chunk := src.read(1024 * 1024):
+                        dst.write(chunk)
+                ok, digest, error = validate_tile(staging)
+                if not ok:
+                    staging.unlink(missing_ok=True)
+                    results[name] = {"status": "invalid", "error": error}
+                    continue
+                os.replace(staging, target)
+                results[name] = {"status": "downloaded", "path": str(target), "sha256": digest}
+    except (OSError, requests.RequestException, zipfile.BadZipFile) as exc:
+        for name in names:
+            results.setdefault(name, {"status": "failed", "error": str(exc)})
+    finally:
+        Path(tmp_name).unlink(missing_ok=True)
+    return results
+
+
+def prefetch_tiles(srtm_dir, names, base_url: str = VIEWPANO_BASE_URL,
+                   max_workers: int = DEFAULT_WORKERS, timeout: float = DEFAULT_TIMEOUT) -> dict[str, dict]:
+    """
+    Makes the given tiles available under srtm_dir. Returns a report per tile
+    with 'status' in ready (already on disk and valid), downloaded,
+    unavailable (no such tile on the server: ocean, filled with zeros by
+    pycraf), invalid or failed, plus 'path'/'sha256' or 'error'.
+    """
+    srtm_dir = Path(srtm_dir)
+    srtm_dir.mkdir(parents=True, exist_ok=True)
+    store = dem_store.get_store(srtm_dir)
+    manifest = load_manifest(srtm_dir)
+    report: dict[str, dict] = {}
+    pending: dict[tuple[str, str], set[str]] = {}
+
+    for name in dict.fromkeys(dem_store.normalize_name(name) for name in names):
+        path = store.tile_path(name)
+        if path is not None:
+            ok, digest, error = validate_tile(path, (manifest.get(name) or {}).get("sha256"))
+            if ok:
+                report[name] = {"status": "ready", "path": str(path), "sha256": digest}
+                continue
+            # set aside (not deleted) so the index stops serving it
+            path.replace(path.with_name(path.name + ".invalid"))
+            report[name] = {"status": "invalid", "path": str(path), "error": error}
+        archive = archive_for_tile(name)
+        if archive is None:
+            report.setdefault(name, {"status": "unavailable"})
+            continue
+        pending.setdefault(archive, set()).add(name)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(pending)))) as pool:
+            futures = [
+                pool.submit(_fetch_archive, archive, supertile, tiles, srtm_dir, base_url, timeout)
+                for (archive, supertile), tiles in pending.items()
+            ]
+            for future in futures:
+                report.update(future.result())
+        store.refresh()
+
+    _record(srtm_dir, {
+        name: {"sha256": entry["sha256"], "size": Path(entry["path"]).stat().st_size}
+        for name, entry in report.items()
+        if entry.get("sha256") and (name not in manifest or entry["status"] == "downloaded")
+    })
+    return report
+
+
+def srtm_download_mode(report: dict[str, dict] | None) -> str:
+    """
+    pycraf srtm_download for an area prefetched into report: 'never' only when
+    every tile is ready or downloaded. A failed, invalid or unavailable tile
+    keeps 'missing', so pycraf retries it instead of silently zero-filling.
+    """
+    if report and all(entry["status"] in {"ready", "downloaded"} for entry in report.values()):
+        return "never"
+    return "missing"
+
+
+def readiness(report: dict[str, dict]) -> dict:
+    """Compact summary of a prefetch report for datasetStatus."""
+    ready = sorted(name for name, entry in report.items() if entry["status"] in {"ready", "downloaded"})
+    return {
+        "total": len(report),
+        "ready": len(ready),
+        "downloaded": sorted(name for name, entry in report.items() if entry["status"] == "downloaded"),
+        "unavailable": sorted(name for name, entry in report.items() if entry["status"] == "unavailable"),
+        "failed": {
+            name: entry.get("error")
+            for name, entry in report.items()
+            if entry["status"] in {"failed", "invalid"}
+        },
+    }
@@ -0,0 +1,226 @@
+"""
+Memory-mapped SRTM tile store.
+
+The .hgt tiles under an SRTM directory are indexed once (tile name -> path,
+searched recursively as pycraf does) and np.memmap-ed read-only on first
+use. Queries only touch the pages they need, and every worker process maps
+the same files, so the OS page cache is shared instead of each request
+decoding whole tiles through pycraf. Heights are bilinear between the tile
+posts; voids (-32768) are left out and the remaining weights renormalised.
+Points whose tile is not on disk come back as NaN so callers can fall back
+to pycraf (which honours SrtmConf.download).
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from astropy import units as u
+from pycraf import pathprof
+
+VOID = -32768
+DTYPE = np.dtype(">i2")
+# a missing tile triggers at most one directory rescan per interval
+INDEX_RESCAN_SECONDS = 10.0
+# geoid_direct rejects distances below 0.1 m
+MIN_DISTANCE_KM = 1e-4
+
+# per-point status codes of sample_status()
+STATUS_OK = 0
+STATUS_VOID_FILLED = 1  # some surrounding posts are voids, interpolated from the rest
+STATUS_VOID = 2  # all four posts are voids
+STATUS_MISSING_TILE = 3
+STATUS_INVALID = 4
+STATUS_NAMES = ("ok", "void_filled", "void", "missing_tile", "invalid")
+
+_stores: dict[str, "DemStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def tile_name(lat: float, lon: float) -> str:
+    """Name (without suffix) of the 1 deg tile whose lower-left corner is below (lat, lon)."""
+    lat_floor = math.floor(lat)
+    lon_floor = math.floor(lon)
+    ns = "N" if lat_floor >= 0 else "S"
+    ew = "E" if lon_floor >= 0 else "W"
+    return f"{ns}{abs(lat_floor):02d}{ew}{abs(lon_floor):03d}"
+
+
+def tiles_covering(south: float, north: float, west: float, east: float) -> list[str]:
+    """Names of every tile tile_name() returns for a point in the box, edges included."""
+    south, north = max(float(south), -90.0), min(float(north), 89.999999)
+    west, east = max(float(west), -180.0), min(float(east), 179.999999)
+    return [
+        tile_name(tile_lat, tile_lon)
+        for tile_lat in range(math.floor(south), math.floor(north) + 1)
+        for tile_lon in range(math.floor(west), math.floor(east) + 1)
+    ]
+
+
+def normalize_name(name: str) -> str:
+    name = Path(str(name)).name
+    if name.lower().endswith(".hgt"):
+        name = name[:-4]
+    return name.upper()
+
+
+class DemStore:
+    """Tile index and memory maps of one SRTM directory."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._index: dict[str, Path] | None = None
+        self._scanned_at = 0.0
+        self._tiles: dict[str, np.memmap] = {}
+        # bumped whenever the set of tiles changes; part of result cache keys
+        self.generation = 0
+
+    def refresh(self) -> dict[str, Path]:
+        """Rescans the directory (call after downloading tiles)."""
+        index: dict[str, Path] = {}
+        if self.root.exists():
+            for path in sorted(self.root.rglob("*.hgt")):
+                index.setdefault(normalize_name(path.name), path)
+        with self._lock:
+            if index != self._index:
+                self.generation += 1
+            self._index = index
+            self._scanned_at = time.monotonic()
+            self._tiles = {name: tile for name, tile in self._tiles.items() if name in index}
+        return index
+
+    def index(self) -> dict[str, Path]:
+        if self._index is None:
+            return self.refresh()
+        return self._index
+
+    def tile_path(self, name: str) -> Path | None:
+        key = normalize_name(name)
+        path = self.index().get(key)
+        if path is not None and path.exists():
+            return path
+        if time.monotonic() - self._scanned_at >= INDEX_RESCAN_SECONDS or path is not None:
+            path = self.refresh().get(key)
+        return path
+
+    def tile(self, name: str) -> np.memmap | None:
+        """Read-only (n, n) big-endian int16 map of the tile, north row first."""
+        key = normalize_name(name)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            return tile
+        path = self.tile_path(key)
+        if path is None:
+            return None
+        size = os.path.getsize(path)
+        side = math.isqrt(size // DTYPE.itemsize)
+        if side < 2 or side * side * DTYPE.itemsize != size:
+            raise ValueError(f"{path} is not a square SRTM tile ({size} bytes)")
+        tile = np.memmap(path, dtype=DTYPE, mode="r", shape=(side, side))
+        with self._lock:
+            tile = self._tiles.setdefault(key, tile)
+        return tile
+
+    def sample(self, lats, lons) -> np.ndarray:
+        """
+        Bilinear heights (m) for broadcastable arrays of points; NaN where the
+        tile is missing or all four surrounding posts are voids.
+        """
+        return self.sample_status(lats, lons)[0]
+
+    def sample_status(self, lats, lons) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Heights as in sample() plus a uint8 STATUS_* code per point. Points are
+        grouped by 1 deg tile so each tile is opened (and paged in) once.
+        """
+        lats, lons = np.broadcast_arrays(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float))
+        shape = lats.shape
+        lats = lats.ravel()
+        lons = lons.ravel()
+        heights = np.full(lats.shape, np.nan)
+        finite = np.isfinite(lats) & np.isfinite(lons) & (np.abs(lats) <= 90.0) & (np.abs(lons) <= 180.0)
+        status = np.where(finite, STATUS_MISSING_TILE, STATUS_INVALID).astype(np.uint8)
+        ilat = np.floor(np.where(finite, lats, 0.0)).astype(np.int64)
+        ilon = np.floor(np.where(finite, lons, 0.0)).astype(np.int64)
+        keys, inverse = np.unique((ilat + 90) * 360 + (ilon + 180), return_inverse=True)
+
+        for position, key in enumerate(keys):
+            members = np.nonzero((inverse == position) & finite)[0]
+            if members.size == 0:
+                continue
+            tile_lat = int(key // 360) - 90
+            tile_lon = int(key % 360) - 180
+            tile = self.tile(tile_name(tile_lat, tile_lon))
+            if tile is None:
+                continue
+            last = tile.shape[0] - 1
+            frow = (tile_lat + 1 - lats[members]) * last
+            fcol = (lons[members] - tile_lon) * last
+            r0 = np.clip(np.floor(frow), 0, last - 1).astype(np.intp)
+            c0 = np.clip(np.floor(fcol), 0, last - 1).astype(np.intp)
+            wr = np.clip(frow - r0, 0.0, 1.0)
+            wc = np.clip(fcol - c0, 0.0, 1.0)
+            total = np.zeros(members.size)
+            weight = np.zeros(members.size)
+            voids = np.zeros(members.size, dtype=bool)
+            for dr, dc, w in ((0, 0, (1 - wr) * (1 - wc)), (1, 0, wr * (1 - wc)),
+                              (0, 1, (1 - wr) * wc), (1, 1, wr * wc)):
+                posts = np.asarray(tile[r0 + dr, c0 + dc], dtype=float)
+                ok = posts != VOID
+                voids |= ~ok & (w > 0)
+                total += np.where(ok, w * posts, 0.0)
+                weight += np.where(ok, w, 0.0)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                heights[members] = np.where(weight > 0, total / weight, np.nan)
+            status[members] = np.where(weight > 0, np.where(voids, STATUS_VOID_FILLED, STATUS_OK), STATUS_VOID)
+        return heights.reshape(shape), status.reshape(shape)
+
+    def profiles(self, lat, lon, bearings_deg, distances_km):
+        """
+        Heights along geodesic radials from (lat, lon): returns
+        (heights, lats, lons), each shaped (n_bearings, n_distances).
+        """
+        bearings = (np.atleast_1d(np.asarray(bearings_deg, dtype=float)) + 180.0) % 360.0 - 180.0
+        distances = np.atleast_1d(np.asarray(distances_km, dtype=float))
+        lons, lats, _ = pathprof.geoid_direct(
+            float(lon) * u.deg,
+            float(lat) * u.deg,
+            bearings[:, None] * u.deg,
+            np.maximum(distances, MIN_DISTANCE_KM)[None, :] * u.km,
+        )
+        lats = np.broadcast_to(lats.to(u.deg).value, (bearings.size, distances.size))
+        lons = np.broadcast_to(lons.to(u.deg).value, (bearings.size, distances.size))
+        return self.sample(lats, lons), lats, lons
+
+    def path_profile(self, lat1, lon1, lat2, lon2, step_m=30.0):
+        """
+        Heights every step_m along the geodesic between two points: returns
+        (distances_m, heights, lats, lons) including both end points.
+        """
+        distance, bearing, _ = pathprof.geoid_inverse(
+            float(lon1) * u.deg, float(lat1) * u.deg,
+            float(lon2) * u.deg, float(lat2) * u.deg,
+        )
+        total_m = float(distance.to(u.m).value)
+        count = max(int(math.ceil(total_m / float(step_m))), 1) + 1
+        distances_m = np.linspace(0.0, total_m, count)
+        heights, lats, lons = self.profiles(
+            lat1, lon1, [float(bearing.to(u.deg).value)], distances_m / 1000.0,
+        )
+        return distances_m, heights[0], lats[0], lons[0]
+
+
+def get_store(root) -> DemStore:
+    """Process-wide store of an SRTM directory."""
+    key = str(Path(root).resolve())
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, DemStore(key))
+    return store
@@ -0,0 +1,430 @@
+"""
+Co-/adjacent-channel interference study of a candidate transmitter.
+
+The stations to protect come from the channel-plan index (app_core.channel_plan):
+every FM/TV station within the study radius whose channel offset from the
+candidate has a protection ratio. For each of them
+
+1. the protected contour is solved on the P.1546 curves (app_core.contours,
+   wanted field at wanted_time_pct, the station's ERP and plan height as
+   heff) - one vectorised bisection per frequency for all stations;
+2. on n_radials points of that contour the candidate's field at
+   interfering_time_pct gives D/U = protected field - E_u, and
+   margin = D/U - protection ratio (negative: the station is interfered);
+3. inside the contour the same check runs on the pixels of a common
+   north-up grid (wanted field - E_u - protection ratio).
+
+Steps 2 and 3 run per station in a spawn-based process pool
+(INTERFERENCE_WORKERS; 0 runs them inline). The per-station windows are
+folded into one raster holding the worst margin per pixel, capped at
+INTERFERENCE_MAX_PIXELS. AM (OM) stations are left out: P.1546 starts at
+30 MHz and medium-wave protection is a ground-wave/sky-wave problem.
+
+The P.1546 figures every step needs are checked before anything is solved
+(require_curves): a missing figure raises p1546.CurvesUnavailable. The
+interfering time percentage defaults to INTERFERING_TIME_PCT only when its
+curves are tabulated, and to 50 % otherwise.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+from . import channel_plan, contours, overlay_render, p1546
+from .contours import PROTECTION_RATIOS_DB
+from .models import Asset, AssetType, Project, db
+from .signal_raster import SignalRaster, encode
+from .storage import ensure_project_path_exists, storage_root, store_bytes
+
+KM_PER_DEGREE = 111.32
+DEFAULT_RADIUS_KM = 300.0
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PIXELS = 1_000_000
+# finest grid step (deg) of the combined raster
+MIN_PIXEL_DEG = 0.005
+MARGIN_SCALE_DB = (-20.0, 20.0)
+INTERFERING_TIME_PCT = 10.0
+# nominal frequencies (MHz) of the P.1546 land curves
+NOMINAL_FREQUENCIES_MHZ = (100.0, 600.0, 2000.0)
+
+_executor: ProcessPoolExecutor | None = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def default_interfering_time_pct() -> float:
+    """INTERFERING_TIME_PCT when its land curves are tabulated, else 50 %."""
+    if any(p1546.missing_figures(f, INTERFERING_TIME_PCT) for f in NOMINAL_FREQUENCIES_MHZ):
+        return 50.0
+    return INTERFERING_TIME_PCT
+
+
+@dataclass(frozen=True)
+class StudyParameters:
+    radius_km: float = DEFAULT_RADIUS_KM
+    wanted_time_pct: float = 50.0
+    interfering_time_pct: float = field(default_factory=default_interfering_time_pct)
+    n_radials: int = 360
+    max_pixels: int = DEFAULT_MAX_PIXELS
+    # overrides of PROTECTION_RATIOS_DB, same layout
+    protection_ratios_db: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_inputs(cls, inputs: dict, max_pixels: int = DEFAULT_MAX_PIXELS) -> "StudyParameters":
+        """Parameters from request keys (ValueError when invalid)."""
+        defaults = cls()
+        ratios = inputs.get("protectionRatiosDb") or {}
+        try:
+            params = cls(
+                radius_km=float(inputs.get("radiusKm") or defaults.radius_km),
+                wanted_time_pct=float(inputs.get("wantedTimePct") or defaults.wanted_time_pct),
+                interfering_time_pct=float(inputs.get("interferingTimePct") or defaults.interfering_time_pct),
+                n_radials=int(inputs.get("radials") or defaults.n_radials),
+                max_pixels=int(max_pixels),
+                protection_ratios_db={str(k).upper(): tuple(float(x) for x in v) for k, v in ratios.items()},
+            )
+        except (TypeError, ValueError, AttributeError):
+            raise ValueError("Invalid interference study parameters.") from None
+        if not 0 < params.radius_km <= contours.MAX_DISTANCE_KM:
+            raise ValueError("Study radius must be between 0 and 1000 km.")
+        if not (1 <= params.wanted_time_pct <= 50 and 1 <= params.interfering_time_pct <= 50):
+            raise ValueError("Time percentages must be between 1 and 50.")
+        if not 4 <= params.n_radials <= 3600:
+            raise ValueError("Radials must be between 4 and 3600.")
+        return params
+
+    def protection_ratio(self, service: str, offset: int) -> float | None:
+        ratios = self.protection_ratios_db.get(service) or PROTECTION_RATIOS_DB.get(service) or ()
+        offset = abs(int(offset))
+        return float(ratios[offset]) if offset < len(ratios) else None
+
+
+@dataclass(frozen=True)
+class Candidate:
+    latitude: float
+    longitude: float
+    frequency_mhz: float
+    erp_kw: float
+    # heff (m) on evenly spaced bearings from north; a single value is omnidirectional
+    heff_m: tuple = (150.0,)
+    service: str = "FM"
+    name: str | None = None
+
+    @classmethod
+    def from_inputs(cls, inputs: dict, heff_m=None) -> "Candidate":
+        """Candidate from request keys; heff_m (per bearing) overrides heightM."""
+        try:
+            latitude = float(inputs["latitude"])
+            longitude = float(inputs["longitude"])
+            frequency = float(inputs["frequency"])
+            erp_kw = float(inputs["erpKw"])
+            heights = tuple(float(h) for h in np.atleast_1d(heff_m if heff_m is not None else inputs["heightM"]))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Candidate needs latitude, longitude, frequency (MHz), erpKw and heightM.") from None
+        if frequency < 30.0:
+            raise ValueError("The interference study covers FM and TV (30 MHz and above).")
+        if erp_kw <= 0 or not heights:
+            raise ValueError("Candidate ERP must be positive.")
+        service = str(inputs.get("service") or channel_plan.service_for(frequency)).upper()
+        if service == "TV":
+            service = "RTV"
+        if service not in PROTECTION_RATIOS_DB or service not in channel_plan.SPACING_MHZ:
+            raise ValueError(f"Unsupported service: {service}")
+        return cls(latitude, longitude, frequency, erp_kw, heights, service, inputs.get("name"))
+
+    def heff_towards(self, bearings_deg) -> np.ndarray:
+        return contours.periodic_interp(self.heff_m, bearings_deg)
+
+    def field(self, t_pct, lats, lons) -> np.ndarray:
+        """Candidate field (dBuV/m) at points."""
+        distances = channel_plan.haversine_km(self.latitude, self.longitude, lats, lons)
+        bearings = channel_plan.azimuth_deg(self.latitude, self.longitude, lats, lons)
+        return contours.field_dbuv(self.frequency_mhz, t_pct, self.heff_towards(bearings), distances, self.erp_kw)
+
+
+def protected_field_dbuv(station: dict) -> float | None:
+    return contours.protected_field_dbuv(station.get("service"), station["frequency_mhz"], station.get("channel"))
+
+
+def select_stations(store, candidate: Candidate, params: StudyParameters) -> list[dict]:
+    """Plan stations of the candidate's service within the radius, on offsets that have a protection ratio."""
+    ratios = params.protection_ratios_db.get(candidate.service) or PROTECTION_RATIOS_DB[candidate.service]
+    return [
+        station
+        for station in store.nearby(candidate.latitude, candidate.longitude, params.radius_km,
+                                    candidate.frequency_mhz, service=candidate.service, adjacent=len(ratios) - 1)
+        if station["service"] == candidate.service
+        and params.protection_ratio(station["service"], station["channel_offset"]) is not None
+    ]
+
+
+def _solvable(station: dict) -> bool:
+    return bool(station.get("erp_kw") and station.get("height_m") is not None and protected_field_dbuv(station))
+
+
+def require_curves(frequency_mhz: float, params: StudyParameters, stations: list[dict] = ()) -> None:
+    """
+    Raises p1546.CurvesUnavailable when a figure the study needs is missing:
+    the candidate's at interfering_time_pct, the stations' at wanted_time_pct.
+    """
+    cases = {(float(frequency_mhz), params.interfering_time_pct)}
+    cases.update((float(station["frequency_mhz"]), params.wanted_time_pct) for station in stations if _solvable(station))
+    p1546.require_figures(cases)
+
+
+def solve_contours(stations: list[dict], params: StudyParameters) -> np.ndarray:
+    """Protected-contour radius (km) of every station; NaN when its data is missing."""
+    radii = np.full(len(stations), np.nan)
+    groups: dict[float, list[int]] = {}
+    for index, station in enumerate(stations):
+        if _solvable(station):
+            groups.setdefault(float(station["frequency_mhz"]), []).append(index)
+    for frequency, members in groups.items():
+        radii[members] = contours.contour_distance_km(
+            frequency,
+            params.wanted_time_pct,
+            [stations[i]["height_m"] for i in members],
+            [stations[i]["erp_kw"] for i in members],
+            [protected_field_dbuv(stations[i]) for i in members],
+        )
+    return radii
+
+
+def _window(transform, shape, lat, lon, radius_km):
+    """Row/column slices of the grid covering a circle, or None outside it."""
+    west, dx, _, north, _, neg_dy = transform
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    rows = (max(int((north - (lat + dlat)) / -neg_dy), 0), min(int(math.ceil((north - (lat - dlat)) / -neg_dy)), shape[0]))
+    cols = (max(int((lon - dlon - west) / dx), 0), min(int(math.ceil((lon + dlon - west) / dx)), shape[1]))
+    if rows[0] >= rows[1] or cols[0] >= cols[1]:
+        return None
+    return slice(*rows), slice(*cols)
+
+
+def study_station(candidate: Candidate, station: dict, contour_km: float, params: StudyParameters, grid):
+    """
+    D/U on the protected contour of one station and its margin window on the
+    grid (transform, shape). Returns (report, (row_slice, col_slice, float32
+    margins) or None). Runs in the pool workers.
+    """
+    service, offset = station["service"], int(station["channel_offset"])
+    ratio = params.protection_ratio(service, offset)
+    protected = protected_field_dbuv(station)
+    report = {
+        key: station.get(key)
+        for key in ("id", "station_id", "source", "municipality", "country", "uf", "service", "class",
+                    "channel", "frequency_mhz", "channel_offset", "distance_km", "azimuth_deg", "erp_kw", "height_m")
+    }
+    report.update({"protected_dbuv": protected, "protection_ratio_db": ratio})
+    if not np.isfinite(contour_km):
+        report["status"] = "missing_data"
+        return report, None
+    if contour_km <= 0:
+        report.update({"status": "no_contour", "contour_km": 0.0})
+        return report, None
+
+    bearings = np.arange(params.n_radials) * (360.0 / params.n_radials)
+    lats, lons = contours.destination(station["latitude"], station["longitude"], bearings, np.full(bearings.shape, contour_km))
+    undesired = candidate.field(params.interfering_time_pct, lats, lons)
+    du = protected - undesired
+    margin = du - ratio
+    worst = int(np.argmin(margin))
+    failing = int(np.count_nonzero(margin < 0))
+    report.update({
+        "status": "interference" if failing else "ok",
+        "contour_km": round(float(contour_km), 3),
+        "min_du_db": round(float(du.min()), 2),
+        "min_margin_db": round(float(margin[worst]), 2),
+        "worst_bearing_deg": round(float(bearings[worst]), 2),
+        "failing_radials": failing,
+        "radials": {
+            "step_deg": 360.0 / params.n_radials,
+            "du_db": np.round(du, 2).tolist(),
+            "margin_db": np.round(margin, 2).tolist(),
+        },
+    })
+
+    transform, shape = grid
+    window = _window(transform, shape, station["latitude"], station["longitude"], contour_km)
+    if window is None:
+        return report, None
+    west, dx, _, north, _, neg_dy = transform
+    rows, cols = window
+    pixel_lats = north + (np.arange(rows.start, rows.stop) + 0.5) * neg_dy
+    pixel_lons = west + (np.arange(cols.start, cols.stop) + 0.5) * dx
+    lat_grid, lon_grid = np.meshgrid(pixel_lats, pixel_lons, indexing="ij")
+    distance = channel_plan.haversine_km(station["latitude"], station["longitude"], lat_grid, lon_grid)
+    inside = distance <= contour_km
+    values = np.full(lat_grid.shape, np.nan, dtype=np.float32)
+    if inside.any():
+        wanted = contours.field_dbuv(
+            station["frequency_mhz"], params.wanted_time_pct, station["height_m"], distance[inside], station["erp_kw"]
+        )
+        undesired = candidate.field(params.interfering_time_pct, lat_grid[inside], lon_grid[inside])
+        values[inside] = wanted - undesired - ratio
+    return report, (rows, cols, values)
+
+
+def _study_task(args):
+    return study_station(*args)
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def study_grid(candidate: Candidate, stations: list[dict], radii, max_pixels: int):
+    """North-up grid (geotransform, shape) over the candidate and every protected contour."""
+    lats, lons, reach = [candidate.latitude], [candidate.longitude], [0.0]
+    for station, radius in zip(stations, radii):
+        if np.isfinite(radius) and radius > 0:
+            lats.append(station["latitude"])
+            lons.append(station["longitude"])
+            reach.append(float(radius))
+    lats, lons, reach = np.asarray(lats), np.asarray(lons), np.asarray(reach)
+    dlat = reach / KM_PER_DEGREE
+    dlon = reach / (KM_PER_DEGREE * np.maximum(np.cos(np.radians(lats)), 0.01))
+    south, north = float((lats - dlat).min()), float((lats + dlat).max())
+    west, east = float((lons - dlon).min()), float((lons + dlon).max())
+    step = max(math.sqrt(max(north - south, MIN_PIXEL_DEG) * max(east - west, MIN_PIXEL_DEG) / max_pixels), MIN_PIXEL_DEG)
+    shape = (max(int(math.ceil((north - south) / step)), 1), max(int(math.ceil((east - west) / step)), 1))
+    return [west, step, 0.0, north, 0.0, -step], shape
+
+
+def run_study(candidate: Candidate, stations: list[dict], params: StudyParameters, workers: int = DEFAULT_WORKERS):
+    """
+    Margin report per station plus the combined worst-margin grid.
+    Returns (reports, transform, shape, margin float32 grid); raises
+    p1546.CurvesUnavailable before solving when a needed figure is missing.
+    """
+    require_curves(candidate.frequency_mhz, params, stations)
+    radii = solve_contours(stations, params)
+    transform, shape = study_grid(candidate, stations, radii, params.max_pixels)
+    tasks = [(candidate, station, float(radius), params, (transform, shape)) for station, radius in zip(stations, radii)]
+    if workers and len(tasks) > 1:
+        try:
+            chunksize = max(len(tasks) // (int(workers) * 4), 1)
+            results = list(_pool(int(workers)).map(_study_task, tasks, chunksize=chunksize))
+        except BrokenProcessPool:
+            # a worker died: drop the pool so the next study starts a fresh one
+            shutdown()
+            raise
+    else:
+        results = [_study_task(task) for task in tasks]
+
+    margin = np.full(shape, np.nan, dtype=np.float32)
+    reports = []
+    for report, window in results:
+        reports.append(report)
+        if window is not None:
+            rows, cols, values = window
+            margin[rows, cols] = np.fmin(margin[rows, cols], values)
+    reports.sort(key=lambda r: (r.get("min_margin_db") is None, r.get("min_margin_db") or 0.0, r["distance_km"]))
+    return reports, transform, shape, margin
+
+
+def summarize(reports: list[dict], transform, margin) -> dict:
+    _, dx, _, north, _, neg_dy = transform
+    lats = north + (np.arange(margin.shape[0]) + 0.5) * neg_dy
+    pixel_km2 = abs(dx * neg_dy) * KM_PER_DEGREE ** 2 * np.cos(np.radians(lats))[:, None]
+    with np.errstate(invalid="ignore"):
+        interfered = margin < 0
+    checked = [r for r in reports if "min_margin_db" in r]
+    return {
+        "stations": len(reports),
+        "stations_checked": len(checked),
+        "stations_interfered": sum(1 for r in checked if r["status"] == "interference"),
+        "worst_margin_db": min((r["min_margin_db"] for r in checked), default=None),
+        "interfered_area_km2": round(float(np.broadcast_to(pixel_km2, margin.shape)[interfered].sum()), 2),
+    }
+
+
+def save_study(project: Project, candidate: Candidate, params: StudyParameters, reports, transform, shape, margin) -> dict:
+    """Store the margin raster and the report under the project; returns the result payload."""
+    study_id = uuid.uuid4().hex
+    root = storage_root()
+    out_dir = ensure_project_path_exists(project, "assets", "interference", study_id)
+    raster = SignalRaster({"margin_db": encode(margin)}, transform)
+    raster_path = out_dir / "margin.npy"
+    sha, size = store_bytes(raster_path, raster.to_bytes())
+    summary = summarize(reports, transform, margin)
+    asset = Asset(
+        project_id=project.id,
+        type=AssetType.other,
+        path=str(raster_path.relative_to(root)),
+        mime_type="application/octet-stream",
+        byte_size=size,
+        checksum_sha256=sha,
+        meta={
+            "kind": "interference_study",
+            "study_id": study_id,
+            "signal_raster": raster.metadata(),
+            "frequency_mhz": candidate.frequency_mhz,
+            **{key: summary[key] for key in ("stations_checked", "stations_interfered", "worst_margin_db")},
+        },
+    )
+    db.session.add(asset)
+    db.session.flush()
+
+    west, dx, _, north, _, neg_dy = transform
+    vmin, vmax = MARGIN_SCALE_DB
+    result = {
+        "study_id": study_id,
+        "candidate": {
+            "latitude": candidate.latitude,
+            "longitude": candidate.longitude,
+            "frequency_mhz": candidate.frequency_mhz,
+            "erp_kw": candidate.erp_kw,
+            "service": candidate.service,
+            "heff_m": round(float(np.mean(candidate.heff_m)), 2),
+            "name": candidate.name,
+        },
+        "parameters": {
+            "radius_km": params.radius_km,
+            "wanted_time_pct": params.wanted_time_pct,
+            "interfering_time_pct": params.interfering_time_pct,
+            "radials": params.n_radials,
+        },
+        "summary": summary,
+        "stations": reports,
+        "bounds": {"north": north, "south": north + shape[0] * neg_dy, "west": west, "east": west + shape[1] * dx},
+        "scale": {"min": vmin, "max": vmax, "unit": "dB"},
+        "images": {
+            "margin": overlay_render.render_grid(margin, vmin, vmax, lut=overlay_render.lut("RdYlGn")),
+            "colorbar": overlay_render.render_colorbar(vmin, vmax, "Margem de proteção (dB)", "RdYlGn"),
+        },
+        "signal_raster": raster.to_payload(),
+        "assets": {"margin": {"id": str(asset.id), "path": asset.path}},
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+    report_path = out_dir / "report.json"
+    store_bytes(report_path, json.dumps(result, ensure_ascii=False).encode("utf-8"))
+    result["report_path"] = str(report_path.relative_to(root))
+    db.session.commit()
+    return result
@@ -0,0 +1,593 @@
+"""
+Local coverage job runner.
+
+The coverage_jobs table is the queue: a job is created 'queued', a worker
+process claims it with a conditional UPDATE (queued -> running), reports
+per-stage progress while it computes and ends it 'succeeded' or 'failed'.
+Cancelling sets the status to 'canceled'; the worker notices it at its next
+progress report (every report is an UPDATE ... WHERE status = 'running')
+and stops there, so cancellation is cooperative at stage granularity.
+
+Workers are spawned processes, each with its own app (create_app) and DB
+connections; the web process only dispatches job ids to the pool, in the
+order and within the limits of app_core.admission. Jobs left 'queued' by a
+previous run of the app are picked up by the first dispatch.
+
+A claimed job records its dispatcher (worker_id(): host, pid and a per-boot
+token) and a heartbeat that every progress report refreshes, as does the
+dispatcher every HEARTBEAT_S while it has jobs in flight. Since the pool
+lives in the web process, a restart or kill leaves its jobs 'running' with
+nobody to finish them: recover(), run by the first dispatch and then every
+RECOVERY_INTERVAL_S, requeues running jobs whose dispatcher is no longer
+alive on this host or whose heartbeat is older than STALE_AFTER_S (failing
+them after MAX_RECOVERIES), and closes network runs whose sites all ended.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+
+from . import admission
+from .models import CoverageJob, CoverageStatus, Project, db
+
+DEFAULT_WORKERS = 2
+# overall progress (%) at the start of each stage of a coverage run
+STAGES = {
+    "queued": 0.0,
+    "datasets": 5.0,
+    "terrain": 20.0,
+    "path_loss": 45.0,
+    "budget": 75.0,
+    "render": 85.0,
+    "persist": 95.0,
+    "done": 100.0,
+}
+TERMINAL = {CoverageStatus.succeeded, CoverageStatus.failed, CoverageStatus.canceled}
+# progress writes closer than this (same stage) are skipped
+PROGRESS_MIN_INTERVAL_S = 1.0
+REDISPATCH_S = 5.0
+HEARTBEAT_S = 30.0
+# a running job not heard from for this long has lost its dispatcher
+STALE_AFTER_S = 180.0
+# a network composition (no progress reports) gets this long
+COMPOSE_STALE_S = 3600.0
+RECOVERY_INTERVAL_S = 60.0
+# orphaned this many times, a job is failed instead of requeued
+MAX_RECOVERIES = 2
+# an open event stream holds a web worker: it is closed after this window
+# and the browser's EventSource reconnects after EVENTS_RETRY_MS
+EVENTS_WINDOW_S = 30.0
+EVENTS_RETRY_MS = 2000
+
+_WORKER_APP = None
+_worker_id = None
+
+
+class JobCanceled(Exception):
+    """Raised inside a worker when its job was canceled."""
+
+
+def worker_id() -> str:
+    """'host:pid:token' of this process; the token tells apart a reused pid."""
+    global _worker_id
+    pid = str(os.getpid())
+    if _worker_id is None or _worker_id.rsplit(":", 2)[1] != pid:
+        _worker_id = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+    return _worker_id
+
+
+def _owner_alive(owner: str | None) -> bool | None:
+    """True for this process, False for a dispatcher gone from this host, None when only the heartbeat can tell."""
+    if not owner:
+        return None
+    if owner == worker_id():
+        return True
+    try:
+        host, pid, _ = owner.rsplit(":", 2)
+        pid = int(pid)
+    except ValueError:
+        return None
+    if host != socket.gethostname():
+        return None
+    if pid == os.getpid():
+        # an earlier run of the app under the same pid (e.g. pid 1 in a container)
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return None
+
+
+class ProgressTracker:
+    """
+    progress(stage, fraction=0.0) callback handed to the computation.
+
+    Each report is a single conditional UPDATE on its own connection (outside
+    the computation's session); no row updated means the job is no longer
+    running, i.e. it was canceled, and JobCanceled is raised.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.stage = None
+        self.percent = None
+        self._last_write = 0.0
+
+    def __call__(self, stage: str, fraction: float = 0.0) -> None:
+        names = list(STAGES)
+        start = STAGES[stage]
+        following = names.index(stage) + 1
+        end = STAGES[names[following]] if following < len(names) else start
+        percent = round(start + (end - start) * min(max(float(fraction), 0.0), 1.0), 1)
+        now = time.monotonic()
+        if (
+            stage == self.stage
+            and now - self._last_write < HEARTBEAT_S
+            and (percent == self.percent or now - self._last_write < PROGRESS_MIN_INTERVAL_S)
+        ):
+            return
+        table = CoverageJob.__table__
+        with db.engine.begin() as conn:
+            updated = conn.execute(
+                update(table)
+                .where(table.c.id == self.job_id, table.c.status == CoverageStatus.running)
+                .values(stage=stage, progress=percent, heartbeat_at=datetime.utcnow())
+            ).rowcount
+        if not updated:
+            raise JobCanceled(str(self.job_id))
+        self.stage, self.percent, self._last_write = stage, percent, now
+
+
+def claim(job_id) -> bool:
+    """queued -> running; False when another dispatcher got it or it was canceled."""
+    table = CoverageJob.__table__
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(table)
+        .where(table.c.id == job_id, table.c.status == CoverageStatus.queued)
+        .values(
+            status=CoverageStatus.running, started_at=now, stage="queued", progress=0.0,
+            worker=worker_id(), heartbeat_at=now,
+        )
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def heartbeat(owner: str | None = None) -> int:
+    """Refresh the heartbeat of the running jobs claimed by owner (this process)."""
+    table = CoverageJob.__table__
+    result = db.session.execute(
+        update(table)
+        .where(table.c.worker == (owner or worker_id()), table.c.status == CoverageStatus.running)
+        .values(heartbeat_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def _orphaned(job: CoverageJob, stale_ids: set) -> bool:
+    alive = _owner_alive(job.worker)
+    return not alive and (alive is False or job.id in stale_ids)
+
+
+def _stale_ids(seconds: float) -> set:
+    """Running jobs whose heartbeat (or start, before the first one) is older than seconds."""
+    last_seen = db.func.coalesce(CoverageJob.heartbeat_at, CoverageJob.started_at)
+    cutoff = datetime.utcnow() - timedelta(seconds=seconds)
+    rows = db.session.query(CoverageJob.id).filter(
+        CoverageJob.status == CoverageStatus.running,
+        db.or_(last_seen.is_(None), last_seen < cutoff),
+    )
+    return {row.id for row in rows}
+
+
+def recover() -> dict:
+    """
+    Requeue the running jobs whose dispatcher is gone (failing those already
+    recovered MAX_RECOVERIES times) and close the network runs whose sites
+    have all ended. Returns {'requeued': n, 'failed': n, 'networks': n}.
+    """
+    from app_core import network
+
+    table = CoverageJob.__table__
+    stats = {"requeued": 0, "failed": 0, "networks": 0}
+    stale_ids = _stale_ids(STALE_AFTER_S)
+    running = CoverageJob.query.filter(CoverageJob.status == CoverageStatus.running).all()
+    parents = [job for job in running if job.parent_id is None and "sites" in (job.inputs or {})]
+    for job in running:
+        if job in parents or not _orphaned(job, stale_ids):
+            continue
+        metrics = dict(job.metrics or {})
+        metrics["recoveries"] = int(metrics.get("recoveries", 0)) + 1
+        if metrics["recoveries"] > MAX_RECOVERIES:
+            metrics["error"] = f"worker lost ({job.worker or 'unknown'})"
+            values = {"status": CoverageStatus.failed, "finished_at": datetime.utcnow(), "metrics": metrics}
+            key = "failed"
+        else:
+            values = {
+                "status": CoverageStatus.queued, "started_at": None, "stage": "queued", "progress": 0.0,
+                "worker": None, "heartbeat_at": None, "metrics": metrics,
+            }
+            key = "requeued"
+        owner = table.c.worker.is_(None) if job.worker is None else table.c.worker == job.worker
+        result = db.session.execute(
+            update(table)
+            .where(table.c.id == job.id, table.c.status == CoverageStatus.running, owner)
+            .values(**values)
+        )
+        db.session.commit()
+        if result.rowcount:
+            stats[key] += 1
+            current_app.logger.warning(
+                "coverage.job.recovered", extra={"job_id": str(job.id), "worker": job.worker, "status": key}
+            )
+
+    # network runs: an interrupted composition is claimed again, a finished one is composed
+    compose_stale = _stale_ids(COMPOSE_STALE_S)
+    for parent in parents:
+        if parent.stage == "render" and _orphaned(parent, compose_stale):
+            db.session.execute(
+                update(table)
+                .where(table.c.id == parent.id, table.c.status == CoverageStatus.running, table.c.stage == "render")
+                .values(stage="path_loss", progress=STAGES["path_loss"], worker=None, heartbeat_at=None)
+            )
+            db.session.commit()
+        db.session.expire_all()
+        children = network.site_jobs(parent.id)
+        if children and all(child.status in TERMINAL for child in children):
+            try:
+                if network.site_finished(parent.id):
+                    stats["networks"] += 1
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception("coverage.network.compose_failed", extra={"job_id": str(parent.id)})
+    return stats
+
+
+def cancel(job: CoverageJob) -> bool:
+    """Cancel a queued or running job (the worker stops at its next report)."""
+    if job.status in TERMINAL:
+        return False
+    table = CoverageJob.__table__
+    values = {"status": CoverageStatus.canceled}
+    # a network run has no worker of its own to close it
+    if job.status == CoverageStatus.queued or "sites" in (job.inputs or {}):
+        values["finished_at"] = datetime.utcnow()
+    pending = [CoverageStatus.queued, CoverageStatus.running]
+    result = db.session.execute(
+        update(table)
+        .where(table.c.id == job.id, table.c.status.in_(pending))
+        .values(**values)
+    )
+    # per-site jobs of a network run go with it
+    db.session.execute(
+        update(table)
+        .where(table.c.parent_id == job.id, table.c.status == CoverageStatus.queued)
+        .values(status=CoverageStatus.canceled, finished_at=datetime.utcnow())
+    )
+    db.session.execute(
+        update(table)
+        .where(table.c.parent_id == job.id, table.c.status == CoverageStatus.running)
+        .values(status=CoverageStatus.canceled)
+    )
+    db.session.commit()
+    db.session.refresh(job)
+    if job.parent_id is not None and job.status in TERMINAL:
+        _site_finished(job.id)
+    return result.rowcount == 1
+
+
+def _finish(job_id, status: CoverageStatus, metrics: dict | None = None) -> None:
+    table = CoverageJob.__table__
+    values = {"status": status, "finished_at": datetime.utcnow()}
+    if metrics is not None:
+        values["metrics"] = metrics
+    db.session.execute(
+        update(table)
+        .where(table.c.id == job_id, table.c.status == CoverageStatus.running)
+        .values(**values)
+    )
+    db.session.commit()
+
+
+def complete(job: CoverageJob, **values) -> None:
+    """
+    running -> succeeded inside the caller's transaction (so the job ends
+    together with the rows it produced), with the conditional UPDATE of
+    _finish. Raises JobCanceled when the job stopped running meanwhile.
+    """
+    table = CoverageJob.__table__
+    db.session.flush()
+    result = db.session.execute(
+        update(table)
+        .where(table.c.id == job.id, table.c.status == CoverageStatus.running)
+        .values(status=CoverageStatus.succeeded, **values)
+    )
+    if result.rowcount != 1:
+        raise JobCanceled(str(job.id))
+    db.session.expire(job, ["status", *values])
+
+
+def _execute(job: CoverageJob, progress: ProgressTracker) -> None:
+    from app_core.routes.ui import run_coverage_job, run_site_job
+
+    if job.parent_id is not None:
+        run_site_job(job, progress)
+    else:
+        run_coverage_job(job, progress)
+
+
+def _site_finished(job_id) -> None:
+    """Let the network run of a per-site job compose once all its sites ended."""
+    from app_core import network
+
+    job = db.session.get(CoverageJob, job_id)
+    if job is None or job.parent_id is None:
+        return
+    try:
+        network.site_finished(job.parent_id)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("coverage.network.compose_failed", extra={"job_id": str(job.parent_id)})
+
+
+def run_job(job_id, claimed: bool = False) -> str:
+    """
+    Run one job in the current app context (claiming it unless the
+    dispatcher already did); returns its final status.
+    """
+    if not claimed and not claim(job_id):
+        job = db.session.get(CoverageJob, job_id)
+        return job.status.value if job else "missing"
+    job = db.session.get(CoverageJob, job_id)
+    if job is None or job.status != CoverageStatus.running:
+        # canceled between dispatch and start
+        return job.status.value if job else "missing"
+    try:
+        _execute(job, ProgressTracker(job_id))
+    except JobCanceled:
+        db.session.rollback()
+        table = CoverageJob.__table__
+        db.session.execute(update(table).where(table.c.id == job_id).values(finished_at=datetime.utcnow()))
+        db.session.commit()
+        current_app.logger.info("coverage.job.canceled", extra={"job_id": str(job_id)})
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.exception("coverage.job.failed", extra={"job_id": str(job_id)})
+        _finish(job_id, CoverageStatus.failed, {
+            "error": str(exc) or exc.__class__.__name__,
+            "traceback": traceback.format_exc(limit=8),
+        })
+    db.session.expire_all()
+    _site_finished(job_id)
+    job = db.session.get(CoverageJob, job_id)
+    return job.status.value
+
+
+def _init_worker() -> None:
+    global _WORKER_APP
+    from app_core import create_app
+
+    _WORKER_APP = create_app()
+
+
+def _worker_main(job_id) -> str:
+    with _WORKER_APP.app_context():
+        try:
+            return run_job(job_id, claimed=True)
+        finally:
+            db.session.remove()
+
+
+class JobRunner:
+    """
+    Process pool of one web process. dispatch() fills its free slots with
+    the jobs admission.next_job() picks, claiming each before handing it
+    over; a finished job frees its slot and dispatches again. Jobs held back
+    only by other processes' load are retried every REDISPATCH_S.
+    """
+
+    def __init__(self, app, max_workers: int | None = None):
+        self.app = app
+        self.max_workers = int(max_workers or app.config.get("COVERAGE_WORKERS") or DEFAULT_WORKERS)
+        self._executor = None
+        self._inflight = 0
+        self._timer = None
+        self._beat_timer = None
+        self._recovered_at = None
+        self._lock = threading.RLock()
+
+    def dispatch(self) -> int:
+        """Start as many eligible queued jobs as there are free slots."""
+        started = 0
+        with self._lock:
+            now = time.monotonic()
+            if self._recovered_at is None or now - self._recovered_at >= RECOVERY_INTERVAL_S:
+                self._recovered_at = now
+                try:
+                    recover()
+                except Exception:
+                    db.session.rollback()
+                    current_app.logger.exception("coverage.job.recover_failed")
+            while self._inflight < self.max_workers:
+                job = admission.next_job()
+                if job is None:
+                    break
+                if not claim(job.id):
+                    continue
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                    )
+                self._inflight += 1
+                started += 1
+                future = self._executor.submit(_worker_main, job.id)
+                future.add_done_callback(functools.partial(self._done, job.id))
+            waiting = CoverageJob.query.filter_by(status=CoverageStatus.queued).count()
+            if waiting and self._inflight == 0 and self._timer is None:
+                self._timer = threading.Timer(REDISPATCH_S, self._redispatch)
+                self._timer.daemon = True
+                self._timer.start()
+            if self._inflight and self._beat_timer is None:
+                self._schedule_beat()
+        return started
+
+    def _schedule_beat(self) -> None:
+        self._beat_timer = threading.Timer(HEARTBEAT_S, self._beat)
+        self._beat_timer.daemon = True
+        self._beat_timer.start()
+
+    def _beat(self) -> None:
+        """Keep the jobs of this dispatcher alive between their progress reports."""
+        with self.app.app_context():
+            try:
+                heartbeat()
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception("coverage.job.heartbeat_failed")
+            finally:
+                db.session.remove()
+        with self._lock:
+            self._beat_timer = None
+            if self._inflight:
+                self._schedule_beat()
+
+    def _redispatch(self) -> None:
+        with self._lock:
+            self._timer = None
+        with self.app.app_context():
+            try:
+                self.dispatch()
+            finally:
+                db.session.remove()
+
+    def _done(self, job_id, future) -> None:
+        with self._lock:
+            self._inflight -= 1
+        if future.cancelled():
+            # pool shut down before the job started: back to the queue
+            with self.app.app_context():
+                try:
+                    table = CoverageJob.__table__
+                    db.session.execute(
+                        update(table)
+                        .where(table.c.id == job_id, table.c.status == CoverageStatus.running)
+                        .values(status=CoverageStatus.queued, started_at=None, worker=None, heartbeat_at=None)
+                    )
+                    db.session.commit()
+                finally:
+                    db.session.remove()
+            return
+        error = future.exception()
+        if error is not None:
+            # the worker process died (BrokenProcessPool): the job cannot end by itself
+            with self._lock:
+                if isinstance(error, BrokenProcessPool):
+                    self._executor = None
+            with self.app.app_context():
+                try:
+                    _finish(job_id, CoverageStatus.failed, {"error": f"worker failure: {error!r}"})
+                    _site_finished(job_id)
+                finally:
+                    db.session.remove()
+        self._redispatch()
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._beat_timer is not None:
+                self._beat_timer.cancel()
+                self._beat_timer = None
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+
+def init_app(app) -> None:
+    app.extensions["coverage_jobs"] = JobRunner(app)
+
+
+def dispatch() -> int:
+    return current_app.extensions["coverage_jobs"].dispatch()
+
+
+def enqueue(project: Project, engine, inputs: dict, interactive: bool = False) -> CoverageJob:
+    """
+    Admit a coverage request (AdmissionError when over budget), queue it
+    and dispatch.
+    """
+    memory_mb = admission.estimate_memory_mb(engine.value, inputs)
+    admission.check_submission(project.user_uuid, memory_mb)
+    job = CoverageJob(
+        project_id=project.id,
+        engine=engine,
+        inputs={**inputs, "projectSlug": project.slug, "coverageEngine": engine.value},
+        status=CoverageStatus.queued,
+        stage="queued",
+        progress=0.0,
+        priority=admission.priority_for(engine.value, inputs, interactive),
+        memory_mb=memory_mb,
+    )
+    db.session.add(job)
+    db.session.commit()
+    dispatch()
+    db.session.refresh(job)
+    return job
+
+
+def status_payload(job: CoverageJob) -> dict:
+    return {
+        "id": str(job.id),
+        "status": job.status.value if job.status else None,
+        "stage": job.stage,
+        "progress": job.progress,
+        "queue_position": admission.queue_position(job),
+        "error": (job.metrics or {}).get("error") if job.status == CoverageStatus.failed else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def stream_status(job_id, interval_s: float = 1.0, window_s: float = EVENTS_WINDOW_S):
+    """
+    Server-sent events with the job status, one per change, until the job
+    ends or window_s passes. A reconnecting client gets the current status
+    as its first event, so nothing is lost between windows.
+    """
+    deadline = time.monotonic() + window_s
+    last = None
+    yield f"retry: {EVENTS_RETRY_MS}\n\n"
+    while True:
+        db.session.expire_all()
+        job = db.session.get(CoverageJob, job_id)
+        if job is None:
+            return
+        payload = status_payload(job)
+        if payload != last:
+            yield f"data: {json.dumps(payload)}\n\n"
+            last = payload
+        if job.status in TERMINAL or time.monotonic() > deadline:
+            return
+        time.sleep(interval_s)
@@ -0,0 +1,287 @@
+"""
+Shared MapBiomas LULC store and per-AOI Cloud-Optimized GeoTIFF crops.
+
+The national mosaics (several GB per year) are kept once per deployment in
+the content-addressed object store of app_core.storage, like every other
+asset. Under <STORAGE_ROOT>/shared/lulc, <year>.tif is the link that keeps
+the year's object referenced (so storage.collect_garbage() drops a mosaic
+once its year is re-fetched) and <year>.json records its SHA-256. Downloads
+go to a .part file and resume with HTTP Range requests after an
+interruption; the complete file is ingested into the store without copying.
+
+Projects never copy a mosaic. They get a small COG cropped to their area of
+interest with a windowed read, either from the shared mosaic when it is
+already on disk or straight from the server through GDAL's /vsicurl/ (which
+only fetches the blocks under the window), and the crop is written with
+internal tiling and mode-resampled overviews so zoomed-out reads stay cheap.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from affine import Affine
+import rasterio
+import rasterio.shutil
+import requests
+from rasterio.io import MemoryFile
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window
+
+from . import storage
+
+KM_PER_DEGREE = 111.32
+DOWNLOAD_CHUNK = 1024 * 1024
+DEFAULT_TIMEOUT = 60.0
+COG_BLOCK_SIZE = 512
+# bounds are rounded before hashing so nearby requests share a crop
+AOI_DECIMALS = 3
+# bounds this close (in pixels) to a pixel edge are treated as on it
+PIXEL_SNAP = 1e-6
+VSICURL_OPTIONS = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "CPL_VSIL_CURL_ALLOWED_EXTENSIONS": ".tif,.tiff",
+    "GDAL_HTTP_MAX_RETRY": "3",
+}
+
+_year_locks: dict[int, threading.Lock] = {}
+_year_locks_guard = threading.Lock()
+
+
+def aoi_bounds(lat: float, lon: float, radius_km: float) -> dict:
+    """Lon/lat box (west, south, east, north) around a point."""
+    dlat = float(radius_km) / KM_PER_DEGREE
+    dlon = float(radius_km) / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return {
+        "west": max(float(lon) - dlon, -180.0),
+        "south": max(float(lat) - dlat, -90.0),
+        "east": min(float(lon) + dlon, 180.0),
+        "north": min(float(lat) + dlat, 90.0),
+    }
+
+
+def aoi_key(bounds: dict) -> str:
+    rounded = ",".join(f"{float(bounds[k]):.{AOI_DECIMALS}f}" for k in ("west", "south", "east", "north"))
+    return hashlib.sha1(rounded.encode("ascii")).hexdigest()[:12]
+
+
+def covers(outer: dict | None, inner: dict) -> bool:
+    """True when the outer box contains the inner one."""
+    if not outer:
+        return False
+    try:
+        return (
+            float(outer["west"]) <= float(inner["west"])
+            and float(outer["south"]) <= float(inner["south"])
+            and float(outer["east"]) >= float(inner["east"])
+            and float(outer["north"]) >= float(inner["north"])
+        )
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def resumable_download(url: str, part_path: Path, timeout: float = DEFAULT_TIMEOUT) -> Path:
+    """
+    Downloads url into part_path, continuing from the bytes already there with
+    a Range request. Raises IOError when the body is shorter than announced
+    (the .part file is kept so the next call resumes).
+    """
+    part_path = Path(part_path)
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with requests.get(url, stream=True, headers=headers, timeout=timeout) as response:
+        if response.status_code == 416 and offset:
+            # nothing left to send: the previous run got the whole body
+            return part_path
+        response.raise_for_status()
+        if response.status_code != 206:
+            offset = 0  # the server ignored the Range header
+        expected = None
+        content_range = response.headers.get("Content-Range", "")
+        if "/" in content_range and not content_range.endswith("/*"):
+            expected = int(content_range.rsplit("/", 1)[1])
+        elif response.headers.get("Content-Length"):
+            expected = offset + int(response.headers["Content-Length"])
+        with part_path.open("ab" if offset else "wb") as fh:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                fh.write(chunk)
+    size = part_path.stat().st_size
+    if expected is not None and size != expected:
+        raise IOError(f"incomplete download of {url}: {size} of {expected} bytes")
+    return part_path
+
+
+def _year_lock(year: int) -> threading.Lock:
+    with _year_locks_guard:
+        return _year_locks.setdefault(int(year), threading.Lock())
+
+
+class LulcStore:
+    """National mosaics in the object store, one link and pointer per year."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _pointer_path(self, year: int) -> Path:
+        return self.root / f"{int(year)}.json"
+
+    def pointer(self, year: int) -> dict | None:
+        try:
+            return json.loads(self._pointer_path(year).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _link_path(self, year: int) -> Path:
+        return self.root / f"{int(year)}.tif"
+
+    def object_path(self, sha256: str) -> Path:
+        return storage.object_path(sha256)
+
+    def mosaic_path(self, year: int) -> Path | None:
+        """Local mosaic of the year, or None when it has not been fetched."""
+        pointer = self.pointer(year)
+        if not pointer or not pointer.get("sha256"):
+            return None
+        path = self.object_path(pointer["sha256"])
+        if not path.exists() or path.stat().st_size != pointer.get("size"):
+            return None
+        return path
+
+    def fetch_mosaic(self, year: int, url: str, timeout: float = DEFAULT_TIMEOUT) -> Path:
+        """Downloads (or resumes) the mosaic of the year and stores it by content."""
+        with _year_lock(year):
+            existing = self.mosaic_path(year)
+            if existing is not None:
+                return existing
+            part = resumable_download(url, self.root / "downloads" / f"{int(year)}.tif.part", timeout=timeout)
+            link = self._link_path(year)
+            os.replace(part, link)
+            sha256, size = storage.ingest_file(link)
+            pointer = {
+                "year": int(year),
+                "url": url,
+                "sha256": sha256,
+                "size": size,
+                "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            path = self._pointer_path(year)
+            tmp = path.with_name(f"{path.name}.tmp{os.getpid()}")
+            tmp.write_text(json.dumps(pointer, indent=1, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, path)
+            return self.object_path(sha256)
+
+    def crop(self, year: int, url: str, bounds: dict, dst, remote: bool = True,
+             timeout: float = DEFAULT_TIMEOUT) -> dict:
+        """
+        Writes the AOI crop of the year's mosaic to dst. Reads from the shared
+        mosaic when present, otherwise through /vsicurl/ (remote=True) and, if
+        that fails, downloads the mosaic once and crops it locally.
+        """
+        mosaic = self.mosaic_path(year)
+        if mosaic is None and remote:
+            try:
+                info = crop_to_cog(f"/vsicurl/{url}", bounds, dst)
+            except (rasterio.errors.RasterioError, OSError):
+                pass
+            else:
+                info.update({"read_from": "remote", "mosaic_sha256": None})
+                return info
+        if mosaic is None:
+            mosaic = self.fetch_mosaic(year, url, timeout=timeout)
+        info = crop_to_cog(mosaic, bounds, dst)
+        info.update({"read_from": "mirror", "mosaic_sha256": mosaic.name})
+        return info
+
+
+def _window(src, bounds: dict) -> Window:
+    """Pixel window (whole pixels, clipped to the raster) covering the lon/lat bounds."""
+    west, south, east, north = (float(bounds[k]) for k in ("west", "south", "east", "north"))
+    if src.crs is not None and not src.crs.is_geographic:
+        west, south, east, north = transform_bounds("EPSG:4326", src.crs, west, south, east, north)
+    t = src.transform
+    if t.b or t.d:
+        raise ValueError("rotated LULC rasters are not supported")
+    # north-up grid: column from x, row from y (e < 0)
+    cols = sorted(((west - t.c) / t.a, (east - t.c) / t.a))
+    rows = sorted(((north - t.f) / t.e, (south - t.f) / t.e))
+    col0 = max(int(math.floor(cols[0] + PIXEL_SNAP)), 0)
+    row0 = max(int(math.floor(rows[0] + PIXEL_SNAP)), 0)
+    col1 = min(int(math.ceil(cols[1] - PIXEL_SNAP)), src.width)
+    row1 = min(int(math.ceil(rows[1] - PIXEL_SNAP)), src.height)
+    if col1 <= col0 or row1 <= row0:
+        raise ValueError("AOI does not intersect the LULC mosaic")
+    return Window(col0, row0, col1 - col0, row1 - row0)
+
+
+def _window_transform(transform: Affine, window: Window) -> Affine:
+    return Affine(
+        transform.a, transform.b, transform.c + window.col_off * transform.a,
+        transform.d, transform.e, transform.f + window.row_off * transform.e,
+    )
+
+
+def crop_to_cog(source, bounds: dict, dst) -> dict:
+    """
+    Windowed read of the AOI from source (path or GDAL URL) written to dst as
+    a DEFLATE COG with mode-resampled overviews. Returns its size and bounds
+    (in the mosaic CRS).
+    """
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    with rasterio.Env(**VSICURL_OPTIONS), rasterio.open(source) as src:
+        window = _window(src, bounds)
+        data = src.read(window=window)
+        profile = {
+            "driver": "GTiff",
+            "count": src.count,
+            "dtype": src.dtypes[0],
+            "width": int(window.width),
+            "height": int(window.height),
+            "crs": src.crs,
+            "transform": _window_transform(src.transform, window),
+            "nodata": src.nodata,
+        }
+        try:
+            colormap = src.colormap(1)
+        except ValueError:
+            colormap = None
+
+    tmp = dst.with_name(f"{dst.name}.tmp{os.getpid()}")
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as mem:
+            mem.write(data)
+            if colormap:
+                mem.write_colormap(1, colormap)
+        with memfile.open() as mem:
+            rasterio.shutil.copy(
+                mem, tmp, driver="COG",
+                COMPRESS="DEFLATE", BLOCKSIZE=COG_BLOCK_SIZE,
+                RESAMPLING="NEAREST", OVERVIEW_RESAMPLING="MODE",
+            )
+    os.replace(tmp, dst)
+    transform = profile["transform"]
+    return {
+        "width": profile["width"],
+        "height": profile["height"],
+        "bounds": {
+            "west": float(transform.c),
+            "south": float(transform.f + profile["height"] * transform.e),
+            "east": float(transform.c + profile["width"] * transform.a),
+            "north": float(transform.f),
+        },
+    }
+
+
+_stores: dict[str, LulcStore] = {}
+
+
+def get_store(root) -> LulcStore:
+    key = str(Path(root).resolve())
+    return _stores.setdefault(key, LulcStore(key))
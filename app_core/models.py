@@ -170,6 +170,20 @@ class CoverageJob(TimestampMixin, db.Model):
     )
     started_at = db.Column(db.DateTime(timezone=True), nullable=True)
     finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    stage = db.Column(db.String(32), nullable=True)
+    progress = db.Column(db.Float, nullable=True)
+    priority = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    memory_mb = db.Column(db.Float, nullable=True)
+    # dispatcher that claimed a running job (app_core.jobs.worker_id) and its last sign of life
+    worker = db.Column(db.String(128), nullable=True)
+    heartbeat_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    # per-site job of a multi-transmitter run (app_core.network)
+    parent_id = db.Column(
+        GUID(),
+        db.ForeignKey("coverage_jobs.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+    )
 
     project = db.relationship("Project", back_populates="coverage_jobs")
     output_asset = db.relationship("Asset", back_populates="coverage_jobs", foreign_keys=[outputs_asset_id])
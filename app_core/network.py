@@ -0,0 +1,457 @@
+"""
+Multi-transmitter (network) coverage.
+
+A project keeps its sites in settings['sites']: each site is the project
+transmitter moved to its own position, with optional per-site overrides
+(height, power, gain, losses, azimuth, tilt, frequency). A network run is a
+parent CoverageJob, running from submit and never dispatched itself, plus
+one queued child per site that the job pool computes like any coverage, in
+parallel within COVERAGE_WORKERS and the memory budget (app_core.admission
+counts the whole network as one run of its user).
+
+Whoever ends the last site composes the network: every site raster is
+resampled onto a common north-up grid (union of the site grids at the
+finest site resolution, capped at NETWORK_MAX_PIXELS) and folded in with
+vectorised per-site updates into
+
+- best_server: index of the strongest site per pixel (-1: no site);
+- max: field of the best server; sum: power sum of all sites;
+- overlap: number of sites at or above the overlap threshold.
+
+With inputs['sfn'] the sites are one single-frequency network and the
+composition adds the C/I stage of app_core.sfn (per-site static delays come
+from the site's delay_us).
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import math
+import uuid
+from datetime import datetime
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import update
+
+from . import admission, overlay_render, sfn
+from . import jobs as coverage_jobs
+from .models import Asset, AssetType, CoverageEngine, CoverageJob, CoverageStatus, Project, db
+from .signal_raster import SignalRaster
+from .storage import ensure_project_path_exists, storage_root, store_bytes
+
+DEFAULT_MAX_SITES = 50
+DEFAULT_MAX_PIXELS = 4_000_000
+DEFAULT_THRESHOLD_DBUV = 35.0
+DEFAULT_SCALE_DBUV = (10.0, 60.0)
+SFN_CI_SCALE_DB = (-10.0, 40.0)
+BAND = "dbuv"
+# site keys copied into the site's job inputs (request overrides of the TX)
+SITE_OVERRIDES = (
+    "frequency",
+    "direction",
+    "tilt",
+    "tower_height",
+    "transmission_power",
+    "antenna_gain",
+    "total_loss",
+)
+
+
+def normalize_sites(raw) -> list[dict]:
+    """Validated site list (ValueError with a message for the API)."""
+    if not isinstance(raw, list):
+        raise ValueError("'sites' must be a list.")
+    sites = []
+    seen = set()
+    for position, entry in enumerate(raw, start=1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Site {position} must be an object.")
+        try:
+            lat = float(entry["latitude"])
+            lon = float(entry["longitude"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Site {position} needs numeric latitude and longitude.") from None
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            raise ValueError(f"Site {position} is outside valid coordinates.")
+        site_id = str(entry.get("id") or uuid.uuid4().hex[:12])
+        if site_id in seen:
+            raise ValueError(f"Duplicate site id: {site_id}.")
+        seen.add(site_id)
+        site = {
+            "id": site_id,
+            "name": str(entry.get("name") or f"Site {position}"),
+            "latitude": lat,
+            "longitude": lon,
+            "enabled": bool(entry.get("enabled", True)),
+        }
+        for key in SITE_OVERRIDES:
+            if entry.get(key) not in (None, ""):
+                site[key] = entry[key]
+        if entry.get("delay_us") not in (None, ""):
+            try:
+                site["delay_us"] = float(entry["delay_us"])
+            except (TypeError, ValueError):
+                raise ValueError(f"Site {position} has a non-numeric delay_us.") from None
+        sites.append(site)
+    limit = int(current_app.config.get("NETWORK_MAX_SITES", DEFAULT_MAX_SITES))
+    if len(sites) > limit:
+        raise ValueError(f"At most {limit} sites per project.")
+    return sites
+
+
+def project_sites(project: Project) -> list[dict]:
+    return list((project.settings or {}).get("sites") or [])
+
+
+def enqueue(project: Project, engine: CoverageEngine, inputs: dict, site_ids=None) -> CoverageJob:
+    """
+    Queue a network run over the enabled sites of the project (or site_ids).
+    ValueError for a bad request, AdmissionError when over budget.
+    """
+    if engine == CoverageEngine.rt3d:
+        raise ValueError("Network coverage is not available for the rt3d engine.")
+    sites = [site for site in project_sites(project) if site.get("enabled", True)]
+    if site_ids:
+        wanted = {str(value) for value in site_ids}
+        sites = [site for site in project_sites(project) if site["id"] in wanted]
+    if not sites:
+        raise ValueError("The project has no sites to compute.")
+    if inputs.get("sfn"):
+        sfn.SfnParameters.from_inputs(inputs)
+
+    memory_mb = admission.estimate_memory_mb(engine.value, inputs)
+    admission.check_submission(project.user_uuid, memory_mb)
+    base = {**inputs, "projectSlug": project.slug, "coverageEngine": engine.value}
+    now = datetime.utcnow()
+    parent = CoverageJob(
+        project_id=project.id,
+        engine=engine,
+        inputs={**base, "sites": sites},
+        status=CoverageStatus.running,
+        started_at=now,
+        stage="path_loss",
+        progress=coverage_jobs.STAGES["path_loss"],
+        priority=admission.PRIORITY_BATCH,
+    )
+    db.session.add(parent)
+    db.session.flush()
+    for site in sites:
+        overrides = {key: site[key] for key in SITE_OVERRIDES if key in site}
+        db.session.add(CoverageJob(
+            project_id=project.id,
+            parent_id=parent.id,
+            engine=engine,
+            inputs={
+                **base,
+                **overrides,
+                "latitude": site["latitude"],
+                "longitude": site["longitude"],
+                "siteId": site["id"],
+            },
+            status=CoverageStatus.queued,
+            stage="queued",
+            progress=0.0,
+            priority=admission.PRIORITY_BATCH,
+            memory_mb=memory_mb,
+        ))
+    db.session.commit()
+    coverage_jobs.dispatch()
+    db.session.refresh(parent)
+    return parent
+
+
+def site_jobs(parent_id) -> list[CoverageJob]:
+    return CoverageJob.query.filter_by(parent_id=parent_id).order_by(CoverageJob.created_at).all()
+
+
+def site_finished(parent_id) -> bool:
+    """
+    Called after a site job ended: updates the run's progress and, for the
+    last site, claims the composition (one conditional UPDATE, so exactly
+    one caller composes). Returns True when this call composed the network.
+    """
+    table = CoverageJob.__table__
+    children = site_jobs(parent_id)
+    done = sum(child.status in coverage_jobs.TERMINAL for child in children)
+    running = [table.c.id == parent_id, table.c.status == CoverageStatus.running]
+    if done < len(children):
+        start, end = coverage_jobs.STAGES["path_loss"], coverage_jobs.STAGES["budget"]
+        db.session.execute(
+            update(table)
+            .where(*running, table.c.stage == "path_loss")
+            .values(progress=round(start + (end - start) * done / max(len(children), 1), 1))
+        )
+        db.session.commit()
+        return False
+    claimed = db.session.execute(
+        update(table)
+        .where(*running, table.c.stage == "path_loss")
+        .values(
+            stage="render", progress=coverage_jobs.STAGES["render"],
+            worker=coverage_jobs.worker_id(), heartbeat_at=datetime.utcnow(),
+        )
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return False
+    parent = db.session.get(CoverageJob, parent_id)
+    try:
+        compose(parent, children)
+    except Exception as exc:
+        db.session.rollback()
+        current_app.logger.exception("coverage.network.failed", extra={"job_id": str(parent_id)})
+        coverage_jobs._finish(parent_id, CoverageStatus.failed, {"error": str(exc) or exc.__class__.__name__})
+    return True
+
+
+def common_grid(transforms_shapes, max_pixels: int = DEFAULT_MAX_PIXELS):
+    """
+    North-up grid covering every (geotransform, shape): union of the extents
+    at the finest pixel size, coarsened evenly when over max_pixels.
+    Returns (geotransform, shape).
+    """
+    west, east, south, north = math.inf, -math.inf, math.inf, -math.inf
+    dx = dy = math.inf
+    for transform, (rows, cols) in transforms_shapes:
+        lon0, dlon, _, lat0, _, dlat = transform
+        lons = (lon0, lon0 + cols * dlon)
+        lats = (lat0, lat0 + rows * dlat)
+        west, east = min(west, *lons), max(east, *lons)
+        south, north = min(south, *lats), max(north, *lats)
+        dx, dy = min(dx, abs(dlon)), min(dy, abs(dlat))
+    if not math.isfinite(dx):
+        raise ValueError("no site grid to combine")
+    cols = math.ceil((east - west) / dx - 1e-9)
+    rows = math.ceil((north - south) / dy - 1e-9)
+    if rows * cols > max_pixels:
+        factor = math.sqrt(rows * cols / max_pixels)
+        dx, dy = dx * factor, dy * factor
+        cols = math.ceil((east - west) / dx - 1e-9)
+        rows = math.ceil((north - south) / dy - 1e-9)
+    return [west, dx, 0.0, north, 0.0, -dy], (rows, cols)
+
+
+def grid_axes(transform, shape):
+    """Pixel-centre longitudes and latitudes of a geotransform."""
+    lon0, dlon, _, lat0, _, dlat = transform
+    rows, cols = shape
+    return lon0 + (np.arange(cols) + 0.5) * dlon, lat0 + (np.arange(rows) + 0.5) * dlat
+
+
+def resample(raster: SignalRaster, transform, shape, band: str = BAND):
+    """
+    Site values on the window of the common grid its raster covers.
+    Returns (row_slice, col_slice, float32 values with NaN where the site
+    has no data).
+    """
+    west, dx, _, north, _, neg_dy = transform
+    dy = -neg_dy
+    lon0, dlon, _, lat0, _, dlat = raster.transform
+    rows, cols = raster.shape
+    r_west, r_east = sorted((lon0, lon0 + cols * dlon))
+    r_south, r_north = sorted((lat0, lat0 + rows * dlat))
+    col0 = max(int(math.floor((r_west - west) / dx)), 0)
+    col1 = min(int(math.ceil((r_east - west) / dx)), shape[1])
+    row0 = max(int(math.floor((north - r_north) / dy)), 0)
+    row1 = min(int(math.ceil((north - r_south) / dy)), shape[0])
+    lons, lats = grid_axes(transform, shape)
+    lat_grid, lon_grid = np.meshgrid(lats[row0:row1], lons[col0:col1], indexing="ij")
+    values, valid = raster.sample(lat_grid.ravel(), lon_grid.ravel(), band)
+    values = np.where(valid, values, np.nan).astype(np.float32).reshape(lat_grid.shape)
+    return slice(row0, row1), slice(col0, col1), values
+
+
+class CompositeGrid:
+    """Running per-pixel reductions over the sites added so far."""
+
+    def __init__(self, shape, threshold: float):
+        self.threshold = float(threshold)
+        self.best_server = np.full(shape, -1, dtype=np.int16)
+        self.max = np.full(shape, -np.inf, dtype=np.float32)
+        self._linear = np.zeros(shape, dtype=np.float64)
+        self.overlap = np.zeros(shape, dtype=np.uint8)
+
+    def add(self, index: int, rows: slice, cols: slice, values) -> None:
+        values = np.asarray(values, dtype=np.float32)
+        valid = np.isfinite(values)
+        current = self.max[rows, cols]
+        better = valid & (values > current)
+        current[better] = values[better]
+        self.best_server[rows, cols][better] = index
+        self._linear[rows, cols] += np.where(valid, 10.0 ** (np.where(valid, values, 0.0) / 10.0), 0.0)
+        self.overlap[rows, cols] += (valid & (values >= self.threshold)).astype(np.uint8)
+
+    @property
+    def covered(self) -> np.ndarray:
+        return self.best_server >= 0
+
+    def max_values(self) -> np.ndarray:
+        return np.where(self.covered, self.max, np.nan).astype(np.float32)
+
+    def sum_values(self) -> np.ndarray:
+        with np.errstate(divide="ignore"):
+            return np.where(self.covered, 10.0 * np.log10(self._linear), np.nan).astype(np.float32)
+
+
+def _bounds(transform, shape) -> dict:
+    west, dx, _, north, _, neg_dy = transform
+    return {
+        "north": north,
+        "south": north + shape[0] * neg_dy,
+        "west": west,
+        "east": west + shape[1] * dx,
+    }
+
+
+def _coerce(value, default):
+    try:
+        return float(value) if value not in (None, "") else default
+    except (TypeError, ValueError):
+        return default
+
+
+def compose(parent: CoverageJob, children: list[CoverageJob]) -> dict:
+    """Build, store and return the composite of the finished site jobs."""
+    project = db.session.get(Project, parent.project_id)
+    inputs = parent.inputs or {}
+    sites = {site["id"]: site for site in inputs.get("sites") or []}
+    threshold = _coerce(inputs.get("overlapThresholdDbuv"), DEFAULT_THRESHOLD_DBUV)
+    vmin = _coerce(inputs.get("minSignalLevel"), DEFAULT_SCALE_DBUV[0])
+    vmax = _coerce(inputs.get("maxSignalLevel"), DEFAULT_SCALE_DBUV[1])
+    root = storage_root()
+
+    succeeded, summary = [], []
+    for child in children:
+        site_id = (child.inputs or {}).get("siteId")
+        entry = {
+            "id": site_id,
+            "name": sites.get(site_id, {}).get("name"),
+            "job_id": str(child.id),
+            "status": child.status.value,
+            "lat": (child.inputs or {}).get("latitude"),
+            "lng": (child.inputs or {}).get("longitude"),
+        }
+        meta = (child.metrics or {}).get("signal_raster")
+        if child.status == CoverageStatus.succeeded and meta:
+            succeeded.append((entry, SignalRaster.load(root / meta["path"], meta)))
+        else:
+            entry["error"] = (child.metrics or {}).get("error")
+        summary.append(entry)
+    if not succeeded:
+        raise RuntimeError("No site of the network finished successfully.")
+
+    max_pixels = int(current_app.config.get("NETWORK_MAX_PIXELS", DEFAULT_MAX_PIXELS))
+    transform, shape = common_grid([(raster.transform, raster.shape) for _, raster in succeeded], max_pixels)
+    grid = CompositeGrid(shape, threshold)
+    for index, (entry, raster) in enumerate(succeeded):
+        entry["index"] = index
+        grid.add(index, *resample(raster, transform, shape))
+
+    covered = grid.covered
+    counts = np.bincount(grid.best_server[covered].ravel(), minlength=len(succeeded))
+    total = max(int(covered.sum()), 1)
+    for entry, _ in succeeded:
+        entry["best_server_pct"] = round(100.0 * counts[entry["index"]] / total, 2)
+        entry["color"] = "#%02x%02x%02x" % tuple(overlay_render.category_colors(len(succeeded))[entry["index"]])
+
+    max_values, sum_values = grid.max_values(), grid.sum_values()
+    overlap = np.where(grid.overlap > 0, grid.overlap, np.nan)
+    lons, lats = grid_axes(transform, shape)
+    bands = {"dbuv": max_values, "dbuv_sum": sum_values}
+    extra_arrays, sfn_summary = {}, None
+    if inputs.get("sfn"):
+        sources = [
+            (raster, entry["lat"], entry["lng"], sites.get(entry["id"], {}).get("delay_us", 0.0))
+            for entry, raster in succeeded
+        ]
+        chunk_mb = float(current_app.config.get("SFN_CHUNK_MB", sfn.DEFAULT_CHUNK_MB))
+        ci_db, sfn_summary = sfn.analyze(sources, transform, shape, sfn.SfnParameters.from_inputs(inputs), chunk_mb)
+        bands["ci"] = ci_db
+        extra_arrays["ci_db"] = ci_db
+    raster = SignalRaster.from_grids(lons, lats, mask=covered, **bands)
+
+    out_dir = ensure_project_path_exists(project, "assets", "coverage", "network", str(parent.id))
+    arrays = io.BytesIO()
+    np.savez_compressed(
+        arrays,
+        best_server=grid.best_server,
+        max_dbuv=max_values,
+        sum_dbuv=sum_values,
+        overlap=grid.overlap,
+        geotransform=np.asarray(transform),
+        **extra_arrays,
+    )
+    arrays_path = out_dir / "composite.npz"
+    sha, size = store_bytes(arrays_path, arrays.getvalue())
+    asset = Asset(
+        project_id=project.id,
+        type=AssetType.other,
+        path=str(arrays_path.relative_to(root)),
+        mime_type="application/octet-stream",
+        byte_size=size,
+        checksum_sha256=sha,
+        meta={
+            "kind": "network_composite",
+            "job_id": str(parent.id),
+            "shape": list(shape),
+            "geotransform": list(transform),
+            "sites": len(succeeded),
+        },
+    )
+    db.session.add(asset)
+    db.session.flush()
+
+    overlap_hist = np.bincount(grid.overlap.ravel(), minlength=len(succeeded) + 1)
+    result = {
+        "network": {
+            "job_id": str(parent.id),
+            "sites": summary,
+            "overlap_threshold_dbuv": threshold,
+            "overlap_histogram": overlap_hist[: len(succeeded) + 1].tolist(),
+        },
+        "bounds": _bounds(transform, shape),
+        "scale": {"min": vmin, "max": vmax, "unit": "dBµV/m"},
+        "images": {
+            "max": overlay_render.render_grid(max_values, vmin, vmax),
+            "sum": overlay_render.render_grid(sum_values, vmin, vmax),
+            "best_server": overlay_render.render_categories(grid.best_server, len(succeeded)),
+            "overlap": overlay_render.render_grid(
+                overlap, 1.0, max(len(succeeded), 2), lut=overlay_render.lut("viridis")
+            ),
+            "colorbar": overlay_render.render_colorbar(vmin, vmax, "Campo (dBµV/m)"),
+        },
+        "signal_raster": raster.to_payload(),
+        "assets": {"composite": {"id": str(asset.id), "path": asset.path}},
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+    if sfn_summary is not None:
+        ci_min, ci_max = SFN_CI_SCALE_DB
+        result["sfn"] = sfn_summary
+        result["images"]["ci"] = overlay_render.render_grid(bands["ci"], ci_min, ci_max)
+        result["images"]["ci_colorbar"] = overlay_render.render_colorbar(ci_min, ci_max, "C/I (dB)")
+
+    result_path = out_dir / "result.json"
+    store_bytes(result_path, json.dumps(result, ensure_ascii=False).encode("utf-8"))
+    db.session.refresh(parent)
+    if parent.status != CoverageStatus.running:
+        # canceled while composing
+        db.session.rollback()
+        return result
+    parent.outputs_asset_id = asset.id
+    parent.metrics = {
+        **(parent.metrics or {}),
+        "result_path": str(result_path.relative_to(root)),
+        "sites": len(summary),
+        "sites_succeeded": len(succeeded),
+        "grid_shape": list(shape),
+    }
+    if sfn_summary is not None:
+        parent.metrics["sfn"] = {key: sfn_summary[key] for key in ("ci_ok_pct", "location_probability_mean")}
+    parent.status = CoverageStatus.succeeded
+    parent.finished_at = datetime.utcnow()
+    parent.stage = "done"
+    parent.progress = 100.0
+    db.session.commit()
+    return result
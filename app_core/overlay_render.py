@@ -0,0 +1,173 @@
+"""
+Direct NumPy -> PNG rendering of coverage overlays.
+
+The field grid is normalised, mapped through a precomputed 256-entry turbo
+LUT, feathered/masked at the coverage edge and encoded by Pillow at the
+native grid resolution, north up, so the PNG matches the grid bounds pixel
+for pixel. The antenna-pattern inset and the colour bar are drawn with
+matplotlib's object API (no pyplot global state) and memoised, since they
+only depend on the pattern and on the scale.
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+from functools import lru_cache
+
+import matplotlib
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import ListedColormap, Normalize
+from matplotlib.figure import Figure
+from PIL import Image
+
+LUT_SIZE = 256
+FEATHER_FRACTION = 0.07
+FEATHER_MIN_KM = 0.5
+PNG_COMPRESS_LEVEL = 6
+# inset side as a fraction of the overlay, as in the former matplotlib layout
+INSET_FRACTION = 0.35
+
+
+@lru_cache(maxsize=16)
+def lut(name: str = "turbo") -> np.ndarray:
+    """256x3 uint8 lookup table of a matplotlib colormap (ValueError if unknown)."""
+    if name not in matplotlib.colormaps:
+        raise ValueError(f"unknown colormap: {name}")
+    table = np.round(matplotlib.colormaps[name](np.linspace(0.0, 1.0, LUT_SIZE))[:, :3] * 255).astype(np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+TURBO_LUT = lut("turbo")
+
+
+def _png_b64(image: Image.Image) -> str:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def _figure_b64(fig: Figure) -> str:
+    buffer = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buffer)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def feather_alpha(dist_km, radius_km) -> np.ndarray:
+    """Opacity ramp (0 to 1) over the last 7 % of the radius (at least 0.5 km)."""
+    width = max(radius_km * FEATHER_FRACTION, FEATHER_MIN_KM)
+    alpha = np.clip((radius_km - np.asarray(dist_km, dtype=float)) / width, 0.0, 1.0)
+    alpha[np.asarray(dist_km) > radius_km] = 0.0
+    return alpha
+
+
+def colorize(values, vmin, vmax, alpha=None, lut=TURBO_LUT) -> np.ndarray:
+    """RGBA uint8 array; NaN pixels are fully transparent."""
+    values = np.asarray(values, dtype=float)
+    span = float(vmax) - float(vmin)
+    if not np.isfinite(span) or span <= 0:
+        span = 1.0
+    finite = np.isfinite(values)
+    scaled = np.where(finite, (values - float(vmin)) / span, 0.0)
+    index = np.clip((scaled * lut.shape[0]).astype(np.intp), 0, lut.shape[0] - 1)
+    rgba = np.empty(values.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = lut[index]
+    opacity = np.ones(values.shape) if alpha is None else np.asarray(alpha, dtype=float)
+    rgba[..., 3] = np.where(finite, np.round(opacity * 255.0), 0).astype(np.uint8)
+    return rgba
+
+
+def render_overlay(values, lats_deg, vmin, vmax, dist_km, radius_km) -> str:
+    """Base64 PNG of the field grid (rows follow lats_deg) masked to radius_km."""
+    rgba = colorize(values, vmin, vmax, feather_alpha(dist_km, radius_km))
+    lats = np.asarray(lats_deg, dtype=float).ravel()
+    if lats.size > 1 and lats[0] < lats[-1]:
+        rgba = rgba[::-1]
+    return _png_b64(Image.fromarray(np.ascontiguousarray(rgba), mode="RGBA"))
+
+
+def render_grid(values, vmin, vmax, lut=TURBO_LUT) -> str:
+    """Base64 PNG of a north-up grid, NaN pixels transparent."""
+    return _png_b64(Image.fromarray(np.ascontiguousarray(colorize(values, vmin, vmax, lut=lut)), mode="RGBA"))
+
+
+def category_colors(count: int, cmap_name: str = "tab20") -> np.ndarray:
+    """count x 3 uint8 colours of a qualitative colormap (cycled)."""
+    return np.round(matplotlib.colormaps[cmap_name](np.arange(count) % 20)[:, :3] * 255).astype(np.uint8)
+
+
+def render_categories(index, count: int, cmap_name: str = "tab20") -> str:
+    """Base64 PNG of a north-up category grid; negative indices are transparent."""
+    index = np.asarray(index)
+    colors = category_colors(max(int(count), 1), cmap_name)
+    valid = index >= 0
+    rgba = np.zeros(index.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = colors[np.where(valid, index, 0)]
+    rgba[..., 3] = np.where(valid, 255, 0)
+    return _png_b64(Image.fromarray(rgba, mode="RGBA"))
+
+
+@lru_cache(maxsize=64)
+def _colorbar_b64(vmin: float, vmax: float, label: str, cmap_name: str) -> str:
+    fig = Figure(figsize=(6, 1))
+    ax = fig.add_subplot()
+    cmap = ListedColormap(lut(cmap_name) / 255.0)
+    scalar_map = ScalarMappable(norm=Normalize(vmin=vmin, vmax=vmax), cmap=cmap)
+    fig.colorbar(scalar_map, cax=ax, orientation="horizontal")
+    ax.set_title(label)
+    fig.tight_layout()
+    fig.patch.set_alpha(0.0)
+    return _figure_b64(fig)
+
+
+def render_colorbar(vmin, vmax, label, cmap_name: str = "turbo") -> str:
+    return _colorbar_b64(round(float(vmin), 2), round(float(vmax), 2), str(label), cmap_name)
+
+
+@lru_cache(maxsize=32)
+def _pattern_inset_b64(pattern_bytes: bytes) -> str:
+    pattern_linear = np.frombuffer(pattern_bytes, dtype=np.float32)
+    fig = Figure(figsize=(2.1, 2.1))
+    fig.patch.set_alpha(0.0)
+    ax = fig.add_axes([0.1, 0.08, 0.8, 0.8], polar=True)
+    azimutes = np.linspace(0, 2 * np.pi, pattern_linear.size, endpoint=False)
+    ax.set_theta_zero_location("N")
+    ax.set_theta_direction(-1)
+    ax.plot(azimutes, pattern_linear, color="#0d47a1", linewidth=2)
+    ax.fill_between(azimutes, 0, pattern_linear, color="#0d47a1", alpha=0.12)
+    ax.set_xticks([])
+    ax.set_yticks([0.25, 0.5, 0.75, 1.0])
+    ax.set_yticklabels(["0.25", "0.50", "0.75", "1.00"], fontsize=7)
+    ax.set_ylim(0.0, 1.05)
+    ax.spines["polar"].set_visible(False)
+    ax.patch.set_alpha(0.0)
+    ax.grid(True, linestyle="--", linewidth=0.6, alpha=0.4)
+    ax.set_title("Diagrama H (E/Emax)", fontsize=8)
+    return _figure_b64(fig)
+
+
+def render_pattern_inset(horizontal_pattern_db) -> str | None:
+    """Base64 PNG of the horizontal pattern (E/Emax), memoised per pattern."""
+    if horizontal_pattern_db is None:
+        return None
+    pattern_db = np.atleast_1d(np.asarray(horizontal_pattern_db, dtype=float))
+    pattern_db = np.nan_to_num(pattern_db, nan=-40.0)
+    pattern_linear = np.clip(10.0 ** (pattern_db / 20.0), 1e-6, None)
+    max_linear = float(np.max(pattern_linear))
+    pattern_linear = np.clip(pattern_linear / (max_linear if max_linear > 0 else 1.0), 0.0, 1.0)
+    return _pattern_inset_b64(np.round(pattern_linear, 4).astype(np.float32).tobytes())
+
+
+def inset_bounds(bounds: dict, center_lat: float, center_lng: float) -> dict:
+    """Square-ish box around the transmitter covering INSET_FRACTION of the overlay."""
+    half_lat = (bounds["north"] - bounds["south"]) * INSET_FRACTION / 2.0
+    half_lon = (bounds["east"] - bounds["west"]) * INSET_FRACTION / 2.0
+    return {
+        "north": center_lat + half_lat,
+        "south": center_lat - half_lat,
+        "east": center_lng + half_lon,
+        "west": center_lng - half_lon,
+    }
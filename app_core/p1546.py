@@ -11,6 +11,53 @@ import datetime
 
 import numpy as np
 
+#              time, path, freq, figure (as defined in ITU-R P.1546-6)
+FIGURE_REC_ARRAY = [[50,   1,  100  , 1],
+                    [10,   1,  100   ,2],
+                    [1,    1,  100   ,3],
+                    [50,   2,  100   ,4],
+                    [10,   3,  100   ,5],
+                    [1,    3,  100   ,6],
+                    [10,   4,  100   ,7],
+                    [1,    4,  100   ,8],
+                    [50,   1,  600   ,9],
+                    [10,   1,  600   ,10],
+                    [1,    1,  600   ,11],
+                    [50,   2,  600   ,12],
+                    [10,   3,  600   ,13],
+                    [1,    3,  600   ,14],
+                    [10,   4,  600   ,15],
+                    [1,    4,  600   ,16],
+                    [50,   1,  2000  ,17],
+                    [10,   1,  2000  ,18],
+                    [1,    1,  2000  ,19],
+                    [50,   2,  2000  ,20],
+                    [10,   3,  2000  ,21],
+                    [1,    3,  2000  ,22],
+                    [10,   4,  2000  ,23],
+                    [1,    4,  2000  ,24]]
+
+# Axes of the tabulated field strengths (Table 1 and Annex 5, Par 4.1)
+NOMINAL_FREQUENCIES = (100, 600, 2000)
+NOMINAL_TIMES = (1, 10, 50)
+PATH_TYPES = ('Land', 'Cold', 'Warm')
+NOMINAL_HEIGHTS = np.array([10, 20, 37.5, 75, 150, 300, 600, 1200])
+NOMINAL_DISTANCES = np.array([
+    1,  2,  3,  4,  5,  6,  7,  8,  9, 10, 11, 12, 13,
+    14, 15, 16, 17, 18, 19, 20, 25, 30, 35, 40, 45, 50,
+    55, 60, 65, 70, 75, 80, 85, 90, 95,100,110,120,130,
+    140,150,160,170,180,190,200,225,250,275,300,325,350,
+    375,400,425,450,475,500,525,550,575,600,625,650,675,
+    700,725,750,775,800,825,850,875,900,925,950,975,1000], dtype=float)
+
+# Field strengths for 1 kW e.r.p. of figures 1-24, indexed by
+# (frequency, time, path type, h1, distance) along the axes above. Figures
+# that are not tabulated are NaN. The 50 % sea curves are stored under both
+# the cold and the warm path types. See build_field_tables().
+FIELD_TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'p1546_tables.npy')
+FIELD_TABLES = np.load(FIELD_TABLES_PATH, mmap_mode='r')
+
+
 def isempty(x):
     if x is None:
         return True
@@ -235,33 +282,7 @@ def bt_loss(f, t, heff, h2, R2, area, d_v, path_c, pathinfo, *args):
             inside_file = 0
         
   
-    #              time, path, freq, figure (as defined in ITU-R P.1546-6)
-    figure_rec_array = [[50,   1,  100  , 1],
-                        [10,   1,  100   ,2],
-                        [1,    1,  100   ,3],
-                        [50,   2,  100   ,4],
-                        [10,   3,  100   ,5],
-                        [1,    3,  100   ,6],
-                        [10,   4,  100   ,7],
-                        [1,    4,  100   ,8],
-                        [50,   1,  600   ,9],
-                        [10,   1,  600   ,10],
-                        [1,    1,  600   ,11],
-                        [50,   2,  600   ,12],
-                        [10,   3,  600   ,13],
-                        [1,    3,  600   ,14],
-                        [10,   4,  600   ,15],
-                        [1,    4,  600   ,16],
-                        [50,   1,  2000  ,17],
-                        [10,   1,  2000  ,18],
-                        [1,    1,  2000  ,19],
-                        [50,   2,  2000  ,20],
-                        [10,   3,  2000  ,21],
-                        [1,    3,  2000  ,22],
-                        [10,   4,  2000  ,23],
-                        [1,    4,  2000  ,24]]
-        
-    figure_rec = np.array(figure_rec_array)
+    figure_rec = np.matrix(FIGURE_REC_ARRAY)
 
     # 3 Determination of transmitting/base antenna height, h1
     # In case of mixed paths, h1 should be calculated using Annex 5, sec. 3
@@ -579,7 +600,7 @@ def bt_loss(f, t, heff, h2, R2, area, d_v, path_c, pathinfo, *args):
     E = E + Correction
     
     if (debug == 1):
-        fid_log.write('Rx repr. clutter height R2\\' (m),S9 (27),14, '+ floatformat %(R2p))
+        fid_log.write('Rx repr. clutter height R2\' (m),S9 (27),14, '+ floatformat %(R2p))
         fid_log.write('Rx antenna height correction (dB),S9 (28-29),14, '+ floatformat %(Correction))
     
     
@@ -701,6 +722,563 @@ def bt_loss(f, t, heff, h2, R2, area, d_v, path_c, pathinfo, *args):
     return E, L
     
     
+def bt_loss_batch(f, t, heff, h2, R2, area, d, path='Land', pathinfo=1, q=50,
+                  wa=None, PTx=1, ha=None, hb=None, R1=None, tca=None,
+                  htter=None, hrter=None, eff1=None, eff2=None):
+    """
+    P1546.bt_loss_batch: Vectorised basic transmission loss according to
+    Recommendation ITU-R P.1546-6
+
+    E, L = P1546.bt_loss_batch(f, t, heff, h2, R2, area, d, path, pathinfo, ...)
+
+    Array counterpart of bt_loss for single-zone paths. The scalar inputs
+    (f, t, h2, R2, area, path, pathinfo, q, wa, PTx) have the same meaning
+    as in bt_loss; R2 and area may also be given per point (land areas,
+    q = 50) for receivers in different clutter. Mixed land/sea paths are
+    combined from an all-land and an all-sea run with step_11a_batch. The
+    per-point inputs below are NumPy-broadcast against each other, so a
+    whole radial x distance grid is evaluated in one pass:
+
+    heff:     m       effective height of the transmitting/base antenna
+    d:        km      horizontal path length (0 < d <= 1000)
+    ha, hb, R1, tca, htter, hrter, eff1, eff2:
+                      optional, as in bt_loss (None when not available)
+
+    Returns the field strength E (dB(uV/m)) for PTx kW e.r.p. and the basic
+    transmission loss L (dB) as arrays of the broadcast shape. Results match
+    bt_loss evaluated point by point with d_v=[d] and path_c=[path].
+
+    Example:
+
+    E, L = P1546.bt_loss_batch(100, 50, heff_grid, 1.5, 10, 'Rural',
+                               dist_grid, 'Land', 1)
+    """
+
+    is_out_of_bounds(f, 30, 4000, 'f')
+
+    if is_out_of_bounds(t, 1, 50, 't'):
+        raise ValueError("Out of bounds")
+
+    path = path.strip().capitalize()
+    if path not in ('Land', 'Sea', 'Warm', 'Cold'):
+        raise ValueError('P1546.bt_loss_batch error: Wrong value in the variable "path".')
+    generalPath = 'Land' if path == 'Land' else 'Sea'
+
+    optional = [ha, hb, R1, tca, htter, hrter, eff1, eff2]
+    optional = [None if isempty(x) else np.asarray(x, dtype=float) for x in optional]
+    arrays = np.broadcast_arrays(np.asarray(d, dtype=float),
+                                 np.asarray(heff, dtype=float),
+                                 *[x for x in optional if x is not None])
+    d, heff = arrays[0], arrays[1]
+    rest = iter(arrays[2:])
+    ha, hb, R1, tca, htter, hrter, eff1, eff2 = [
+        None if x is None else next(rest) for x in optional
+    ]
+
+    if np.any(d <= 0) or np.any(d > 1000):
+        raise ValueError("Out of bounds")
+
+    if (htter is None) != (hrter is None):
+        raise ValueError('P1546.bt_loss_batch error: htter and hrter must be given together.')
+    terrain = () if htter is None else (htter, hrter)
+
+    # Step 3: transmitting/base antenna height
+    h1 = h1_calc_batch(d, heff, ha, hb, generalPath, pathinfo)
+    h1 = np.minimum(h1, 3000.0)
+    if np.any(np.isnan(h1)):
+        raise ValueError('P1546.bt_loss_batch error: h1 is nan')
+
+    if (pathinfo == 1 and q != 50):
+        if (wa is None or np.isnan(wa) or wa <= 0):
+            raise ValueError(' "wa" needs to be defined when path is known (pathinfo = 1)')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # Step 19 (Emax), with the slope-path correction of Step 16 if needed
+        if generalPath == 'Land':
+            EmaxF = step_19a(t, d, 0.0)
+        else:
+            EmaxF = step_19a(t, 0.0, d)
+
+        if ha is not None:
+            EmaxF = EmaxF + step_16a(ha, h2, d, *terrain)
+
+        # Steps 6 to 10 are evaluated at 1 km for shorter paths (Step 17)
+        deff = np.maximum(d, 1.0)
+        E = step6_10_batch(h1, deff, path, f, EmaxF, t)
+
+        # Step 12: terrain clearance angle correction
+        if tca is not None:
+            E = E + step_12a_batch(f, tca)
+
+        # Step 13: tropospheric scattering
+        if eff1 is not None and eff2 is not None:
+            E = np.maximum(E, step_13a_batch(deff, f, t, eff1, eff2))
+
+        # Step 14: receiving/mobile antenna height correction
+        E = E + step_14a_batch(h1, d, R2, h2, f, area)
+
+        # Step 15: transmitting/base clutter correction
+        if ha is not None and R1 is not None:
+            E = E + step_15a_batch(ha, R1, f)
+
+        # Step 16: slope-path correction
+        if ha is not None:
+            E = E + step_16a(ha, h2, deff, *terrain)
+
+        # Step 17: paths shorter than 1 km
+        if np.any(d < 1):
+            if ha is None:
+                raise ValueError('Input arguments ha, h2, d, or Esup not defined.')
+            E = np.where(d < 1, step_17a_batch(ha, h2, d, E, *terrain), E)
+
+        # Step 18: location variability
+        if (abs(q - 50.0) > 0):
+            if not isinstance(area, str):
+                raise ValueError('P1546.bt_loss_batch error: per-point areas require q = 50.')
+            E = step_18a(E, q, f, pathinfo, wa, area)
+
+        # Step 19: limit to the maximum field strength
+        E = np.minimum(E, EmaxF)
+
+        # Step 20: equivalent basic transmission loss for 1 kW
+        L = step_20a(f, E)
+
+    E = E + 10.0 * np.log10(PTx)
+
+    return E, L
+
+
+def figure_number(time, path, fnom):
+    """
+    Returns the figure number (1-24) of ITU-R P.1546-6 tabulating the
+    nominal percentage time, path type ('Land', 'Sea', 'Warm', 'Cold') and
+    nominal frequency, following the selection made in step6_10.
+    When a sea curve is not tabulated for the given time, the cold sea
+    curve is used, as in bt_loss.
+    """
+    if path == 'Land':
+        code = 1
+    elif time == 50:
+        code = 2
+    elif path == 'Warm':
+        code = 4
+    else:
+        code = 3
+    for row in FIGURE_REC_ARRAY:
+        if row[0] == time and row[1] == code and row[2] == fnom:
+            return row[3]
+    raise ValueError('No figure for t = %g, path = %s, f = %g' % (time, path, fnom))
+
+
+def figure_index(fig):
+    """
+    fi, ti, pi = figure_index(fig)
+
+    Returns the frequency and time indices and the list of path-type indices
+    under which figure fig (1-24) is stored in FIELD_TABLES.
+    """
+    time, code, fnom, _ = FIGURE_REC_ARRAY[fig - 1]
+    paths = {1: [0], 2: [1, 2], 3: [1], 4: [2]}[code]
+    return NOMINAL_FREQUENCIES.index(fnom), NOMINAL_TIMES.index(time), paths
+
+
+def figure_table(fig):
+    """
+    values = figure_table(fig)
+
+    Returns the field strengths E[h1, d] (dB(uV/m)) of figure fig as a
+    read-only view of FIELD_TABLES, with the nominal heights and distances
+    of NOMINAL_HEIGHTS and NOMINAL_DISTANCES along its axes.
+    """
+    fi, ti, paths = figure_index(fig)
+    values = FIELD_TABLES[fi, ti, paths[0]]
+    if np.isnan(values[0, 0]):
+        raise ValueError('P1546: the tabulated values of figure %d are not available.' % fig)
+    return values
+
+
+def required_figures(f, t, path='Land'):
+    """
+    figs = required_figures(f, t, path)
+
+    Returns the figure numbers whose tabulated values bt_loss_batch
+    interpolates for frequency f (MHz), percentage time t and path type,
+    following the nominal values selected in step6_10_batch and step7_batch.
+    """
+    path = path.strip().capitalize()
+    tinf, tsup = search_closest([1, 10, 50], t)
+    finf, fsup = search_closest([100, 600, 2000], f)
+    times = [tsup] if tinf == tsup else [tinf, tsup]
+    frequencies = [fsup] if finf == fsup else [finf, fsup]
+    return sorted(set(figure_number(time, path, fnom) for time in times for fnom in frequencies))
+
+
+def missing_figures(f, t, path='Land'):
+    """
+    figs = missing_figures(f, t, path)
+
+    Returns the figures of required_figures(f, t, path) whose tabulated
+    values are not in FIELD_TABLES (empty when bt_loss_batch can run).
+    """
+    missing = []
+    for fig in required_figures(f, t, path):
+        try:
+            figure_table(fig)
+        except ValueError:
+            missing.append(fig)
+    return missing
+
+
+class CurvesUnavailable(LookupError):
+    """
+    The tabulated values a prediction needs are not in FIELD_TABLES; a
+    condition of the installed data, not of the request.
+    """
+
+    def __init__(self, figures):
+        self.figures = sorted(set(figures))
+        super().__init__(
+            'P1546: the tabulated values of figure(s) %s are not available.'
+            % ', '.join(str(fig) for fig in self.figures)
+        )
+
+
+def require_figures(cases, path='Land'):
+    """
+    require_figures([(f, t), ...], path)
+
+    Raises CurvesUnavailable listing every figure that bt_loss_batch would
+    need for the (frequency, percentage time) pairs and that is missing.
+    """
+    missing = set()
+    for f, t in cases:
+        missing.update(missing_figures(f, t, path))
+    if missing:
+        raise CurvesUnavailable(missing)
+
+
+def build_field_tables(tables):
+    """
+    cube = build_field_tables(tables)
+
+    Assembles FIELD_TABLES from a dict mapping figure numbers to the
+    tabulated values of ITU-R P.1546-6 in the layout of the Excel sheets
+    (range 'B6:K84'): a header row with the nominal heights h1 followed by
+    one row per distance holding the distance and the field strengths for
+    each height. Figures missing from the dict are left as NaN.
+    """
+    cube = np.full((len(NOMINAL_FREQUENCIES), len(NOMINAL_TIMES), len(PATH_TYPES),
+                    len(NOMINAL_HEIGHTS), len(NOMINAL_DISTANCES)), np.nan)
+    for fig, table in tables.items():
+        table = np.asarray(table, dtype=float)
+        if not np.array_equal(table[0, 1:9], NOMINAL_HEIGHTS):
+            raise ValueError('Figure %d: unexpected nominal heights %s' % (fig, table[0, 1:9]))
+        distances, rows = np.unique(table[1:, 0], return_index=True)
+        if not np.array_equal(distances, NOMINAL_DISTANCES):
+            raise ValueError('Figure %d: unexpected nominal distances' % fig)
+        fi, ti, paths = figure_index(fig)
+        for pi in paths:
+            cube[fi, ti, pi] = table[1:, 1:9][rows].T
+    return cube
+
+
+def nominal_interval(nominals, x):
+    """
+    k, w = nominal_interval(nominals, x)
+
+    Vectorised search_closest followed by the log interpolation weight used
+    in equations (8), (13) and (14): x lies between nominals[k] and
+    nominals[k + 1] with weight w, extrapolating beyond the end values.
+    """
+    k = np.clip(np.searchsorted(nominals, x, side='right') - 1, 0, len(nominals) - 2)
+    w = np.log10(x / nominals[k]) / np.log10(nominals[k + 1] / nominals[k])
+    return k, w
+
+
+def step814_815_batch(values, k, d):
+    """
+    E = step814_815_batch(values, k, d)
+
+    Vectorised Steps 8.1.4 and 8.1.5: field strength for the nominal height
+    index k (scalar or array) interpolated in log(d) between the nominal
+    distances of Table 1 (equation (13)).
+    """
+    i, w = nominal_interval(NOMINAL_DISTANCES, d)
+    Einf = values[k, i]
+    return Einf + (values[k, i + 1] - Einf) * w
+
+
+def step81_batch(values, h1, d, Emax):
+    """
+    E = step81_batch(values, h1, d, Emax)
+
+    Vectorised Step 8.1 (h1 >= 10 m): one gather of the four surrounding
+    nominal (h1, d) values, interpolated in log(d) (equation (13)) and
+    log(h1) (equation (8)), limited to Emax. Values of h1 below 10 m are
+    evaluated as 10 m.
+    """
+    k, wh = nominal_interval(NOMINAL_HEIGHTS, np.maximum(h1, 10.0))
+    i, wd = nominal_interval(NOMINAL_DISTANCES, d)
+    E00 = values[k, i]
+    E10 = values[k + 1, i]
+    Einf = E00 + (values[k, i + 1] - E00) * wd
+    Esup = E10 + (values[k + 1, i + 1] - E10) * wd
+    return np.minimum(Einf + (Esup - Einf) * wh, Emax)
+
+
+def step82_batch(values, h1, d, path, fnom, f, Emaxvalue, t):
+    """
+    E = step82_batch(values, h1, d, path, fnom, f, Emaxvalue, t)
+
+    Vectorised Step 8.2 (h1 < 10 m) following Annex 5, Par 4.2 and 4.3 b).
+    path is either 'Land' or 'Sea'.
+    """
+    E10 = step814_815_batch(values, 0, d)
+    E20 = step814_815_batch(values, 1, d)
+
+    v = V(fnom, -10.)
+    Jneg10 = J(v) if v > -0.7806 else 0.0
+    Ch1neg10 = 6.03 - Jneg10                     # equ'n (12)
+    C1020 = E10 - E20                            # equ'n (9b)
+    Ezero = E10 + 0.5 * (C1020 + Ch1neg10)       # equ'n (9a)
+    Epos = Ezero + 0.1 * h1 * (E10 - Ezero)      # equ'n (9)
+
+    if path == 'Land':
+        v = V_batch(fnom, np.minimum(h1, 0.0))
+        Jh1 = np.where(v > -0.7806, J(v), 0.0)
+        return np.where(h1 >= 0, Epos, Ezero + 6.03 - Jh1)
+
+    h1 = np.maximum(h1, 1.0)
+    Dh1 = d06_batch(f, h1, 10.)                  # equ'n (10a)
+    D20 = d06(f, 20., 10.)                       # equ'n (10b)
+
+    E10D20 = step814_815_batch(values, 0, D20)
+    E20D20 = step814_815_batch(values, 1, D20)
+    ED20 = E10D20 + (E20D20 - E10D20) * np.log10(h1 / 10.) / np.log10(20. / 10.)
+    EDh1 = step_19a(t, 0, Dh1)
+    Emid = EDh1 + (ED20 - EDh1) * np.log10(d / Dh1) / np.log10(D20 / Dh1)   # equ'n (11b)
+
+    E1 = E10 + (E20 - E10) * np.log10(h1 / 10.) / np.log10(20. / 10.)
+    Fs = (d - D20) / d
+    Efar = E1 * (1.0 - Fs) + Epos * Fs           # equ'n (11c)
+
+    return np.where(d <= Dh1, Emaxvalue, np.where(d < D20, Emid, Efar))   # equ'n (11a)
+
+
+def step7_batch(figures, h1, d, generalPath, f, Emaxvalue, t):
+    """
+    E = step7_batch(figures, h1, d, generalPath, f, Emaxvalue, t)
+
+    Vectorised step7_normal. figures maps the nominal frequencies
+    100, 600 and 2000 MHz to the figure numbers selected in Step 6.
+    """
+    finf, fsup = search_closest([100, 600, 2000], f)
+    argj = [finf, fsup]
+    Ef = [None, None]
+    st = 1 if finf == fsup else 0
+    for j in range(st, 2):
+        values = figure_table(figures[argj[j]])
+        Ef[j] = np.where(h1 >= 10,
+                         step81_batch(values, h1, d, Emaxvalue),
+                         step82_batch(values, h1, d, generalPath, argj[j], f, Emaxvalue, t))
+
+    if finf != fsup:
+        E = Ef[0] + (Ef[1] - Ef[0]) * mt.log10(1.0 * f / finf) / mt.log10(1.0 * fsup / finf) # eq'n (14)
+        if (f > 2000.0):
+            E = np.minimum(E, Emaxvalue)
+        return E
+    return Ef[1]
+
+
+def step6_10_batch(h1, d, path, f, Emaxvalue, t):
+    """
+    E = step6_10_batch(h1, d, path, f, Emaxvalue, t)
+
+    Vectorised step6_10: Steps 7 to 9 for the nominal percentage times and
+    interpolation in time (equation (16)).
+    """
+    tinf, tsup = search_closest([1, 10, 50], t)
+    argl = [tinf, tsup]
+    generalPath = 'Land' if path == 'Land' else 'Sea'
+    Ep = [None, None]
+    st = 1 if tinf == tsup else 0
+    for l in range(st, 2):
+        figures = dict((fnom, figure_number(argl[l], path, fnom)) for fnom in (100, 600, 2000))
+        Ep[l] = step7_batch(figures, h1, d, generalPath, f, Emaxvalue, t)
+
+        if generalPath == 'Sea' and f < 100:
+            df = d06_batch(f, h1, 10)
+            d600 = d06_batch(600, h1, 10)
+            Edf = emax(df, t, generalPath)
+            Ed600 = step7_batch(figures, h1, d600, generalPath, f, Emaxvalue, t)
+            Elow = np.where(d <= df, Emaxvalue,
+                            Edf + (Ed600 - Edf) * np.log10(d / df) / np.log10(d600 / df))  # equ'n (15a, 15b)
+            Ep[l] = np.where(d < d600, Elow, Ep[l])
+
+    if tinf != tsup:
+        Qsup = qi(tsup / 100.)
+        Qinf = qi(tinf / 100.)
+        Qt = qi(t / 100.)
+        return Ep[1] * (Qinf - Qt) / (Qinf - Qsup) + Ep[0] * (Qt - Qsup) / (Qinf - Qsup)    # equ'n (16)
+    return Ep[1]
+
+
+def h1_calc_batch(d, heff, ha, hb, path, flag):
+    """
+    h1 = h1_calc_batch(d, heff, ha, hb, path, flag)
+
+    Vectorised h1_calc. ha and hb are arrays or None. For sea paths h1 is
+    limited to 3 m.
+    """
+    if path == 'Sea':
+        return np.maximum(heff, 3.0)
+
+    h1 = np.array(heff, dtype=float, copy=True)
+    short = d < 15
+    if flag == 0 and ha is not None:
+        h1 = np.where(short & (d <= 3), ha, h1)                              # eq'n (4)
+        h1 = np.where(short & (d > 3), ha + (heff - ha) * (d - 3.0) / 12.0, h1)  # equ'n (5)
+    elif flag != 0 and hb is not None:
+        h1 = np.where(short, hb, h1)                                        # equ'n (6)
+    return h1
+
+
+def d06_batch(f, h1, h2):
+    """
+    Vectorised d06: approximation to the 0.6 Fresnel clearance path length.
+    """
+    h1 = np.maximum(h1, 0.0)
+    Df = 0.0000389 * f * h1 * h2                  # equ'n (39a)
+    Dh = 4.1 * (np.sqrt(h1) + np.sqrt(h2))        # equ'n (39b)
+    return np.maximum(Df * Dh / (Df + Dh), 0.001) # equ'n (38)
+
+
+def V_batch(Kv, h1):
+    """
+    Vectorised V(Kv, h1) for Annex 5 section 4.3 case b.
+    """
+    factors = {100: 1.35, 600: 3.31, 2000: 6.0}
+    if Kv not in factors:
+        raise ValueError('Invalid frequency input in V(Kv, h1)')
+    return factors[Kv] * np.degrees(np.arctan(-h1 / 9000.))   # equ'n (12c and 12b)
+
+
+def step_12a_batch(f, tca):
+    """
+    Vectorised step_12a: terrain clearance angle correction (Annex 5, Par 11).
+    """
+    tca = np.clip(tca, 0.55, 40.0)
+    nup = 0.036 * np.sqrt(f)
+    nu = 0.065 * tca * np.sqrt(f)
+    J1 = J(nup) if nup > -0.7806 else 0.0
+    J2 = np.where(nu > -0.7806, J(nu), 0.0)
+    return J1 - J2
+
+
+def step_13a_batch(d, f, t, eff1, eff2):
+    """
+    Vectorised step_13a: field strength due to tropospheric scattering.
+    """
+    thetaS = np.maximum(180.0 * d / np.pi / 4. * 3. / 6370. + eff1 + eff2, 0.0)    # equ'n (35)
+    return 24.4 - 20.0 * np.log10(1.0 * d) - 10.0 * thetaS - (5.0 * np.log10(f * 1.0) - 2.5 * (np.log10(1.0 * f) - 3.3) ** 2.0) + 0.15 * 325.0 + 10.1 * (-np.log10(0.02 * t)) ** 0.7 # equ'n (36),(36a),(36b)
+
+
+def step_14a_batch(h1, d, R2, h2, f, area):
+    """
+    Vectorised step_14a: receiving/mobile antenna height correction
+    (Annex 5, Par 9) for scalar h2. R2 may be per point; area is a string
+    or, for land receivers, an array of area names broadcast against d.
+    """
+    if not isinstance(area, str):
+        area = np.asarray(area).astype(str)
+        built = (np.char.find(area, 'Urban') != -1) | (np.char.find(area, 'Suburban') != -1)
+        if np.any(np.char.find(np.char.lower(area), 'sea') != -1):
+            raise ValueError('Per-point areas must be land areas in step_14a')
+        open_land = step_14a_batch(h1, d, 10.0, h2, f, 'Rural')
+        if not built.any():
+            return np.broadcast_to(open_land, np.broadcast(h1, d, built).shape)
+        return np.where(built, step_14a_batch(h1, d, R2, h2, f, 'Urban'), open_land)
+
+    if (area.lower().find('urban') != -1 or area.lower().find('rural') != -1 or area.lower().find('suburban') != -1):
+        path = 'Land'
+    elif (area.lower().find('sea') != -1):
+        path = 'Sea'
+    else:
+        raise ValueError('Wrong area in step_14a')
+
+    K_h2 = 3.2 + 6.2 * np.log10(1.0 * f)
+    shape = np.broadcast(h1, d).shape
+
+    if path == 'Land':
+        if (h2 < 1):
+            raise ValueError('This recommendation is not valid for receiving/mobile antenna height h2 < 1 m when adjacent to land.')
+
+        if (area.find('Urban') != -1 or area.find('Suburban') != -1):
+            Rp = (1000.0 * d * R2 - 15.0 * h1) / (1000.0 * d - 15.0)
+            Rp = np.maximum(Rp, 1.0)
+            h_dif = np.maximum(Rp - h2, 0.0)
+            K_nu = 0.0108 * np.sqrt(f)
+            theta_clut = np.degrees(np.arctan(h_dif / 27.0))
+            nu = K_nu * np.sqrt(h_dif * theta_clut)
+            Correction = np.where(h2 < Rp, 6.03 - J(nu), K_h2 * np.log10(1.0 * h2 / Rp))  # (28a), (28b)
+            return np.where(Rp < 10, Correction - K_h2 * np.log10(10.0 / Rp), Correction)
+
+        return np.full(shape, K_h2 * np.log10(h2 / 10.0))
+
+    if (h2 < 3):
+        raise ValueError('This recommendation is not valid for receiving/mobile antenna height h2 < 3 m when adjacent to sea.')
+
+    C10 = K_h2 * np.log10(h2 / 10.0)
+    if (h2 >= 10):
+        return np.full(shape, C10)
+
+    d10 = d06_batch(f, h1, 10.0)
+    dh2 = d06_batch(f, h1, h2)
+    Correction = np.where(d <= dh2, 0.0, C10 * np.log10(1.0 * d / dh2) / np.log10(1.0 * d10 / dh2))
+    return np.where(d >= d10, C10, Correction)
+
+
+def step_11a_batch(Eland, Esea, fsea):
+    """
+    Vectorised step_11a_rrc06 for one land and one sea/coastal zone: Eland
+    and Esea are the field strengths of an all-land and an all-sea path as
+    long as the mixed path and fsea the fraction of the path over sea.
+    """
+    Eland, Esea, fsea = np.broadcast_arrays(np.asarray(Eland, dtype=float),
+                                            np.asarray(Esea, dtype=float),
+                                            np.clip(np.asarray(fsea, dtype=float), 0.0, 1.0))
+    V = np.maximum(1.0, 1.0 + (Esea - Eland) / 40.0)
+    A0 = 1.0 - (1.0 - fsea) ** (2.0 / 3.0)
+    A = A0 ** V
+    return (1.0 - A) * Eland + A * Esea
+
+
+def step_15a_batch(ha, R1, f):
+    """
+    Vectorised step_15a: correction for clutter around the transmitter.
+    """
+    K_nu = 0.0108 * np.sqrt(f)
+    hdif1 = ha - R1
+    theta_clut = np.degrees(np.arctan(hdif1 / 27.0))
+    nu = K_nu * np.sqrt(hdif1 * theta_clut)
+    nu = np.where(R1 >= ha, nu, -nu)
+    return np.where(nu > -0.7806, -J(nu), 0.0)
+
+
+def step_17a_batch(ha, h2, d, Esup, *argc):
+    """
+    Vectorised step_17a: extrapolation to distances less than 1 km.
+    """
+    d_slope = dslope(ha, h2, d, *argc)
+    dinf_slope = dslope(ha, h2, 0.04, *argc)
+    dsup_slope = dslope(ha, h2, 1, *argc)
+    Einf = 106.9 - 20 * np.log10(dinf_slope)
+    Eshort = 106.9 - 20 * np.log10(d_slope)
+    Einterp = Einf + (Esup - Einf) * np.log10(d_slope / dinf_slope) / np.log10(dsup_slope / dinf_slope)
+    return np.where(d <= 0.04, Eshort, Einterp)
+    
+    
 def is_out_of_bounds(var, low, hi, name):
     """
     Function is_out_of_bounds(var, low, hi, name)
@@ -840,16 +1418,9 @@ def h1_calc(d, heff, ha, hb, path, flag):
     return h1
 
 def find_d_nominals(d):
-        
-    distance = [  1,  2,  3,  4,  5,  6,  7,  8,  9, 10, 11, 12, 13,
-        14, 15, 16, 17, 18, 19, 20, 25, 30, 35, 40, 45, 50,
-        55, 60, 65, 70, 75, 80, 85, 90, 95,100,110,120,130,
-        140,150,160,170,180,190,200,225,250,275,300,325,350,
-        375,400,425,450,475,500,525,550,575,600,625,650,675,
-        700,725,750,775,800,825,850,875,900,925,950,975,1000]
     
     #if value is not found dsup = 'nothing'
-    dinf, dsup = search_closest(distance, d)
+    dinf, dsup = search_closest(NOMINAL_DISTANCES, d)
     
     return dinf, dsup
     
@@ -1217,11 +1788,9 @@ def step7_normal(figureStep6, h1, dinf, dsup, d, generalPath, f, Emaxvalue, t):
      returns a field strength otherwise NaN.
     
      Step 7: For the lower nominal frequency follow Steps 8 and 9.
-     comment out exceltables if direct excel access is preffered for better
-     accuracy. Not as effecient for repeated use.
+     The tabulated values are read from FIELD_TABLES (see figure_table).
      """       
     
-    exceltables = Exceltables()
     frequencies = [100, 600, 2000]
     finf, fsup = search_closest(frequencies, f)
     
@@ -1241,11 +1810,7 @@ def step7_normal(figureStep6, h1, dinf, dsup, d, generalPath, f, Emaxvalue, t):
         figureStep7 = figureStep6[idx, :]
         
         
-        #Following 2 lines can be swapped interchangebly line 62 is best used
-        #for hundredes of successful excel look ups.
-        #tabulatedValues = xlsread('Rec_P_1546_2_Tab_values.xls',figureStep7(1,4), 'B6:K84')
-        
-        tabulatedValues = np.array(exceltables[figureStep7[0,3]-1])
+        tabulatedValues = figure_table(figureStep7[0,3])
         
         # Step 8: Obtain the field strength exceeded at 50% locations for a
         # receiving/mobile antenna at the height of representative clutter, R,
@@ -1316,9 +1881,8 @@ def step81(tabulatedValues, h1, dinf, dsup, d, Emax):
              the maximum given in Annex 5, Par 2.
     E = step81(tabulatedValues,h1,dinf,dsup,d,Emax)
        
-     tabulatedValues a matrix of value from a figure 1-24 of excel sheet of
-       values for recommendation. Expected range from table 'B6:K84' may still
-       work with different range value. results unexpected.
+     tabulatedValues the h1 x distance table of a figure 1-24 as returned
+       by figure_table.
      h1 is the caculated h1 from h1Calc
      dinf and dsup must correspond to values in Table 1 of ITU-r p.1546 on
        page 38 otherwise NaN will be returned
@@ -1333,9 +1897,7 @@ def step81(tabulatedValues, h1, dinf, dsup, d, Emax):
         raise ValueError('h1 is less then 10 for step81')
     
     # obtain hsup and hinf
-    height = [10, 20, 37.5, 75, 150, 300, 600, 1200]
- 
-    hinf, hsup = search_closest(height, h1)
+    hinf, hsup = search_closest(NOMINAL_HEIGHTS, h1)
     
 #    if (h1<hinf or h1>hsup):
 #        print hinf,h1,hsup
@@ -1408,9 +1970,8 @@ def step814_815(tabulatedValues, h1, dinf, dsup, d):
     function E = step814_815(tabulatedValues,h1,dinf,dsup)
     if only step 8.1.4 is needed pass the same value for dinf and dsup. 
     
-    tabulatedValues a matrix of value from a figure 1-24 of excel sheet of
-      values for recommendation. Expected range from table 'B6:K84' may still
-      work with different range value. results unexpected.
+    tabulatedValues the h1 x distance table of a figure 1-24 as returned
+      by figure_table.
     h1 must equal one of the nominal value 10,20,37.5,75,150,300,600,1200 if
       not return is unknown.
     dinf and dsup must correspond to values in Table 1 of ITU-r p.1546 on
@@ -1419,23 +1980,16 @@ def step814_815(tabulatedValues, h1, dinf, dsup, d):
     Returns a single field strength value for the given parameters 
     """
     
-    #kLookUp = ml.find(tabulatedValues[0,:] == h1)
-    (idxn,kLookUp) = np.where(( tabulatedValues[0,:] == h1 ))
-    
-    eLookUp = np.hstack((tabulatedValues[:, 0], tabulatedValues[:, kLookUp]))
+    kLookUp = np.searchsorted(NOMINAL_HEIGHTS, h1)
+    kinf = np.searchsorted(NOMINAL_DISTANCES, dinf)
+    ksup = np.searchsorted(NOMINAL_DISTANCES, dsup)
+    if (NOMINAL_HEIGHTS[kLookUp] != h1 or NOMINAL_DISTANCES[kinf] != dinf or NOMINAL_DISTANCES[ksup] != dsup):
+        return float('nan')
     
-    #kinf = ml.find(eLookUp[:, 0] == dinf)
-    (kinf,idxn) = np.where(( eLookUp[:, 0] == dinf ))
-    Einf = eLookUp[kinf, 1].item(0,0)
-    #ksup = ml.find(eLookUp[:, 0] == dsup)
-    (ksup,idxn) = np.where(( eLookUp[:, 0] == dsup ))
-    Esup = eLookUp[ksup, 1].item(0,0)
+    Einf = float(tabulatedValues[kLookUp, kinf])
+    Esup = float(tabulatedValues[kLookUp, ksup])
     
     if dsup != dinf:
-        #ksup = ml.find(eLookUp[:, 0] == dsup ) ## STI: this seams to be redundant ?
-        (ksup,idxn) = np.where((eLookUp[:, 0] == dsup))
-        Esup = eLookUp[ksup, 1].item(0,0)
-        
         E = Einf + (Esup - Einf) * np.log10(1.0* d / dinf) / np.log10(1.0* dsup / dinf) #    %equ'n (13)
         
         return E
@@ -1443,8 +1997,6 @@ def step814_815(tabulatedValues, h1, dinf, dsup, d):
         E = Esup
         
         return E
-    E = float('nan')
-    return E
     
 def step82(tabulatedValues, h1, dinf, dsup, d, path, fnom, f, Emaxvalue, t):
     """    
@@ -1455,9 +2007,8 @@ def step82(tabulatedValues, h1, dinf, dsup, d, path, fnom, f, Emaxvalue, t):
     
      function E = step82(tabulatedValues,h1,dinf,dsup,d,path,fnom,f,Emaxvalue,t)
     
-     tabulatedValues a matrix of value from a figure 1-24 of excel sheet of
-       values for recommendation. Expected range from table 'B6:K84' may still
-       work with different range value. results unexpected.
+     tabulatedValues the h1 x distance table of a figure 1-24 as returned
+       by figure_table.
      h1 is the caculated h1 from h1Calc
      dinf and dsup must correspond to values in Table 1 of ITU-r p.1546 on
        page 38 otherwise NaN will be returned
@@ -1523,7 +2074,7 @@ def step82(tabulatedValues, h1, dinf, dsup, d, path, fnom, f, Emaxvalue, t):
             
         Dh1 = d06(f, h1, 10.)              # equ'n (10a)
         D20 = d06(f, 20., 10.)             # equ'n (10b)
-        if d >= Dh1:
+        if d <= Dh1:
             
             E = Emaxvalue                  # equ'n (11a)
             return E
@@ -1540,7 +2091,7 @@ def step82(tabulatedValues, h1, dinf, dsup, d, path, fnom, f, Emaxvalue, t):
             E = EDh1 + (ED20 - EDh1) * np.log10(1.0 * d / Dh1)/np.log10(1.0 * D20 / Dh1)
             return E
         elif d >= D20:
-            E1 = E10 + (E20 - E10) * np.log10(h1 / 10.) / np.log(20. / 10.)
+            E1 = E10 + (E20 - E10) * np.log10(h1 / 10.) / np.log10(20. / 10.)
             v = V(fnom, -10.)
             if v > -0.7806:
                 J = 6.9 + 20 * np.log10(np.sqrt((v - 0.1) ** 2 + 1) + v - 0.1)  # equ'n (12a)
@@ -2269,15 +2820,4 @@ def step_20a(f, E):
 
     Lb = 139.3 - E + 20*np.log10(f)
 
-    return   Lb   
-
-
-def Exceltables():
-    ee = [
-    [[78,10,20,37.5,75,150,300,600,1200,0], [1,89.9759,92.1812,94.6355,97.3845,100.3181,103.1205,105.2426,106.3566,106.9], [2,80.2751,83.0908,86.0014,89.2076,92.6742,96.1197,98.8577,100.2846,100.8794], [3,74.1662,77.5296,80.8234,84.3504,88.1427,91.9686,95.0958,96.7306,97.3576], [4,69.5184,73.3548,77.0149,80.8312,84.885,88.9934,92.4125,94.2077,94.8588], [5,65.6994,69.9206,73.9248,78.0214,82.3137,86.6601,90.3203,92.2498,92.9206], [6,62.4359,66.9578,71.2723,75.6407,80.1635,84.7271,88.6005,90.6489,91.337], [7,59.5803,64.3322,68.9161,73.5423,78.2915,83.0633,87.1352,89.294,89.998], [8,57.0412,61.9673,66.7783,71.6424,76.6127,81.5891,85.8531,88.1186,88.8382], [9,54.756,59.814,64.8127,69.8903,75.0733,80.2524,84.7074,87.0797,87.8152], [10,52.6796,57.8377,62.9896,68.2548,73.6382,79.0175,83.6656,86.1477,86.9], [11,50.7782,56.0126,61.2886,66.7156,72.2842,77.8593,82.704,85.3015,86.0721], [12,49.0255,54.3183,59.6945,65.2592,70.9957,76.7598,81.8047,84.5251,85.3164], [13,47.4007,52.7385,58.1954,63.8762,69.7625,75.7062,80.9539,83.8065,84.6211], [14,45.8873,51.2596,56.7816,62.5595,68.5777,74.6895,80.141,83.1361,83.9774], [15,44.4715,49.8704,55.4448,61.3035,67.4365,73.7034,79.3576,82.5061,83.3782], [16,43.1423,48.5613,54.1779,60.1035,66.3356,72.7438,78.5971,81.9102,82.8176], [17,41.8902,47.3243,52.9746,58.9555,65.2725,71.8079,77.8546,81.3432,82.291], [18,40.7074,46.1523,51.8294,57.8559,64.2452,70.894,77.1264,80.8006,81.7946], [19,39.5871,45.0395,50.7377,56.8014,63.2518,70.0011,76.4098,80.2786,81.3249], [20,38.5237,43.9806,49.695,55.7889,62.291,69.1285,75.7029,79.7742,80.8794], [25,33.9069,39.3532,45.097,51.2676,57.9231,65.0574,72.2902,77.4302,78.9412], [30,30.1811,35.5753,41.2901,47.4593,54.1611,61.4361,69.0821,75.247,77.3576], [35,27.1022,32.4093,38.0527,44.1712,50.8594,58.1943,66.0991,73.1376,76.0186], [40,24.5178,29.7039,35.239,41.2678,47.9017,55.2511,63.3319,71.0823,74.8588], [45,22.3242,27.3561,32.7481,38.6526,45.199,52.5325,60.7465,69.0829,73.8358], [50,20.4457,25.2917,30.5082,36.2563,42.6853,49.9783,58.3013,67.139,72.9206], [55,18.8242,23.456,28.4679,34.0304,40.3142,47.5432,55.9575,65.2431,72.0927], [60,17.4138,21.8079,26.5907,31.9423,38.0553,45.1964,53.6839,63.3818,71.337], [65,16.1775,20.3164,24.8512,29.9716,35.891,42.9195,51.4583,61.5403,70.6417], [70,15.0848,18.9575,23.232,28.1062,33.813,40.7044,49.2674,59.7052,69.998], [75,14.1104,17.7128,21.721,26.3401,31.8196,38.5503,47.1059,57.8662,69.3988], [80,13.2334,16.5674,20.3094,24.6703,29.9126,36.4612,44.9742,56.017,68.8382], [85,12.4361,15.5089,18.9902,23.0948,28.0952,34.4436,42.8775,54.1554,68.3116], [90,11.7041,14.5267,17.757,21.612,26.3701,32.5044,40.8233,52.2826,67.8152], [95,11.0249,13.6116,16.6037,20.2192,24.7389,30.6498,38.8202,50.4029,67.3455], [100,10.3885,12.7552,15.5241,18.9127,23.2014,28.8839,36.8766,48.5226,66.9], [110,9.2115,11.1888,13.56,16.5389,20.3971,25.6248,33.1954,44.7914,66.0721], [120,8.121,9.775,11.8136,14.4442,17.9235,22.7202,29.8173,41.1534,65.3164], [130,7.0818,8.4718,10.2372,12.578,15.733,20.1389,26.7509,37.666,64.6211], [140,6.0704,7.2464,8.7898,10.8924,13.7749,17.8372,23.9815,34.3703,63.9774], [150,5.0717,6.0747,7.4382,9.3465,12.0024,15.7687,21.4807,31.2885,63.3782], [160,4.0764,4.9392,6.157,7.9069,10.3756,13.8901,19.2138,28.4266,62.8176], [170,3.0791,3.8278,4.9273,6.5481,8.8623,12.1644,17.1458,25.7785,62.291], [180,2.0772,2.7325,3.7355,5.2507,7.4373,10.5609,15.2444,23.3302,61.7946], [190,1.0699,1.6483,2.5723,4.0007,6.0818,9.0554,13.4815,21.0635,61.3249], [200,0.0578,0.5723,1.4312,2.7879,4.7814,7.629,11.8338,18.9592,60.8794], [225,-2.4856,-2.0889,-1.3489,-0.1229,1.7093,4.3216,8.101,14.2872,59.8564], [250,-5.0264,-4.7076,-4.0446,-2.9035,-1.1768,1.2793,4.7672,10.2631,58.9412], [275,-7.539,-7.2732,-6.6619,-5.5778,-3.922,-1.5725,1.7131,6.7063,58.1133], [300,-10.0034,-9.7747,-9.1991,-8.1543,-6.5478,-4.2726,-1.1303,3.4955,57.3576], [325,-12.408,-12.204,-11.661,-10.703,-9.063,-6.83,-3.39,0.56,56.66], [350,-14.746,-14.554,-14.046,-13.156,-11.48,-9.26,-5.5, -2.2,56.01], [375,-17.01,-16.82,-16.35,-15.52,-13.81,-11.58,-7.49,-4.8,55.4], [400,-19.2,-19.02,-18.58,-17.8,-16.06,-13.82,-9.38,-7.3,54.82], [425,-21.33,-21.15,-20.75,-20.01,-18.24,-15.98,-11.19,-9.7,54.28], [450,-23.39,-23.22,-22.85,-22.16,-20.36,-18.08,-12.93,-12,53.76], [475,-25.39,-25.23,-24.89,-24.25,-22.43,-20.13,-14.6,-14.2,53.27], [500,-27.34,-27.18,-26.87,-26.28,-24.45,-22.13,-16.2,-16.3,52.8], [525,-29.23,-29.08,-28.8,-28.26,-26.43,-24.08,-17.74,-18.3,52.35], [550,-31.08,-30.94,-30.68,-30.19,-28.37,-25.99,-19.22,-20.2,51.92], [550,-31.08,-30.94,-30.68,-30.19,-28.37,-25.99,-19.22,-20.2,51.92], [575,-32.88,-32.75,-32.53,-32.08,-30.27,-27.86,-20.65,-22.1,51.5], [600,-34.64,-34.52,-34.33,-33.92,-32.13,-29.69,-22.03,-23.9,51.1], [625,-36.36,-36.25,-36.09,-35.72,-33.96,-31.49,-23.36,-25.6,50.71], [650,-38.04,-37.94,-37.81,-37.48,-35.75,-33.26,-24.65,-27.3,50.34], [675,-39.68,-39.59,-39.49,-39.2,-37.51,-34.99,-25.9,-28.9,49.98], [700,-41.29,-41.21,-41.13,-40.88,-39.23,-36.69,-27.11,-30.5,49.63], [725,-42.86,-42.79,-42.73,-42.52,-40.92,-38.36,-28.28,-32,49.29], [750,-44.4,-44.34,-44.29,-44.13,-42.58,-40,-29.42,-33.5,48.96], [775,-45.91,-45.86,-45.82,-45.7,-44.21,-41.61,-30.53,-34.9,48.64], [800,-47.39,-47.35,-47.32,-47.24,-45.81,-43.19,-31.61,-36.3,48.33], [825,-48.84,-48.81,-48.79,-48.74,-47.39,-44.75,-32.66,-37.6,48.03], [850,-50.27,-50.24,-50.23,-50.21,-48.94,-46.28,-33.69,-38.9,47.73], [875,-51.67,-51.65,-51.64,-51.64,-50.47,-47.79,-34.69,-40.2,47.44], [900,-53.05,-53.04,-53.03,-53.04,-51.97,-49.27,-35.67,-41.4,47.16], [925,-54.41,-54.4,-54.4,-54.42,-53.45,-50.73,-36.63,-42.6,46.88], [950,-55.75,-55.75,-55.75,-55.78,-54.91,-52.17,-37.57,-43.8,46.61], [975,-57.07,-57.07,-57.08,-57.12,-56.35,-53.59,-38.49,-45,46.35], [1000,-58.37,-58.38,-58.39,-58.44,-57.77,-54.99,-39.4,-46.1,46.09]]
-    ]
-    return ee
-    
-def Exceltables():
-    ee = [
-    [[78,10,20,37.5,75,150,300,600,1200,0], [1,89.9759,92.1812,94.6355,97.3845,100.3181,103.1205,105.2426,106.3566,106.9], [2,80.2751,83.0908,86.0014,89.2076,92.6742,96.1197,98.8577,100.2846,100.8794], [3,74.1662,77.5296,80.8234,84.3504,88.1427,91.9686,95.0958,96.7306,97.3576], [4,69.5184,73.3548,77.0149,80.8312,84.885,88.9934,92.4125,94.2077,94.8588], [5,65.6994,69.9206,73.9248,78.0214,82.3137,86.6601,90.3203,92.2498,92.9206], [6,62.4359,66.9578,71.2723,75.6407,80.1635,84.7271,88.6005,90.6489,91.337], [7,59.5803,64.3322,68.9161,73.5423,78.2915,83.0633,87.1352,89.294,89.998], [8,57.0412,61.9673,66.7783,71.6424,76.6127,81.5891,85.8531,88.1186,88.8382], [9,54.756,59.814,64.8127,69.8903,75.0733,80.2524,84.7074,87.0797,87.8152], [10,52.6796,57.8377,62.9896,68.2548,73.6382,79.0175,83.6656,86.1477,86.9], [11,50.7782,56.0126,61.2886,66.7156,72.2842,77.8593,82.704,85.3015,86.0721], [12,49.0255,54.3183,59.6945,65.2592,70.9957,76.7598,81.8047,84.5251,85.3164], [13,47.4007,52.7385,58.1954,63.8762,69.7625,75.7062,80.9539,83.8065,84.6211], [14,45.8873,51.2596,56.7816,62.5595,68.5777,74.6895,80.141,83.1361,83.9774], [15,44.4715,49.8704,55.4448,61.3035,67.4365,73.7034,79.3576,82.5061,83.3782], [16,43.1423,48.5613,54.1779,60.1035,66.3356,72.7438,78.5971,81.9102,82.8176], [17,41.8902,47.3243,52.9746,58.9555,65.2725,71.8079,77.8546,81.3432,82.291], [18,40.7074,46.1523,51.8294,57.8559,64.2452,70.894,77.1264,80.8006,81.7946], [19,39.5871,45.0395,50.7377,56.8014,63.2518,70.0011,76.4098,80.2786,81.3249], [20,38.5237,43.9806,49.695,55.7889,62.291,69.1285,75.7029,79.7742,80.8794], [25,33.9069,39.3532,45.097,51.2676,57.9231,65.0574,72.2902,77.4302,78.9412], [30,30.1811,35.5753,41.2901,47.4593,54.1611,61.4361,69.0821,75.247,77.3576], [35,27.1022,32.4093,38.0527,44.1712,50.8594,58.1943,66.0991,73.1376,76.0186], [40,24.5178,29.7039,35.239,41.2678,47.9017,55.2511,63.3319,71.0823,74.8588], [45,22.3242,27.3561,32.7481,38.6526,45.199,52.5325,60.7465,69.0829,73.8358], [50,20.4457,25.2917,30.5082,36.2563,42.6853,49.9783,58.3013,67.139,72.9206], [55,18.8242,23.456,28.4679,34.0304,40.3142,47.5432,55.9575,65.2431,72.0927], [60,17.4138,21.8079,26.5907,31.9423,38.0553,45.1964,53.6839,63.3818,71.337], [65,16.1775,20.3164,24.8512,29.9716,35.891,42.9195,51.4583,61.5403,70.6417], [70,15.0848,18.9575,23.232,28.1062,33.813,40.7044,49.2674,59.7052,69.998], [75,14.1104,17.7128,21.721,26.3401,31.8196,38.5503,47.1059,57.8662,69.3988], [80,13.2334,16.5674,20.3094,24.6703,29.9126,36.4612,44.9742,56.017,68.8382], [85,12.4361,15.5089,18.9902,23.0948,28.0952,34.4436,42.8775,54.1554,68.3116], [90,11.7041,14.5267,17.757,21.612,26.3701,32.5044,40.8233,52.2826,67.8152], [95,11.0249,13.6116,16.6037,20.2192,24.7389,30.6498,38.8202,50.4029,67.3455], [100,10.3885,12.7552,15.5241,18.9127,23.2014,28.8839,36.8766,48.5226,66.9], [110,9.2115,11.1888,13.56,16.5389,20.3971,25.6248,33.1954,44.7914,66.0721], [120,8.121,9.775,11.8136,14.4442,17.9235,22.7202,29.8173,41.1534,65.3164], [130,7.0818,8.4718,10.2372,12.578,15.733,20.1389,26.7509,37.666,64.6211], [140,6.0704,7.2464,8.7898,10.8924,13.7749,17.8372,23.9815,34.3703,63.9774], [150,5.0717,6.0747,7.4382,9.3465,12.0024,15.7687,21.4807,31.2885,63.3782], [160,4.0764,4.9392,6.157,7.9069,10.3756,13.8901,19.2138,28.4266,62.8176], [170,3.0791,3.8278,4.9273,6.5481,8.8623,12.1644,17.1458,25.7785,62.291], [180,2.0772,2.7325,3.7355,5.2507,7.4373,10.5609,15.2444,23.3302,61.7946], [190,1.0699,1.6483,2.5723,4.0007,6.0818,9.0554,13.4815,21.0635,61.3249], [200,0.0578,0.5723,1.4312,2.7879,4.7814,7.629,11.8338,18.9592,60.8794], [225,-2.4856,-2.0889,-1.3489,-0.1229,1.7093,4.3216,8.101,14.2872,59.8564], [250,-5.0264,-4.7076,-4.0446,-2.9035,-1.1768,1.2793,4.7672,10.2631,58.9412], [275,-7.539,-7.2732,-6.6619,-5.5778,-3.922,-1.5725,1.7131,6.7063,58.1133], [300,-10.0034,-9.7747,-9.1991,-8.1543,-6.5478,-4.2726,-1.1303,3.4955,57.3576], [32
+    return   Lb
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 
-from flask import jsonify, request, send_file, url_for
+import numpy as np
+from flask import current_app, jsonify, request, send_file, url_for
 from flask_login import login_required, current_user
 
 from extensions import db
+from app_core import channel_plan, contours, coverage, interference, p1546
+from app_core.admission import heavy_request
 from app_core.utils import project_by_slug_or_404
 from app_core.storage import storage_root
 
@@ -17,6 +21,7 @@ from . import bp
 
 @bp.route('/reports', methods=['POST'])
 @login_required
+@heavy_request('report')
 def create_report():
     payload = request.get_json() or {}
     project_slug = payload.get('project') or payload.get('projectSlug')
@@ -70,6 +75,132 @@ def anatel_basic_form(slug):
     return jsonify({'project': project.slug, 'sections': sections})
 
 
+@bp.route('/channel-plan/nearby', methods=['GET'])
+@login_required
+def channel_plan_nearby():
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        frequency = float(request.args['frequency'])
+        radius = float(request.args.get('radius', 300))
+        adjacent = int(request.args.get('adjacent', 1))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Informe lat, lon e frequency (MHz) numéricos.'}), 400
+    store = channel_plan.default_store()
+    try:
+        stations = store.nearby(lat, lon, radius, frequency, service=request.args.get('service'), adjacent=adjacent)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({
+        'query': {'lat': lat, 'lon': lon, 'frequency_mhz': frequency, 'radius_km': radius, 'adjacent': adjacent},
+        'sources': store.sources(),
+        'stations': stations,
+    })
+
+
+@bp.route('/projects/<slug>/interference', methods=['POST'])
+@login_required
+@heavy_request('interference')
+def interference_study(slug):
+    project = project_by_slug_or_404(slug, current_user.uuid)
+    payload = request.get_json() or {}
+    try:
+        heff_m = None
+        if payload.get('heightM') in (None, '') and payload.get('towerHeight') not in (None, ''):
+            # HAAT por radial (3-16 km) a partir do SRTM
+            _, stats, _ = coverage.site_haat(
+                float(payload['longitude']), float(payload['latitude']), float(payload['towerHeight']), n_radials=72,
+            )
+            heff_m = stats['haat']
+        candidate = interference.Candidate.from_inputs(payload, heff_m)
+        params = interference.StudyParameters.from_inputs(
+            payload, current_app.config.get('INTERFERENCE_MAX_PIXELS', interference.DEFAULT_MAX_PIXELS)
+        )
+        # curvas do candidato antes de consultar o plano; as das estações são checadas em run_study
+        interference.require_curves(candidate.frequency_mhz, params)
+        stations = interference.select_stations(channel_plan.default_store(), candidate, params)
+        reports, transform, shape, margin = interference.run_study(
+            candidate, stations, params,
+            workers=current_app.config.get('INTERFERENCE_WORKERS', interference.DEFAULT_WORKERS),
+        )
+    except p1546.CurvesUnavailable as exc:
+        # tabelas P.1546 ausentes no servidor: não é erro do pedido
+        return jsonify({'error': f'Curvas P.1546 indisponíveis neste servidor: {exc}', 'figures': exc.figures}), 503
+    except (KeyError, TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc) or 'Parâmetros inválidos.'}), 400
+    result = interference.save_study(project, candidate, params, reports, transform, shape, margin)
+    return jsonify(result), 201
+
+
+@bp.route('/contours', methods=['POST'])
+@login_required
+@heavy_request('contours')
+def protected_contours():
+    payload = request.get_json() or {}
+    try:
+        latitude = float(payload['latitude'])
+        longitude = float(payload['longitude'])
+        frequency = float(payload['frequency'])
+        service = str(payload.get('service') or channel_plan.service_for(frequency)).upper()
+        if service == 'RTV' and not payload.get('service'):
+            service = 'TVD'  # sem serviço explícito, TV é tratada como digital
+        n_radials = int(payload.get('radials') or contours.DEFAULT_RADIALS)
+        hnmt_m = None
+        heff_m = payload.get('heightM')
+        if heff_m in (None, ''):
+            # HNMT/HAAT por radial (3-16 km) a partir do SRTM
+            elevation = payload.get('siteElevation')
+            _, stats, _ = coverage.site_haat(
+                longitude, latitude, float(payload['towerHeight']),
+                site_elevation_m=float(elevation) if elevation not in (None, '') else None,
+                n_radials=n_radials,
+            )
+            hnmt_m, heff_m = stats['hnmt'], stats['haat']
+        pattern_db = payload.get('patternDb')
+        if pattern_db is None and payload.get('useStoredPattern', True):
+            pattern_db = _stored_pattern_db(current_user)
+        direction = payload.get('direction')
+        if direction in (None, ''):
+            direction = getattr(current_user, 'antenna_direction', None) or 0.0
+        result = contours.radial_contours(
+            latitude, longitude, frequency, float(payload['erpKw']), heff_m, service,
+            hnmt_m=hnmt_m,
+            pattern_db=pattern_db,
+            direction_deg=float(direction),
+            protected_dbuv=payload.get('protectedDbuv'),
+            channel=payload.get('channel'),
+            wanted_time_pct=float(payload.get('wantedTimePct') or 50.0),
+            interfering_time_pct=float(payload.get('interferingTimePct') or 10.0),
+            protection_ratios_db={
+                str(k).upper(): tuple(float(x) for x in v) for k, v in (payload.get('protectionRatiosDb') or {}).items()
+            },
+            n_radials=n_radials,
+        )
+    except p1546.CurvesUnavailable as exc:
+        # só o contorno protegido exige as curvas; interferentes ausentes voltam como 'unavailable'
+        return jsonify({'error': f'Curvas P.1546 indisponíveis neste servidor: {exc}', 'figures': exc.figures}), 503
+    except (KeyError, TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc) or 'Parâmetros inválidos.'}), 400
+    return jsonify(result)
+
+
+def _stored_pattern_db(user):
+    """Diagrama horizontal salvo pelo usuário (E/Emax por azimute) em dB, reamostrado a cada 1°."""
+    table = getattr(user, 'antenna_pattern_data_h_modified', None) or getattr(user, 'antenna_pattern_data_h', None)
+    if not table:
+        return None
+    try:
+        entries = json.loads(table)
+        azimuths = np.array([float(str(e['azimuth']).rstrip('°').replace(',', '.')) for e in entries])
+        gains = np.array([float(str(e['gain']).replace(',', '.')) for e in entries])
+    except (TypeError, ValueError, KeyError, json.JSONDecodeError):
+        return None
+    if gains.size < 2:
+        return None
+    linear = np.interp(np.arange(360.0), azimuths % 360.0, np.clip(gains, 1e-6, None), period=360.0)
+    return (20.0 * np.log10(linear)).tolist()
+
+
 def _serialize_report(report: RegulatoryReport) -> dict:
     pdf_url = url_for('regulator_api.download_pdf', report_id=report.id)
     bundle_url = url_for('regulator_api.download_bundle', report_id=report.id)
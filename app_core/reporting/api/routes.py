@@ -6,6 +6,7 @@ from datetime import datetime
 import base64
 import binascii
 
+from app_core.admission import heavy_request
 from app_core.utils import project_by_slug_or_404
 from extensions import db
 
@@ -15,6 +16,7 @@ from . import bp
 
 @bp.route('/analysis', methods=['POST'])
 @login_required
+@heavy_request('report')
 def analysis_report():
     payload = request.get_json() or {}
     slug = payload.get('project') or payload.get('projectSlug')
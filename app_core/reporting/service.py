@@ -18,7 +18,7 @@ import matplotlib.pyplot as plt
 
 from extensions import db
 from app_core.models import Asset, AssetType, Project, Report
-from app_core.storage import ensure_project_path_exists, storage_root
+from app_core.storage import ensure_project_path_exists, ingest_file, storage_root
 from .ai import build_ai_summary, AIUnavailable, AISummaryError
 from app_core.integrations import ibge as ibge_api
 from app_core.analytics.coverage_ibge import summarize_coverage_demographics
@@ -1812,6 +1812,7 @@ def generate_analysis_report(
     c.drawString(40, 40, "Documento interno ATX Coverage")
 
     c.save()
+    checksum, size = ingest_file(pdf_path)
 
     relative_path = pdf_path.relative_to(storage_root())
     asset = Asset(
@@ -1819,6 +1820,8 @@ def generate_analysis_report(
         type=AssetType.pdf,
         path=str(relative_path),
         mime_type='application/pdf',
+        byte_size=size,
+        checksum_sha256=checksum,
         meta={'kind': 'analysis', 'snapshot_asset': snapshot.get('asset_id')},
     )
     db.session.add(asset)
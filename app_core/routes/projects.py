@@ -1,30 +1,38 @@
 from __future__ import annotations
 
+import base64
+import hashlib
 import io
 import json
 import math
+import sqlite3
 from functools import lru_cache
 from pathlib import Path
 
 from flask import (
     Blueprint,
     abort,
+    current_app,
     jsonify,
+    make_response,
     redirect,
     render_template,
     request,
     send_file,
+    stream_with_context,
     url_for,
     flash,
 )
 from flask_login import current_user, login_required
 from sqlalchemy.exc import SQLAlchemyError
 from PIL import Image
+import numpy as np
 
 from extensions import db
 from app_core.models import Project, Asset, AssetType, CoverageJob, Report, DatasetSource
 from app_core.storage import ensure_storage_structure, remove_project_storage, storage_root
 from app_core.utils import (
+    admin_required,
     ensure_unique_slug,
     project_by_slug_or_404,
     project_to_dict,
@@ -32,7 +40,11 @@ from app_core.utils import (
     slugify,
 )
 from app_core.data_acquisition import download_srtm_tile, download_mapbiomas_tile
-from app_core.models import CoverageEngine
+from app_core.models import CoverageEngine, CoverageStatus
+from app_core import admission, coverage_tiles, lulc_store, network, overlay_render
+from app_core import jobs as coverage_jobs
+from app_core.coverage import point_geometry
+from app_core.signal_raster import SignalRaster
 
 
 bp = Blueprint("projects", __name__, url_prefix="/projects")
@@ -128,7 +140,13 @@ def asset_preview(slug, asset_id):
     file_path = storage_root() / asset.path
     if not file_path.exists():
         abort(404)
-    return send_file(file_path, mimetype=asset.mime_type or 'application/octet-stream')
+    # conteúdo endereçado por hash: o SHA-256 é um ETag forte (304 em If-None-Match)
+    return send_file(
+        file_path,
+        mimetype=asset.mime_type or 'application/octet-stream',
+        etag=asset.checksum_sha256 or True,
+        conditional=True,
+    )
 
 
 TILE_SIZE = 256
@@ -276,10 +294,15 @@ def _compose_tile_bytes(image_bytes: bytes, coverage_bounds, tile_bounds) -> byt
     return output.getvalue()
 
 
-def _tile_response(tile_bytes: bytes):
-    buffer = io.BytesIO(tile_bytes)
-    buffer.seek(0)
-    response = send_file(buffer, mimetype='image/png')
+def _tile_response(tile_bytes: bytes, etag: str | None = None):
+    if etag and request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        buffer = io.BytesIO(tile_bytes)
+        buffer.seek(0)
+        response = send_file(buffer, mimetype='image/png')
+    if etag:
+        response.set_etag(etag)
     response.headers['Cache-Control'] = 'public, max-age=86400'
     return response
 
@@ -311,6 +334,20 @@ def coverage_tile(slug, asset_id, z, x, y):
     if y < 0 or y >= scale:
         return _tile_response(_empty_tile_bytes())
 
+    # pirâmide gerada ao salvar a cobertura: uma leitura indexada, com ETag/304
+    tiles_rel = (asset.meta or {}).get('tiles_path')
+    tiles_path = storage_root() / tiles_rel if tiles_rel else None
+    if tiles_path is not None and tiles_path.exists():
+        stat = tiles_path.stat()
+        etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}-{z}-{wrapped_x}-{y}"
+        if request.if_none_match.contains(etag):
+            return _tile_response(b'', etag)
+        try:
+            tile_bytes = coverage_tiles.read_tile(tiles_path, z, wrapped_x, y)
+        except sqlite3.Error:
+            tile_bytes = None
+        return _tile_response(tile_bytes or _empty_tile_bytes(), etag)
+
     summary_path = _resolve_summary_path(image_path)
     coverage_bounds = None
     if summary_path and summary_path.exists():
@@ -330,6 +367,223 @@ def coverage_tile(slug, asset_id, z, x, y):
     return _tile_response(tile_bytes)
 
 
+MAX_SAMPLE_POINTS = 20000
+
+
+@lru_cache(maxsize=32)
+def _load_signal_raster(path_str: str, mtime_ns: int, metadata_json: str) -> SignalRaster:
+    # mtime_ns entra na chave para invalidar o cache se o .npy for regravado
+    return SignalRaster.load(path_str, json.loads(metadata_json))
+
+
+def _json_abort(status, message):
+    abort(make_response(jsonify({"error": message}), status))
+
+
+def _coverage_signal_source(slug, asset_id):
+    """
+    Asset, resumo e raster de sinal (.npy) de uma cobertura do projeto.
+    asset_id é o heatmap ou 'latest'; aborta com 404/409 se faltar algo.
+    """
+    project = project_by_slug_or_404(slug, current_user.uuid)
+    if asset_id == "latest":
+        asset_id = ((project.settings or {}).get("lastCoverage") or {}).get("asset_id")
+        if not asset_id:
+            abort(404)
+    asset = Asset.query.filter_by(id=asset_id, project_id=project.id).first()
+    if asset is None:
+        abort(404)
+
+    image_path = storage_root() / asset.path
+    summary_path = _resolve_summary_path(image_path)
+    if summary_path is None:
+        _json_abort(404, "Resumo da cobertura não encontrado.")
+    try:
+        summary_payload = _load_summary_payload(str(summary_path))
+    except (OSError, json.JSONDecodeError):
+        _json_abort(404, "Resumo da cobertura ilegível.")
+    raster_meta = summary_payload.get("signal_raster") or {}
+    raster_path = summary_path.parent / Path(raster_meta.get("path") or "").name
+    if not raster_meta.get("path") or not raster_path.exists():
+        _json_abort(409, "Cobertura sem raster de sinal; gere a cobertura novamente.")
+    return asset, summary_payload, raster_path, raster_meta
+
+
+def _open_signal_raster(raster_path: Path, raster_meta: dict) -> SignalRaster:
+    return _load_signal_raster(
+        str(raster_path),
+        raster_path.stat().st_mtime_ns,
+        json.dumps(raster_meta, sort_keys=True),
+    )
+
+
+def _parse_sample_points(payload):
+    points = payload.get("points")
+    if points is None and "lat" in payload:
+        points = list(zip(payload.get("lat") or [], payload.get("lon") or payload.get("lng") or []))
+    if not isinstance(points, list):
+        raise ValueError("Informe 'points' como lista de [lat, lon] ou {lat, lon}.")
+    lats, lons = [], []
+    for point in points:
+        if isinstance(point, dict):
+            lat = point.get("lat", point.get("latitude"))
+            lon = point.get("lon", point.get("lng", point.get("longitude")))
+        elif isinstance(point, (list, tuple)) and len(point) >= 2:
+            lat, lon = point[0], point[1]
+        else:
+            raise ValueError("Ponto inválido: use [lat, lon] ou {lat, lon}.")
+        lats.append(float(lat))
+        lons.append(float(lon))
+    return np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+
+
+def _nullable(values, decimals):
+    return [None if not np.isfinite(value) else round(float(value), decimals) for value in values]
+
+
+@bp.route("/<slug>/coverage/<asset_id>/sample", methods=["POST"])
+@login_required
+def coverage_sample(slug, asset_id):
+    """
+    Avalia pontos (receptores, drive test) no raster de sinal de uma cobertura:
+    campo e potência interpolados (bilinear), flag de dentro do raio e
+    distância/azimute a partir do TX. asset_id é o heatmap da cobertura ou
+    'latest' para a última cobertura do projeto.
+    """
+    asset, summary_payload, raster_path, raster_meta = _coverage_signal_source(slug, asset_id)
+
+    try:
+        lats, lons = _parse_sample_points(request.get_json(silent=True) or {})
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    if lats.size > MAX_SAMPLE_POINTS:
+        return jsonify({"error": f"Máximo de {MAX_SAMPLE_POINTS} pontos por requisição."}), 413
+
+    raster = _open_signal_raster(raster_path, raster_meta)
+    field, valid = raster.sample(lats, lons, "dbuv")
+    power = raster.sample(lats, lons, "dbm")[0] if "dbm" in raster.bands else np.full(lats.shape, np.nan)
+
+    response = {
+        "asset_id": str(asset.id),
+        "count": int(lats.size),
+        "lat": lats.tolist(),
+        "lon": lons.tolist(),
+        "field_dbuv_m": _nullable(field, 2),
+        "power_dbm": _nullable(power, 2),
+        "in_range": valid.tolist(),
+    }
+    center = summary_payload.get("center") or {}
+    try:
+        lat_tx = float(center.get("lat"))
+        lon_tx = float(center.get("lng", center.get("lon")))
+    except (TypeError, ValueError):
+        lat_tx = lon_tx = None
+    if lat_tx is not None and lats.size:
+        distance_km, bearing_deg = point_geometry(lon_tx, lat_tx, lons, lats)
+        radius_km = summary_payload.get("requested_radius_km")
+        if radius_km is not None:
+            valid &= distance_km <= float(radius_km)
+            response["in_range"] = valid.tolist()
+        response["distance_km"] = _nullable(distance_km, 3)
+        response["bearing_deg"] = _nullable(bearing_deg, 2)
+    return jsonify(response)
+
+
+DATA_TILE_UNITS = {
+    "dbuv": ("dbuv", "Campo elétrico [dBµV/m]"),
+    "dbm": ("dbm", "Potência recebida [dBm]"),
+}
+
+
+@lru_cache(maxsize=256)
+def _decoded_data_tile(path_str: str, mtime_ns: int, metadata_json: str, band: str, z: int, x: int, y: int):
+    # tile decodificado (float, dB) antes da cor: trocar escala/cmap reaproveita a leitura
+    raster = _load_signal_raster(path_str, mtime_ns, metadata_json)
+    values = coverage_tiles.sample_raster_tile(raster, band, z, x, y)
+    if values is not None:
+        values.flags.writeable = False
+    return values
+
+
+def _data_tile_style(summary_payload):
+    """Unidade, banda, vmin/vmax, colormap e limiares pedidos na query string."""
+    unit = (request.args.get("unit") or "dbuv").lower()
+    if unit not in DATA_TILE_UNITS:
+        _json_abort(400, "Unidade inválida; use dbuv ou dbm.")
+    band, label = DATA_TILE_UNITS[unit]
+    scale_units = ((summary_payload.get("scale") or {}).get("units") or {}).get(unit) or {}
+    try:
+        vmin = float(request.args.get("vmin", scale_units.get("min", 0.0)))
+        vmax = float(request.args.get("vmax", scale_units.get("max", 100.0)))
+        thresholds = tuple(
+            float(value) for value in (request.args.get("thresholds") or "").split(",") if value.strip()
+        )
+    except (TypeError, ValueError):
+        _json_abort(400, "vmin, vmax e thresholds devem ser numéricos.")
+    cmap_name = request.args.get("cmap") or "turbo"
+    try:
+        lut = overlay_render.lut(cmap_name)
+    except ValueError:
+        _json_abort(400, f"Colormap desconhecido: {cmap_name}")
+    return band, label, vmin, vmax, cmap_name, lut, thresholds
+
+
+@bp.route("/<slug>/coverage/<asset_id>/data-tiles/<int:z>/<int:x>/<int:y>.png", methods=["GET"])
+@login_required
+def coverage_data_tile(slug, asset_id, z, x, y):
+    """
+    Tile XYZ gerado na hora a partir do raster de sinal, com unidade,
+    vmin/vmax, colormap e faixas de limiar (thresholds) escolhidos pelo cliente.
+    """
+    if z < 0 or z > 22:
+        abort(404)
+    _, summary_payload, raster_path, raster_meta = _coverage_signal_source(slug, asset_id)
+    band, _, vmin, vmax, cmap_name, lut, thresholds = _data_tile_style(summary_payload)
+    if band not in (raster_meta.get("bands") or []):
+        _json_abort(409, "Raster sem a banda pedida.")
+
+    scale = 1 << z
+    wrapped_x = x % scale
+    if y < 0 or y >= scale:
+        return _tile_response(_empty_tile_bytes())
+
+    stat = raster_path.stat()
+    style_key = f"{band}|{vmin:g}|{vmax:g}|{cmap_name}|{','.join(f'{t:g}' for t in thresholds)}"
+    etag = hashlib.sha1(
+        f"{stat.st_mtime_ns}-{stat.st_size}-{style_key}-{z}-{wrapped_x}-{y}".encode("utf-8")
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        return _tile_response(b"", etag)
+
+    values = _decoded_data_tile(
+        str(raster_path),
+        stat.st_mtime_ns,
+        json.dumps(raster_meta, sort_keys=True),
+        band,
+        z,
+        wrapped_x,
+        y,
+    )
+    if values is None:
+        return _tile_response(_empty_tile_bytes(), etag)
+    return _tile_response(
+        coverage_tiles.render_data_tile(values, vmin, vmax, lut=lut, thresholds=thresholds),
+        etag,
+    )
+
+
+@bp.route("/<slug>/coverage/<asset_id>/legend.png", methods=["GET"])
+@login_required
+def coverage_data_legend(slug, asset_id):
+    """Barra de cores correspondente aos parâmetros dos data tiles."""
+    _, summary_payload, _, _ = _coverage_signal_source(slug, asset_id)
+    _, label, vmin, vmax, cmap_name, _, _ = _data_tile_style(summary_payload)
+    image_b64 = overlay_render.render_colorbar(vmin, vmax, label, cmap_name)
+    response = send_file(io.BytesIO(base64.b64decode(image_b64)), mimetype="image/png")
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response
+
+
 @bp.route("/<slug>/coverage", methods=["GET"])
 @login_required
 def project_coverage_redirect(slug):
@@ -463,6 +717,12 @@ def _job_to_dict(job: CoverageJob) -> dict:
         "inputs": job.inputs,
         "metrics": job.metrics,
         "outputs_asset_id": str(job.outputs_asset_id) if job.outputs_asset_id else None,
+        "stage": job.stage,
+        "progress": job.progress,
+        "priority": job.priority,
+        "memory_mb": job.memory_mb,
+        "parent_id": str(job.parent_id) if job.parent_id else None,
+        "queue_position": admission.queue_position(job),
         "started_at": job.started_at.isoformat() if job.started_at else None,
         "finished_at": job.finished_at.isoformat() if job.finished_at else None,
         "created_at": job.created_at.isoformat() if job.created_at else None,
@@ -595,7 +855,19 @@ def api_acquire_lulc(slug):
     except (ValueError, TypeError):
         return jsonify({"error": "Year must be a number."}), 400
 
-    asset = download_mapbiomas_tile(project, year)
+    # AOI opcional (latitude/longitude/radiusKm); sem ela vale a posição do projeto
+    bounds = None
+    if payload.get("latitude") is not None and payload.get("longitude") is not None:
+        try:
+            bounds = lulc_store.aoi_bounds(
+                float(payload["latitude"]),
+                float(payload["longitude"]),
+                float(payload.get("radiusKm") or current_app.config.get("LULC_AOI_RADIUS_KM", 50.0)),
+            )
+        except (TypeError, ValueError):
+            return jsonify({"error": "latitude, longitude and radiusKm must be numbers."}), 400
+
+    asset = download_mapbiomas_tile(project, year, bounds=bounds)
 
     if asset:
         return jsonify({"asset": _asset_to_dict(asset)}), 201
@@ -619,26 +891,81 @@ def api_submit_job(slug):
     except ValueError:
         return jsonify({"error": f"Invalid engine. Must be one of: {[e.value for e in CoverageEngine]}"}), 400
 
-    job = CoverageJob(
-        project_id=project.id,
-        engine=engine_enum,
-        inputs=inputs,
-    )
-    db.session.add(job)
     try:
-        db.session.commit()
+        job = coverage_jobs.enqueue(project, engine_enum, inputs)
+    except admission.AdmissionError as exc:
+        return admission.too_busy(str(exc), exc.retry_after)
     except SQLAlchemyError as exc:
         db.session.rollback()
         return jsonify({"error": f"Failed to create job: {exc}"}), 500
 
-    # TODO: Trigger background worker here
-
     response = jsonify({"job": _job_to_dict(job)})
     response.status_code = 202 # Accepted
     response.headers["Location"] = url_for("projects_api.api_get_job", slug=slug, job_id=job.id)
     return response
 
 
+@api_bp.route("/<slug>/sites", methods=["GET"])
+@login_required
+def api_list_sites(slug):
+    project = project_by_slug_or_404(slug, current_user.uuid)
+    return jsonify({"sites": network.project_sites(project)})
+
+
+@api_bp.route("/<slug>/sites", methods=["PUT"])
+@login_required
+def api_replace_sites(slug):
+    project = project_by_slug_or_404(slug, current_user.uuid)
+    payload = request.get_json(silent=True) or {}
+    try:
+        sites = network.normalize_sites(payload.get("sites"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    settings = dict(project.settings or {})
+    settings["sites"] = sites
+    project.settings = settings
+    try:
+        db.session.commit()
+    except SQLAlchemyError as exc:
+        db.session.rollback()
+        return jsonify({"error": f"Failed to save sites: {exc}"}), 500
+    return jsonify({"sites": sites})
+
+
+@api_bp.route("/<slug>/network", methods=["POST"])
+@login_required
+def api_submit_network(slug):
+    project = project_by_slug_or_404(slug, current_user.uuid)
+    payload = request.get_json(silent=True) or {}
+    try:
+        engine_enum = CoverageEngine(payload.get("engine") or CoverageEngine.p1546.value)
+    except ValueError:
+        return jsonify({"error": f"Invalid engine. Must be one of: {[e.value for e in CoverageEngine]}"}), 400
+
+    try:
+        job = network.enqueue(project, engine_enum, payload.get("inputs") or {}, payload.get("siteIds"))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except admission.AdmissionError as exc:
+        return admission.too_busy(str(exc), exc.retry_after)
+    except SQLAlchemyError as exc:
+        db.session.rollback()
+        return jsonify({"error": f"Failed to create job: {exc}"}), 500
+
+    data = _job_to_dict(job)
+    data["sites"] = [_job_to_dict(site_job) for site_job in network.site_jobs(job.id)]
+    response = jsonify({
+        "job": data,
+        "status_url": url_for("projects_api.api_get_job", slug=slug, job_id=job.id),
+        "events_url": url_for("projects_api.api_job_events", slug=slug, job_id=job.id),
+        "result_url": url_for("projects_api.api_job_result", slug=slug, job_id=job.id),
+    })
+    response.status_code = 202
+    response.headers["Location"] = url_for("projects_api.api_get_job", slug=slug, job_id=job.id)
+    return response
+
+
 @api_bp.route("/<slug>/jobs/<job_id>", methods=["GET"])
 @login_required
 def api_get_job(slug, job_id):
@@ -647,4 +974,59 @@ def api_get_job(slug, job_id):
     if not job:
         return jsonify({"error": "Job not found."}), 404
 
+    data = _job_to_dict(job)
+    site_jobs = network.site_jobs(job.id)
+    if site_jobs:
+        data["sites"] = [_job_to_dict(site_job) for site_job in site_jobs]
+    return jsonify({"job": data})
+
+
+@api_bp.route("/jobs/metrics", methods=["GET"])
+@login_required
+@admin_required
+def api_jobs_metrics():
+    return jsonify(admission.metrics())
+
+
+def _project_job_or_404(slug, job_id) -> CoverageJob:
+    project = project_by_slug_or_404(slug, current_user.uuid)
+    job = CoverageJob.query.filter_by(id=job_id, project_id=project.id).first()
+    if job is None:
+        abort(404)
+    return job
+
+
+@api_bp.route("/<slug>/jobs/<job_id>/events", methods=["GET"])
+@login_required
+def api_job_events(slug, job_id):
+    job = _project_job_or_404(slug, job_id)
+    # Server-Sent Events: um evento por mudança de etapa/progresso, em janelas curtas
+    # (o EventSource reconecta) para não prender um worker web pelo job inteiro
+    response = current_app.response_class(
+        stream_with_context(coverage_jobs.stream_status(
+            job.id, window_s=current_app.config.get("COVERAGE_EVENTS_WINDOW_S", coverage_jobs.EVENTS_WINDOW_S),
+        )),
+        mimetype="text/event-stream",
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_bp.route("/<slug>/jobs/<job_id>/cancel", methods=["POST"])
+@login_required
+def api_cancel_job(slug, job_id):
+    job = _project_job_or_404(slug, job_id)
+    if not coverage_jobs.cancel(job):
+        return jsonify({"error": "Job already finished.", "job": _job_to_dict(job)}), 409
     return jsonify({"job": _job_to_dict(job)})
+
+
+@api_bp.route("/<slug>/jobs/<job_id>/result", methods=["GET"])
+@login_required
+def api_job_result(slug, job_id):
+    job = _project_job_or_404(slug, job_id)
+    result_path = (job.metrics or {}).get("result_path")
+    if job.status != CoverageStatus.succeeded or not result_path:
+        return jsonify({"error": "Job has no result.", "job": _job_to_dict(job)}), 409
+    return send_file(storage_root() / result_path, mimetype="application/json")
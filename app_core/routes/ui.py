@@ -68,9 +68,24 @@ from app_core.models import (
     CoverageStatus,
 )
 from app_core.email_utils import generate_token, load_token, send_email
-from app_core.storage import ensure_storage_structure, ensure_project_path_exists, storage_root
+from app_core.storage import ensure_storage_structure, ensure_project_path_exists, storage_root, store_bytes
 from app_core.reporting.service import generate_analysis_report, AnalysisReportError
 from app_core.data_acquisition import ensure_geodata_availability, ensure_rt3d_scene, global_srtm_dir
+from app_core import clutter, coverage_tiles, dem_prefetch, dem_store, overlay_render, p1546, terrain_cache
+from app_core import admission
+from app_core import jobs as coverage_jobs
+from app_core.signal_raster import SignalRaster
+from app_core.coverage import (
+    grid_geometry,
+    p1546_coverage_grid,
+    p452_polar_losses,
+    polar_to_grid,
+    pycraf_map_coords,
+    radial_distance_axis,
+    select_map_resolution,
+    site_haat,
+    srtm_terrain_sampler,
+)
 from app_core.utils import (
     ensure_unique_slug,
     project_by_slug_or_404,
@@ -971,6 +986,7 @@ def calculos_rf():
 
 @bp.route('/gerar-relatorio', methods=['GET'])
 @login_required
+@admission.heavy_request('report')
 def download_report():
     project_slug = request.args.get('project')
     project = None
@@ -2113,6 +2129,79 @@ def fetch_elevation():
         current_app.logger.error('Erro ao processar /fetch-elevation: {}'.format(e))
         return jsonify({"error": "Internal server error"}), 500
 
+# -------- Elevação SRTM em lote --------
+
+MAX_ELEVATION_BATCH_POINTS = 100_000
+
+
+def _parse_elevation_points(payload):
+    """Coordenadas do lote: colunas 'lats'/'lons' ou 'points' com [lat, lon] / {lat, lng}."""
+    if 'lats' in payload or 'lat' in payload:
+        lats = np.asarray(payload.get('lats', payload.get('lat')), dtype=float)
+        lons = np.asarray(payload.get('lons', payload.get('lon', payload.get('lng'))), dtype=float)
+        if lats.ndim != 1 or lats.shape != lons.shape:
+            raise ValueError("'lats' e 'lons' devem ser listas do mesmo tamanho.")
+        return lats, lons
+    points = payload.get('points')
+    if not isinstance(points, list):
+        raise ValueError("Informe 'points' como lista de [lat, lon] ou {lat, lng}, ou as colunas 'lats'/'lons'.")
+    lats = np.empty(len(points))
+    lons = np.empty(len(points))
+    for idx, point in enumerate(points):
+        if isinstance(point, dict):
+            lats[idx] = float(point.get('lat', point.get('latitude')))
+            lons[idx] = float(point.get('lng', point.get('lon', point.get('longitude'))))
+        elif isinstance(point, (list, tuple)) and len(point) >= 2:
+            lats[idx] = float(point[0])
+            lons[idx] = float(point[1])
+        else:
+            raise ValueError('Ponto inválido: use [lat, lon] ou {lat, lng}.')
+    return lats, lons
+
+
+@bp.route('/elevation/batch', methods=['POST'])
+@login_required
+def elevation_batch():
+    """
+    Elevações SRTM de um lote de pontos (receptores, drive test): agrupa por
+    tile de 1°, lê cada tile uma vez do store mapeado em memória e devolve a
+    altura bilinear e o status de tile/void de cada ponto. Tiles ausentes não
+    são baixados aqui; aparecem como 'missing_tile'.
+    """
+    try:
+        lats, lons = _parse_elevation_points(request.get_json(silent=True) or {})
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+    if lats.size > MAX_ELEVATION_BATCH_POINTS:
+        return jsonify({'error': f'Máximo de {MAX_ELEVATION_BATCH_POINTS} pontos por requisição.'}), 413
+
+    store = dem_store.get_store(global_srtm_dir())
+    heights, status = store.sample_status(lats, lons)
+
+    elevations = np.round(heights, 2).astype(object)
+    elevations[~np.isfinite(heights)] = None
+    status_names = np.asarray(dem_store.STATUS_NAMES)
+    counts = np.bincount(status, minlength=len(dem_store.STATUS_NAMES))
+
+    tiles = {}
+    valid = status != dem_store.STATUS_INVALID
+    if valid.any():
+        keys, per_tile = np.unique(
+            (np.floor(lats[valid]).astype(int) + 90) * 360 + np.floor(lons[valid]).astype(int) + 180,
+            return_counts=True,
+        )
+        for key, count in zip(keys, per_tile):
+            name = dem_store.tile_name(int(key // 360) - 90, int(key % 360) - 180)
+            tiles[name] = {'available': store.tile_path(name) is not None, 'points': int(count)}
+
+    return jsonify({
+        'count': int(lats.size),
+        'elevation_m': elevations.tolist(),
+        'status': status_names[status].tolist(),
+        'summary': {name: int(count) for name, count in zip(dem_store.STATUS_NAMES, counts)},
+        'tiles': tiles,
+    })
+
 # -------- Utilitários geodésicos --------
 
 def adjust_center_for_coverage(lon_center, lat_center, radius_km):
@@ -2133,14 +2222,15 @@ def _persist_receiver_profile_asset(project: Project, receiver_label: str | None
     slug = _slug_for_filename(receiver_label)
     filename = f"{slug}_{timestamp}.png"
     file_path = storage_dir / filename
-    file_path.write_bytes(image_bytes)
+    checksum, size = store_bytes(file_path, image_bytes)
     rel_path = file_path.relative_to(storage_root())
     asset = Asset(
         project_id=project.id,
         type=AssetType.png,
         path=str(rel_path),
         mime_type='image/png',
-        byte_size=file_path.stat().st_size,
+        byte_size=size,
+        checksum_sha256=checksum,
         meta={
             'kind': 'receiver_profile',
             'label': receiver_label,
@@ -2243,46 +2333,38 @@ def _estimate_tile_zoom(bounds_payload):
 
 
 def _latlon_to_tile_indices(lat_deg, lon_deg, zoom):
-    lat_rad = math.radians(max(min(lat_deg, 85.05112878), -85.05112878))
+    """Índices XYZ (Web Mercator) de um ponto ou de arrays de pontos."""
+    lat_rad = np.radians(np.clip(lat_deg, -85.05112878, 85.05112878))
     scale = 1 << zoom
-    x = (lon_deg + 180.0) / 360.0 * scale
-    y = (1.0 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2.0 * scale
-    return int(math.floor(x)), int(math.floor(y))
+    x = (np.asarray(lon_deg, dtype=float) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2.0 * scale
+    return np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
 
 
-def _build_tile_signal_stats(signal_level_dict, min_zoom, max_zoom):
-    if not signal_level_dict or min_zoom is None or max_zoom is None:
+def _build_tile_signal_stats(signal_raster, min_zoom, max_zoom):
+    """Média do campo [dBµV/m] por tile XYZ, para cada zoom entre min_zoom e max_zoom."""
+    if signal_raster is None or min_zoom is None or max_zoom is None:
+        return {}
+    lats, lons, values = signal_raster.points('dbuv')
+    if not values.size:
         return {}
-    stats = {}
-    for key, value in signal_level_dict.items():
-        try:
-            lat_str, lon_str = key.strip()[1:-1].split(',')
-            lat = float(lat_str)
-            lon = float(lon_str)
-            field_val = float(value)
-        except (ValueError, IndexError, AttributeError, TypeError):
-            continue
-        for zoom in range(int(min_zoom), int(max_zoom) + 1):
-            x_idx, y_idx = _latlon_to_tile_indices(lat, lon, zoom)
-            bucket = stats.setdefault(str(zoom), {})
-            tile_key = f"{x_idx}/{y_idx}"
-            entry = bucket.setdefault(tile_key, {"sum": 0.0, "count": 0})
-            entry["sum"] += field_val
-            entry["count"] += 1
     summary = {}
-    for zoom_key, tiles in stats.items():
-        cleaned = {}
-        for tile_key, payload in tiles.items():
-            if payload["count"]:
-                cleaned[tile_key] = round(payload["sum"] / payload["count"], 2)
-        if cleaned:
-            summary[zoom_key] = cleaned
+    for zoom in range(int(min_zoom), int(max_zoom) + 1):
+        x_idx, y_idx = _latlon_to_tile_indices(lats, lons, zoom)
+        scale = 1 << zoom
+        tiles, inverse = np.unique(x_idx * scale + y_idx, return_inverse=True)
+        means = np.bincount(inverse, weights=values) / np.bincount(inverse)
+        summary[str(zoom)] = {
+            f"{int(tile // scale)}/{int(tile % scale)}": round(float(mean), 2)
+            for tile, mean in zip(tiles, means)
+        }
     return summary
 
 # -------- Perfil (TX → RX) COM CORREÇÃO DA CURVATURA --------
 
 @bp.route('/gerar_img_perfil', methods=['POST'])
 @login_required
+@admission.heavy_request('profile')
 def gerar_img_perfil():
     data = request.get_json()
     start_coords = data['path'][0]
@@ -2397,8 +2479,14 @@ def gerar_img_perfil():
         sample_count = len(elevations)
         distance_samples = np.linspace(0.0, total_distance, sample_count)
         # Ajusta o perfil para coincidir com o solo da torre RX/TX medido via SRTM
-        tx_ground = _compute_site_elevation(tx_coords['lat'], tx_coords['lng'])
-        rx_ground = _compute_site_elevation(rx_coords['lat'], rx_coords['lng'])
+        try:
+            tx_ground, rx_ground = (float(value) for value in _site_elevations(
+                [tx_coords['lat'], rx_coords['lat']],
+                [tx_coords['lng'], rx_coords['lng']],
+            ))
+        except Exception as exc:
+            current_app.logger.warning('Falha ao obter elevação SRTM: %s', exc)
+            tx_ground = rx_ground = None
         if tx_ground is not None or rx_ground is not None:
             start_target = tx_ground if tx_ground is not None else elevations[0]
             end_target = rx_ground if rx_ground is not None else elevations[-1]
@@ -2418,21 +2506,26 @@ def gerar_img_perfil():
         }
         current_app.logger.info('elevation.profile.using_srtm')
         profile_step = 30 * u.m  # SRTM1 tem resolução ≈30 m; evita amostragem excessiva
-        try:
-            with SrtmConf.set(srtm_dir=srtm_dir, download='none', server='viewpano'):
-                profile = pathprof.srtm_height_profile(
-                    lon_tx, lat_tx,
-                    lon_rx, lat_rx,
-                    step=profile_step
-                )
-        except Exception:
+        # perfil lido direto dos tiles mapeados em memória; o pycraf só entra se faltar tile
+        distances_m, heights_m, latitudes, longitudes = dem_store.get_store(srtm_dir).path_profile(
+            lat_tx.value, lon_tx.value,
+            lat_rx.value, lon_rx.value,
+            step_m=profile_step.value,
+        )
+        if np.all(np.isfinite(heights_m)):
+            total_distance = distances_m[-1] * u.m
+            distances = distances_m * u.m
+            heights = heights_m * u.m
+            additional_data = {}
+        else:
             with SrtmConf.set(srtm_dir=srtm_dir, download='missing', server='viewpano'):
                 profile = pathprof.srtm_height_profile(
                     lon_tx, lat_tx,
                     lon_rx, lat_rx,
                     step=profile_step
                 )
-        longitudes, latitudes, total_distance, distances, heights, angle1, angle2, additional_data = profile
+            dem_store.get_store(srtm_dir).refresh()
+            longitudes, latitudes, total_distance, distances, heights, angle1, angle2, additional_data = profile
 
     # alturas das antenas acima do solo
     h_rg = (current_user.rx_height or 1.0) * u.m
@@ -2929,21 +3022,6 @@ def adjust_center(radius_km, center_lat, center_lon):
     new_lon = center_lon - adj_lon*scale_factor_log
     return new_lat, new_lon
 
-def determine_hgt_files(bounds):
-    files_hgt = []
-    lat_start = int(math.floor(bounds['south']))
-    lat_end   = int(math.ceil(bounds['north']))
-    lon_start = int(math.floor(bounds['west']))
-    lon_end   = int(math.ceil(bounds['east']))
-    for lat in range(lat_start, lat_end):
-        for lon in range(lon_start, lon_end):
-            lat_prefix = 'N' if lat >= 0 else 'S'
-            lon_prefix = 'E' if lon >= 0 else 'W'
-            filename = f"{lat_prefix}{abs(lat):02d}{lon_prefix}{abs(lon):03d}.hgt"
-            files_hgt.append(filename)
-    return files_hgt
-
-
 def _load_antenna_patterns(user):
     if not user.antenna_pattern:
         return None, None
@@ -3053,54 +3131,37 @@ def _determine_auto_scale(values, min_val, max_val):
     return float(min_val), float(max_val)
 
 
-def _select_map_resolution(radius_km, min_arcsec=0.5, max_arcsec=20.0):
-    radius_km = max(float(radius_km), 0.5)
-    if radius_km <= 25:
-        target_pixels = 640.0
-    elif radius_km <= 80:
-        target_pixels = 512.0
-    else:
-        target_pixels = 384.0
-
-    km_per_degree = 111.32
-    diameter_deg = max((2.0 * radius_km) / km_per_degree, 0.01)
-    resolution_arcsec = (diameter_deg * 3600.0) / max(target_pixels, 256.0)
-    resolution_arcsec = float(np.clip(resolution_arcsec, min_arcsec, max_arcsec))
-    return resolution_arcsec * u.arcsec
+def _site_elevations(lats, lons):
+    """
+    Elevações SRTM (m) de vários pontos numa leitura só do store mapeado em
+    memória; tiles ausentes são baixados pelo pycraf (viewpano).
+    """
+    with SrtmConf.set(srtm_dir=str(global_srtm_dir()), download='missing', server='viewpano'):
+        return srtm_terrain_sampler(
+            np.atleast_1d(np.asarray(lons, dtype=float)),
+            np.atleast_1d(np.asarray(lats, dtype=float)),
+        )
 
 
 def _compute_site_elevation(lat, lon):
     try:
-        srtm_dir = str(global_srtm_dir())
-        download_mode = 'none'
-        try:
-            with pathprof.SrtmConf.set(srtm_dir=srtm_dir, download=download_mode, server='viewpano'):
-                _, _, height_map = pathprof.srtm_height_map(
-                    lon * u.deg,
-                    lat * u.deg,
-                    0.02 * u.deg,
-                    0.02 * u.deg,
-                    map_resolution=3 * u.arcsec,
-                )
-        except Exception:
-            with pathprof.SrtmConf.set(srtm_dir=srtm_dir, download='missing', server='viewpano'):
-                _, _, height_map = pathprof.srtm_height_map(
-                    lon * u.deg,
-                    lat * u.deg,
-                    0.02 * u.deg,
-                    0.02 * u.deg,
-                    map_resolution=3 * u.arcsec,
-                )
-        hm = np.asarray(height_map.to(u.m).value, dtype=float)
-        if hm.size == 0:
-            return None
-        center_idx = hm.shape[0] // 2
-        return float(hm[center_idx, center_idx])
+        return float(_site_elevations([float(lat)], [float(lon)])[0])
     except Exception as exc:
         current_app.logger.warning('Falha ao obter elevação SRTM: %s', exc)
         return None
 
 
+@lru_cache(maxsize=256)
+def _cached_site_haat(lat, lon, tower_height_m, site_elevation_m, n_radials, inner_km, outer_km,
+                      step_km, srtm_dir, dem_generation):
+    # dem_generation entra na chave: um tile novo no diretório invalida o resultado
+    with SrtmConf.set(srtm_dir=srtm_dir, download='missing', server='viewpano'):
+        return site_haat(
+            lon, lat, tower_height_m, site_elevation_m,
+            n_radials=n_radials, inner_km=inner_km, outer_km=outer_km, step_km=step_km,
+        )
+
+
 def _compute_haat_radials(
     lat_deg,
     lon_deg,
@@ -3109,86 +3170,149 @@ def _compute_haat_radials(
     dem_directory=None,
     inner_km=3.0,
     outer_km=16.0,
-    bearing_step_deg=15,
+    n_radials=24,
     profile_step_m=200.0,
 ):
-    """Calcula HAAT médio com radiais a cada 15° usando perfis SRTM."""
+    """
+    HAAT/HNMT por radial (padrão: 24 radiais, a cada 15°) numa única passada
+    vetorizada sobre o DEM, com cache por sítio. Cada radial traz o HNMT
+    (avg_terrain_m), o HAAT, os extremos e o Δh do terreno entre inner_km e
+    outer_km; retorna (radiais, HAAT médio).
+    """
     try:
         lat = float(lat_deg)
         lon = float(lon_deg)
+        n_radials = int(n_radials or 24)
     except (TypeError, ValueError, RuntimeError):
         return [], None
 
-    if bearing_step_deg <= 0:
-        bearing_step_deg = 15
+    if n_radials <= 0:
+        n_radials = 24
     if outer_km <= inner_km:
         outer_km = inner_km + 0.5
 
-    tower_height = float(tower_height_m or 0.0)
-    origin = (lat, lon)
-    lon_tx = lon * u.deg
-    lat_tx = lat * u.deg
-    srtm_dir = dem_directory or str(global_srtm_dir())
-    radials = []
-
-    def _fetch_profile(lon_rx, lat_rx):
-        try:
-            with SrtmConf.set(srtm_dir=srtm_dir, download='none', server='viewpano'):
-                return pathprof.srtm_height_profile(
-                    lon_tx,
-                    lat_tx,
-                    lon_rx,
-                    lat_rx,
-                    step=max(50.0, profile_step_m) * u.m,
-                )
-        except Exception:
-            with SrtmConf.set(srtm_dir=srtm_dir, download='missing', server='viewpano'):
-                return pathprof.srtm_height_profile(
-                    lon_tx,
-                    lat_tx,
-                    lon_rx,
-                    lat_rx,
-                    step=max(50.0, profile_step_m) * u.m,
-                )
-
-    for bearing in range(0, 360, int(bearing_step_deg)):
-        destination = geodesic(kilometers=outer_km).destination(origin, bearing)
-        lon_rx = float(destination.longitude) * u.deg
-        lat_rx = float(destination.latitude) * u.deg
-        try:
-            profile = _fetch_profile(lon_rx, lat_rx)
-        except Exception as exc:
-            current_app.logger.warning('haat.profile_error', extra={'bearing': bearing, 'error': str(exc)})
-            continue
-
-        try:
-            _, _, _, distances, heights, *_ = profile
-        except (ValueError, TypeError):
-            continue
-
-        dist_km = np.asarray(distances.to(u.km).value, dtype=float)
-        ground_m = np.asarray(heights.to(u.m).value, dtype=float)
-        mask = (dist_km >= float(inner_km)) & (dist_km <= float(outer_km))
-        if not np.any(mask):
-            continue
-
-        avg_ground = float(np.nanmean(ground_m[mask]))
-        site_elevation = float(site_elevation_m) if site_elevation_m is not None else float(ground_m[0])
-        haat_value = (site_elevation + tower_height) - avg_ground
+    srtm_dir = str(dem_directory or global_srtm_dir())
+    store = dem_store.get_store(srtm_dir)
+    store.index()
+    try:
+        bearings, stats, _ = _cached_site_haat(
+            round(lat, 6),
+            round(lon, 6),
+            round(float(tower_height_m or 0.0), 2),
+            round(float(site_elevation_m), 2) if site_elevation_m is not None else None,
+            n_radials,
+            float(inner_km),
+            float(outer_km),
+            max(50.0, float(profile_step_m)) / 1000.0,
+            srtm_dir,
+            store.generation,
+        )
+    except Exception as exc:
+        current_app.logger.warning('haat.profile_error', extra={'error': str(exc)})
+        return [], None
 
-        radials.append({
+    radials = [
+        {
             'bearing_deg': float(bearing),
-            'avg_terrain_m': round(avg_ground, 2),
-            'haat_m': round(haat_value, 2),
-        })
-
+            'avg_terrain_m': round(float(stats['hnmt'][idx]), 2),
+            'haat_m': round(float(stats['haat'][idx]), 2),
+            'min_terrain_m': round(float(stats['min'][idx]), 2),
+            'max_terrain_m': round(float(stats['max'][idx]), 2),
+            'delta_h_m': round(float(stats['delta_h'][idx]), 2),
+        }
+        for idx, bearing in enumerate(bearings)
+        if np.isfinite(stats['haat'][idx])
+    ]
     if not radials:
         return [], None
 
-    haat_average = round(float(np.nanmean([item['haat_m'] for item in radials])), 2)
+    haat_average = round(float(np.mean([item['haat_m'] for item in radials])), 2)
     return radials, haat_average
 
 
+PATH_LOSS_KEYS = ('L_b0p', 'L_bd', 'L_bs', 'L_ba', 'L_b', 'L_b_corr')
+
+
+def _path_loss_signature(params):
+    """Assinatura estável (floats arredondados) dos parâmetros que definem a perda de percurso."""
+    normalized = {
+        key: round(float(value), 6) if isinstance(value, (int, float, np.floating)) and not isinstance(value, bool) else value
+        for key, value in params.items()
+    }
+    return json.dumps(_json_safe(normalized), sort_keys=True, default=str)
+
+
+def _save_path_loss_state(path, state):
+    """Grava o estado de perda (.npz) usado pelo re-budget."""
+    arrays = {key: value for key, value in state.items() if isinstance(value, np.ndarray)}
+    meta = {key: value for key, value in state.items() if not isinstance(value, np.ndarray)}
+    np.savez_compressed(path, meta=np.array(json.dumps(_json_safe(meta))), **arrays)
+
+
+def _load_path_loss_state(path):
+    with np.load(path, allow_pickle=False) as archive:
+        state = {key: archive[key] for key in archive.files if key != 'meta'}
+        meta = json.loads(str(archive['meta'])) if 'meta' in archive.files else {}
+    state.update(meta)
+    return state
+
+
+# ambiente do receptor (Annex 5, Par 9 da P.1546): tipo de área e altura de clutter R2 [m]
+P1546_CLUTTER_BY_MODEL = {
+    'modelo1': ('Urban', 20.0),
+    'modelo2': ('Suburban', 10.0),
+    'modelo3': ('Rural', 15.0),
+    'modelo4': ('Rural', 15.0),
+}
+
+
+def _compute_p1546_grid(
+    lon_tx_deg,
+    lat_tx_deg,
+    xcoords,
+    ycoords,
+    freq_mhz,
+    time_pct,
+    tx_height_m,
+    rx_height_m,
+    propagation_model=None,
+    srtm_dir=None,
+    srtm_download='missing',
+    n_radials=360,
+    distances_km=None,
+    lulc=None,
+):
+    """
+    Perda P.1546 no grid do mapa; None se as curvas não cobrem f/t pedidos.
+    Com lulc (clutter.LulcRaster) o ambiente do receptor e o trecho sobre
+    água vêm do MapBiomas ponto a ponto, e não do propagation_model.
+    """
+    area, clutter_height = P1546_CLUTTER_BY_MODEL.get(propagation_model, ('Rural', 10.0))
+    time_pct = max(float(time_pct), 1.0)
+    missing = p1546.missing_figures(float(freq_mhz), time_pct)
+    if missing:
+        current_app.logger.warning(
+            'p1546.unavailable', extra={'frequency_mhz': float(freq_mhz), 'time_pct': time_pct, 'figures': missing}
+        )
+        return None
+    with SrtmConf.set(srtm_dir=srtm_dir or str(global_srtm_dir()), download=srtm_download, server='viewpano'):
+        return p1546_coverage_grid(
+            float(lon_tx_deg),
+            float(lat_tx_deg),
+            xcoords,
+            ycoords,
+            float(freq_mhz),
+            time_pct,
+            max(float(tx_height_m), 1.0),
+            max(float(rx_height_m), 1.0),
+            area=area,
+            R2=clutter_height,
+            n_radials=n_radials,
+            distances_km=distances_km,
+            lulc=lulc,
+        )
+
+
 def _lookup_municipality_details(lat, lon, include_ibge=False, include_population=False):
     params = {
         'lat': lat,
@@ -3737,106 +3861,41 @@ def _apply_rt3d_penalty(total_loss_db, lat_grid, lon_grid, lat_tx_deg, lon_tx_de
 
 def _render_field_strength_image(lons_deg, lats_deg, field_levels,
                                  radius_km, lon_center_deg, lat_center_deg,
-                                 min_val, max_val, horizontal_pattern_db,
+                                 min_val, max_val,
                                  dist_map_km=None, colorbar_label='Nível de Campo [dBµV/m]'):
-    lon_grid, lat_grid = np.meshgrid(lons_deg, lats_deg)
-    field_plot = np.array(field_levels, copy=True)
+    """
+    PNG da mancha (LUT turbo + feathering na borda, na resolução da malha)
+    e barra de cores, ambos em base64. O diagrama da antena vai à parte
+    (_pattern_inset_payload).
+    """
+    field_plot = np.asarray(field_levels, dtype=float)
 
     if dist_map_km is not None:
         dist_km = np.asarray(dist_map_km, dtype=float)
         if dist_km.shape != field_plot.shape:
             raise ValueError('dist_map_km shape mismatch with field levels grid')
     else:
+        lon_grid, lat_grid = np.meshgrid(lons_deg, lats_deg)
         dist = np.sqrt((lon_grid - lon_center_deg) ** 2 + (lat_grid - lat_center_deg) ** 2)
         earth_radius_km = 6371.0
         dist_km = dist * (np.pi / 180.0) * earth_radius_km
-    field_plot[dist_km > radius_km] = np.nan
-
-    masked_plot = np.ma.masked_invalid(field_plot)
-    base_cmap = plt.cm.get_cmap('turbo')
-    try:
-        cmap = base_cmap.copy()
-    except AttributeError:
-        cmap = ListedColormap(base_cmap(np.linspace(0, 1, base_cmap.N)))
-    cmap.set_bad(alpha=0.0)
 
-    fig, ax = plt.subplots(figsize=(6, 6))
-
-    feather_width = max(radius_km * 0.07, 0.5)
-    transition = (radius_km - dist_km) / feather_width
-    alpha_mask = np.clip(transition, 0.0, 1.0)
-    alpha_mask[dist_km > radius_km] = 0.0
-    if np.ma.isMaskedArray(masked_plot):
-        alpha_mask = np.where(masked_plot.mask, 0.0, alpha_mask)
-
-    mesh = ax.pcolormesh(
-        lon_grid,
-        lat_grid,
-        masked_plot,
-        cmap=cmap,
-        shading='auto',
-        vmin=min_val,
-        vmax=max_val,
-        alpha=alpha_mask,
+    image_base64 = overlay_render.render_overlay(
+        field_plot, lats_deg, min_val, max_val, dist_km, radius_km
     )
+    colorbar_base64 = overlay_render.render_colorbar(min_val, max_val, colorbar_label)
+    return image_base64, colorbar_base64
 
-    if horizontal_pattern_db is not None:
-        pattern_db = np.asarray(horizontal_pattern_db, dtype=float)
-        if pattern_db.ndim == 0:
-            pattern_db = np.array([pattern_db], dtype=float)
-        pattern_db = np.nan_to_num(pattern_db, nan=-40.0)
-        pattern_linear = np.clip(10.0 ** (pattern_db / 20.0), 1e-6, None)
-        max_linear = float(np.nanmax(pattern_linear)) if np.isfinite(pattern_linear).any() else 1.0
-        if max_linear <= 0:
-            max_linear = 1.0
-        pattern_linear = np.clip(pattern_linear / max_linear, 0.0, 1.0)
-        polar_dimension = min(fig.get_size_inches()) * 0.35
-        inset_left = (1.0 - polar_dimension / fig.get_size_inches()[0]) * 0.5
-        inset_bottom = (1.0 - polar_dimension / fig.get_size_inches()[1]) * 0.5
-        ax_inset = fig.add_axes(
-            [inset_left, inset_bottom,
-             polar_dimension / fig.get_size_inches()[0],
-             polar_dimension / fig.get_size_inches()[1]],
-            polar=True,
-        )
-        azimutes = np.linspace(0, 2 * np.pi, len(pattern_linear), endpoint=False)
-        ax_inset.set_theta_zero_location('N')
-        ax_inset.set_theta_direction(-1)
-        ax_inset.plot(azimutes, pattern_linear, color='#0d47a1', linewidth=2)
-        ax_inset.fill_between(azimutes, 0, pattern_linear, color='#0d47a1', alpha=0.12)
-        ax_inset.set_xticks([])
-        ax_inset.set_yticks([0.25, 0.5, 0.75, 1.0])
-        ax_inset.set_yticklabels(['0.25', '0.50', '0.75', '1.00'], fontsize=7)
-        ax_inset.set_ylim(0.0, 1.05)
-        ax_inset.spines['polar'].set_visible(False)
-        ax_inset.grid(True, linestyle='--', linewidth=0.6, alpha=0.4)
-        ax_inset.set_title('Diagrama H (E/Emax)', fontsize=8)
-
-    for spine in ax.spines.values():
-        spine.set_visible(False)
-    ax.set_xticks([]); ax.set_yticks([])
-    ax.xaxis.label.set_visible(False); ax.yaxis.label.set_visible(False)
-
-    img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', transparent=True)
-    img_buffer.seek(0)
-    image_base64 = base64.b64encode(img_buffer.read()).decode('utf-8')
-    plt.close(fig)
-
-    fig_cb, ax_cb = plt.subplots(figsize=(6, 1))
-    norm = Normalize(vmin=min_val, vmax=max_val)
-    scalar_map = ScalarMappable(norm=norm, cmap=cmap)
-    scalar_map.set_array([])
-    fig_cb.colorbar(scalar_map, cax=ax_cb, orientation='horizontal')
-    ax_cb.set_title(colorbar_label)
-    fig_cb.tight_layout()
-    cb_buffer = io.BytesIO()
-    fig_cb.savefig(cb_buffer, format='png', transparent=True)
-    cb_buffer.seek(0)
-    colorbar_base64 = base64.b64encode(cb_buffer.read()).decode('utf-8')
-    plt.close(fig_cb)
 
-    return image_base64, colorbar_base64
+def _pattern_inset_payload(horizontal_pattern_db, bounds, lat_center_deg, lon_center_deg):
+    """Diagrama H (E/Emax) como imagem própria, centrada no TX sobre a mancha."""
+    image = overlay_render.render_pattern_inset(horizontal_pattern_db)
+    if image is None:
+        return None
+    return {
+        "image": image,
+        "bounds": overlay_render.inset_bounds(bounds, float(lat_center_deg), float(lon_center_deg)),
+    }
 
 
 def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scene=None):
@@ -3923,19 +3982,6 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
     except (TypeError, ValueError):
         lon_tx_deg, lat_tx_deg = tx.longitude, tx.latitude
 
-    haat_radials = []
-    haat_average = None
-    try:
-        haat_radials, haat_average = _compute_haat_radials(
-            lat_tx_deg,
-            lon_tx_deg,
-            getattr(tx, 'tower_height', None),
-            getattr(tx, 'tx_site_elevation', None),
-            dem_directory=dem_directory,
-        )
-    except Exception:
-        haat_radials, haat_average = [], None
-
     haat_radials: list[dict] = []
     haat_average = None
     try:
@@ -3945,6 +3991,7 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
             getattr(tx, 'tower_height', None),
             getattr(tx, 'tx_site_elevation', None),
             dem_directory=dem_directory,
+            n_radials=_coerce_optional(data.get('haatRadials')) or 24,
         )
     except Exception:
         haat_radials, haat_average = [], None
@@ -4100,7 +4147,6 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
         lat_tx_deg,
         min_val,
         max_val,
-        horizontal_pattern_db,
         dist_map_km=dist_km_grid,
         colorbar_label='Campo elétrico [dBµV/m]'
     )
@@ -4114,7 +4160,6 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
         lat_tx_deg,
         power_min,
         power_max,
-        None,
         dist_map_km=dist_km_grid,
         colorbar_label='Potência recebida [dBm]'
     )
@@ -4131,7 +4176,6 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
             lat_tx_deg,
             qmin,
             qmax,
-            None,
             dist_map_km=dist_km_grid,
             colorbar_label='Qualidade RT3D [dB]',
         )
@@ -4176,19 +4220,12 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
             },
         }
 
-    signal_level_dict = {}
-    signal_level_dict_dbm = {}
-    for i, lat_val in enumerate(lats_deg):
-        for j, lon_val in enumerate(lons_deg):
-            if not inrange_mask[i, j]:
-                continue
-            if np.isfinite(E_dbuv[i, j]):
-                signal_level_dict[f"({lat_val}, {lon_val})"] = float(E_dbuv[i, j])
-            if np.isfinite(Prx_dbm[i, j]):
-                signal_level_dict_dbm[f"({lat_val}, {lon_val})"] = float(Prx_dbm[i, j])
+    signal_raster = SignalRaster.from_grids(
+        lons_deg, lats_deg, mask=inrange_mask, dbuv=E_dbuv, dbm=Prx_dbm
+    )
 
     tile_min_zoom, tile_max_zoom = _estimate_tile_zoom(bounds)
-    tile_stats_payload = _build_tile_signal_stats(signal_level_dict, tile_min_zoom, tile_max_zoom)
+    tile_stats_payload = _build_tile_signal_stats(signal_raster, tile_min_zoom, tile_max_zoom)
 
     payload = {
         "images": images_payload,
@@ -4220,8 +4257,7 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
         },
         "loss_components": loss_components_summary,
         "center_metrics": center_metrics,
-        "signal_level_dict": signal_level_dict,
-        "signal_level_dict_dbm": signal_level_dict_dbm,
+        "signal_raster": signal_raster.to_payload(),
         "rt3dDiagnostics": penalty_meta.get('diagnostics'),
         "rt3dSettings": {
             "building_source": building_source,
@@ -4234,10 +4270,9 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
         payload['haat_radials'] = haat_radials
     if haat_average is not None:
         payload['haat_average_m'] = haat_average
-    if haat_radials:
-        payload['haat_radials'] = haat_radials
-    if haat_average is not None:
-        payload['haat_average_m'] = haat_average
+    pattern_inset = _pattern_inset_payload(horizontal_pattern_db, bounds, lat_tx_deg, lon_tx_deg)
+    if pattern_inset:
+        payload["pattern_inset"] = pattern_inset
     if tile_min_zoom is not None and tile_max_zoom is not None:
         payload["tile_zoom"] = {"min": int(tile_min_zoom), "max": int(tile_max_zoom)}
     if tile_stats_payload:
@@ -4251,7 +4286,7 @@ def _compute_rt3d_only_map(tx, data, include_arrays=False, label=None, rt3d_scen
     return payload
 
 
-def _persist_coverage_artifacts(user, project, engine_value, request_payload, coverage_payload):
+def _persist_coverage_artifacts(user, project, engine_value, request_payload, coverage_payload, path_loss_state=None, job=None):
     if project is None:
         return None
 
@@ -4300,10 +4335,17 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
     colorbar_path = coverage_dir / f"{base_name}_colorbar.png"
     json_path = coverage_dir / f"{base_name}_summary.json"
 
+    # (sha256, bytes) de cada arquivo: gravados no object store, o caminho do projeto é um link
+    stored = {}
     if heatmap_bytes:
-        heatmap_path.write_bytes(heatmap_bytes)
+        stored['heatmap'] = store_bytes(heatmap_path, heatmap_bytes)
     if colorbar_bytes:
-        colorbar_path.write_bytes(colorbar_bytes)
+        stored['colorbar'] = store_bytes(colorbar_path, colorbar_bytes)
+
+    signal_raster = SignalRaster.from_payload(coverage_payload.get('signal_raster'))
+    signal_raster_path = coverage_dir / f"{base_name}_signal.npy"
+    if signal_raster is not None:
+        stored['signal_raster'] = store_bytes(signal_raster_path, signal_raster.to_bytes())
 
     receivers_payload = coverage_payload.get('receivers') or request_payload.get('receivers')
 
@@ -4322,8 +4364,6 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
         "requested_radius_km": _clean_json(coverage_payload.get('requested_radius_km')),
         "radius": _clean_json(coverage_payload.get('radius')),
         "gain_components": _clean_json(coverage_payload.get('gain_components')),
-        "signal_level_dict": _clean_json(coverage_payload.get('signal_level_dict')),
-        "signal_level_dict_dbm": _clean_json(coverage_payload.get('signal_level_dict_dbm')),
         "location_status": coverage_payload.get('location_status'),
         "tx_location_name": coverage_payload.get('tx_location_name'),
         "tx_site_elevation": coverage_payload.get('tx_site_elevation'),
@@ -4360,7 +4400,8 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
         type=AssetType.heatmap,
         path=str(heatmap_path.relative_to(root_path)),
         mime_type='image/png',
-        byte_size=heatmap_path.stat().st_size if heatmap_path.exists() else 0,
+        byte_size=stored['heatmap'][1] if 'heatmap' in stored else 0,
+        checksum_sha256=stored['heatmap'][0] if 'heatmap' in stored else None,
         meta={
             "engine": engine_enum.value,
             "generated_at": timestamp_iso,
@@ -4391,7 +4432,8 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
             type=AssetType.png,
             path=str(colorbar_path.relative_to(root_path)),
             mime_type='image/png',
-            byte_size=colorbar_path.stat().st_size if colorbar_path.exists() else 0,
+            byte_size=stored['colorbar'][1],
+            checksum_sha256=stored['colorbar'][0],
             meta={
                 "engine": engine_enum.value,
                 "generated_at": timestamp_iso,
@@ -4400,6 +4442,24 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
         )
         db.session.add(colorbar_asset)
 
+    signal_raster_asset = None
+    if signal_raster is not None:
+        signal_raster_asset = Asset(
+            project_id=project.id,
+            type=AssetType.other,
+            path=str(signal_raster_path.relative_to(root_path)),
+            mime_type='application/octet-stream',
+            byte_size=stored['signal_raster'][1],
+            checksum_sha256=stored['signal_raster'][0],
+            meta={
+                "engine": engine_enum.value,
+                "generated_at": timestamp_iso,
+                "kind": "signal_raster",
+                **signal_raster.metadata(),
+            },
+        )
+        db.session.add(signal_raster_asset)
+
     db.session.flush()
 
     tile_metadata = None
@@ -4440,6 +4500,31 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
                 extra={'error': str(exc)},
             )
 
+    # pirâmide Web-Mercator pronta (MBTiles): o endpoint de tiles só faz uma leitura indexada
+    if tile_metadata and heatmap_bytes:
+        tiles_path = coverage_dir / f"{base_name}_tiles.mbtiles"
+        try:
+            tile_count = coverage_tiles.build_mbtiles(
+                heatmap_bytes,
+                {key: float(bounds_payload[key]) for key in ('north', 'south', 'east', 'west')},
+                tile_metadata["min_zoom"],
+                tile_metadata["max_zoom"],
+                tiles_path,
+                name=base_name,
+            )
+        except Exception as exc:
+            current_app.logger.warning(
+                'coverage.tiles.pyramid_failed',
+                extra={'error': str(exc)},
+            )
+        else:
+            heatmap_asset.meta = {
+                **(heatmap_asset.meta or {}),
+                "tiles_path": str(tiles_path.relative_to(root_path)),
+                "tile_count": tile_count,
+            }
+            tile_metadata["store"] = "mbtiles"
+
     summary_payload.update({
         "asset_id": str(heatmap_asset.id),
         "asset_path": heatmap_asset.path,
@@ -4448,30 +4533,46 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
     })
     if colorbar_asset:
         summary_payload["colorbar_asset_id"] = str(colorbar_asset.id)
+    if signal_raster_asset:
+        # só metadados; os níveis ficam no .npy ao lado do resumo
+        summary_payload["signal_raster"] = {
+            **signal_raster.metadata(),
+            "path": signal_raster_asset.path,
+            "asset_id": str(signal_raster_asset.id),
+        }
 
     if tile_metadata:
         summary_payload["tiles"] = _clean_json(tile_metadata)
 
-    json_path.write_text(json.dumps(_json_safe(summary_payload), ensure_ascii=False, indent=2, default=_json_default))
-
-    job = CoverageJob(
-        project_id=project.id,
-        status=CoverageStatus.succeeded,
-        engine=engine_enum,
-        inputs={
-            "request": request_payload,
-            "project_settings": _clean_json(project.settings),
-        },
-        metrics={
-            "center_metrics": _clean_json(coverage_payload.get('center_metrics')),
-            "loss_components": _clean_json(coverage_payload.get('loss_components')),
-            "summary": _clean_json(summary_payload),
-        },
-        outputs_asset_id=heatmap_asset.id,
-        started_at=timestamp,
-        finished_at=timestamp,
+    json_asset.checksum_sha256, json_asset.byte_size = store_bytes(
+        json_path,
+        json.dumps(_json_safe(summary_payload), ensure_ascii=False, indent=2, default=_json_default).encode('utf-8'),
     )
-    db.session.add(job)
+
+    # job da fila (worker): conclui o próprio registro em vez de criar outro
+    queued_job = job is not None
+    if not queued_job:
+        job = CoverageJob(
+            project_id=project.id,
+            engine=engine_enum,
+            status=CoverageStatus.succeeded,
+            inputs={
+                "request": request_payload,
+                "project_settings": _clean_json(project.settings),
+            },
+            started_at=timestamp,
+            finished_at=timestamp,
+        )
+        db.session.add(job)
+    job.metrics = {
+        "center_metrics": _clean_json(coverage_payload.get('center_metrics')),
+        "loss_components": _clean_json(coverage_payload.get('loss_components')),
+        "summary": _clean_json(summary_payload),
+    }
+    job.outputs_asset_id = heatmap_asset.id
+    if queued_job:
+        # UPDATE condicional: um cancelamento depois de progress('persist') prevalece
+        coverage_jobs.complete(job, finished_at=timestamp)
 
     settings = project.settings or {}
     updated_settings = dict(settings)
@@ -4500,6 +4601,8 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
         last_coverage["ibge_registry"] = ibge_registry
     if colorbar_asset:
         last_coverage["colorbar_asset_id"] = str(colorbar_asset.id)
+    if signal_raster_asset:
+        last_coverage["signal_raster"] = summary_payload["signal_raster"]
     if tile_metadata:
         last_coverage["tiles"] = _clean_json(tile_metadata)
     if coverage_payload.get('rt3dScene'):
@@ -4511,6 +4614,19 @@ def _persist_coverage_artifacts(user, project, engine_value, request_payload, co
     if coverage_payload.get('rt3dSettings'):
         last_coverage["rt3d_settings"] = _clean_json(coverage_payload.get('rt3dSettings'))
 
+    # só a última execução de cada projeto guarda o estado de perda (re-budget)
+    previous_state = (settings.get('lastCoverage') or {}).get('path_loss_state')
+    if path_loss_state:
+        state_path = coverage_dir / f"{base_name}_pathloss.npz"
+        try:
+            _save_path_loss_state(state_path, path_loss_state)
+        except Exception as exc:
+            current_app.logger.warning('coverage.path_loss_state_failed', extra={'error': str(exc)})
+        else:
+            last_coverage["path_loss_state"] = str(state_path.relative_to(root_path))
+    if previous_state and previous_state != last_coverage.get("path_loss_state"):
+        (root_path / previous_state).unlink(missing_ok=True)
+
     updated_settings['lastCoverage'] = last_coverage
     project.settings = updated_settings
 
@@ -4658,13 +4774,34 @@ def rt3d_viewer():
         scene_endpoint=url_for('ui.download_rt3d_scene', slug=project.slug),
         data_endpoint=url_for('ui.rt3d_data', slug=project.slug),
     )
-def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_directory=None, rt3d_scene=None):
+def _compute_coverage_map(
+    tx,
+    data,
+    include_arrays=False,
+    label=None,
+    dem_directory=None,
+    rt3d_scene=None,
+    path_loss_state=None,
+    state_sink=None,
+    srtm_download='missing',
+    lulc_path=None,
+    progress=None,
+):
     """
     Gera todos os artefatos de cobertura (heatmap, barra de cores, metadados)
     em formato compatível com mapa.js / generateCoverage() / applyCoverageOverlay().
 
     tx   -> objeto "transmissor" (ex: current_user)
     data -> payload JSON vindo do front (radius, min/max escala, customCenter ...)
+    path_loss_state -> estado salvo por _persist_coverage_artifacts; se a
+                       assinatura bater, pula terreno/perda e refaz só o enlace
+    state_sink -> dict preenchido com o estado de perda desta execução
+    srtm_download -> modo de download do pycraf; 'never' quando os tiles do
+                     raio já foram baixados antes (tile faltante vira zero)
+    lulc_path -> raster MapBiomas do projeto; com ele (e clutterSource != 'model')
+                 o clutter do receptor é calculado pixel a pixel
+    progress -> callback progress(etapa) de app_core.jobs, chamado no início
+                de cada etapa (terreno, perda, enlace, imagens)
     """
 
     if data.get('coverageEngine') == CoverageEngine.rt3d.value:
@@ -4753,6 +4890,10 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
             out['center'] = float(np.nanmean(arr_np[finite_mask]))
         return out
 
+    def _stage(name):
+        if progress is not None:
+            progress(name)
+
     def adjust_center(radius_km, center_lat, center_lon):
         """
         Corrige o centro do raster em função do raio, para compensar
@@ -4881,7 +5022,7 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
     max_valu = _coerce_optional(data.get('maxSignalLevel'))
 
     # resolução do grid em função do raio
-    map_resolution = _select_map_resolution(radius_km)
+    map_resolution = select_map_resolution(radius_km)
 
     # bounding box geodésico aproximado só pra recortar SRTM
     # IMPORTANTE: usamos o centro AJUSTADO aqui, pois é ele que vamos
@@ -4923,60 +5064,284 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
     else:
         zone_t, zone_r = pathprof.CLUTTER.UNKNOWN, pathprof.CLUTTER.UNKNOWN
 
+    # clutter pelo MapBiomas: categoria do pixel do TX e, no receptor, perda
+    # por pixel somada depois (o pycraf só aceita uma zona para o mapa todo)
+    lulc_raster = None
+    if lulc_path and str(data.get('clutterSource') or 'lulc').strip().lower() == 'lulc':
+        try:
+            lulc_raster = clutter.load_raster(lulc_path)
+        except (OSError, ValueError) as exc:
+            current_app.logger.warning('coverage.lulc.unavailable', extra={'error': str(exc)})
+    if lulc_raster is not None:
+        tx_zone, _ = clutter.classify(lulc_raster.classes(lat_tx_deg, lon_tx_deg))
+        zone_t = pathprof.CLUTTER(int(tx_zone))
+        zone_r = pathprof.CLUTTER.UNKNOWN
+
+    _stage('terrain')
+
     # -------------------------------------------------
-    # 2. GERA GRID DE TERRENO + ATENUAÇÃO P.452
+    # 2. GERA GRID DE TERRENO + ATENUAÇÃO
+    #     P.1546 por radiais ou P.452 (pycraf) no grid completo;
+    #     no modo polar o P.452 também é calculado só nas radiais
     #     (usando o centro AJUSTADO!)
     # -------------------------------------------------
     srtm_dir = dem_directory or './SRTM'
-    download_mode = 'none'
-    try:
-        with pathprof.SrtmConf.set(
+    engine_used = data.get('coverageEngine') or CoverageEngine.p1546.value
+    polar_mode = str(data.get('coverageMode') or 'grid').strip().lower() == 'polar'
+    polar_radials = int(np.clip(_coerce_optional(data.get('radials')) or 360, 8, 1440))
+    polar_steps = int(np.clip(_coerce_optional(data.get('steps')) or 250, 16, 4000))
+    # um pouco além do raio para não deixar buracos na borda da máscara circular
+    polar_outer_km = radius_km * 1.01
+
+    # tudo que altera a perda de percurso; potência, perdas, ganhos, azimute
+    # e tilt ficam de fora e podem ser refeitos sobre o estado guardado
+    path_loss_signature = _path_loss_signature({
+        'lat': lat_tx_deg,
+        'lon': lon_tx_deg,
+        'radius_km': radius_km,
+        'frequency_mhz': freq_mhz,
+        'tx_height_m': tx_height_m,
+        'rx_height_m': rx_height_m,
+        'time_pct': time_pct,
+        'polarization': polarization,
+        'p452_version': version,
+        'temperature_k': temperature_k,
+        'pressure_hpa': pressure_hpa,
+        'water_density': water_density,
+        'propagation_model': modelo,
+        'lulc': str(lulc_path) if lulc_raster is not None else None,
+        'engine': engine_used,
+        'coverage_mode': 'polar' if polar_mode else 'grid',
+        'radials': polar_radials if polar_mode else None,
+        'steps': polar_steps if polar_mode else None,
+    })
+    reuse_state = bool(path_loss_state) and path_loss_state.get('signature') == path_loss_signature
+    if path_loss_state and not reuse_state:
+        current_app.logger.info('coverage.rebudget.stale_state')
+
+    xcoords = ycoords = None
+    if not reuse_state and (engine_used == CoverageEngine.p1546.value or polar_mode):
+        xcoords, ycoords = pycraf_map_coords(
+            lon_ref_deg,
+            lat_ref_deg,
+            span_lon,
+            span_lat,
+            map_resolution.to(u.deg).value,
+        )
+
+    p1546_grid = None
+    if not reuse_state and engine_used == CoverageEngine.p1546.value:
+        p1546_grid = _compute_p1546_grid(
+            lon_tx_deg,
+            lat_tx_deg,
+            xcoords,
+            ycoords,
+            freq_mhz,
+            time_pct,
+            tx_height_m,
+            rx_height_m,
+            propagation_model=modelo,
             srtm_dir=srtm_dir,
-            download=download_mode,
-            server='viewpano'
-        ):
-            hprof_cache = pathprof.height_map_data(
-                lon_ref,
-                lat_ref,
-                map_size_lon,
-                map_size_lat,
-                map_resolution=map_resolution,
+            srtm_download=srtm_download,
+            n_radials=polar_radials if polar_mode else 360,
+            distances_km=radial_distance_axis(polar_outer_km, polar_steps) if polar_mode else None,
+            lulc=lulc_raster,
+        )
+        if p1546_grid is None:
+            engine_used = CoverageEngine.pycraf.value
+
+    if reuse_state:
+        # re-budget: perda e geometria da última execução
+        hprof_cache = {
+            key: path_loss_state[key]
+            for key in ('xcoords', 'ycoords', 'dist_map', 'bearing_map')
+        }
+        results = {
+            key: u.Quantity(path_loss_state[key], u.dB)
+            for key in PATH_LOSS_KEYS
+            if key in path_loss_state
+        }
+        if 'path_type' in path_loss_state:
+            results['path_type'] = path_loss_state['path_type']
+        engine_used = path_loss_state.get('engine') or engine_used
+        haat_radials = path_loss_state.get('haat_radials') or []
+        haat_average = path_loss_state.get('haat_average_m')
+    elif p1546_grid is not None:
+        # mesmo formato do hprof_cache do pycraf (dist em km, bearing em rad)
+        hprof_cache = {
+            'xcoords': xcoords,
+            'ycoords': ycoords,
+            'dist_map': p1546_grid['dist_map'],
+            'bearing_map': p1546_grid['bearing_map'],
+        }
+        results = {'L_b': u.Quantity(p1546_grid['loss_map'], u.dB)}
+        haat_radials = [
+            item for item in p1546_grid['radials']
+            if float(item['bearing_deg']) % 15.0 == 0.0
+        ]
+        haat_average = p1546_grid['haat_average_m']
+    elif polar_mode:
+        dist_map, bearing_map = grid_geometry(lon_tx_deg, lat_tx_deg, xcoords, ycoords)
+        hprof_cache = {
+            'xcoords': xcoords,
+            'ycoords': ycoords,
+            'dist_map': dist_map,
+            'bearing_map': bearing_map,
+        }
+        # pycraf analisa perfis com passo uniforme: 'steps' define esse passo
+        with pathprof.SrtmConf.set(srtm_dir=srtm_dir, download=srtm_download, server='viewpano'):
+            bearings, distances, polar_losses = p452_polar_losses(
+                lon_tx_deg,
+                lat_tx_deg,
+                polar_radials,
+                polar_outer_km,
+                polar_outer_km / polar_steps,
+                dict(
+                    freq=frequency,
+                    temperature=temperature,
+                    pressure=pressure,
+                    h_tg=h_tx,
+                    h_rg=h_rx,
+                    timepercent=timepercent,
+                    polarization=polarization,
+                    version=version,
+                    base_water_density=(water_density if water_density is not None else 7.5) * u.g / u.m**3,
+                ),
                 zone_t=zone_t,
                 zone_r=zone_r,
             )
-    except Exception:
-        with pathprof.SrtmConf.set(
-            srtm_dir=srtm_dir,
-            download='missing',
-            server='viewpano'
-        ):
-            hprof_cache = pathprof.height_map_data(
-                lon_ref,
-                lat_ref,
-                map_size_lon,
-                map_size_lat,
-                map_resolution=map_resolution,
-                zone_t=zone_t,
-                zone_r=zone_r,
+        bearing_map_deg = np.degrees(bearing_map)
+        results = {
+            key: u.Quantity(polar_to_grid(values, bearings, distances, bearing_map_deg, dist_map), u.dB)
+            for key, values in polar_losses.items()
+        }
+    else:
+        # terreno do pycraf em cache persistente (só muda com sítio, grade, clutter ou DEM)
+        def _height_map_data():
+            download_mode = 'none'
+            try:
+                with pathprof.SrtmConf.set(
+                    srtm_dir=srtm_dir,
+                    download=download_mode,
+                    server='viewpano'
+                ):
+                    return pathprof.height_map_data(
+                        lon_ref,
+                        lat_ref,
+                        map_size_lon,
+                        map_size_lat,
+                        map_resolution=map_resolution,
+                        zone_t=zone_t,
+                        zone_r=zone_r,
+                    )
+            except Exception:
+                with pathprof.SrtmConf.set(
+                    srtm_dir=srtm_dir,
+                    download=srtm_download,
+                    server='viewpano'
+                ):
+                    return pathprof.height_map_data(
+                        lon_ref,
+                        lat_ref,
+                        map_size_lon,
+                        map_size_lat,
+                        map_resolution=map_resolution,
+                        zone_t=zone_t,
+                        zone_r=zone_r,
+                    )
+
+        grid_lons, grid_lats = pycraf_map_coords(
+            lon_ref_deg,
+            lat_ref_deg,
+            span_lon,
+            span_lat,
+            map_resolution.to(u.deg).value,
+        )
+        dem_tiles = dem_store.tiles_covering(
+            float(grid_lats.min()), float(grid_lats.max()), float(grid_lons.min()), float(grid_lons.max()),
+        )
+        hprof_cache = terrain_cache.cached_height_map_data(
+            _height_map_data,
+            lon_ref_deg,
+            lat_ref_deg,
+            span_lon,
+            span_lat,
+            map_resolution.to(u.arcsec).value,
+            zone_t,
+            zone_r,
+            terrain_cache.dem_tile_checksums(srtm_dir, dem_tiles),
+        )
+        current_app.logger.info('hprof_cache.stats', extra=terrain_cache.cache_stats())
+        _stage('path_loss')
+
+        results = pathprof.atten_map_fast(
+            freq=frequency,
+            temperature=temperature,
+            pressure=pressure,
+            h_tg=h_tx,
+            h_rg=h_rx,
+            timepercent=timepercent,
+            hprof_data=hprof_cache,
+            polarization=polarization,
+            version=version,
+            base_water_density=(water_density if water_density is not None else 7.5) * u.g / u.m**3
+        )
+
+    clutter_summary = {'source': 'lulc' if lulc_raster is not None else 'model'}
+    if lulc_raster is not None:
+        # classes MapBiomas de todos os pixels do mapa numa única leitura
+        pixel_zones, pixel_sea = clutter.classify(lulc_raster.classes(
+            np.asarray(hprof_cache['ycoords'], dtype=float).reshape(-1, 1),
+            np.asarray(hprof_cache['xcoords'], dtype=float).reshape(1, -1),
+        ))
+        zone_values, zone_counts = np.unique(pixel_zones, return_counts=True)
+        clutter_summary['zones'] = {
+            name: round(float(count) / pixel_zones.size, 4)
+            for name, count in zip(clutter.zone_names(zone_values), zone_counts)
+        }
+        clutter_summary['sea_fraction'] = round(float(pixel_sea.mean()), 4)
+        if not reuse_state and p1546_grid is None:
+            # P.452: perda de clutter do receptor (Eq. 57) pixel a pixel
+            clutter_loss = clutter.receiver_clutter_loss(
+                pixel_zones, rx_height_m, frequency.to(u.GHz).value,
             )
+            key = 'L_b_corr' if results.get('L_b_corr') is not None else 'L_b'
+            loss_db = np.asarray(u.Quantity(results[key], u.dB).value, dtype=float)
+            if loss_db.shape == clutter_loss.shape:
+                results[key] = u.Quantity(loss_db + clutter_loss, u.dB)
 
-    results = pathprof.atten_map_fast(
-        freq=frequency,
-        temperature=temperature,
-        pressure=pressure,
-        h_tg=h_tx,
-        h_rg=h_rx,
-        timepercent=timepercent,
-        hprof_data=hprof_cache,
-        polarization=polarization,
-        version=version,
-        base_water_density=(water_density if water_density is not None else 7.5) * u.g / u.m**3
-    )
+    if not haat_radials:
+        # P.452 não calcula HEFF: HAAT/HNMT pelo motor vetorizado (cache por sítio)
+        haat_radials, haat_average = _compute_haat_radials(
+            lat_tx_deg,
+            lon_tx_deg,
+            tx_height_m,
+            getattr(tx, 'tx_site_elevation', None),
+            dem_directory=srtm_dir,
+            n_radials=_coerce_optional(data.get('haatRadials')) or 24,
+        )
+
+    if state_sink is not None:
+        state_sink.update({
+            'signature': path_loss_signature,
+            'engine': engine_used,
+            'haat_radials': haat_radials,
+            'haat_average_m': haat_average,
+        })
+        for key in ('xcoords', 'ycoords', 'dist_map', 'bearing_map'):
+            state_sink[key] = np.asarray(hprof_cache[key], dtype=float)
+        for key in PATH_LOSS_KEYS:
+            if results.get(key) is not None:
+                state_sink[key] = np.asarray(u.Quantity(results[key], u.dB).value, dtype=np.float32)
+        if results.get('path_type') is not None:
+            state_sink['path_type'] = np.asarray(results['path_type'])
 
     # vetores 1D de coordenadas (centros de pixel) do RASTER AJUSTADO
     _lons = hprof_cache['xcoords']
     _lats = hprof_cache['ycoords']
 
+    _stage('budget')
+
     # -------------------------------------------------
     # 3. MAPAS DE PERDA
     # -------------------------------------------------
@@ -5271,13 +5636,22 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
         'system_losses_db': float(loss_sys_db),
         'frequency_mhz': float(freq_mhz),
         'radius_km': float(radius_km),
+        'engine': engine_used,
+        'coverage_mode': 'polar' if polar_mode else 'grid',
+        'rebudget': reuse_state,
+        'clutter': clutter_summary,
     }
+    if polar_mode:
+        center_metrics['radials'] = polar_radials
+        center_metrics['steps'] = polar_steps
 
     try:
         center_metrics['distance_center_km'] = float(dist_km_grid[center_idx])
     except Exception:
         pass
 
+    _stage('render')
+
     # -------------------------------------------------
     # 12. IMAGENS (heatmap/base64) p/ overlay e barra
     # -------------------------------------------------
@@ -5290,7 +5664,6 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
         lat_tx_deg,
         min_val,
         max_val,
-        gain_comp_raw['horizontal_pattern_db'],
         dist_map_km=dist_km_grid,
         colorbar_label='Campo elétrico [dBµV/m]'
     )
@@ -5304,7 +5677,6 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
         lat_tx_deg,
         power_min,
         power_max,
-        gain_comp_raw['horizontal_pattern_db'],
         dist_map_km=dist_km_grid,
         colorbar_label='Potência recebida [dBm]'
     )
@@ -5334,20 +5706,14 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
     }
 
     # -------------------------------------------------
-    # 13. DICIONÁRIOS DE NÍVEL DE CAMPO (p/ clique RX)
+    # 13. RASTER DE NÍVEL DE CAMPO (p/ clique RX)
     # -------------------------------------------------
-    signal_level_dict = {}
-    signal_level_dict_dbm = {}
-
+    # int16 em 0,01 dB + geotransform: consulta por índice, sem chaves "(lat, lon)"
+    signal_raster = None
     if E_plot.shape == (len(lats_deg), len(lons_deg)):
-        for i, lat_val in enumerate(lats_deg):
-            for j, lon_val in enumerate(lons_deg):
-                if not inrange_mask[i, j]:
-                    continue
-                if np.isfinite(E_dbuv[i, j]):
-                    signal_level_dict[f"({lat_val}, {lon_val})"] = float(E_dbuv[i, j])
-                if np.isfinite(Prx_dbm[i, j]):
-                    signal_level_dict_dbm[f"({lat_val}, {lon_val})"] = float(Prx_dbm[i, j])
+        signal_raster = SignalRaster.from_grids(
+            lons_deg, lats_deg, mask=inrange_mask, dbuv=E_dbuv, dbm=Prx_dbm
+        )
 
     # -------------------------------------------------
     # 14. GAIN COMPONENTS (interface com updateGainSummary no front)
@@ -5424,8 +5790,7 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
         "center_metrics": center_metrics,
 
         # usado por computeReceiverSummary() pra estimar o nível no RX clicado
-        "signal_level_dict": signal_level_dict,
-        "signal_level_dict_dbm": signal_level_dict_dbm,
+        "signal_raster": signal_raster.to_payload() if signal_raster is not None else None,
     }
 
     if haat_radials:
@@ -5433,6 +5798,12 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
     if haat_average is not None:
         payload['haat_average_m'] = haat_average
 
+    pattern_inset = _pattern_inset_payload(
+        gain_comp_raw['horizontal_pattern_db'], bounds, lat_tx_deg, lon_tx_deg
+    )
+    if pattern_inset:
+        payload["pattern_inset"] = pattern_inset
+
     if label is not None:
         payload["label"] = str(label)
 
@@ -5442,21 +5813,8 @@ def _compute_coverage_map(tx, data, include_arrays=False, label=None, dem_direct
 
 
 
-@bp.route('/calculate-coverage', methods=['POST'])
-@login_required
-def calculate_coverage():
-    data = request.get_json() or {}
-    project_slug = data.get('projectSlug') or data.get('project_slug')
-    project = None
-    if project_slug:
-        project = project_by_slug_or_404(project_slug, current_user.uuid)
-
-    engine_value = data.get('coverageEngine') or CoverageEngine.p1546.value
-    if engine_value not in {engine.value for engine in CoverageEngine}:
-        engine_value = CoverageEngine.p1546.value
-
-    receivers = data.get('receivers') or []
-
+def _coverage_overrides(project, data):
+    """Parâmetros do TX: configurações do projeto sobrepostas pelos valores da requisição."""
     # Prepare overrides from project settings
     project_overrides = {}
     if project and project.settings:
@@ -5560,24 +5918,151 @@ def calculate_coverage():
     # Combine overrides: request_overrides take precedence over project_overrides
     # which take precedence over current_user defaults.
     all_overrides = {**project_overrides, **request_overrides}
+    return all_overrides
 
-    # Construct the tx_object
-    tx_object = _prepare_tx_object(current_user, overrides=all_overrides)
 
-    if receivers:
-        receivers = _enrich_receivers_metadata(receivers, tx_object)
-        data['receivers'] = receivers
+@bp.route('/calculate-coverage', methods=['POST'])
+@login_required
+def calculate_coverage():
+    data = request.get_json() or {}
+    project_slug = data.get('projectSlug') or data.get('project_slug')
+    if current_app.config.get('FEATURE_WORKERS') and project_slug:
+        # cálculo no pool de workers: o front acompanha pelo status do job
+        project = project_by_slug_or_404(project_slug, current_user.uuid)
+        engine_value = data.get('coverageEngine') or CoverageEngine.p1546.value
+        if engine_value not in {engine.value for engine in CoverageEngine}:
+            engine_value = CoverageEngine.p1546.value
+        try:
+            job = coverage_jobs.enqueue(project, CoverageEngine(engine_value), data, interactive=True)
+        except admission.AdmissionError as exc:
+            return admission.too_busy(str(exc), exc.retry_after)
+        response = jsonify({
+            'job': coverage_jobs.status_payload(job),
+            'status_url': url_for('projects_api.api_get_job', slug=project.slug, job_id=job.id),
+            'events_url': url_for('projects_api.api_job_events', slug=project.slug, job_id=job.id),
+            'result_url': url_for('projects_api.api_job_result', slug=project.slug, job_id=job.id),
+        })
+        response.status_code = 202
+        return response
+    return _run_coverage_request(data)
+
+
+@bp.route('/coverage/rebudget', methods=['POST'])
+@login_required
+def rebudget_coverage():
+    """
+    Refaz só o enlace (potência, perdas, ganhos, azimute, tilt) sobre a perda
+    de percurso guardada da última cobertura do projeto. Se algo que altera a
+    perda mudou (local, frequência, alturas, raio, modelo...), faz o cálculo completo.
+    """
+    data = request.get_json() or {}
+    project_slug = data.get('projectSlug') or data.get('project_slug')
+    if not project_slug:
+        return jsonify({'error': 'Informe o projeto para recalcular o enlace.'}), 400
+    project = project_by_slug_or_404(project_slug, current_user.uuid)
+    if data.get('coverageEngine') == CoverageEngine.rt3d.value:
+        return jsonify({'error': 'Re-budget não disponível para o motor rt3d.'}), 409
+
+    state_rel = ((project.settings or {}).get('lastCoverage') or {}).get('path_loss_state')
+    state_path = storage_root() / state_rel if state_rel else None
+    if state_path is None or not state_path.exists():
+        return jsonify({'error': 'Nenhuma cobertura anterior com perda de percurso salva para este projeto.'}), 409
+    try:
+        path_loss_state = _load_path_loss_state(state_path)
+    except (OSError, ValueError) as exc:
+        current_app.logger.warning('coverage.rebudget.load_failed', extra={'error': str(exc)})
+        return jsonify({'error': 'Estado da última cobertura ilegível; gere a cobertura novamente.'}), 409
+    return _run_coverage_request(data, path_loss_state=path_loss_state)
+
+
+@admission.heavy_request('coverage')
+def _run_coverage_request(data, path_loss_state=None):
+    return jsonify(_json_safe(_coverage_result(data, path_loss_state=path_loss_state)))
+
+
+def run_coverage_job(job, progress):
+    """
+    Executa um CoverageJob da fila (processo worker) exatamente como o
+    /calculate-coverage, em nome do dono do projeto. O payload de resposta
+    fica num JSON do projeto (metrics.result_path) para o front buscar.
+    """
+    project = db.session.get(Project, job.project_id)
+    user = User.query.filter_by(uuid=project.user_uuid).first()
+    data = dict(job.inputs or {})
+    with current_app.test_request_context('/calculate-coverage', method='POST'):
+        login_user(user)
+        result = _coverage_result(data, progress=progress, job=job)
+    if job.status != CoverageStatus.succeeded:
+        raise RuntimeError('Falha ao persistir os artefatos de cobertura.')
+
+    result_path = ensure_project_path_exists(project, 'assets', 'coverage', 'jobs') / f"{job.id}.json"
+    store_bytes(result_path, json.dumps(_json_safe(result), ensure_ascii=False).encode('utf-8'))
+    job.metrics = {**(job.metrics or {}), 'result_path': str(result_path.relative_to(storage_root()))}
+    job.stage = 'done'
+    job.progress = 100.0
+    db.session.commit()
 
+
+def run_site_job(job, progress):
+    """
+    Executa a cobertura de um site de uma rede (job filho de app_core.network).
+    Só o raster de sinal do site é guardado; heatmap, resumo e lastCoverage
+    do projeto ficam de fora — o composto da rede é montado a partir dos rasters.
+    """
+    project = db.session.get(Project, job.project_id)
+    user = User.query.filter_by(uuid=project.user_uuid).first()
+    data = dict(job.inputs or {})
+    engine_value = data.get('coverageEngine') or CoverageEngine.p1546.value
+    with current_app.test_request_context('/calculate-coverage', method='POST'):
+        login_user(user)
+        tx_object = _prepare_tx_object(current_user, overrides=_coverage_overrides(project, data))
+        progress('datasets')
+        dataset_summary, _, lulc_path = _coverage_datasets(project, tx_object, data, engine_value)
+        result = _compute_coverage_map(
+            tx_object,
+            data,
+            dem_directory=dataset_summary.get('dem_dir') if dataset_summary else None,
+            srtm_download=dem_prefetch.srtm_download_mode(dataset_summary.get('dem_tiles')),
+            lulc_path=lulc_path,
+            progress=progress,
+        )
+    raster = SignalRaster.from_payload(result.get('signal_raster'))
+    if raster is None:
+        raise RuntimeError('Cobertura do site sem raster de sinal.')
+
+    progress('persist')
+    network_dir = ensure_project_path_exists(project, 'assets', 'coverage', 'network', str(job.parent_id))
+    raster_path = network_dir / f"{job.id}_signal.npy"
+    # um job reenfileirado grava de novo no mesmo caminho: o link é trocado, nunca reescrito
+    store_bytes(raster_path, raster.to_bytes())
+    job.metrics = {
+        **(job.metrics or {}),
+        'site_id': data.get('siteId'),
+        'center': result.get('center'),
+        'bounds': result.get('bounds'),
+        'signal_raster': {**raster.metadata(), 'path': str(raster_path.relative_to(storage_root()))},
+    }
+    coverage_jobs.complete(job, finished_at=datetime.utcnow(), stage='done', progress=100.0)
+    db.session.commit()
+
+
+def _coverage_datasets(project, tx_object, data, engine_value, path_loss_state=None):
+    """
+    Prepara DEM/LULC (ou a cena rt3d) do projeto em torno do TX.
+    Retorna (dataset_summary, rt3d_scene_summary, lulc_path).
+    """
     dataset_summary = {}
     rt3d_scene_summary = None
     if project and tx_object.latitude is not None and tx_object.longitude is not None:
-        if engine_value != CoverageEngine.rt3d.value:
+        if engine_value != CoverageEngine.rt3d.value and path_loss_state is None:
             try:
                 dataset_summary = ensure_geodata_availability(
                     project,
                     tx_object.latitude,
                     tx_object.longitude,
                     data.get('lulcYear'),
+                    # as radiais do P.1546 vão até o canto do grid quadrado (r·√2)
+                    radius_km=(_coerce_float(data.get('radius')) or 10.0) * math.sqrt(2.0),
                 )
             except Exception as exc:
                 current_app.logger.warning('Falha ao preparar datasets base: %s', exc)
@@ -5598,8 +6083,66 @@ def calculate_coverage():
                 current_app.logger.warning('rt3d.scene.failure', extra={'error': str(exc)})
                 rt3d_scene_summary = None
 
+    lulc_asset = (dataset_summary or {}).get('lulc_asset')
+    if lulc_asset is None and project is not None:
+        # re-budget não passa pelo ensure_geodata: mesmo LULC da execução anterior
+        lulc_asset = (
+            Asset.query.filter_by(project_id=project.id, type=AssetType.lulc)
+            .order_by(Asset.created_at.desc())
+            .first()
+        )
+    lulc_path = None
+    if lulc_asset is not None and lulc_asset.path:
+        candidate = storage_root() / lulc_asset.path
+        lulc_path = str(candidate) if candidate.exists() else None
+    return dataset_summary, rt3d_scene_summary, lulc_path
+
+
+def _coverage_result(data, path_loss_state=None, progress=None, job=None):
+    """
+    progress -> callback progress(etapa, fração) de app_core.jobs (pode
+                cancelar o job levantando JobCanceled)
+    job      -> CoverageJob da fila a concluir com os artefatos
+    """
+    project_slug = data.get('projectSlug') or data.get('project_slug')
+    project = None
+    if project_slug:
+        project = project_by_slug_or_404(project_slug, current_user.uuid)
+
+    engine_value = data.get('coverageEngine') or CoverageEngine.p1546.value
+    if engine_value not in {engine.value for engine in CoverageEngine}:
+        engine_value = CoverageEngine.p1546.value
+
+    receivers = data.get('receivers') or []
+
+    all_overrides = _coverage_overrides(project, data)
+
+    # Construct the tx_object
+    tx_object = _prepare_tx_object(current_user, overrides=all_overrides)
+
+    if receivers:
+        receivers = _enrich_receivers_metadata(receivers, tx_object)
+        data['receivers'] = receivers
+
+    if progress is not None:
+        progress('datasets')
+    dataset_summary, rt3d_scene_summary, lulc_path = _coverage_datasets(
+        project, tx_object, data, engine_value, path_loss_state
+    )
     dem_directory = dataset_summary.get('dem_dir') if dataset_summary else None
-    result = _compute_coverage_map(tx_object, data, dem_directory=dem_directory, rt3d_scene=rt3d_scene_summary)
+    state_sink = {} if engine_value != CoverageEngine.rt3d.value else None
+    result = _compute_coverage_map(
+        tx_object,
+        data,
+        dem_directory=dem_directory,
+        rt3d_scene=rt3d_scene_summary,
+        path_loss_state=path_loss_state,
+        state_sink=state_sink,
+        # tiles do raio já baixados e validados: o cálculo não espera rede
+        srtm_download=dem_prefetch.srtm_download_mode(dataset_summary.get('dem_tiles')),
+        lulc_path=lulc_path,
+        progress=progress,
+    )
     if receivers:
         result['receivers'] = receivers
     receivers_pop = _collect_receivers_population(receivers)
@@ -5613,6 +6156,8 @@ def calculate_coverage():
             status_payload['demTile'] = meta.get('tile')
             status_payload['demResolution'] = meta.get('resolution')
             status_payload['demSource'] = meta.get('source')
+        if dataset_summary.get('dem_tiles'):
+            status_payload['demTiles'] = dem_prefetch.readiness(dataset_summary['dem_tiles'])
         lulc_asset = dataset_summary.get('lulc_asset')
         if lulc_asset is not None:
             meta = lulc_asset.meta or {}
@@ -5645,9 +6190,16 @@ def calculate_coverage():
         result.setdefault('project_slug', project.slug)
 
     persisted = None
+    if progress is not None:
+        progress('persist')
     try:
-        persisted = _persist_coverage_artifacts(current_user, project, engine_value, data, result)
+        persisted = _persist_coverage_artifacts(
+            current_user, project, engine_value, data, result, path_loss_state=state_sink, job=job
+        )
         db.session.commit()
+    except coverage_jobs.JobCanceled:
+        db.session.rollback()
+        raise
     except Exception as exc:
         current_app.logger.exception('Falha ao persistir artefatos de cobertura: %s', exc)
         db.session.rollback()
@@ -5683,7 +6235,7 @@ def calculate_coverage():
         if tiles_meta:
             result['tiles'] = tiles_meta
 
-    return jsonify(_json_safe(result))
+    return result
 
 
 
@@ -0,0 +1,204 @@
+"""
+Compact binary rasters for the coverage field-strength and received-power grids.
+
+Each band is stored as int16 counts of SCALE_DB (0.01 dB); pixels outside the
+coverage radius hold NODATA. The grid is described by a GDAL-style
+geotransform (lon0, dlon, 0, lat0, 0, dlat) whose origin is the outer corner
+of the first pixel, so a (lat, lon) lookup is plain index arithmetic.
+Rasters are written as .npy sidecars (bands stacked on axis 0) and travel to
+the browser base64-encoded.
+"""
+
+from __future__ import annotations
+
+import base64
+import io
+from pathlib import Path
+
+import numpy as np
+
+SCALE_DB = 0.01
+NODATA = int(np.iinfo(np.int16).min)
+FORMAT = "int16-le"
+DTYPE = np.dtype("<i2")
+
+
+def geotransform(lons_deg, lats_deg) -> list[float]:
+    """Geotransform of a regular grid given its pixel-centre coordinates."""
+    lons = np.asarray(lons_deg, dtype=float).ravel()
+    lats = np.asarray(lats_deg, dtype=float).ravel()
+    dlon = (lons[-1] - lons[0]) / (lons.size - 1) if lons.size > 1 else 1.0
+    dlat = (lats[-1] - lats[0]) / (lats.size - 1) if lats.size > 1 else 1.0
+    return [
+        float(lons[0] - dlon / 2.0), float(dlon), 0.0,
+        float(lats[0] - dlat / 2.0), 0.0, float(dlat),
+    ]
+
+
+def encode(values, mask=None) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    valid = np.isfinite(values)
+    if mask is not None:
+        valid &= np.asarray(mask, dtype=bool)
+    counts = np.full(values.shape, NODATA, dtype=DTYPE)
+    counts[valid] = np.clip(np.rint(values[valid] / SCALE_DB), NODATA + 1, np.iinfo(np.int16).max)
+    return counts
+
+
+def decode(counts) -> np.ndarray:
+    counts = np.asarray(counts)
+    values = counts.astype(np.float32) * np.float32(SCALE_DB)
+    values[counts == NODATA] = np.nan
+    return values
+
+
+class SignalRaster:
+    """Named int16 bands sharing one geotransform."""
+
+    def __init__(self, bands: dict[str, np.ndarray], transform):
+        if not bands:
+            raise ValueError("SignalRaster needs at least one band")
+        shapes = {band.shape for band in bands.values()}
+        if len(shapes) != 1:
+            raise ValueError("all bands must share the same shape")
+        self.bands = bands
+        self.transform = [float(value) for value in transform]
+
+    @classmethod
+    def from_grids(cls, lons_deg, lats_deg, mask=None, **grids) -> "SignalRaster":
+        bands = {name: encode(grid, mask) for name, grid in grids.items()}
+        return cls(bands, geotransform(lons_deg, lats_deg))
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return next(iter(self.bands.values())).shape
+
+    def index(self, lat, lon):
+        """(row, col) of the pixel containing (lat, lon), or None outside the grid."""
+        lon0, dlon, _, lat0, _, dlat = self.transform
+        col = int(np.floor((float(lon) - lon0) / dlon))
+        row = int(np.floor((float(lat) - lat0) / dlat))
+        rows, cols = self.shape
+        if 0 <= row < rows and 0 <= col < cols:
+            return row, col
+        return None
+
+    def lookup(self, lat, lon, band: str = "dbuv"):
+        idx = self.index(lat, lon)
+        if idx is None:
+            return None
+        count = int(self.bands[band][idx])
+        return None if count == NODATA else count * SCALE_DB
+
+    def sample(self, lats, lons, band: str = "dbuv"):
+        """
+        Bilinear interpolation between pixel centres for arrays of points.
+        NODATA neighbours are left out and the remaining weights renormalised.
+        Returns (values, valid): values is NaN when no neighbour is valid or
+        the point falls outside the grid; valid says whether the pixel that
+        contains the point holds data.
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        counts = self.bands[band]
+        rows, cols = self.shape
+        lon0, dlon, _, lat0, _, dlat = self.transform
+        frow = (lats - lat0) / dlat
+        fcol = (lons - lon0) / dlon
+        inside = (frow >= 0) & (frow < rows) & (fcol >= 0) & (fcol < cols)
+
+        cell_r = np.clip(np.floor(frow), 0, rows - 1).astype(np.intp)
+        cell_c = np.clip(np.floor(fcol), 0, cols - 1).astype(np.intp)
+        valid = inside & (np.asarray(counts[cell_r, cell_c]) != NODATA)
+
+        frow = frow - 0.5
+        fcol = fcol - 0.5
+        r0 = np.floor(frow).astype(np.intp)
+        c0 = np.floor(fcol).astype(np.intp)
+        wr = frow - r0
+        wc = fcol - c0
+        total = np.zeros(lats.shape)
+        weight = np.zeros(lats.shape)
+        for dr, dc, w in ((0, 0, (1 - wr) * (1 - wc)), (1, 0, wr * (1 - wc)),
+                          (0, 1, (1 - wr) * wc), (1, 1, wr * wc)):
+            rr = r0 + dr
+            cc = c0 + dc
+            ok = inside & (rr >= 0) & (rr < rows) & (cc >= 0) & (cc < cols)
+            vals = np.asarray(counts[np.clip(rr, 0, rows - 1), np.clip(cc, 0, cols - 1)])
+            ok &= vals != NODATA
+            total += np.where(ok, w * vals, 0.0)
+            weight += np.where(ok, w, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values = np.where(inside & (weight > 0), total / weight * SCALE_DB, np.nan)
+        return values, valid
+
+    def values(self, band: str = "dbuv") -> np.ndarray:
+        return decode(self.bands[band])
+
+    def points(self, band: str = "dbuv", min_value=None):
+        """Pixel-centre (lats, lons, values) of valid pixels, optionally >= min_value."""
+        counts = np.asarray(self.bands[band])
+        valid = counts != NODATA
+        if min_value is not None:
+            valid &= counts >= np.ceil(float(min_value) / SCALE_DB - 1e-9)
+        rows, cols = np.nonzero(valid)
+        lon0, dlon, _, lat0, _, dlat = self.transform
+        lats = lat0 + (rows + 0.5) * dlat
+        lons = lon0 + (cols + 0.5) * dlon
+        return lats, lons, counts[rows, cols].astype(float) * SCALE_DB
+
+    def metadata(self) -> dict:
+        return {
+            "format": FORMAT,
+            "shape": list(self.shape),
+            "bands": list(self.bands),
+            "geotransform": list(self.transform),
+            "scale": SCALE_DB,
+            "nodata": NODATA,
+        }
+
+    def to_payload(self) -> dict:
+        payload = self.metadata()
+        payload["data"] = {
+            name: base64.b64encode(np.ascontiguousarray(band, dtype=DTYPE).tobytes()).decode("ascii")
+            for name, band in self.bands.items()
+        }
+        return payload
+
+    def save(self, path) -> None:
+        np.save(path, np.stack([np.asarray(band, dtype=DTYPE) for band in self.bands.values()]))
+
+    def to_bytes(self) -> bytes:
+        """The .npy file save() writes, for storage.store_bytes."""
+        buffer = io.BytesIO()
+        self.save(buffer)
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, path, metadata: dict) -> "SignalRaster":
+        stack = np.load(path, mmap_mode="r", allow_pickle=False)
+        names = metadata.get("bands") or ["dbuv", "dbm"][: stack.shape[0]]
+        return cls(dict(zip(names, stack)), metadata["geotransform"])
+
+    @classmethod
+    def from_payload(cls, payload: dict, base_dir=None) -> "SignalRaster | None":
+        """
+        Rebuilds a raster from a response payload (base64 bands) or from
+        summary metadata pointing at the .npy sidecar (resolved by file name
+        inside base_dir).
+        """
+        if not payload or not payload.get("geotransform"):
+            return None
+        shape = tuple(payload.get("shape") or ())
+        data = payload.get("data")
+        if data:
+            bands = {
+                name: np.frombuffer(base64.b64decode(blob), dtype=DTYPE).reshape(shape)
+                for name, blob in data.items()
+            }
+            return cls(bands, payload["geotransform"])
+        if payload.get("path") and base_dir is not None:
+            sidecar = Path(base_dir) / Path(payload["path"]).name
+            if sidecar.exists():
+                return cls.load(sidecar, payload)
+        return None
@@ -1,12 +1,35 @@
+"""
+Project storage layout and the content-addressed object store.
+
+Asset bytes live once under ``objects/<sha[:2]>/<sha256>``; the file at an
+asset's project path is a hard link to its object, so path-based readers
+(rasterio, np.load, send_file) keep working unchanged while identical
+outputs of different projects share one inode. The link count of an object
+is its reference count: removing a project drops its links and
+collect_garbage() deletes objects nothing links to anymore. Shared datasets
+(the LULC mosaics of app_core.lulc_store) are linked from shared/ the same
+way.
+"""
+
 from __future__ import annotations
 
+import hashlib
 import os
 import shutil
+import tempfile
+import time
+import uuid
 from pathlib import Path
 from typing import Iterable
 
 from flask import current_app
 
+OBJECTS_DIR = "objects"
+HASH_CHUNK = 1 << 20
+OBJECT_MODE = 0o444
+# objects younger than this may be between "stored" and "linked" in another worker
+GC_GRACE_SECONDS = 3600
+
 
 def storage_root() -> Path:
     root = current_app.config.get("STORAGE_ROOT")
@@ -15,6 +38,13 @@ def storage_root() -> Path:
     return Path(root)
 
 
+def shared_storage_path(*parts: str) -> Path:
+    """Datasets shared by every project (e.g. shared/lulc)."""
+    base = storage_root().joinpath("shared", *parts)
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
 def project_storage_path(user_uuid: str, project_slug: str) -> Path:
     base = storage_root() / str(user_uuid) / project_slug
     base.mkdir(parents=True, exist_ok=True)
@@ -49,6 +79,7 @@ def remove_project_storage(user_uuid: str, project_slug: str) -> None:
     path = storage_root() / str(user_uuid) / project_slug
     if path.exists():
         shutil.rmtree(path)
+        collect_garbage()
 
 
 def iter_user_projects(user_uuid: str) -> Iterable[Path]:
@@ -73,3 +104,149 @@ def get_project_asset_path(project, asset_type: str, filename: str) -> str:
     """
     return str(Path(str(project.user_uuid)) / project.slug / 'assets' / asset_type / filename)
 
+
+def objects_root() -> Path:
+    base = storage_root() / OBJECTS_DIR
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+def object_path(sha256: str) -> Path:
+    return storage_root() / OBJECTS_DIR / sha256[:2] / sha256
+
+
+def file_sha256(path) -> tuple[str, int]:
+    """(sha256 hex digest, size) of a file, read in HASH_CHUNK blocks."""
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK), b""):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+def _link(target: Path, dest: Path) -> None:
+    """Atomically make dest a hard link to target (a copy across devices)."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.link")
+    try:
+        try:
+            os.link(target, tmp)
+        except OSError:
+            shutil.copyfile(target, tmp)
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _adopt(tmp: Path, sha256: str) -> Path:
+    """Move a fully written temp file into the store (or drop it on a dedup hit)."""
+    target = object_path(sha256)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists():
+        tmp.unlink()
+        # identical bytes written again: refresh mtime for age-based readers
+        os.utime(target)
+    else:
+        os.chmod(tmp, OBJECT_MODE)
+        os.replace(tmp, target)
+    return target
+
+
+def store_stream(dest, chunks: Iterable[bytes]) -> tuple[str, int]:
+    """
+    Write chunks to the object store, hashing them on the way, and link dest
+    to the resulting object. Returns (sha256, size).
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=objects_root(), prefix=".incoming-")
+    tmp = Path(tmp_name)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            for chunk in chunks:
+                hasher.update(chunk)
+                fh.write(chunk)
+                size += len(chunk)
+        sha256 = hasher.hexdigest()
+        target = _adopt(tmp, sha256)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    _link(target, Path(dest))
+    return sha256, size
+
+
+def store_bytes(dest, data: bytes) -> tuple[str, int]:
+    view = memoryview(data)
+    return store_stream(dest, (view[i:i + HASH_CHUNK] for i in range(0, len(view), HASH_CHUNK)))
+
+
+def ingest_file(path) -> tuple[str, int]:
+    """
+    Move a file already written at its project path (by rasterio, numpy,
+    reportlab...) into the object store and leave a link in its place.
+    A new object is linked, not copied, so ingestion reads the file once.
+
+    The file must be a fresh one: a path still linked to a stored object
+    was written through that link (corrupting every path sharing it), so
+    it is refused with ValueError. Rewrite such paths with store_bytes.
+    """
+    path = Path(path)
+    sha256, size = file_sha256(path)
+    target = object_path(sha256)
+    if path.stat().st_nlink > 1 and not (target.exists() and os.path.samefile(path, target)):
+        raise ValueError(f"{path} shares its inode with a stored object; write a new file instead.")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if not target.exists():
+        tmp = target.with_name(f".incoming-{uuid.uuid4().hex}")
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+        _adopt(tmp, sha256)
+    else:
+        os.utime(target)
+    if not os.path.samefile(path, target):
+        _link(target, path)
+    return sha256, size
+
+
+def object_refcount(sha256: str) -> int:
+    """Project paths currently linked to an object (0 when it is missing)."""
+    try:
+        return os.stat(object_path(sha256)).st_nlink - 1
+    except FileNotFoundError:
+        return 0
+
+
+def collect_garbage(grace_seconds: float = GC_GRACE_SECONDS, dry_run: bool = False) -> dict:
+    """
+    Delete objects no project path links to anymore, plus stale incoming
+    temp files. Returns {'removed': n, 'freed_bytes': n, 'kept': n}.
+    """
+    root = storage_root() / OBJECTS_DIR
+    stats = {"removed": 0, "freed_bytes": 0, "kept": 0}
+    if not root.exists():
+        return stats
+    cutoff = time.time() - grace_seconds
+    for path in root.glob("*/*"):
+        try:
+            info = path.stat()
+        except FileNotFoundError:
+            continue
+        if info.st_nlink > 1 or info.st_mtime > cutoff:
+            stats["kept"] += 1
+            continue
+        if not dry_run:
+            path.unlink(missing_ok=True)
+        stats["removed"] += 1
+        stats["freed_bytes"] += info.st_size
+    for path in root.glob(".incoming-*"):
+        try:
+            if path.stat().st_mtime <= cutoff and not dry_run:
+                path.unlink(missing_ok=True)
+        except FileNotFoundError:
+            continue
+    return stats
@@ -0,0 +1,221 @@
+"""
+Persistent cache of pathprof.height_map_data results (the hprof_cache dict).
+
+Entries live under STORAGE_ROOT/cache/hprof as compressed .npz files named by
+the SHA-256 of the site, grid, clutter zones and DEM tile checksums. On the
+first hit an entry is expanded to plain .npy files that are memory-mapped on
+every later load. Least recently used entries are evicted once the cache
+exceeds HPROF_CACHE_MAX_BYTES.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from flask import current_app
+
+from app_core import dem_store
+from app_core.storage import storage_root
+
+CACHE_DIRNAME = Path("cache") / "hprof"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+COORD_DECIMALS = 6
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_checksum_memo: dict[tuple[str, int, int], str] = {}
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def cache_stats() -> dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def cache_dir() -> Path:
+    path = storage_root() / CACHE_DIRNAME
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _max_bytes() -> int:
+    return int(current_app.config.get("HPROF_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+
+
+def file_checksum(path: Path) -> str:
+    """SHA-256 of a file, memoised by path, size and mtime."""
+    stat = path.stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    cached = _checksum_memo.get(memo_key)
+    if cached:
+        return cached
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    _checksum_memo[memo_key] = value
+    return value
+
+
+def dem_tile_checksums(srtm_dir, tile_names: Iterable[str]) -> dict[str, str | None]:
+    """
+    Checksums of the .hgt tiles (looked up in the DEM store index, which
+    searches recursively as pycraf does) that cover the map. Missing tiles
+    map to None so that a later download changes the key.
+    """
+    store = dem_store.get_store(srtm_dir)
+    checksums = {}
+    for name in sorted(set(tile_names)):
+        path = store.tile_path(name)
+        checksums[name] = file_checksum(path) if path is not None else None
+    return checksums
+
+
+def make_key(lon_deg, lat_deg, map_size_lon_deg, map_size_lat_deg, map_resolution_arcsec,
+             zone_t, zone_r, dem_checksums: dict[str, str | None]) -> str:
+    payload = {
+        "lon": round(float(lon_deg), COORD_DECIMALS),
+        "lat": round(float(lat_deg), COORD_DECIMALS),
+        "size_lon": round(float(map_size_lon_deg), COORD_DECIMALS),
+        "size_lat": round(float(map_size_lat_deg), COORD_DECIMALS),
+        "resolution": round(float(map_resolution_arcsec), 4),
+        "zone_t": int(zone_t),
+        "zone_r": int(zone_r),
+        "dem": dem_checksums,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _entry_paths(key: str) -> tuple[Path, Path]:
+    base = cache_dir()
+    return base / f"{key}.npz", base / f"{key}.d"
+
+
+def _touch(path: Path) -> None:
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _unpack(value):
+    if isinstance(value, np.ndarray) and value.ndim == 0:
+        return value.item()
+    return value
+
+
+def _expand(npz_path: Path, expanded: Path) -> None:
+    tmp = expanded.with_name(expanded.name + f".tmp{os.getpid()}")
+    tmp.mkdir(parents=True, exist_ok=True)
+    with np.load(npz_path, allow_pickle=False) as archive:
+        for name in archive.files:
+            np.save(tmp / f"{name}.npy", archive[name], allow_pickle=False)
+    try:
+        tmp.rename(expanded)
+    except OSError:
+        # another worker expanded the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load(key: str) -> dict | None:
+    npz_path, expanded = _entry_paths(key)
+    if not npz_path.exists():
+        _count("misses")
+        return None
+    try:
+        if not expanded.exists():
+            _expand(npz_path, expanded)
+        # copy-on-write maps: pycraf's cython kernels need writable buffers
+        data = {
+            path.stem: _unpack(np.load(path, mmap_mode="c", allow_pickle=False))
+            for path in expanded.glob("*.npy")
+        }
+    except (OSError, ValueError) as exc:
+        current_app.logger.warning("hprof_cache.corrupt", extra={"key": key, "error": str(exc)})
+        discard(key)
+        _count("misses")
+        return None
+    _touch(npz_path)
+    _count("hits")
+    return data
+
+
+def store(key: str, hprof_cache: dict) -> None:
+    npz_path, _ = _entry_paths(key)
+    arrays = {name: np.asarray(value) for name, value in hprof_cache.items()}
+    tmp = npz_path.with_name(f"{key}.tmp{os.getpid()}.npz")
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, npz_path)
+    _count("stores")
+    evict()
+
+
+def discard(key: str) -> None:
+    npz_path, expanded = _entry_paths(key)
+    npz_path.unlink(missing_ok=True)
+    shutil.rmtree(expanded, ignore_errors=True)
+
+
+def _entry_size(npz_path: Path) -> int:
+    size = npz_path.stat().st_size
+    expanded = npz_path.with_suffix(".d")
+    if expanded.exists():
+        size += sum(p.stat().st_size for p in expanded.glob("*.npy"))
+    return size
+
+
+def evict(max_bytes: int | None = None) -> int:
+    """Removes least recently used entries until the cache fits in max_bytes."""
+    limit = _max_bytes() if max_bytes is None else int(max_bytes)
+    entries = []
+    for npz_path in cache_dir().glob("*.npz"):
+        try:
+            entries.append((npz_path.stat().st_mtime, npz_path, _entry_size(npz_path)))
+        except OSError:
+            continue
+    total = sum(size for _, _, size in entries)
+    removed = 0
+    for _, npz_path, size in sorted(entries, key=lambda item: item[0]):
+        if total <= limit:
+            break
+        discard(npz_path.stem)
+        total -= size
+        removed += 1
+    if removed:
+        _count("evictions", removed)
+    return removed
+
+
+def cached_height_map_data(compute, lon_deg, lat_deg, map_size_lon_deg, map_size_lat_deg,
+                           map_resolution_arcsec, zone_t, zone_r, dem_checksums):
+    """
+    Returns the cached hprof_cache for the given site/grid or calls compute()
+    and stores its result. Cache failures never break the coverage request.
+    """
+    key = make_key(lon_deg, lat_deg, map_size_lon_deg, map_size_lat_deg,
+                   map_resolution_arcsec, zone_t, zone_r, dem_checksums)
+    try:
+        cached = load(key)
+    except Exception as exc:
+        current_app.logger.warning("hprof_cache.load_failed", extra={"error": str(exc)})
+        cached = None
+    if cached is not None:
+        return cached
+    hprof_cache = compute()
+    try:
+        store(key, hprof_cache)
+    except Exception as exc:
+        current_app.logger.warning("hprof_cache.store_failed", extra={"error": str(exc)})
+    return hprof_cache
@@ -1,6 +1,7 @@
 import re
 import unicodedata
 import uuid
+from functools import wraps
 from typing import Iterable, Optional
 
 from flask import abort
@@ -46,6 +47,18 @@ def project_by_slug_or_404(slug: str, user_uuid=None) -> Project:
     return project
 
 
+def admin_required(view):
+    """Restringe a rota a administradores; use abaixo de ``login_required``."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not getattr(current_user, "is_admin", False):
+            abort(403)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
 def projects_to_dict(projects: Iterable[Project]) -> list[dict]:
     return [project_to_dict(project) for project in projects]
 
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""CLI para gerar app_core/p1546_tables.npy a partir da planilha de valores tabulados da ITU-R P.1546."""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from app_core import p1546
+
+
+def _read_workbook(path: Path, cell_range: str) -> dict[int, list[list[float]]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:  # pragma: no cover - dependência opcional
+        raise SystemExit("openpyxl é necessário para ler a planilha (.xlsx).") from exc
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    tables = {}
+    for fig, sheet in enumerate(workbook.worksheets[:24], start=1):
+        rows = [[cell.value for cell in row] for row in sheet[cell_range]]
+        tables[fig] = [[np.nan if value is None else float(value) for value in row] for row in rows]
+    return tables
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gera o cubo de curvas da ITU-R P.1546 usado por app_core.p1546.")
+    parser.add_argument('--input', required=True, help='Planilha .xlsx com uma aba por figura (1 a 24).')
+    parser.add_argument('--range', default='B6:K84', help="Intervalo de cada aba (padrão 'B6:K84').")
+    parser.add_argument('--output', default=p1546.FIELD_TABLES_PATH, help='Arquivo .npy de saída.')
+    args = parser.parse_args()
+
+    workbook_path = Path(args.input)
+    if not workbook_path.exists():
+        raise SystemExit(f"Arquivo {args.input} não encontrado.")
+
+    cube = p1546.build_field_tables(_read_workbook(workbook_path, args.range))
+    # Mantém as figuras já disponíveis que não constam da planilha.
+    current = np.asarray(p1546.FIELD_TABLES)
+    cube = np.where(np.isnan(cube), current, cube)
+
+    np.save(args.output, cube)
+    available = []
+    for fig in range(1, 25):
+        fi, ti, paths = p1546.figure_index(fig)
+        if not np.isnan(cube[fi, ti, paths[0], 0, 0]):
+            available.append(fig)
+    print(f"Tabelas gravadas em {args.output}: figuras {available}")
+
+
+if __name__ == '__main__':
+    main()
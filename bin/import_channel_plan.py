@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""CLI para importar o plano básico ANATEL (docs/Canais/*.xml) no índice local."""
+
+import argparse
+
+from app3 import app
+from app_core import channel_plan
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Importa os XML do plano de canais (só os arquivos alterados).")
+    parser.add_argument('--dir', help='Diretório com os XML (padrão: CHANNEL_PLAN_DIR).')
+    args = parser.parse_args()
+
+    with app.app_context():
+        store = channel_plan.default_store()
+        for result in store.import_directory(args.dir):
+            print(f"{result['name']}: {result['status']} ({result['rows']} estações)")
+        print(f"Índice: {len(store.index())} estações em {store.db_path}")
+
+
+if __name__ == '__main__':
+    main()
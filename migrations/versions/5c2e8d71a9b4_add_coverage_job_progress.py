@@ -0,0 +1,28 @@
+"""add coverage job stage and progress
+
+Revision ID: 5c2e8d71a9b4
+Revises: 1e4fa8cd5acb
+Create Date: 2026-10-17 09:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8d71a9b4'
+down_revision = '1e4fa8cd5acb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('coverage_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stage', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('progress', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('coverage_jobs', schema=None) as batch_op:
+        batch_op.drop_column('progress')
+        batch_op.drop_column('stage')
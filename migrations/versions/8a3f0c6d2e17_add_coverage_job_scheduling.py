@@ -0,0 +1,28 @@
+"""add coverage job priority and memory estimate
+
+Revision ID: 8a3f0c6d2e17
+Revises: 5c2e8d71a9b4
+Create Date: 2026-10-17 11:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3f0c6d2e17'
+down_revision = '5c2e8d71a9b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('coverage_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('priority', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('memory_mb', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('coverage_jobs', schema=None) as batch_op:
+        batch_op.drop_column('memory_mb')
+        batch_op.drop_column('priority')
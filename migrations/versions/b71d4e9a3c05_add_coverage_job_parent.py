@@ -0,0 +1,40 @@
+"""add coverage job parent (per-site jobs of a network run)
+
+Revision ID: b71d4e9a3c05
+Revises: 8a3f0c6d2e17
+Create Date: 2026-10-17 14:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import app_core
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71d4e9a3c05'
+down_revision = '8a3f0c6d2e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('coverage_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parent_id', app_core.db_types.GUID(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_coverage_jobs_parent_id'), ['parent_id'], unique=False)
+        batch_op.create_foreign_key(
+            "fk_coverage_jobs_parent_id_coverage_jobs",
+            "coverage_jobs",
+            ["parent_id"],
+            ["id"],
+            ondelete="CASCADE",
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('coverage_jobs', schema=None) as batch_op:
+        batch_op.drop_constraint(
+            "fk_coverage_jobs_parent_id_coverage_jobs",
+            type_="foreignkey",
+        )
+        batch_op.drop_index(batch_op.f('ix_coverage_jobs_parent_id'))
+        batch_op.drop_column('parent_id')
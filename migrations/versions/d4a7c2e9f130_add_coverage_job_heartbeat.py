@@ -0,0 +1,28 @@
+"""add coverage job owner and heartbeat (recovery of orphaned runs)
+
+Revision ID: d4a7c2e9f130
+Revises: b71d4e9a3c05
+Create Date: 2026-10-17 18:05:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7c2e9f130'
+down_revision = 'b71d4e9a3c05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('coverage_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('worker', sa.String(length=128), nullable=True))
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('coverage_jobs', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('worker')
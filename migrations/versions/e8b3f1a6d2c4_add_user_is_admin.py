@@ -0,0 +1,26 @@
+"""add users.is_admin (admin-only operational endpoints)
+
+Revision ID: e8b3f1a6d2c4
+Revises: d4a7c2e9f130
+Create Date: 2026-10-17 19:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b3f1a6d2c4'
+down_revision = 'd4a7c2e9f130'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_admin', sa.Boolean(), nullable=False, server_default=sa.text('false')))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('is_admin')
@@ -0,0 +1,28 @@
+// Compartilhado por pages/mapa.js e pages/cobertura.js: cálculo enfileirado (202),
+// acompanha o job e devolve a resposta final da cobertura
+async function awaitCoverageJob(response, onProgress = null) {
+    if (response.status !== 202) {
+        return response;
+    }
+    const accepted = await response.json();
+    for (;;) {
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+        const statusResponse = await fetch(accepted.status_url);
+        if (!statusResponse.ok) {
+            throw new Error('Falha ao consultar o job de cobertura');
+        }
+        const { job } = await statusResponse.json();
+        if (onProgress) {
+            onProgress(job);
+        }
+        if (job.status === 'succeeded') {
+            return fetch(accepted.result_url);
+        }
+        if (job.status === 'failed' || job.status === 'canceled') {
+            const message = job.status === 'canceled'
+                ? 'Cálculo de cobertura cancelado'
+                : (job.metrics?.error || 'Falha ao gerar cobertura');
+            throw new Error(message);
+        }
+    }
+}
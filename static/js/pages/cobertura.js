@@ -526,10 +526,14 @@
         }
 
         try {
-            const response = await fetch('/calculate-coverage', {
+            const response = await awaitCoverageJob(await fetch('/calculate-coverage', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(coveragePayload),
+            }), (job) => {
+                if (job.progress != null) {
+                    notify(`Gerando cobertura... ${Math.round(job.progress)}%`, 'info', 1500);
+                }
             });
 
             if (!response.ok) {
@@ -544,11 +548,18 @@
             }
 
             if (data.datasetStatus) {
-                const { demTile, lulcYear, buildingsSource, buildingsCount } = data.datasetStatus;
+                const { demTile, demTiles, lulcYear, buildingsSource, buildingsCount } = data.datasetStatus;
                 const parts = [];
                 if (demTile) {
                     parts.push(`DEM ${demTile}`);
                 }
+                if (demTiles && demTiles.total) {
+                    parts.push(`SRTM ${demTiles.ready}/${demTiles.total} tiles`);
+                    const failed = Object.keys(demTiles.failed || {});
+                    if (failed.length) {
+                        notify(`Tiles SRTM indisponíveis: ${failed.join(', ')}`, 'warning', 6000);
+                    }
+                }
                 if (lulcYear) {
                     parts.push(`LULC ${lulcYear}`);
                 }
@@ -29,6 +29,7 @@ const state = {
     linkLine: null,
     directionLine: null,
     coverageOverlay: null,
+    patternInsetOverlay: null,
     tileOverlayLayer: null,
     tileLabelLayer: null,
     tileOverlayLayer: null,
@@ -317,6 +318,93 @@ function blobToBase64(blob) {
     });
 }
 
+function base64ToInt16(base64) {
+    const binary = atob(base64);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i += 1) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return new Int16Array(bytes.buffer);
+}
+
+// Lê um .npy int16 (bandas empilhadas no eixo 0) gerado pelo backend.
+function npyToInt16(buffer) {
+    const view = new DataView(buffer);
+    const major = view.getUint8(6);
+    const headerLen = major >= 2 ? view.getUint32(8, true) : view.getUint16(8, true);
+    const offset = (major >= 2 ? 12 : 10) + headerLen;
+    return new Int16Array(buffer, offset);
+}
+
+// Raster de sinal: int16 em `scale` dB por banda + geotransform (lon0, dlon, 0, lat0, 0, dlat).
+function decodeSignalRaster(meta, npyBuffer = null) {
+    if (!meta || !Array.isArray(meta.geotransform) || !Array.isArray(meta.shape)) {
+        return null;
+    }
+    const [rows, cols] = meta.shape;
+    const bands = {};
+    if (meta.data) {
+        Object.entries(meta.data).forEach(([name, blob]) => {
+            bands[name] = base64ToInt16(blob);
+        });
+    } else if (npyBuffer) {
+        const stack = npyToInt16(npyBuffer);
+        (meta.bands || []).forEach((name, idx) => {
+            bands[name] = stack.subarray(idx * rows * cols, (idx + 1) * rows * cols);
+        });
+    }
+    if (!Object.keys(bands).length) {
+        return null;
+    }
+    return {
+        rows,
+        cols,
+        geotransform: meta.geotransform,
+        scale: meta.scale ?? 0.01,
+        nodata: meta.nodata ?? -32768,
+        bands,
+    };
+}
+
+function lookupSignalRaster(raster, lat, lng, band = 'dbuv') {
+    const values = raster?.bands?.[band];
+    if (!values) {
+        return null;
+    }
+    const [lon0, dlon, , lat0, , dlat] = raster.geotransform;
+    const col = Math.floor((lng - lon0) / dlon);
+    const row = Math.floor((lat - lat0) / dlat);
+    if (row < 0 || row >= raster.rows || col < 0 || col >= raster.cols) {
+        return null;
+    }
+    const count = values[row * raster.cols + col];
+    return count === raster.nodata ? null : count * raster.scale;
+}
+
+async function fetchSignalRaster(slug, meta) {
+    if (!meta) {
+        return null;
+    }
+    if (meta.data) {
+        return decodeSignalRaster(meta);
+    }
+    if (!meta.asset_id || !slug) {
+        return null;
+    }
+    try {
+        const response = await fetch(
+            `/projects/${encodeURIComponent(slug)}/assets/${encodeURIComponent(meta.asset_id)}/preview`
+        );
+        if (!response.ok) {
+            return null;
+        }
+        return decodeSignalRaster(meta, await response.arrayBuffer());
+    } catch (error) {
+        console.warn('Falha ao carregar raster de sinal da cobertura.', error);
+        return null;
+    }
+}
+
 function updateRadiusLabel() {
     const radiusInput = document.getElementById('radiusInput');
     const radiusValue = document.getElementById('radiusValue');
@@ -1134,6 +1222,10 @@ function clearCoverageOverlay() {
         state.coverageOverlay.setMap(null);
         state.coverageOverlay = null;
     }
+    if (state.patternInsetOverlay) {
+        state.patternInsetOverlay.setMap(null);
+        state.patternInsetOverlay = null;
+    }
     if (state.radiusCircle) {
         state.radiusCircle.setMap(null);
         state.radiusCircle = null;
@@ -1215,6 +1307,20 @@ function applyCoverageOverlay(response) {
         });
     }
 
+    // Diagrama H da antena: imagem própria, centrada no TX
+    const inset = response.pattern_inset;
+    if (inset && inset.image && inset.bounds) {
+        state.patternInsetOverlay = new google.maps.GroundOverlay(
+            `data:image/png;base64,${inset.image}`,
+            new google.maps.LatLngBounds(
+                new google.maps.LatLng(inset.bounds.south, inset.bounds.west),
+                new google.maps.LatLng(inset.bounds.north, inset.bounds.east),
+            ),
+            { clickable: false },
+        );
+        state.patternInsetOverlay.setMap(state.map);
+    }
+
     // Colorbar lateral
     if (colorbarImage) {
         const card = document.getElementById('colorbarCard');
@@ -1328,8 +1434,8 @@ async function loadCoverageOverlay(lastCoverage) {
         gain_components: summary?.gain_components || lastCoverage.gain_components,
         loss_components: summary?.loss_components || lastCoverage.loss_components,
         center_metrics: summary?.center_metrics || lastCoverage.center_metrics,
-        signal_level_dict: summary?.signal_level_dict,
-        signal_level_dict_dbm: summary?.signal_level_dict_dbm,
+        signal_raster: await fetchSignalRaster(slug, summary?.signal_raster || lastCoverage.signal_raster),
+        signal_level_dict: summary?.signal_raster ? null : summary?.signal_level_dict,
         location_status: summary?.location_status || lastCoverage.location_status,
         receivers: lastCoverage.receivers || summary?.receivers || [],
         rt3dScene: summary?.rt3d_scene || lastCoverage.rt3d_scene || null,
@@ -1374,8 +1480,8 @@ async function loadCoverageOverlay(lastCoverage) {
             state.coverageData.receivers || [],
         );
     }
+    state.coverageData.signal_raster = coveragePayload.signal_raster;
     state.coverageData.signal_level_dict = coveragePayload.signal_level_dict;
-    state.coverageData.signal_level_dict_dbm = coveragePayload.signal_level_dict_dbm;
     state.coverageData.tiles = coveragePayload.tiles || null;
     state.coverageData.project_slug = slug;
     state.coverageData.rt3dScene = coveragePayload.rt3dScene || summary?.rt3d_scene || lastCoverage.rt3d_scene || state.coverageData.rt3dScene || null;
@@ -1736,12 +1842,14 @@ function computeReceiverSummary(position, baseSummary = {}) {
         lng: Number(position.lng().toFixed(7)),
     };
 
-    if (state.coverageData && state.coverageData.signal_level_dict) {
-        const field = findNearestFieldStrength(
-            position.lat(),
-            position.lng(),
-            state.coverageData.signal_level_dict
-        );
+    if (state.coverageData && (state.coverageData.signal_raster || state.coverageData.signal_level_dict)) {
+        const field = state.coverageData.signal_raster
+            ? lookupSignalRaster(state.coverageData.signal_raster, position.lat(), position.lng())
+            : findNearestFieldStrength(
+                position.lat(),
+                position.lng(),
+                state.coverageData.signal_level_dict
+            );
         if (field !== null) {
             summary.fieldValue = Number(field.toFixed(3));
             summary.field = `${field.toFixed(1)} dBµV/m`;
@@ -2081,6 +2189,7 @@ function confirmPersistAndGenerate(options = {}) {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload),
     })
+        .then((response) => awaitCoverageJob(response))
         .then((response) => {
             if (!response.ok) {
                 return response.json()
@@ -2186,8 +2295,8 @@ function confirmPersistAndGenerate(options = {}) {
             updateLossSummary(data.loss_components);
             updateCenterSummary(data.center_metrics);
 
-            state.coverageData.signal_level_dict = data.signal_level_dict;
-            state.coverageData.signal_level_dict_dbm = data.signal_level_dict_dbm;
+            state.coverageData.signal_raster = decodeSignalRaster(data.signal_raster);
+            state.coverageData.signal_level_dict = null;
 
             if (state.txData) {
                 if (data.txLocationName || data.tx_location_name) {
@@ -2618,8 +2727,8 @@ function initCoverageMap() {
                 state.coverageData.gain_components = state.coverageData.gain_components || null;
                 state.coverageData.loss_components = state.coverageData.loss_components || null;
                 state.coverageData.center_metrics = state.coverageData.center_metrics || null;
+                state.coverageData.signal_raster = state.coverageData.signal_raster || null;
                 state.coverageData.signal_level_dict = state.coverageData.signal_level_dict || null;
-                state.coverageData.signal_level_dict_dbm = state.coverageData.signal_level_dict_dbm || null;
                 state.coverageData.location_status = state.coverageData.location_status || null;
                 state.coverageData.rt3dScene = state.coverageData.rt3dScene
                     || state.coverageData.rt3d_scene
@@ -2701,8 +2810,8 @@ function initCoverageMap() {
             ensureElevationService();
 
             if (state.coverageData) {
+                state.coverageData.signal_raster = null;
                 state.coverageData.signal_level_dict = null;
-                state.coverageData.signal_level_dict_dbm = null;
                 if (!state.coverageData.rt3dScene && state.coverageData.rt3d_scene) {
                     state.coverageData.rt3dScene = state.coverageData.rt3d_scene;
                 }
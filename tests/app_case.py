@@ -0,0 +1,68 @@
+"""Base dos testes que sobem o app Flask sobre um banco SQLite temporário."""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app_core import create_app, jobs
+from app_core.models import Project
+from extensions import db
+from user import User
+
+
+class AppTestCase(unittest.TestCase):
+    """App com SQLite e STORAGE_ROOT num diretório temporário e o contexto empilhado.
+
+    Subclasses acrescentam variáveis de ambiente em ``app_env`` e criam seus
+    usuários/projetos com ``create_user``/``create_project`` no próprio setUp.
+    """
+
+    def app_env(self):
+        # chamado com self.tmp já criado, antes do create_app
+        return {}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {
+            'DATABASE_URL': f'sqlite:///{self.tmp.name}/app.db',
+            'STORAGE_ROOT': os.path.join(self.tmp.name, 'storage'),
+            **self.app_env(),
+        }
+        with mock.patch.dict(os.environ, env):
+            self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        self.tmp.cleanup()
+
+    def create_user(self, username='u', **fields):
+        user = User(username=username, email=f'{username}@x', is_email_confirmed=True, **fields)
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def create_project(self, user, slug='p', name='P', settings=None):
+        project = Project(user_uuid=user.uuid, name=name, slug=slug, settings={} if settings is None else settings)
+        db.session.add(project)
+        db.session.commit()
+        return project
+
+    def login(self, user, client=None):
+        client = client or self.client
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        return client
+
+    def hold_dispatch(self):
+        # o pool não sobe nos testes: run_job roda no próprio processo
+        patcher = mock.patch.object(jobs.JobRunner, 'dispatch', return_value=0)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
@@ -0,0 +1,145 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from app_case import AppTestCase
+from app_core import admission
+from app_core.models import CoverageEngine, CoverageJob, CoverageStatus
+from extensions import db
+
+
+class AdmissionTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.config.update(
+            COVERAGE_USER_CONCURRENCY=1,
+            COVERAGE_USER_MAX_PENDING=3,
+            COVERAGE_MAX_QUEUE=32,
+            COVERAGE_MEMORY_BUDGET_MB=1000,
+        )
+        self.projects = {}
+        for name in ('ana', 'bia'):
+            self.projects[name] = self.create_project(self.create_user(name), slug=name, name=name)
+        self.ana_id = self.projects['ana'].user_uuid
+        self.hold_dispatch()
+        admission._rejections.clear()
+
+    def _job(self, owner, minutes_ago, priority=admission.PRIORITY_BATCH, memory_mb=100.0,
+             status=CoverageStatus.queued):
+        job = CoverageJob(
+            project_id=self.projects[owner].id,
+            engine=CoverageEngine.p1546,
+            inputs={},
+            status=status,
+            priority=priority,
+            memory_mb=memory_mb,
+            created_at=datetime.utcnow() - timedelta(minutes=minutes_ago),
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    def test_memory_estimate_and_priority(self):
+        small = admission.estimate_memory_mb('p1546', {'radius': 2})
+        # mesma resolução de mapa: cresce com a área
+        self.assertGreater(admission.estimate_memory_mb('p1546', {'radius': 5}), small)
+        # pycraf guarda mais camadas por pixel que o P.1546
+        self.assertGreater(admission.estimate_memory_mb('pycraf', {'radius': 5}), small)
+        polar = {'coverageMode': 'polar', 'radials': 360, 'steps': 100}
+        self.assertEqual(admission.grid_pixels(polar), 36000)
+        self.assertEqual(admission.priority_for('p1546', {'radius': 5}, True), admission.PRIORITY_INTERACTIVE)
+        self.assertEqual(admission.priority_for('p1546', {'radius': 80}, True), admission.PRIORITY_BATCH)
+        self.assertEqual(admission.priority_for('rt3d', {'radius': 5}, True), admission.PRIORITY_BATCH)
+        self.assertEqual(admission.priority_for('p1546', {'radius': 5}, False), admission.PRIORITY_BATCH)
+
+    def test_next_job_order_and_limits(self):
+        old_batch = self._job('ana', 30)
+        interactive = self._job('bia', 5, priority=admission.PRIORITY_INTERACTIVE)
+        self.assertEqual(admission.next_job().id, interactive.id)
+        self.assertEqual(admission.queue_position(interactive), 1)
+        self.assertEqual(admission.queue_position(old_batch), 2)
+
+        interactive.status = CoverageStatus.running
+        db.session.commit()
+        self.assertIsNone(admission.queue_position(interactive))
+        self.assertEqual(admission.next_job().id, old_batch.id)
+
+        # ana já roda um job: o dela espera; bia também está no limite
+        old_batch.status = CoverageStatus.running
+        db.session.commit()
+        self._job('ana', 1)
+        self.assertIsNone(admission.next_job())
+
+        # memória: só entra o que cabe no que sobra do orçamento
+        self.app.config['COVERAGE_USER_CONCURRENCY'] = 3
+        big = self._job('bia', 20, memory_mb=900.0)
+        fits = self._job('bia', 2, memory_mb=500.0)
+        # 200 MB em uso: o de 900 MB (mais antigo) não cabe, o de 500 MB sim
+        self.assertEqual(admission.next_job().id, fits.id)
+        self.assertNotEqual(admission.next_job().id, big.id)
+
+    def test_submission_limits(self):
+        with self.assertRaises(admission.AdmissionError) as caught:
+            admission.check_submission(self.ana_id, 5000.0)
+        self.assertIsNone(caught.exception.retry_after)
+        for minutes in (3, 2, 1):
+            self._job('ana', minutes)
+        with self.assertRaises(admission.AdmissionError) as caught:
+            admission.check_submission(self.ana_id, 10.0)
+        self.assertGreaterEqual(caught.exception.retry_after, admission.RETRY_AFTER_MIN_S)
+        # outro usuário continua sendo aceito
+        admission.check_submission(self.projects['bia'].user_uuid, 10.0)
+        self.assertEqual(admission.metrics()['rejections'], {'memory': 1, 'user': 1})
+
+    def test_api_rejects_and_reports_metrics(self):
+        client = self.login(self.projects['ana'].user)
+        for _ in range(3):
+            response = client.post('/api/projects/ana/jobs', json={'engine': 'p1546', 'inputs': {'radius': 5}})
+            self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()['job']['queue_position'], 3)
+        response = client.post('/api/projects/ana/jobs', json={'engine': 'p1546', 'inputs': {'radius': 5}})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        response = client.post('/api/projects/ana/jobs', json={'engine': 'pycraf', 'inputs': {'radius': 500}})
+        self.assertEqual(response.status_code, 422)
+
+        # métricas globais: só administradores
+        self.assertEqual(client.get('/api/projects/jobs/metrics').status_code, 403)
+        self.projects['ana'].user.is_admin = True
+        db.session.commit()
+        metrics = client.get('/api/projects/jobs/metrics').get_json()
+        self.assertEqual((metrics['queue_depth'], metrics['queued_batch'], metrics['running']), (3, 3, 0))
+
+    def test_heavy_request_waits_then_rejects(self):
+        self.app.config.update(HEAVY_SYNC_CONCURRENCY=1, HEAVY_SYNC_WAIT_S=0.05)
+        inside, release = threading.Event(), threading.Event()
+
+        @admission.heavy_request('profile')
+        def slow():
+            inside.set()
+            release.wait(5)
+            return 'ok'
+
+        @admission.heavy_request('profile')
+        def quick():
+            return 'ok'
+
+        def worker():
+            with self.app.test_request_context():
+                slow()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        inside.wait(5)
+        with self.app.test_request_context():
+            response = quick()
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response.headers['Retry-After'], str(admission.RETRY_AFTER_MIN_S))
+        release.set()
+        thread.join(5)
+        with self.app.test_request_context():
+            self.assertEqual(quick(), 'ok')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from app_case import AppTestCase
+from app_core import channel_plan
+
+AM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<plano_basico data_geracao="2025-11-26">
+  <row item="1" id="am1" Pais="BRA" UF="SP" Municipio="Campinas" Frequencia="1170" Classe="B" Servico="OM" Status="AM-C4" Latitude="-22.9" Longitude="-47.06" ERP_Dia="10" Altura_Diurno="90" ERP_Noturno="2.5"></row>
+  <row item="2" id="am2" Pais="BRA" UF="SP" Municipio="Santos" Frequencia="1180" Classe="C" Servico="OM" Latitude="-23.96" Longitude="-46.33" ERP_Dia="1" Altura_Diurno="60"></row>
+  <row item="3" id="am3" Pais="BRA" UF="SP" Municipio="Sem coordenada" Frequencia="1170" Classe="C" Servico="OM" Latitude="" Longitude=""></row>
+</plano_basico>
+"""
+
+TVFM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<plano_basico data_geracao="2025-11-26">
+  <row item="1" id="fm1" Pais="URG" Municipio="Rivera" Canal="241" Frequencia="96.1" Classe="C" Servico="FM" Latitude="-30.9" Longitude="-55.55" ERP="10" Altura="100"></row>
+  <row item="2" id="fm2" Pais="URG" Municipio="Artigas" Frequencia="96.3" Classe="E" Servico="FM" Latitude="-30.4" Longitude="-56.47" ERP="1" Altura="60"></row>
+  <row item="3" id="tv1" Pais="ARG" Municipio="Posadas" Canal="7" Frequencia="177" Classe="C" Servico="RTV" Latitude="-27.37" Longitude="-55.9" ERP="3" Altura="120"></row>
+</plano_basico>
+"""
+
+
+def _random_plan(path, count=400, seed=3):
+    # estações FM aleatórias no sul do Brasil para comparar com força bruta
+    rng = np.random.default_rng(seed)
+    rows = []
+    for index in range(count):
+        channel = int(rng.integers(200, 206))
+        rows.append(
+            f'<row id="r{index}" Pais="BRA" Canal="{channel}" Frequencia="{87.9 + (channel - 200) * 0.2:.1f}"'
+            f' Servico="FM" Classe="C" Latitude="{rng.uniform(-34, -20):.4f}"'
+            f' Longitude="{rng.uniform(-58, -44):.4f}" ERP="1" Altura="50"></row>'
+        )
+    path.write_text(f'<plano_basico data_geracao="2025-01-01">{"".join(rows)}</plano_basico>', encoding='utf-8')
+
+
+class ChannelPlanStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = Path(self.tmp.name) / 'Canais'
+        self.source.mkdir()
+        (self.source / 'plano_basicoAM.xml').write_text(AM_XML, encoding='utf-8')
+        (self.source / 'estrangeirosTVFM.xml').write_text(TVFM_XML, encoding='utf-8')
+        self.store = channel_plan.ChannelPlanStore(Path(self.tmp.name) / 'plan.sqlite', self.source)
+
+    def test_import_normalises_rows(self):
+        results = {r['name']: r for r in self.store.import_directory()}
+        self.assertEqual(results['plano_basicoAM.xml']['rows'], 2)  # linha sem coordenada descartada
+        self.assertEqual(results['estrangeirosTVFM.xml']['rows'], 3)
+        stations = {s['station_id']: s for s in self.store.records(self.store.index().ids).values()}
+        self.assertEqual((stations['am1']['service'], stations['am1']['frequency_mhz']), ('OM', 1.17))
+        self.assertEqual((stations['am1']['erp_kw'], stations['am1']['erp_night_kw'], stations['am1']['height_m']),
+                         (10.0, 2.5, 90.0))
+        # canal FM derivado da frequência quando o XML não traz
+        self.assertEqual(stations['fm2']['channel'], 242)
+        self.assertEqual((stations['tv1']['service'], stations['tv1']['channel']), ('RTV', 7))
+        self.assertEqual(self.store.sources()[0]['generated'], '2025-11-26')
+
+    def test_reimport_is_incremental(self):
+        self.store.import_directory()
+        generation = self.store.generation()
+        self.assertEqual({r['status'] for r in self.store.import_directory()}, {'unchanged'})
+        self.assertEqual(self.store.generation(), generation)
+
+        # mesmo conteúdo com mtime novo: só o fingerprint é atualizado
+        path = self.source / 'estrangeirosTVFM.xml'
+        os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+        self.assertEqual({r['status'] for r in self.store.import_directory()}, {'unchanged'})
+
+        path.write_text(TVFM_XML.replace('ERP="3"', 'ERP="5"'), encoding='utf-8')
+        (self.source / 'plano_basicoAM.xml').unlink()
+        results = {r['name']: r['status'] for r in self.store.import_directory()}
+        self.assertEqual(results, {'estrangeirosTVFM.xml': 'imported', 'plano_basicoAM.xml': 'removed'})
+        self.assertGreater(self.store.generation(), generation)
+        index = self.store.index()
+        self.assertEqual(len(index), 3)
+        erps = [s['erp_kw'] for s in self.store.records(index.ids).values() if s['service'] == 'RTV']
+        self.assertEqual(erps, [5.0])
+
+    def test_nearby_co_and_adjacent_channel(self):
+        stations = self.store.nearby(-30.6, -56.0, 300.0, 96.1, adjacent=1)
+        self.assertEqual([s['station_id'] for s in stations], ['fm2', 'fm1'])
+        self.assertEqual([s['channel_offset'] for s in stations], [1, 0])
+        self.assertLess(stations[0]['distance_km'], stations[1]['distance_km'])
+        self.assertEqual([s['station_id'] for s in self.store.nearby(-30.6, -56.0, 300.0, 96.1, adjacent=0)], ['fm1'])
+        # AM em kHz -> MHz, espaçamento de 10 kHz
+        am = self.store.nearby(-23.5, -46.6, 150.0, 1.17, adjacent=1)
+        self.assertEqual(sorted(s['channel_offset'] for s in am), [0, 1])
+        self.assertEqual(self.store.nearby(-23.5, -46.6, 10.0, 1.17), [])
+        with self.assertRaises(ValueError):
+            self.store.nearby(-23.5, -46.6, 100.0, 1.17, service='XX')
+
+    def test_kdtree_matches_brute_force(self):
+        _random_plan(self.source / 'aleatorio.xml')
+        index = self.store.index()
+        lat, lon, radius = -27.0, -51.0, 300.0
+        distances = channel_plan.haversine_km(lat, lon, index.latitudes, index.longitudes)
+        within = np.abs(index.frequencies - 88.3) <= 0.3 + 1e-9
+        expected = set(index.ids[(distances <= radius) & within].tolist())
+        scanned = self.store.nearby(lat, lon, radius, 88.3, adjacent=1)
+        with mock.patch.object(channel_plan, 'SCAN_LIMIT', 0):
+            indexed = self.store.nearby(lat, lon, radius, 88.3, adjacent=1)
+        self.assertEqual({s['id'] for s in scanned}, expected)
+        self.assertEqual([s['id'] for s in indexed], [s['id'] for s in scanned])
+        self.assertEqual(set(index.within(lat, lon, radius).tolist()), set(np.flatnonzero(distances <= radius).tolist()))
+
+
+class ChannelPlanApiTest(AppTestCase):
+    def app_env(self):
+        source = Path(self.tmp.name) / 'Canais'
+        source.mkdir()
+        (source / 'estrangeirosTVFM.xml').write_text(TVFM_XML, encoding='utf-8')
+        return {'CHANNEL_PLAN_DIR': str(source)}
+
+    def setUp(self):
+        super().setUp()
+        self.login(self.create_user())
+
+    def test_nearby_endpoint(self):
+        self.assertEqual(self.client.get('/api/regulator/channel-plan/nearby?lat=x').status_code, 400)
+        response = self.client.get('/api/regulator/channel-plan/nearby?lat=-27.5&lon=-55.5&frequency=177&radius=100')
+        self.assertEqual(response.status_code, 200)
+        payload = response.get_json()
+        self.assertEqual([s['station_id'] for s in payload['stations']], ['tv1'])
+        self.assertEqual(payload['sources'][0]['rows'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
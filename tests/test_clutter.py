@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import rasterio
+from affine import Affine
+from astropy import units as u
+from pycraf import pathprof
+
+from app_core import clutter, coverage, p1546
+
+LON, LAT = -47.0, -22.9
+
+
+def _flat_terrain(lons, lats):
+    return np.full(np.shape(lons), 500.0)
+
+
+def _write_lulc(path, side=200, span=1.0):
+    # metade norte rio/lago/oceano (33), metade sul área urbana (24), TX no centro
+    data = np.full((side, side), 24, dtype='uint8')
+    data[:side // 2] = 33
+    profile = {
+        'driver': 'GTiff', 'width': side, 'height': side, 'count': 1, 'dtype': 'uint8', 'crs': 'EPSG:4326',
+        'transform': Affine(span / side, 0.0, LON - span / 2, 0.0, -span / side, LAT + span / 2),
+        'nodata': 0,
+    }
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data, 1)
+
+
+class ClutterLookupTest(unittest.TestCase):
+    def test_classify(self):
+        zones, sea = clutter.classify([3, 24, 33, 0, 15])
+        self.assertEqual(clutter.zone_names(zones),
+                         ['TROPICAL_FOREST', 'URBAN', 'UNKNOWN', 'UNKNOWN', 'SPARSE'])
+        self.assertEqual(sea.tolist(), [False, False, True, False, False])
+
+    def test_receiver_loss_matches_pycraf(self):
+        zones = np.array([int(zone) for zone in pathprof.CLUTTER])
+        loss = clutter.receiver_clutter_loss(zones, 10.0, 0.6)
+        for zone, value in zip(pathprof.CLUTTER, loss):
+            expected = pathprof.clutter_correction(10.0 * u.m, zone, 0.6 * u.GHz).to(u.dB).value
+            self.assertAlmostEqual(value, float(np.ravel(expected)[0]), places=6, msg=zone.name)
+
+    def test_sea_fractions(self):
+        fractions = clutter.sea_fractions([[False, True, True, False]], [1.0, 2.0, 4.0, 8.0])
+        np.testing.assert_allclose(fractions, [[0.0, 0.5, 0.75, 0.375]])
+
+    def test_mixed_path_matches_rrc06(self):
+        for fsea in (0.0, 0.3, 1.0):
+            expected = p1546.step_11a_rrc06([40.0], [52.0], [10.0 * (1 - fsea)], [10.0 * fsea])
+            self.assertAlmostEqual(float(p1546.step_11a_batch(40.0, 52.0, fsea)), float(expected))
+
+    def test_step14_per_point_areas(self):
+        h1, d = 60.0, np.array([5.0, 20.0])
+        batch = p1546.step_14a_batch(h1, d, np.array([10.0, 20.0]), 1.5, 600.0, np.array(['Rural', 'Urban']))
+        self.assertAlmostEqual(batch[0], float(p1546.step_14a_batch(h1, d[0], 10.0, 1.5, 600.0, 'Rural')))
+        self.assertAlmostEqual(batch[1], float(p1546.step_14a_batch(h1, d[1], 20.0, 1.5, 600.0, 'Urban')))
+
+
+class LulcCoverageTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'lulc.tif'
+        _write_lulc(self.path)
+        self.raster = clutter.load_raster(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_raster_classes(self):
+        classes = self.raster.classes([LAT + 0.2, LAT - 0.2, LAT + 2.0], [LON, LON, LON])
+        self.assertEqual(classes.tolist(), [33, 24, 0])
+        small = clutter.LulcRaster(self.path, max_side=50)
+        self.assertEqual(small.data.shape, (50, 50))
+        self.assertEqual(small.classes(LAT - 0.2, LON + 0.2), 24)
+
+    def test_p1546_grid_uses_lulc(self):
+        xcoords, ycoords = coverage.pycraf_map_coords(LON, LAT, 0.4, 0.4, 0.01)
+        kwargs = dict(n_radials=72, step_km=0.25, terrain_sampler=_flat_terrain)
+        rural = coverage.p1546_coverage_grid(LON, LAT, xcoords, ycoords, 100, 50, 60.0, 1.5, **kwargs)
+        mixed = coverage.p1546_coverage_grid(LON, LAT, xcoords, ycoords, 100, 50, 60.0, 1.5,
+                                             lulc=self.raster, **kwargs)
+        col = np.argmin(np.abs(xcoords - LON))
+        south = np.argmin(np.abs(ycoords - (LAT - 0.15)))
+        # receptor urbano (R2 = 20 m) abaixo do clutter: perda maior que no rural
+        self.assertGreater(mixed['loss_map'][south, col], rural['loss_map'][south, col] + 1.0)
+        by_bearing = {item['bearing_deg']: item for item in mixed['radials']}
+        self.assertGreater(by_bearing[0.0]['sea_fraction'], 0.95)
+        self.assertEqual(by_bearing[180.0]['sea_fraction'], 0.0)
+        self.assertNotIn('sea_fraction', rural['radials'][0])
+        # só as curvas de terra de 100 MHz estão tabuladas: sem mistura terra/mar
+        self.assertFalse(mixed['mixed_path'])
+
+
+if __name__ == '__main__':
+    unittest.main()
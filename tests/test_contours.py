@@ -0,0 +1,144 @@
+import json
+import time
+import unittest
+
+import numpy as np
+
+from app_case import AppTestCase
+from app_core import contours, coverage, p1546
+
+# só a Figura 1 (100 MHz, terra, 50 %) acompanha o repositório
+FULL_CURVES = not np.isnan(p1546.FIELD_TABLES[1, 1, 0, 0, 0])
+
+
+def _sloped_terrain(lons, lats):
+    # terreno sobe para leste: HNMT maior e HAAT menor nas radiais a leste
+    return 500.0 + (np.asarray(lons) + 47.0) * 200.0
+
+
+class RadialContoursTest(unittest.TestCase):
+    def test_omnidirectional_contour(self):
+        result = contours.radial_contours(-23.0, -47.0, 100.0, 1.0, 90.0, interfering_time_pct=50.0)
+        expected = float(contours.contour_distance_km(100, 50, 90.0, 1.0, 66.0))
+        self.assertEqual(len(result['radials']), 360)
+        self.assertEqual(result['protected_dbuv'], 66.0)
+        self.assertAlmostEqual(result['summary']['protected_min_km'], expected, places=2)
+        self.assertAlmostEqual(result['summary']['protected_max_km'], expected, places=2)
+        self.assertAlmostEqual(result['summary']['protected_area_km2'], np.pi * expected ** 2, delta=1.0)
+
+        # um polígono protegido e um interferente por canal adjacente (37, 7, -20, -30 dB)
+        features = result['geojson']['features']
+        self.assertEqual([f['properties']['channel_offset'] for f in features], [None, 0, 1, 2, 3])
+        self.assertEqual([f['properties']['level_dbuv'] for f in features], [66.0, 29.0, 59.0, 86.0, 96.0])
+        ring = features[0]['geometry']['coordinates'][0]
+        self.assertEqual(len(ring), 361)
+        self.assertEqual(ring[0], ring[-1])
+        # cocanal a 29 dBµV/m vai além do contorno protegido
+        self.assertGreater(result['radials'][0]['interfering_km'][0], result['radials'][0]['protected_km'])
+
+    def test_pattern_and_hnmt_per_radial(self):
+        pattern = np.full(360, -10.0)
+        pattern[0] = 0.0
+        started = time.perf_counter()
+        _, stats, _ = coverage.site_haat(-47.0, -23.0, 60.0, n_radials=360, terrain_sampler=_sloped_terrain)
+        result = contours.radial_contours(
+            -23.0, -47.0, 100.0, 5.0, stats['haat'], hnmt_m=stats['hnmt'], pattern_db=pattern, direction_deg=90.0,
+            interfering_time_pct=50.0,
+        )
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+        rows = result['radials']
+        self.assertEqual((rows[90]['pattern_db'], rows[90]['erp_kw']), (0.0, 5.0))
+        self.assertEqual((rows[270]['pattern_db'], rows[270]['erp_kw']), (-10.0, 0.5))
+        self.assertGreater(rows[0]['hnmt_m'], 500.0 - 1e-6)
+        self.assertGreater(rows[90]['hnmt_m'], rows[270]['hnmt_m'])
+        self.assertLess(rows[90]['heff_m'], rows[270]['heff_m'])
+        # o lóbulo principal domina a diferença de altura
+        distances = [row['protected_km'] for row in rows]
+        self.assertEqual(int(np.argmax(distances)), 90)
+        self.assertAlmostEqual(
+            distances[90], float(contours.contour_distance_km(100, 50, rows[90]['heff_m'], 5.0, 66.0)), delta=0.05,
+        )
+
+    def test_protected_levels(self):
+        self.assertEqual(contours.protected_field_dbuv('TVD', 533.0), 51.0)
+        self.assertEqual(contours.protected_field_dbuv('TVD', 195.0), 43.0)
+        self.assertEqual(contours.protected_field_dbuv('RTV', 0.0, channel=9), 64.0)
+        self.assertIsNone(contours.protected_field_dbuv('OM', 1.17))
+        with self.assertRaises(ValueError):
+            contours.radial_contours(-23.0, -47.0, 100.0, 1.0, 90.0, service='OM')
+        result = contours.radial_contours(-23.0, -47.0, 100.0, 1.0, 90.0, 'OM', protected_dbuv=60.0, n_radials=8)
+        self.assertEqual(len(result['geojson']['features']), 1)
+
+    @unittest.skipIf(FULL_CURVES, 'P.1546 curves other than Figure 1 available')
+    def test_missing_curves(self):
+        # sem a Figura 2 o protegido sai e os interferentes a 10 % ficam indisponíveis
+        result = contours.radial_contours(-23.0, -47.0, 100.0, 1.0, 90.0, n_radials=36)
+        protected, *interfering = result['geojson']['features']
+        self.assertEqual(protected['properties']['status'], 'ok')
+        self.assertEqual(protected['geometry']['type'], 'Polygon')
+        self.assertEqual(len(interfering), 4)
+        for feature in interfering:
+            self.assertIsNone(feature['geometry'])
+            self.assertEqual(feature['properties']['status'], 'unavailable')
+            self.assertEqual(feature['properties']['missing_figures'], [2])
+        self.assertEqual(result['radials'][0]['interfering_km'], [None] * 4)
+        # sem as curvas do protegido não há o que devolver
+        with self.assertRaises(p1546.CurvesUnavailable) as caught:
+            contours.radial_contours(-23.0, -47.0, 98.1, 1.0, 90.0, n_radials=36)
+        self.assertEqual(caught.exception.figures, [9])
+
+    @unittest.skipUnless(FULL_CURVES, 'P.1546 curves other than Figure 1 not available')
+    def test_interfering_contours_at_10_percent(self):
+        result = contours.radial_contours(-23.0, -47.0, 100.0, 1.0, 90.0)
+        self.assertEqual(result['contours'][1]['time_pct'], 10.0)
+
+
+class ContoursApiTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        # diagrama salvo pelo usuário: só o azimute 0° sem atenuação
+        table = [{'azimuth': f'{az:.1f}°', 'gain': '1.000' if az == 0 else '0.316'} for az in range(360)]
+        self.login(self.create_user(antenna_direction=180.0, antenna_pattern_data_h=json.dumps(table)))
+
+    def test_contours_endpoint(self):
+        url = '/api/regulator/contours'
+        self.assertEqual(self.client.post(url, json={'latitude': -23.0}).status_code, 400)
+        payload = {
+            'latitude': -23.0, 'longitude': -47.0, 'frequency': 100.0, 'erpKw': 1.0, 'heightM': 90.0,
+            'interferingTimePct': 50,
+        }
+        response = self.client.post(url, json=payload)
+        self.assertEqual(response.status_code, 200)
+        result = response.get_json()
+        self.assertEqual(result['service'], 'FM')
+        self.assertEqual(result['direction_deg'], 180.0)
+        rows = result['radials']
+        self.assertEqual(rows[180]['pattern_db'], 0.0)
+        self.assertAlmostEqual(rows[0]['pattern_db'], -10.0, places=1)
+        self.assertEqual(result['geojson']['features'][0]['geometry']['type'], 'Polygon')
+
+        # diagrama explícito e sem diagrama salvo
+        payload.update({'patternDb': [0.0], 'direction': 0})
+        rows = self.client.post(url, json=payload).get_json()['radials']
+        self.assertEqual({row['protected_km'] for row in rows}, {rows[0]['protected_km']})
+
+        # conta no orçamento de requisições pesadas síncronas
+        self.app.config.update(HEAVY_SYNC_CONCURRENCY=0, HEAVY_SYNC_WAIT_S=0)
+        self.assertEqual(self.client.post(url, json=payload).status_code, 429)
+
+    @unittest.skipIf(FULL_CURVES, 'P.1546 curves other than Figure 1 available')
+    def test_contours_endpoint_without_curves(self):
+        url = '/api/regulator/contours'
+        payload = {'latitude': -23.0, 'longitude': -47.0, 'frequency': 100.0, 'erpKw': 1.0, 'heightM': 90.0, 'radials': 36}
+        # interferentes a 10 % padrão: o protegido continua saindo
+        features = self.client.post(url, json=payload).get_json()['geojson']['features']
+        self.assertEqual([f['properties']['status'] for f in features], ['ok'] + ['unavailable'] * 4)
+        # curvas do protegido ausentes são condição do servidor, não do pedido
+        response = self.client.post(url, json={**payload, 'frequency': 98.1})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()['figures'], [9])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import socket
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from app_case import AppTestCase
+from app_core import jobs, network
+from app_core.models import CoverageEngine, CoverageJob, CoverageStatus
+from extensions import db
+
+
+class CoverageJobsTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        user = self.create_user()
+        self.project = self.create_project(user)
+        self.user_id = user.id
+        self.dispatch = self.hold_dispatch()
+
+    def _enqueue(self):
+        return jobs.enqueue(self.project, CoverageEngine.p1546, {'radius': 5})
+
+    def _status(self, job_id):
+        db.session.expire_all()
+        return db.session.get(CoverageJob, job_id)
+
+    def test_job_lifecycle_and_progress(self):
+        seen = []
+
+        def fake(job, progress):
+            progress('terrain')
+            seen.append((self._status(job.id).stage, self._status(job.id).progress))
+            progress('render')
+            seen.append((self._status(job.id).stage, self._status(job.id).progress))
+            job.status = CoverageStatus.succeeded
+            job.finished_at = job.started_at
+            db.session.commit()
+
+        job = self._enqueue()
+        self.assertEqual(job.status, CoverageStatus.queued)
+        self.assertEqual(job.inputs['projectSlug'], 'p')
+        self.dispatch.assert_called_once_with()
+        with mock.patch.object(jobs, '_execute', fake):
+            self.assertEqual(jobs.run_job(job.id), 'succeeded')
+            # já reivindicado: não roda de novo
+            self.assertEqual(jobs.run_job(job.id), 'succeeded')
+        self.assertEqual(seen, [('terrain', 20.0), ('render', 85.0)])
+        self.assertIsNotNone(self._status(job.id).started_at)
+
+    def test_cancel_stops_at_next_stage(self):
+        reached = []
+
+        def fake(job, progress):
+            progress('terrain')
+            jobs.cancel(self._status(job.id))
+            reached.append('terrain')
+            progress('path_loss')
+            reached.append('path_loss')
+
+        job = self._enqueue()
+        with mock.patch.object(jobs, '_execute', fake):
+            self.assertEqual(jobs.run_job(job.id), 'canceled')
+        self.assertEqual(reached, ['terrain'])
+        final = self._status(job.id)
+        self.assertIsNotNone(final.finished_at)
+        self.assertEqual(final.stage, 'terrain')
+
+    def test_cancel_during_persist_wins(self):
+        def fake(job, progress):
+            progress('persist')
+            jobs.cancel(self._status(job.id))
+            job.metrics = {'summary': {}}
+            jobs.complete(job, finished_at=datetime.utcnow())
+            db.session.commit()
+
+        job = self._enqueue()
+        with mock.patch.object(jobs, '_execute', fake):
+            self.assertEqual(jobs.run_job(job.id), 'canceled')
+        final = self._status(job.id)
+        self.assertIsNotNone(final.finished_at)
+        self.assertIsNone(final.metrics)
+
+        job = self._enqueue()
+        jobs.claim(job.id)
+        job = self._status(job.id)
+        jobs.complete(job, stage='done', progress=100.0)
+        db.session.commit()
+        self.assertEqual((job.status, job.stage), (CoverageStatus.succeeded, 'done'))
+
+    def test_canceled_while_queued_never_runs(self):
+        job = self._enqueue()
+        self.assertTrue(jobs.cancel(job))
+        self.assertFalse(jobs.cancel(job))
+        with mock.patch.object(jobs, '_execute') as execute:
+            self.assertEqual(jobs.run_job(job.id), 'canceled')
+        execute.assert_not_called()
+
+    def test_failure_is_recorded(self):
+        job = self._enqueue()
+        with mock.patch.object(jobs, '_execute', side_effect=ValueError('sem DEM')):
+            self.assertEqual(jobs.run_job(job.id), 'failed')
+        final = self._status(job.id)
+        self.assertEqual(final.metrics['error'], 'sem DEM')
+        self.assertIsNotNone(final.finished_at)
+
+    def test_heartbeat_on_claim_and_progress(self):
+        job = self._enqueue()
+        self.assertTrue(jobs.claim(job.id))
+        claimed = self._status(job.id)
+        self.assertEqual(claimed.worker, jobs.worker_id())
+        table = CoverageJob.__table__
+        old = datetime.utcnow() - timedelta(hours=1)
+        db.session.execute(table.update().values(heartbeat_at=old))
+        db.session.commit()
+        jobs.ProgressTracker(job.id)('terrain')
+        self.assertGreater(self._status(job.id).heartbeat_at, old)
+        db.session.execute(table.update().values(heartbeat_at=old))
+        db.session.commit()
+        self.assertEqual(jobs.heartbeat(), 1)
+        self.assertGreater(self._status(job.id).heartbeat_at, old)
+
+    def test_recover_orphaned_jobs(self):
+        dead = self._enqueue()
+        foreign_live = self._enqueue()
+        foreign_stale = self._enqueue()
+        mine = self._enqueue()
+        for job in (dead, foreign_live, foreign_stale, mine):
+            jobs.claim(job.id)
+        table = CoverageJob.__table__
+        stale = datetime.utcnow() - timedelta(seconds=jobs.STALE_AFTER_S + 60)
+        owners = {
+            # processo que não existe mais neste host
+            dead.id: (f'{socket.gethostname()}:999999999:dead', datetime.utcnow()),
+            foreign_live.id: ('outro-host:42:abc', datetime.utcnow()),
+            foreign_stale.id: ('outro-host:43:abc', stale),
+            mine.id: (jobs.worker_id(), stale),
+        }
+        for job_id, (owner, beat) in owners.items():
+            db.session.execute(table.update().where(table.c.id == job_id).values(worker=owner, heartbeat_at=beat))
+        db.session.commit()
+
+        self.assertEqual(jobs.recover(), {'requeued': 2, 'failed': 0, 'networks': 0})
+        statuses = {job.id: self._status(job.id) for job in (dead, foreign_live, foreign_stale, mine)}
+        self.assertEqual(statuses[dead.id].status, CoverageStatus.queued)
+        self.assertIsNone(statuses[dead.id].worker)
+        self.assertEqual(statuses[dead.id].metrics, {'recoveries': 1})
+        self.assertEqual(statuses[foreign_stale.id].status, CoverageStatus.queued)
+        self.assertEqual(statuses[foreign_live.id].status, CoverageStatus.running)
+        self.assertEqual(statuses[mine.id].status, CoverageStatus.running)
+
+        # órfão de novo além de MAX_RECOVERIES: falha em vez de voltar à fila
+        for _ in range(jobs.MAX_RECOVERIES):
+            jobs.claim(dead.id)
+            db.session.execute(table.update().where(table.c.id == dead.id).values(worker=owners[dead.id][0]))
+            db.session.commit()
+            jobs.recover()
+        final = self._status(dead.id)
+        self.assertEqual(final.status, CoverageStatus.failed)
+        self.assertIn('worker lost', final.metrics['error'])
+        self.assertIsNotNone(final.finished_at)
+
+    def test_recover_closes_finished_network_run(self):
+        parent = CoverageJob(
+            project_id=self.project.id, engine=CoverageEngine.p1546, inputs={'sites': [{'id': 'a'}]},
+            status=CoverageStatus.running, stage='path_loss', progress=45.0, started_at=datetime.utcnow(),
+        )
+        db.session.add(parent)
+        db.session.flush()
+        db.session.add(CoverageJob(
+            project_id=self.project.id, parent_id=parent.id, engine=CoverageEngine.p1546, inputs={},
+            status=CoverageStatus.succeeded, finished_at=datetime.utcnow(),
+        ))
+        db.session.commit()
+        with mock.patch.object(network, 'compose') as compose:
+            self.assertEqual(jobs.recover()['networks'], 1)
+        compose.assert_called_once()
+        self.assertEqual(self._status(parent.id).stage, 'render')
+
+        # composição interrompida por um processo que morreu: reivindicada de novo
+        table = CoverageJob.__table__
+        db.session.execute(table.update().where(table.c.id == parent.id).values(
+            worker=f'{socket.gethostname()}:999999999:dead'
+        ))
+        db.session.commit()
+        with mock.patch.object(network, 'compose') as compose:
+            self.assertEqual(jobs.recover()['networks'], 1)
+        compose.assert_called_once()
+
+    def test_api_status_cancel_and_events(self):
+        client = self.login(self.project.user)
+        response = client.post('/api/projects/p/jobs', json={'engine': 'p1546', 'inputs': {'radius': 5}})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['job']['id']
+        status = client.get(response.headers['Location']).get_json()['job']
+        self.assertEqual((status['status'], status['stage'], status['progress']), ('queued', 'queued', 0.0))
+
+        self.assertEqual(client.post(f'/api/projects/p/jobs/{job_id}/cancel').status_code, 200)
+        self.assertEqual(client.post(f'/api/projects/p/jobs/{job_id}/cancel').status_code, 409)
+        self.assertEqual(client.get(f'/api/projects/p/jobs/{job_id}/result').status_code, 409)
+        events = client.get(f'/api/projects/p/jobs/{job_id}/events')
+        self.assertEqual(events.mimetype, 'text/event-stream')
+        body = events.get_data(as_text=True)
+        self.assertEqual(body.count('data: '), 1)
+        self.assertIn('"status": "canceled"', body)
+
+    def test_event_stream_closes_after_its_window(self):
+        job = self._enqueue()
+        started = time.monotonic()
+        events = list(jobs.stream_status(job.id, interval_s=0.01, window_s=0.05))
+        # job ainda na fila: a conexão fecha sozinha e o cliente reconecta
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(events[0], f'retry: {jobs.EVENTS_RETRY_MS}\n\n')
+        self.assertEqual(len(events), 2)
+        self.assertIn('"status": "queued"', events[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from app_core import coverage_tiles
+from app_core.signal_raster import SignalRaster
+
+
+def _png(rgba):
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, mode='RGBA').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class CoverageTilesTest(unittest.TestCase):
+    def setUp(self):
+        # metade norte vermelha, metade sul azul, coluna leste transparente
+        self.rgba = np.zeros((200, 200, 4), dtype=np.uint8)
+        self.rgba[:100] = (255, 0, 0, 255)
+        self.rgba[100:] = (0, 0, 255, 255)
+        self.rgba[:, 190:, 3] = 0
+        self.bounds = {'north': -22.0, 'south': -24.0, 'west': -48.0, 'east': -46.0}
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'coverage_tiles.mbtiles'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _tile_pixel(self, zoom, lat, lon):
+        x = coverage_tiles._lon_to_x(lon, zoom)
+        y = coverage_tiles._lat_to_y(lat, zoom)
+        data = coverage_tiles.read_tile(self.path, zoom, int(x), int(y))
+        if data is None:
+            return None
+        tile = np.asarray(Image.open(io.BytesIO(data)).convert('RGBA'))
+        return tile[int((y % 1) * 256), int((x % 1) * 256)]
+
+    def test_pyramid_is_reprojected(self):
+        count = coverage_tiles.build_mbtiles(_png(self.rgba), self.bounds, 5, 9, self.path)
+        self.assertGreater(count, 5)
+        for zoom in (5, 9):
+            np.testing.assert_array_equal(self._tile_pixel(zoom, -22.5, -47.0), (255, 0, 0, 255))
+            np.testing.assert_array_equal(self._tile_pixel(zoom, -23.5, -47.0), (0, 0, 255, 255))
+        # equador da imagem: em Mercator a linha de -23° não fica no meio do tile
+        np.testing.assert_array_equal(self._tile_pixel(9, -22.99, -47.0)[:3], (255, 0, 0))
+        np.testing.assert_array_equal(self._tile_pixel(9, -23.01, -47.0)[:3], (0, 0, 255))
+        self.assertEqual(self._tile_pixel(9, -23.5, -46.02)[3], 0)
+
+    def test_empty_tiles_are_not_stored(self):
+        coverage_tiles.build_mbtiles(_png(self.rgba), self.bounds, 9, 9, self.path)
+        self.assertIsNone(coverage_tiles.read_tile(self.path, 9, 0, 0))
+        x0, x1, y0, y1 = coverage_tiles.tile_range(self.bounds, 9)
+        self.assertLessEqual(x0, x1)
+        self.assertLessEqual(y0, y1)
+
+
+class DataTilesTest(unittest.TestCase):
+    def setUp(self):
+        lons = np.linspace(-48.0, -46.0, 201)
+        lats = np.linspace(-24.0, -22.0, 201)  # sul -> norte, como a malha do pycraf
+        field = np.tile(lons[None, :] + 100.0, (lats.size, 1))  # 52..54 dBµV/m de oeste a leste
+        self.raster = SignalRaster.from_grids(lons, lats, dbuv=field)
+
+    def test_tile_values_follow_raster(self):
+        zoom = 8
+        x = int(coverage_tiles._lon_to_x(-47.0, zoom))
+        y = int(coverage_tiles._lat_to_y(-23.0, zoom))
+        values = coverage_tiles.sample_raster_tile(self.raster, 'dbuv', zoom, x, y)
+        lons, _ = coverage_tiles.tile_lonlat(zoom, x, y)
+        inside = (lons > -48.0) & (lons < -46.0)
+        np.testing.assert_allclose(values[128, inside], lons[inside] + 100.0, atol=0.01)
+        self.assertIsNone(coverage_tiles.sample_raster_tile(self.raster, 'dbuv', zoom, 0, 0))
+
+    def test_threshold_banding(self):
+        banded = coverage_tiles.band_thresholds(np.array([40.0, 48.0, 60.0, 70.0, np.nan]), [66, 48])
+        np.testing.assert_array_equal(banded[:4], [np.nan, 48.0, 48.0, 66.0])
+        self.assertTrue(np.isnan(banded[4]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import functools
+import http.server
+import tempfile
+import threading
+import unittest
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from app_core import dem_prefetch, dem_store
+
+SIDE = 1201
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class DemPrefetchTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.srtm_dir = root / 'srtm'
+        served = root / 'server'
+        served.mkdir()
+        # stand-in local do viewpano: SE23.zip com E23/<tile>.hgt
+        tile = np.full((SIDE, SIDE), 321, dtype='>i2').tobytes()
+        with zipfile.ZipFile(served / 'SE23.zip', 'w') as archive:
+            for name in ('S18W044', 'S18W045'):
+                archive.writestr(f'E23/{name}.hgt', tile)
+
+        handler = functools.partial(_QuietHandler, directory=str(served))
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_covering_tiles(self):
+        tiles = dem_prefetch.covering_tiles(-17.5, -43.5, 100.0)
+        self.assertEqual(len(tiles), 9)
+        self.assertIn('S18W044', tiles)
+        self.assertEqual(dem_prefetch.covering_tiles(-17.5, -43.5, 5.0), ['S18W044'])
+
+    def test_downloads_validates_and_reports(self):
+        report = dem_prefetch.prefetch_tiles(
+            self.srtm_dir, ['S18W044', 'S18W045.hgt', 'S30W030'], base_url=self.base_url, max_workers=2,
+        )
+        self.assertEqual(report['S18W044']['status'], 'downloaded')
+        self.assertEqual(report['S18W045']['status'], 'downloaded')
+        self.assertEqual(report['S30W030']['status'], 'unavailable')  # oceano
+        self.assertTrue((self.srtm_dir / 'E23' / 'S18W044.hgt').exists())
+        manifest = dem_prefetch.load_manifest(self.srtm_dir)
+        self.assertEqual(manifest['S18W044']['sha256'], report['S18W044']['sha256'])
+        self.assertAlmostEqual(float(dem_store.get_store(self.srtm_dir).sample(-17.5, -43.5)), 321.0)
+
+        again = dem_prefetch.prefetch_tiles(self.srtm_dir, ['S18W044'], base_url=self.base_url)
+        self.assertEqual(again['S18W044']['status'], 'ready')
+        summary = dem_prefetch.readiness(report)
+        self.assertEqual((summary['total'], summary['ready']), (3, 2))
+        self.assertEqual(summary['unavailable'], ['S30W030'])
+
+    def test_corrupted_tile_is_fetched_again(self):
+        dem_prefetch.prefetch_tiles(self.srtm_dir, ['S18W044'], base_url=self.base_url)
+        tile = self.srtm_dir / 'E23' / 'S18W044.hgt'
+        data = bytearray(tile.read_bytes())
+        data[0] ^= 0xFF
+        tile.write_bytes(bytes(data))
+        report = dem_prefetch.prefetch_tiles(self.srtm_dir, ['S18W044'], base_url=self.base_url)
+        self.assertEqual(report['S18W044']['status'], 'downloaded')
+        self.assertTrue((self.srtm_dir / 'E23' / 'S18W044.hgt.invalid').exists())
+
+    def test_server_error_is_reported(self):
+        report = dem_prefetch.prefetch_tiles(self.srtm_dir, ['S20W044'], base_url=self.base_url + 'missing/')
+        self.assertEqual(report['S20W044']['status'], 'failed')
+        self.assertIn('404', report['S20W044']['error'])
+        # tile com falha: o pycraf continua autorizado a baixar, nunca preenche com zeros calado
+        ready = dem_prefetch.prefetch_tiles(self.srtm_dir, ['S18W044'], base_url=self.base_url)
+        self.assertEqual(dem_prefetch.srtm_download_mode(ready), 'never')
+        self.assertEqual(dem_prefetch.srtm_download_mode({**ready, **report}), 'missing')
+        self.assertEqual(dem_prefetch.srtm_download_mode({}), 'missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
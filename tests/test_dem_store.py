@@ -0,0 +1,87 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from app_core import dem_store
+
+
+def _write_tile(directory, name, side=5, fill=None):
+    # posts crescem para leste (1 m por coluna) e para o sul (10 m por linha)
+    rows, cols = np.mgrid[0:side, 0:side]
+    data = (rows * 10 + cols).astype('>i2') if fill is None else np.full((side, side), fill, dtype='>i2')
+    path = Path(directory) / 'sub' / f'{name}.hgt'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data.tofile(path)
+    return path
+
+
+class DemStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = _write_tile(self.tmp.name, 'S18W044')
+        self.store = dem_store.DemStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_index_and_memory_map(self):
+        self.assertEqual(self.store.tile_path('S18W044.hgt'), self.path)
+        tile = self.store.tile('s18w044')
+        self.assertIsInstance(tile, np.memmap)
+        self.assertEqual(tile.shape, (5, 5))
+        self.assertIs(self.store.tile('S18W044'), tile)
+        self.assertEqual(dem_store.tile_name(-17.5, -43.5), 'S18W044')
+        # bordas inteiras entram: o conjunto bate com o tile que o sampler procura
+        self.assertEqual(dem_store.tiles_covering(-18.0, -17.0, -44.0, -43.5), ['S18W044', 'S17W044'])
+        self.assertIn(dem_store.tile_name(-17.0, -44.0), dem_store.tiles_covering(-18.0, -17.0, -44.0, -43.5))
+
+    def test_bilinear_sample_and_missing_tile(self):
+        # canto noroeste = post (0, 0); o tile tem 4 intervalos por grau
+        lats = np.array([-17.125, -17.25, -17.75, -16.5])
+        lons = np.array([-43.875, -43.25, -43.5, -43.5])
+        heights = self.store.sample(lats, lons)
+        np.testing.assert_allclose(heights[:3], [5.5, 13.0, 32.0])
+        self.assertTrue(np.isnan(heights[3]))
+
+    def test_voids_are_skipped(self):
+        data = np.memmap(self.path, dtype='>i2', mode='r+', shape=(5, 5))
+        data[0, 0] = dem_store.VOID
+        data.flush()
+        del data
+        height = self.store.sample(-17.125, -43.875)
+        # média dos três posts válidos (1, 10, 11)
+        self.assertAlmostEqual(float(height), 22.0 / 3.0)
+
+    def test_sample_status_codes(self):
+        data = np.memmap(self.path, dtype='>i2', mode='r+', shape=(5, 5))
+        data[0, 0] = dem_store.VOID
+        data[3:5, 3:5] = dem_store.VOID
+        data.flush()
+        del data
+        heights, status = self.store.sample_status(
+            [-17.6, -17.125, -17.875, 5.5, np.nan],
+            [-43.6, -43.875, -43.125, 5.5, -43.5],
+        )
+        names = [dem_store.STATUS_NAMES[code] for code in status]
+        self.assertEqual(names, ['ok', 'void_filled', 'void', 'missing_tile', 'invalid'])
+        self.assertTrue(np.isfinite(heights[:2]).all())
+        self.assertTrue(np.isnan(heights[2:]).all())
+
+    def test_profiles_shape(self):
+        heights, lats, lons = self.store.profiles(-17.5, -43.5, [0, 90, 180, 270], [0.0, 5.0, 10.0])
+        self.assertEqual(heights.shape, (4, 3))
+        np.testing.assert_allclose(heights[:, 0], heights[0, 0], atol=0.01)
+        self.assertGreater(lats[0, 2], -17.5)
+        self.assertGreater(lons[1, 2], -43.5)
+
+    def test_refresh_picks_up_new_tiles(self):
+        self.assertIsNone(self.store.tile_path('S19W044'))
+        _write_tile(self.tmp.name, 'S19W044', fill=7)
+        self.store.refresh()
+        self.assertAlmostEqual(float(self.store.sample(-18.5, -43.5)), 7.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from app_case import AppTestCase
+from app_core import channel_plan, contours, interference, p1546
+from app_core.models import Asset
+from app_core.storage import storage_root
+from extensions import db
+
+# só a Figura 1 (100 MHz, terra, 50 %) acompanha o repositório
+FULL_CURVES = not np.isnan(p1546.FIELD_TABLES[1, 1, 0, 0, 0])
+PLAN_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<plano_basico data_geracao="2025-11-26">
+  <row id="co" Pais="BRA" Canal="261" Frequencia="100" Classe="B2" Servico="FM" Latitude="-23.0" Longitude="-46.0" ERP="1" Altura="90"></row>
+  <row id="adj1" Pais="BRA" Canal="262" Frequencia="100.2" Classe="B2" Servico="FM" Latitude="-23.2" Longitude="-46.5" ERP="1" Altura="90"></row>
+  <row id="adj4" Pais="BRA" Canal="265" Frequencia="100.8" Classe="B2" Servico="FM" Latitude="-23.1" Longitude="-46.5" ERP="1" Altura="90"></row>
+  <row id="longe" Pais="BRA" Canal="261" Frequencia="100" Classe="B2" Servico="FM" Latitude="-10.0" Longitude="-46.0" ERP="1" Altura="90"></row>
+  <row id="tv" Pais="ARG" Canal="6" Frequencia="85" Classe="C" Servico="RTV" Latitude="-23.0" Longitude="-47.2" ERP="1" Altura="120"></row>
+</plano_basico>
+"""
+
+
+def _station(key, lat, lon, erp_kw=1.0, height_m=90.0, frequency=100.0, offset=0):
+    return {
+        'id': key, 'station_id': key, 'source': 'teste.xml', 'municipality': key, 'country': 'BRA', 'uf': 'SP',
+        'service': 'FM', 'class': 'B2', 'channel': 261, 'frequency_mhz': frequency, 'channel_offset': offset,
+        'distance_km': 0.0, 'azimuth_deg': 0.0, 'erp_kw': erp_kw, 'height_m': height_m,
+        'latitude': lat, 'longitude': lon,
+    }
+
+
+class ContourTest(unittest.TestCase):
+    def test_contours_match_fm_class_table(self):
+        # classes B2, A3 e E1: 66 dBµV/m a 12,5 / 30 / 78,5 km (tabela ANATEL)
+        distances = contours.contour_distance_km(100, 50, [90.0, 150.0, 600.0], [1.0, 15.0, 100.0], 66.0)
+        np.testing.assert_allclose(distances, [12.5, 30.0, 78.5], atol=1.2)
+        fields = contours.field_dbuv(100, 50, [90.0, 150.0, 600.0], distances, [1.0, 15.0, 100.0])
+        np.testing.assert_allclose(fields, 66.0, atol=0.01)
+
+    def test_contour_limits(self):
+        distances = contours.contour_distance_km(100, 50, 90.0, [1e-9, 1e3], [66.0, -100.0])
+        self.assertEqual(distances.tolist(), [0.0, contours.MAX_DISTANCE_KM])
+
+    def test_destination_round_trip(self):
+        lats, lons = contours.destination(-23.0, -47.0, [0.0, 90.0, 225.0], [10.0, 50.0, 120.0])
+        np.testing.assert_allclose(channel_plan.haversine_km(-23.0, -47.0, lats, lons), [10.0, 50.0, 120.0])
+        np.testing.assert_allclose(channel_plan.azimuth_deg(-23.0, -47.0, lats, lons), [0.0, 90.0, 225.0], atol=1e-6)
+
+
+class InterferenceStudyTest(unittest.TestCase):
+    def setUp(self):
+        self.candidate = interference.Candidate(-23.0, -47.0, 100.0, 1.0, (90.0,), 'FM')
+        self.params = interference.StudyParameters(interfering_time_pct=50.0, n_radials=72)
+
+    def test_heff_per_bearing(self):
+        candidate = interference.Candidate(-23.0, -47.0, 100.0, 1.0, (100.0, 200.0, 300.0, 200.0))
+        np.testing.assert_allclose(candidate.heff_towards([0.0, 45.0, 180.0, 315.0, 360.0]), [100, 150, 300, 150, 100])
+        with self.assertRaises(ValueError):
+            interference.Candidate.from_inputs({'latitude': -23, 'longitude': -47, 'frequency': 1.17, 'erpKw': 1, 'heightM': 90})
+
+    def test_margins_and_combined_raster(self):
+        stations = [
+            _station('perto', -23.0, -46.7),
+            _station('longe', -23.0, -45.0),
+            _station('sem_erp', -23.0, -46.0, erp_kw=None),
+        ]
+        reports, transform, shape, margin = interference.run_study(self.candidate, stations, self.params, workers=0)
+        by_id = {report['id']: report for report in reports}
+        self.assertEqual([r['id'] for r in reports], ['perto', 'longe', 'sem_erp'])
+        self.assertEqual(by_id['perto']['status'], 'interference')
+        # pior radial do contorno é o voltado para o candidato (oeste)
+        self.assertEqual(by_id['perto']['worst_bearing_deg'], 270.0)
+        self.assertEqual(by_id['longe']['status'], 'ok')
+        self.assertGreater(by_id['longe']['min_margin_db'], 0)
+        self.assertEqual(by_id['sem_erp']['status'], 'missing_data')
+        self.assertEqual(len(by_id['perto']['radials']['margin_db']), 72)
+        # D/U no contorno: campo protegido (66) menos o campo do candidato
+        self.assertAlmostEqual(by_id['perto']['min_du_db'] - 37.0, by_id['perto']['min_margin_db'], places=1)
+
+        self.assertEqual(margin.shape, shape)
+        self.assertLess(np.nanmin(margin), 0.0)
+        self.assertGreater(np.nanmax(margin), 0.0)
+        summary = interference.summarize(reports, transform, margin)
+        self.assertEqual((summary['stations_checked'], summary['stations_interfered']), (2, 1))
+        self.assertGreater(summary['interfered_area_km2'], 0.0)
+
+    def test_pool_matches_inline(self):
+        stations = [_station(f's{i}', -23.0 + 0.05 * i, -46.6 - 0.02 * i) for i in range(4)]
+        inline = interference.run_study(self.candidate, stations, self.params, workers=0)
+        pooled = interference.run_study(self.candidate, stations, self.params, workers=2)
+        self.addCleanup(interference.shutdown)
+        self.assertEqual(inline[0], pooled[0])
+        np.testing.assert_array_equal(inline[3], pooled[3])
+
+    def test_station_selection(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / 'plano.xml').write_text(PLAN_XML, encoding='utf-8')
+            store = channel_plan.ChannelPlanStore(Path(tmp) / 'plan.sqlite', tmp)
+            selected = interference.select_stations(store, self.candidate, interference.StudyParameters())
+            self.assertEqual({s['station_id']: s['channel_offset'] for s in selected}, {'co': 0, 'adj1': 1})
+
+    @unittest.skipIf(FULL_CURVES, 'P.1546 curves other than Figure 1 available')
+    def test_missing_curves_refused_up_front(self):
+        # sem a Figura 2 o padrão não pode ser 10 %
+        self.assertEqual(interference.StudyParameters().interfering_time_pct, 50.0)
+        stations = [_station('adj', -23.0, -46.7, frequency=100.2, offset=1)]
+        with mock.patch.object(interference.contours, 'contour_distance_km') as solve:
+            with self.assertRaises(p1546.CurvesUnavailable) as caught:
+                interference.run_study(self.candidate, stations, self.params, workers=0)
+        solve.assert_not_called()
+        # acima de 100 MHz a interpolação usa também a curva de 600 MHz
+        self.assertEqual(caught.exception.figures, [9])
+
+    @unittest.skipUnless(FULL_CURVES, 'P.1546 curves other than Figure 1 not available')
+    def test_adjacent_channel_with_full_curves(self):
+        stations = [_station('adj', -23.0, -46.7, frequency=100.2, offset=1)]
+        reports, *_ = interference.run_study(self.candidate, stations, interference.StudyParameters(), workers=0)
+        self.assertEqual(reports[0]['protection_ratio_db'], 7.0)
+
+
+class InterferenceApiTest(AppTestCase):
+    def app_env(self):
+        source = Path(self.tmp.name) / 'Canais'
+        source.mkdir()
+        (source / 'plano.xml').write_text(PLAN_XML.replace('Frequencia="100.2"', 'Frequencia="100"'), encoding='utf-8')
+        return {'CHANNEL_PLAN_DIR': str(source), 'INTERFERENCE_WORKERS': '0'}
+
+    def setUp(self):
+        super().setUp()
+        user = self.create_user()
+        self.create_project(user)
+        self.login(user)
+
+    def test_study_endpoint(self):
+        url = '/api/regulator/projects/p/interference'
+        self.assertEqual(self.client.post(url, json={'latitude': -23.0}).status_code, 400)
+        response = self.client.post(url, json={
+            'latitude': -23.0, 'longitude': -46.8, 'frequency': 100.0, 'erpKw': 1.0, 'heightM': 90.0,
+            'interferingTimePct': 50, 'radials': 36,
+        })
+        self.assertEqual(response.status_code, 201)
+        result = response.get_json()
+        self.assertEqual({s['station_id'] for s in result['stations']}, {'co', 'adj1'})
+        self.assertEqual(result['summary']['stations_checked'], 2)
+        self.assertEqual(result['signal_raster']['bands'], ['margin_db'])
+        self.assertEqual(set(result['images']), {'margin', 'colorbar'})
+        stored = json.loads((storage_root() / result['report_path']).read_text())
+        self.assertEqual(stored['study_id'], result['study_id'])
+        asset = db.session.get(Asset, result['assets']['margin']['id'])
+        self.assertEqual(asset.meta['kind'], 'interference_study')
+
+    @unittest.skipIf(FULL_CURVES, 'P.1546 curves other than Figure 1 available')
+    def test_missing_curves_are_a_server_condition(self):
+        url = '/api/regulator/projects/p/interference'
+        payload = {'latitude': -23.0, 'longitude': -46.8, 'frequency': 100.0, 'erpKw': 1.0, 'heightM': 90.0, 'radials': 36}
+        # sem interferingTimePct o estudo usa o que as curvas instaladas permitem
+        self.assertEqual(self.client.post(url, json=payload).status_code, 201)
+        response = self.client.post(url, json={**payload, 'frequency': 98.1})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()['figures'], [9])
+
+
+if __name__ == '__main__':
+    unittest.main()
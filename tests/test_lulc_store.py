@@ -0,0 +1,166 @@
+import functools
+import hashlib
+import http.server
+import os
+import re
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import rasterio
+from affine import Affine
+from flask import Flask
+
+from app_core import lulc_store, storage
+
+SIDE = 400  # 0.0025 deg por pixel em 1 deg
+
+
+class _RangeHandler(http.server.SimpleHTTPRequestHandler):
+    """SimpleHTTPRequestHandler com suporte a um único 'Range: bytes=a-b'."""
+
+    ranges = []
+
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        header = self.headers.get('Range')
+        path = Path(self.translate_path(self.path))
+        if not header or not path.is_file() or not self.server.range_enabled:
+            return super().send_head()
+        match = re.match(r'bytes=(\d+)-(\d*)', header)
+        size = path.stat().st_size
+        start = int(match.group(1))
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        type(self).ranges.append((start, end))
+        if start >= size:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{size}')
+            self.end_headers()
+            return None
+        fh = path.open('rb')
+        fh.seek(start)
+        self.send_response(206)
+        self.send_header('Content-Type', 'image/tiff')
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self._remaining = end - start + 1
+        return fh
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, '_remaining', None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        outputfile.write(source.read(remaining))
+
+
+def _write_mosaic(path):
+    # classes em faixas de 40 colunas (3, 4, ..., 12), como um mosaico MapBiomas em EPSG:4326
+    data = (3 + np.arange(SIDE)[None, :] // 40).repeat(SIDE, axis=0).astype('uint8')
+    profile = {
+        'driver': 'GTiff', 'width': SIDE, 'height': SIDE, 'count': 1, 'dtype': 'uint8',
+        'crs': 'EPSG:4326', 'transform': Affine(1.0 / SIDE, 0.0, -44.0, 0.0, -1.0 / SIDE, -17.0),
+        'nodata': 0, 'tiled': True, 'blockxsize': 128, 'blockysize': 128,
+    }
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data, 1)
+    return data
+
+
+class LulcStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        served = root / 'server'
+        served.mkdir()
+        self.mosaic = served / 'brazil_coverage_2023.tif'
+        self.data = _write_mosaic(self.mosaic)
+        # os mosaicos vão para o object store de app_core.storage
+        app = Flask(__name__)
+        app.config['STORAGE_ROOT'] = str(root / 'storage')
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.store = lulc_store.LulcStore(root / 'storage' / 'shared' / 'lulc')
+        self.bounds = {'west': -43.8, 'south': -17.6, 'east': -43.5, 'north': -17.3}
+
+        _RangeHandler.ranges = []
+        handler = functools.partial(_RangeHandler, directory=str(served))
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.range_enabled = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/{self.mosaic.name}'
+        self.out = root / 'project' / 'lulc.tif'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.ctx.pop()
+        self.tmp.cleanup()
+
+    def test_crop_is_a_cog_covering_the_aoi(self):
+        # blocos pequenos para o recorte de teste (120 px) já ganhar overviews
+        with mock.patch.object(lulc_store, 'COG_BLOCK_SIZE', 64):
+            info = lulc_store.crop_to_cog(self.mosaic, self.bounds, self.out)
+        self.assertTrue(lulc_store.covers(info['bounds'], self.bounds))
+        self.assertEqual((info['width'], info['height']), (120, 120))
+        with rasterio.open(self.out) as src:
+            self.assertEqual(src.tags(ns='IMAGE_STRUCTURE').get('LAYOUT'), 'COG')
+            self.assertTrue(src.overviews(1))
+            crop = src.read(1)
+        # coluna 80 do mosaico = primeira coluna do recorte
+        np.testing.assert_array_equal(crop, self.data[120:240, 80:200])
+        self.assertLess(self.out.stat().st_size, self.mosaic.stat().st_size)
+
+    def test_remote_window_read_skips_the_mosaic_download(self):
+        info = self.store.crop(2023, self.url, self.bounds, self.out)
+        self.assertEqual(info['read_from'], 'remote')
+        self.assertIsNone(self.store.mosaic_path(2023))
+        self.assertTrue(_RangeHandler.ranges)
+        with rasterio.open(self.out) as src:
+            np.testing.assert_array_equal(src.read(1), self.data[120:240, 80:200])
+
+    def test_download_resumes_and_is_content_addressed(self):
+        blob = self.mosaic.read_bytes()
+        part = self.store.root / 'downloads' / '2023.tif.part'
+        part.parent.mkdir(parents=True)
+        part.write_bytes(blob[:1000])
+
+        info = self.store.crop(2023, self.url, self.bounds, self.out, remote=False)
+        self.assertEqual(info['read_from'], 'mirror')
+        self.assertIn((1000, len(blob) - 1), _RangeHandler.ranges)
+        sha = hashlib.sha256(blob).hexdigest()
+        self.assertEqual(info['mosaic_sha256'], sha)
+        self.assertEqual(self.store.mosaic_path(2023), storage.object_path(sha))
+        self.assertEqual(self.store.pointer(2023)['size'], len(blob))
+        self.assertFalse(part.exists())
+        # <ano>.tif é o link que mantém o objeto vivo na coleta de lixo
+        self.assertTrue(os.path.samefile(self.store.root / '2023.tif', storage.object_path(sha)))
+        self.assertEqual(storage.object_refcount(sha), 1)
+        storage.collect_garbage(grace_seconds=0)
+        self.assertEqual(self.store.mosaic_path(2023), storage.object_path(sha))
+
+    def test_server_without_range_support_restarts(self):
+        self.server.range_enabled = False
+        part = self.store.root / 'downloads' / '2023.tif.part'
+        part.parent.mkdir(parents=True)
+        part.write_bytes(b'garbage')
+        path = self.store.fetch_mosaic(2023, self.url)
+        self.assertEqual(path.read_bytes(), self.mosaic.read_bytes())
+
+    def test_aoi_helpers(self):
+        bounds = lulc_store.aoi_bounds(-17.5, -43.5, 11.132)
+        self.assertAlmostEqual(bounds['north'] - bounds['south'], 0.2)
+        self.assertTrue(lulc_store.covers(bounds, self.bounds) is False)
+        self.assertTrue(lulc_store.covers(lulc_store.aoi_bounds(-17.5, -43.5, 50.0), self.bounds))
+        self.assertEqual(lulc_store.aoi_key(self.bounds), lulc_store.aoi_key(dict(self.bounds)))
+        self.assertFalse(lulc_store.covers(None, self.bounds))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import json
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+
+from app_case import AppTestCase
+from app_core import admission, jobs, network
+from app_core.models import CoverageEngine, CoverageJob, CoverageStatus, Project
+from app_core.signal_raster import SignalRaster
+from app_core.storage import ensure_project_path_exists, storage_root
+from extensions import db
+
+
+def _site_raster(lon0, lat0, value, side=20, step=0.01, missing=None):
+    # grid ascendente (sul -> norte), como o de _compute_coverage_map
+    lons = lon0 + np.arange(side) * step
+    lats = lat0 + np.arange(side) * step
+    grid = np.full((side, side), float(value))
+    mask = np.ones_like(grid, dtype=bool)
+    if missing is not None:
+        mask[missing] = False
+    return SignalRaster.from_grids(lons, lats, mask=mask, dbuv=grid, dbm=grid - 100.0)
+
+
+class CompositeTest(unittest.TestCase):
+    def test_common_grid_is_union_at_finest_step(self):
+        a = _site_raster(-47.0, -23.0, 40.0)
+        b = _site_raster(-46.9, -22.95, 40.0, step=0.02)
+        transform, shape = network.common_grid([(a.transform, a.shape), (b.transform, b.shape)])
+        west, dx, _, north, _, neg_dy = transform
+        self.assertAlmostEqual(dx, 0.01)
+        self.assertAlmostEqual(neg_dy, -0.01)
+        self.assertAlmostEqual(west, -47.005)
+        self.assertAlmostEqual(north, -22.95 + 19 * 0.02 + 0.01)
+        # 0,445° x 0,495° a 0,01°: borda parcial conta como pixel
+        self.assertEqual(shape, (45, 50))
+        # limite de pixels: passo maior, mesma extensão
+        _, small = network.common_grid([(a.transform, a.shape), (b.transform, b.shape)], max_pixels=100)
+        self.assertLessEqual(small[0] * small[1], 121)
+
+    def test_best_server_max_sum_and_overlap(self):
+        strong = _site_raster(-47.0, -23.0, 50.0)
+        weak = _site_raster(-47.0, -23.0, 50.0 - 10 * np.log10(3), missing=(slice(0, 5), slice(None)))
+        transform, shape = network.common_grid([(r.transform, r.shape) for r in (strong, weak)])
+        self.assertEqual(shape, (20, 20))
+        grid = network.CompositeGrid(shape, threshold=45.0)
+        for index, raster in enumerate((weak, strong)):
+            grid.add(index, *network.resample(raster, transform, shape))
+
+        self.assertTrue((grid.best_server == 1).all())
+        np.testing.assert_allclose(grid.max_values(), 50.0, atol=0.01)
+        # grid norte-para-cima: as 5 linhas sem o site fraco ficam embaixo
+        sums = grid.sum_values()
+        np.testing.assert_allclose(sums[:15], 50.0 + 10 * np.log10(4 / 3), atol=0.02)
+        np.testing.assert_allclose(sums[15:], 50.0, atol=0.01)
+        self.assertEqual(grid.overlap[:15].tolist(), np.full((15, 20), 2).tolist())
+        self.assertTrue((grid.overlap[15:] == 1).all())
+
+    def test_uncovered_pixels(self):
+        west = _site_raster(-47.0, -23.0, 40.0, side=10)
+        east = _site_raster(-46.7, -23.0, 30.0, side=10)
+        transform, shape = network.common_grid([(r.transform, r.shape) for r in (west, east)])
+        grid = network.CompositeGrid(shape, threshold=35.0)
+        for index, raster in enumerate((west, east)):
+            grid.add(index, *network.resample(raster, transform, shape))
+        gap = grid.best_server[:, 12:28]
+        self.assertTrue((gap == -1).all())
+        self.assertTrue(np.isnan(grid.max_values()[:, 12:28]).all())
+        self.assertEqual(set(np.unique(grid.best_server)), {-1, 0, 1})
+
+
+class NetworkJobTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        user = self.create_user()
+        sites = network.normalize_sites([
+            {'id': 'a', 'name': 'Centro', 'latitude': -22.9, 'longitude': -47.0},
+            {'id': 'b', 'name': 'Gap filler', 'latitude': -22.9, 'longitude': -46.9, 'tower_height': 30},
+            {'id': 'c', 'latitude': -23.0, 'longitude': -47.0, 'enabled': False},
+        ])
+        self.project = self.create_project(user, settings={'sites': sites})
+        self.user_id = user.id
+        self.hold_dispatch()
+
+    @staticmethod
+    def _fake_site(job, progress):
+        # o que run_site_job deixa no job: raster de sinal + metadados
+        progress('path_loss')
+        raster = _site_raster(job.inputs['longitude'] - 0.1, job.inputs['latitude'] - 0.1, 45.0)
+        project = db.session.get(Project, job.project_id)
+        path = ensure_project_path_exists(project, 'assets', 'coverage', 'network', str(job.parent_id))
+        path = path / f'{job.id}_signal.npy'
+        raster.save(path)
+        job.metrics = {'signal_raster': {**raster.metadata(), 'path': str(path.relative_to(storage_root()))}}
+        job.status = CoverageStatus.succeeded
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    def test_sites_run_as_one_user_run_and_compose(self):
+        parent = network.enqueue(self.project, CoverageEngine.p1546, {'radius': 5})
+        children = network.site_jobs(parent.id)
+        self.assertEqual([c.inputs['siteId'] for c in children], ['a', 'b'])
+        self.assertEqual(children[1].inputs['tower_height'], 30)
+        self.assertEqual(parent.status, CoverageStatus.running)
+
+        # concorrência por usuário = 1, mas os sites da rede contam como uma execução só
+        first = admission.next_job()
+        self.assertEqual(first.parent_id, parent.id)
+        jobs.claim(first.id)
+        second = admission.next_job()
+        self.assertIsNotNone(second)
+        self.assertNotEqual(second.id, first.id)
+
+        with mock.patch.object(jobs, '_execute', self._fake_site):
+            self.assertEqual(jobs.run_job(first.id, claimed=True), 'succeeded')
+            db.session.expire_all()
+            self.assertEqual(db.session.get(CoverageJob, parent.id).progress, 60.0)
+            self.assertEqual(jobs.run_job(second.id), 'succeeded')
+
+        db.session.expire_all()
+        parent = db.session.get(CoverageJob, parent.id)
+        self.assertEqual((parent.status, parent.stage), (CoverageStatus.succeeded, 'done'))
+        result = json.loads((storage_root() / parent.metrics['result_path']).read_text())
+        shares = [site['best_server_pct'] for site in result['network']['sites']]
+        self.assertAlmostEqual(sum(shares), 100.0, places=1)
+        self.assertEqual(set(result['images']), {'max', 'sum', 'best_server', 'overlap', 'colorbar'})
+        self.assertEqual(result['signal_raster']['bands'], ['dbuv', 'dbuv_sum'])
+        self.assertGreater(result['network']['overlap_histogram'][2], 0)
+        self.assertIsNotNone(parent.outputs_asset_id)
+
+    def test_failed_site_is_left_out(self):
+        parent = network.enqueue(self.project, CoverageEngine.p1546, {'radius': 5})
+        first, second = network.site_jobs(parent.id)
+        with mock.patch.object(jobs, '_execute', side_effect=ValueError('sem DEM')):
+            jobs.run_job(first.id)
+        with mock.patch.object(jobs, '_execute', self._fake_site):
+            jobs.run_job(second.id)
+        db.session.expire_all()
+        parent = db.session.get(CoverageJob, parent.id)
+        self.assertEqual(parent.status, CoverageStatus.succeeded)
+        result = json.loads((storage_root() / parent.metrics['result_path']).read_text())
+        statuses = {site['id']: site['status'] for site in result['network']['sites']}
+        self.assertEqual(statuses, {'a': 'failed', 'b': 'succeeded'})
+
+    def test_sfn_stage_in_composition(self):
+        with self.assertRaises(ValueError):
+            network.enqueue(self.project, CoverageEngine.p1546, {'radius': 5, 'sfn': True, 'sfnMode': 7})
+        parent = network.enqueue(
+            self.project, CoverageEngine.p1546, {'radius': 5, 'sfn': True, 'sfnGuardInterval': '1/4'}
+        )
+        with mock.patch.object(jobs, '_execute', self._fake_site):
+            for site_job in network.site_jobs(parent.id):
+                jobs.run_job(site_job.id)
+        db.session.expire_all()
+        parent = db.session.get(CoverageJob, parent.id)
+        result = json.loads((storage_root() / parent.metrics['result_path']).read_text())
+        self.assertEqual((result['sfn']['guard_interval'], result['sfn']['sites']), ('1/4', 2))
+        # sites a ~10 km (~33 µs) dentro do intervalo de guarda de 252 µs
+        self.assertEqual(result['sfn']['self_interference_pct'], 0.0)
+        self.assertIn('ci', result['images'])
+        self.assertIn('ci', result['signal_raster']['bands'])
+        self.assertEqual(parent.metrics['sfn']['ci_ok_pct'], 100.0)
+
+    def test_api_sites_network_and_cancel(self):
+        client = self.login(self.project.user)
+        bad = client.put('/api/projects/p/sites', json={'sites': [{'name': 'x'}]})
+        self.assertEqual(bad.status_code, 400)
+        sites = client.put('/api/projects/p/sites', json={'sites': [
+            {'latitude': -22.9, 'longitude': -47.0}, {'latitude': -22.8, 'longitude': -47.1},
+        ]}).get_json()['sites']
+        self.assertEqual(len(client.get('/api/projects/p/sites').get_json()['sites']), 2)
+
+        self.assertEqual(client.post('/api/projects/p/network', json={'engine': 'rt3d'}).status_code, 400)
+        response = client.post('/api/projects/p/network', json={'inputs': {'radius': 5}, 'siteIds': [sites[0]['id']]})
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()['job']
+        self.assertEqual(len(job['sites']), 1)
+
+        self.assertEqual(client.post(f"/api/projects/p/jobs/{job['id']}/cancel").status_code, 200)
+        status = client.get(response.get_json()['status_url']).get_json()['job']
+        self.assertEqual(status['status'], 'canceled')
+        self.assertIsNotNone(status['finished_at'])
+        self.assertEqual([site['status'] for site in status['sites']], ['canceled'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import base64
+import io
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from app_core import overlay_render
+
+
+def _decode(image_b64):
+    return np.asarray(Image.open(io.BytesIO(base64.b64decode(image_b64))).convert('RGBA'))
+
+
+class OverlayRenderTest(unittest.TestCase):
+    def test_native_resolution_north_up_and_masked(self):
+        lats = np.linspace(-23.0, -22.0, 21)  # sul -> norte
+        values = np.tile(np.linspace(0.0, 100.0, 21)[:, None], (1, 31))
+        dist = np.full(values.shape, 5.0)
+        dist[:, -1] = 50.0  # fora do raio
+        values[0, 0] = np.nan
+        rgba = _decode(overlay_render.render_overlay(values, lats, 0.0, 100.0, dist, 20.0))
+
+        self.assertEqual(rgba.shape, (21, 31, 4))
+        np.testing.assert_array_equal(rgba[0, 0, :3], overlay_render.TURBO_LUT[-1])  # norte = máximo
+        np.testing.assert_array_equal(rgba[-1, 1, :3], overlay_render.TURBO_LUT[0])
+        self.assertEqual(rgba[-1, 0, 3], 0)  # NaN
+        self.assertTrue(np.all(rgba[:, -1, 3] == 0))
+        self.assertEqual(rgba[5, 5, 3], 255)
+
+    def test_feather_ramp(self):
+        alpha = overlay_render.feather_alpha(np.array([0.0, 99.0, 100.0, 101.0]), 100.0)
+        np.testing.assert_allclose(alpha, [1.0, 1.0 / 7.0, 0.0, 0.0])
+
+    def test_inset_is_cached(self):
+        pattern = np.linspace(-10.0, 0.0, 36)
+        first = overlay_render.render_pattern_inset(pattern)
+        self.assertIs(first, overlay_render.render_pattern_inset(pattern.copy()))
+        self.assertIsNone(overlay_render.render_pattern_inset(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+
+import numpy as np
+
+from app_core import p1546
+
+
+DISTANCES = [0.3, 1, 1.5, 2.5, 3, 7, 14.9, 15, 20, 33, 100, 550, 560, 999, 1000]
+HEIGHTS = [-40, -20, 0, 5, 9.99, 10, 30, 150, 1199, 1200, 1500, 2999]
+
+
+def _scalar_grid(heights, distances, h2, R2, area, pathinfo, q=50, wa=None, PTx=1,
+                 ha=None, hb=None, R1=None, tca=None, htter=None, hrter=None):
+    optional = [q, [] if wa is None else wa, PTx]
+    optional += [[] if value is None else value for value in (ha, hb, R1, tca, htter, hrter)]
+    E = np.empty(heights.shape)
+    L = np.empty(heights.shape)
+    for idx in np.ndindex(heights.shape):
+        E[idx], L[idx] = p1546.bt_loss(
+            100, 50, heights[idx], h2, R2, area, [distances[idx]], ['Land'], pathinfo, *optional
+        )
+    return E, L
+
+
+class P1546BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.distances, self.heights = np.meshgrid(DISTANCES, HEIGHTS)
+
+    def assertMatchesScalar(self, h2=10, R2=10, area='Rural', pathinfo=1, **kwargs):
+        E_ref, L_ref = _scalar_grid(self.heights, self.distances, h2, R2, area, pathinfo, **kwargs)
+        E, L = p1546.bt_loss_batch(
+            100, 50, self.heights, h2, R2, area, self.distances, 'Land', pathinfo, **kwargs
+        )
+        self.assertEqual(E.shape, self.heights.shape)
+        np.testing.assert_allclose(E, E_ref, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(L, L_ref, rtol=0, atol=1e-9)
+
+    def test_rural_receiver(self):
+        self.assertMatchesScalar(ha=30.0)
+
+    def test_urban_receiver_below_clutter(self):
+        self.assertMatchesScalar(h2=1.5, R2=20, area='Urban', ha=30.0)
+
+    def test_location_variability_and_power(self):
+        self.assertMatchesScalar(q=90, wa=500, PTx=5, ha=30.0)
+
+    def test_terrain_corrections(self):
+        self.assertMatchesScalar(ha=30.0, R1=10.0, tca=5.0, htter=800.0, hrter=700.0)
+
+    def test_no_terrain_information(self):
+        self.assertMatchesScalar(pathinfo=0, ha=40.0)
+
+    def test_heights_broadcast_over_distances(self):
+        E, L = p1546.bt_loss_batch(100, 50, np.array([[50.0], [150.0]]), 10, 10, 'Rural',
+                                   np.array([10.0, 20.0, 40.0]))
+        self.assertEqual(E.shape, (2, 3))
+        self.assertTrue(np.all(np.diff(E, axis=1) < 0))
+
+    def test_short_paths_require_ha(self):
+        with self.assertRaises(ValueError):
+            p1546.bt_loss_batch(100, 50, 50.0, 10, 10, 'Rural', [0.5, 2.0])
+
+
+class P1546TablesTest(unittest.TestCase):
+    def test_tables_are_memory_mapped(self):
+        self.assertIsInstance(p1546.FIELD_TABLES, np.memmap)
+        self.assertEqual(p1546.FIELD_TABLES.shape, (3, 3, 3, 8, 78))
+
+    def test_figure_table_axes(self):
+        values = p1546.figure_table(1)
+        self.assertEqual(values.shape, (8, 78))
+        self.assertAlmostEqual(values[0, 0], 89.9759)
+        self.assertAlmostEqual(values[7, -1], -46.1)
+
+    def test_sea_50_percent_curve_is_shared(self):
+        self.assertEqual(p1546.figure_index(4), (0, 2, [1, 2]))
+
+    def test_missing_figure_raises(self):
+        with self.assertRaises(ValueError):
+            p1546.figure_table(9)
+
+    def test_required_figures(self):
+        self.assertEqual(p1546.required_figures(100, 50), [1])
+        # abaixo de 100 MHz a Eq. (14) extrapola entre 100 e 600 MHz
+        self.assertEqual(p1546.required_figures(98.1, 50), [1, 9])
+        self.assertEqual(p1546.required_figures(600, 20, 'Warm'), [12, 15])
+        self.assertEqual(p1546.missing_figures(100, 50), [])
+        self.assertEqual(p1546.missing_figures(98.1, 10), [2, 10])
+        p1546.require_figures([(100, 50), (100, 50.0)])
+        with self.assertRaises(p1546.CurvesUnavailable) as caught:
+            p1546.require_figures([(100, 50), (98.1, 10), (600, 10)])
+        self.assertEqual(caught.exception.figures, [2, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
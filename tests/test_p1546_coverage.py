@@ -0,0 +1,138 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+from astropy import units as u
+from pycraf import pathprof
+
+from app_core import coverage, p1546
+
+SRTM_DIR = Path(__file__).resolve().parents[1] / 'SRTM'
+
+
+def _flat_terrain(lons, lats):
+    return np.full(np.shape(lons), 500.0)
+
+
+class RadialTerrainParametersTest(unittest.TestCase):
+    def setUp(self):
+        self.distances = np.arange(1, 41) * 0.5
+
+    def test_flat_terrain(self):
+        terrain = np.full((4, self.distances.size + 1), 200.0)
+        params = coverage.radial_terrain_parameters(terrain, self.distances, 50.0, 10.0)
+        np.testing.assert_allclose(params['heff'], 50.0)
+        np.testing.assert_allclose(params['hb'], 50.0)
+        self.assertEqual(params['tca'].shape, (4, self.distances.size))
+        self.assertTrue(np.all(params['tca'] < 0))
+
+    def test_ridge_raises_clearance_angle(self):
+        terrain = np.zeros((1, self.distances.size + 1))
+        terrain[0, 20] = 300.0  # 10 km
+        params = coverage.radial_terrain_parameters(terrain, self.distances, 50.0, 10.0)
+        tca = params['tca'][0]
+        # 1 km behind the ridge the receiver sees it at atan(290 / 1000)
+        self.assertAlmostEqual(tca[21], np.degrees(np.arctan(290.0 / 1000.0)))
+        self.assertTrue(np.all(tca[:19] < 0))
+        self.assertAlmostEqual(params['heff'][0], 50.0 - 300.0 / 25)
+
+
+class SiteHaatTest(unittest.TestCase):
+    def test_flat_terrain(self):
+        bearings, stats, site = coverage.site_haat(-47.0, -22.9, 40.0, n_radials=8, terrain_sampler=_flat_terrain)
+        np.testing.assert_allclose(bearings, np.arange(8) * 45.0)
+        self.assertEqual(site, 500.0)
+        np.testing.assert_allclose(stats['hnmt'], 500.0)
+        np.testing.assert_allclose(stats['haat'], 40.0)
+        np.testing.assert_allclose(stats['delta_h'], 0.0)
+
+    def test_sloped_terrain_and_site_override(self):
+        # terreno sobe para o norte: HAAT menor nas radiais ao norte
+        def sloped(lons, lats):
+            return 500.0 + (np.asarray(lats) + 22.9) * 1000.0
+
+        bearings, stats, site = coverage.site_haat(
+            -47.0, -22.9, 40.0, site_elevation_m=600.0, n_radials=4, terrain_sampler=sloped,
+        )
+        self.assertEqual(site, 600.0)
+        self.assertLess(stats['haat'][0], stats['haat'][2])
+        self.assertAlmostEqual(stats['haat'][1], 140.0, delta=0.5)
+        self.assertGreater(stats['delta_h'][0], 50.0)
+        self.assertLess(stats['min'][0], stats['max'][0])
+
+
+class PolarToGridTest(unittest.TestCase):
+    def test_bilinear_and_bearing_wrap(self):
+        bearings = np.arange(4) * 90.0
+        distances = np.array([1.0, 2.0, 3.0])
+        values = bearings[:, None] + 10.0 * distances[None, :]
+        grid = coverage.polar_to_grid(
+            values, bearings, distances,
+            np.array([45.0, 315.0, 0.0, 0.0, 90.0]),
+            np.array([1.5, 2.0, 0.2, 3.5, 2.5]),
+        )
+        np.testing.assert_allclose(grid[:3], [60.0, 155.0, 10.0])
+        self.assertTrue(np.isnan(grid[3]))
+        self.assertAlmostEqual(grid[4], 115.0)
+
+
+class P1546CoverageGridTest(unittest.TestCase):
+    def test_grid_matches_radial_evaluation(self):
+        lon, lat = -47.0, -22.9
+        xcoords, ycoords = coverage.pycraf_map_coords(lon, lat, 0.4, 0.4, 0.01)
+        result = coverage.p1546_coverage_grid(
+            lon, lat, xcoords, ycoords, 100, 50, 60.0, 10.0,
+            n_radials=72, step_km=0.25, terrain_sampler=_flat_terrain,
+        )
+        shape = (ycoords.size, xcoords.size)
+        self.assertEqual(result['loss_map'].shape, shape)
+        self.assertEqual(result['bearing_map'].shape, shape)
+        self.assertFalse(np.any(np.isnan(result['loss_map'])))
+        np.testing.assert_allclose([item['haat_m'] for item in result['radials']], 60.0)
+
+        # pixel due north of the transmitter
+        row = np.argmin(np.abs(ycoords - (lat + 0.15)))
+        col = np.argmin(np.abs(xcoords - lon))
+        d = result['dist_map'][row, col]
+        _, L = p1546.bt_loss_batch(100, 50, 60.0, 10.0, 10.0, 'Rural', d, ha=60.0,
+                                   hb=60.0, tca=-0.5, htter=500.0, hrter=500.0)
+        self.assertAlmostEqual(result['loss_map'][row, col], float(L), delta=0.2)
+
+        north = result['loss_map'][ycoords > lat, col]
+        self.assertTrue(np.all(np.diff(north) > 0))
+
+
+class PolarModeTest(unittest.TestCase):
+    def test_distance_axis_widens_with_distance(self):
+        distances = coverage.radial_distance_axis(100.0, 200)
+        self.assertEqual(distances.size, 200)
+        self.assertAlmostEqual(distances[-1], 100.0)
+        self.assertTrue(np.all(np.diff(np.diff(distances)) > 0))
+
+    def test_p1546_on_distance_axis_stops_at_radius(self):
+        lon, lat = -47.0, -22.9
+        xcoords, ycoords = coverage.pycraf_map_coords(lon, lat, 0.4, 0.4, 0.01)
+        result = coverage.p1546_coverage_grid(
+            lon, lat, xcoords, ycoords, 100, 50, 60.0, 10.0, n_radials=90,
+            distances_km=coverage.radial_distance_axis(15.0, 64), terrain_sampler=_flat_terrain,
+        )
+        inside = result['dist_map'] <= 15.0
+        self.assertFalse(np.any(np.isnan(result['loss_map'][inside])))
+        self.assertTrue(np.all(np.isnan(result['loss_map'][~inside])))
+
+    @unittest.skipUnless((SRTM_DIR / 'E23' / 'S18W044.hgt').exists(), 'SRTM tiles not available')
+    def test_p452_radials(self):
+        kwargs = dict(
+            freq=0.1 * u.GHz, temperature=293.15 * u.K, pressure=1013 * u.hPa,
+            h_tg=60 * u.m, h_rg=10 * u.m, timepercent=40 * u.percent,
+        )
+        with pathprof.SrtmConf.set(srtm_dir=str(SRTM_DIR), download='never'):
+            bearings, distances, losses = coverage.p452_polar_losses(-43.5, -17.5, 8, 10.0, 0.25, kwargs)
+        self.assertEqual(bearings.size, 8)
+        self.assertAlmostEqual(distances[-1], 10.0, places=2)
+        self.assertEqual(losses['L_b'].shape, (8, distances.size))
+        self.assertTrue(np.all(losses['L_b'] > 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
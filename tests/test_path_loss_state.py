@@ -0,0 +1,36 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from app_core.routes import ui
+
+
+class PathLossStateTest(unittest.TestCase):
+    def test_signature_ignores_float_noise(self):
+        base = {'lat': -22.9, 'lon': -47.0, 'frequency_mhz': 100.0, 'engine': 'p1546'}
+        noisy = dict(base, lat=-22.9000000001)
+        self.assertEqual(ui._path_loss_signature(base), ui._path_loss_signature(noisy))
+        self.assertNotEqual(ui._path_loss_signature(base), ui._path_loss_signature(dict(base, frequency_mhz=98.1)))
+
+    def test_round_trip(self):
+        state = {
+            'signature': 'abc',
+            'engine': 'pycraf',
+            'haat_radials': [{'bearing_deg': 0.0, 'haat_m': 55.0}],
+            'L_b': np.arange(6, dtype=np.float32).reshape(2, 3),
+            'xcoords': np.linspace(-47.1, -46.9, 3),
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'state.npz'
+            ui._save_path_loss_state(path, state)
+            loaded = ui._load_path_loss_state(path)
+        self.assertEqual(loaded['signature'], 'abc')
+        self.assertEqual(loaded['haat_radials'], state['haat_radials'])
+        self.assertEqual(loaded['L_b'].dtype, np.float32)
+        np.testing.assert_array_equal(loaded['xcoords'], state['xcoords'])
+
+
+if __name__ == '__main__':
+    unittest.main()
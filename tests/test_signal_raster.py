@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from app_core.analytics import coverage_ibge
+from app_core.signal_raster import NODATA, SignalRaster
+
+
+class SignalRasterTest(unittest.TestCase):
+    def setUp(self):
+        self.lons = np.linspace(-47.2, -46.8, 41)
+        self.lats = np.linspace(-23.1, -22.7, 31)
+        lon_grid, lat_grid = np.meshgrid(self.lons, self.lats)
+        self.field = 60.0 + 100.0 * (lon_grid - self.lons[0]) + 10.0 * (lat_grid - self.lats[0])
+        self.mask = np.hypot(lon_grid + 47.0, lat_grid + 22.9) <= 0.15
+        self.raster = SignalRaster.from_grids(
+            self.lons, self.lats, mask=self.mask, dbuv=self.field, dbm=self.field - 120.0
+        )
+
+    def test_lookup_matches_grid(self):
+        i, j = 15, 22
+        self.assertTrue(self.mask[i, j])
+        self.assertAlmostEqual(self.raster.lookup(self.lats[i], self.lons[j]), self.field[i, j], places=2)
+        self.assertAlmostEqual(self.raster.lookup(self.lats[i], self.lons[j], 'dbm'), self.field[i, j] - 120.0, places=2)
+        self.assertIsNone(self.raster.lookup(self.lats[0], self.lons[0]))  # fora do raio
+        self.assertIsNone(self.raster.lookup(-20.0, -47.0))  # fora da malha
+        self.assertEqual(self.raster.bands['dbuv'][0, 0], NODATA)
+
+    def test_payload_and_sidecar_round_trip(self):
+        from_payload = SignalRaster.from_payload(self.raster.to_payload())
+        np.testing.assert_array_equal(from_payload.bands['dbuv'], self.raster.bands['dbuv'])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'coverage_signal.npy'
+            self.raster.save(path)
+            meta = dict(self.raster.metadata(), path='user/project/assets/coverage/coverage_signal.npy')
+            loaded = SignalRaster.from_payload(meta, base_dir=tmp)
+            np.testing.assert_array_equal(loaded.bands['dbm'], self.raster.bands['dbm'])
+
+    def test_bilinear_sample(self):
+        lat = (self.lats[15] + self.lats[16]) / 2
+        lon = self.lons[22] + 0.25 * (self.lons[23] - self.lons[22])
+        expected = 60.0 + 100.0 * (lon - self.lons[0]) + 10.0 * (lat - self.lats[0])
+        field, valid = self.raster.sample([lat, self.lats[0], -20.0], [lon, self.lons[0], -47.0])
+        self.assertAlmostEqual(field[0], expected, places=2)
+        self.assertTrue(valid[0])
+        self.assertFalse(valid[1])
+        self.assertTrue(np.isnan(field[1]))  # vizinhos todos fora do raio
+        self.assertTrue(np.isnan(field[2]))
+
+    def test_ibge_points_from_raster_and_legacy_dict(self):
+        points = coverage_ibge._load_summary_points(
+            {'signal_raster': self.raster.to_payload()}, Path('.'), 80.0
+        )
+        expected = (self.mask & (np.round(self.field, 2) >= 80.0)).sum()
+        self.assertEqual(len(points), expected)
+        lat, lon, value = points[0]
+        self.assertAlmostEqual(self.raster.lookup(lat, lon), value)
+
+        legacy = coverage_ibge._load_summary_points(
+            {'signal_level_dict': {'(-22.9, -47.0)': 85.0, '(-22.8, -47.1)': 70.0}}, Path('.'), 80.0
+        )
+        self.assertEqual(legacy, [(-22.9, -47.0, 85.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
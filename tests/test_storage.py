@@ -0,0 +1,101 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from flask import Flask
+
+from app_core import storage
+
+
+class ObjectStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        app = Flask(__name__)
+        app.config['STORAGE_ROOT'] = str(self.root)
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.blob = os.urandom(3 * storage.HASH_CHUNK + 17)
+        self.sha = hashlib.sha256(self.blob).hexdigest()
+
+    def tearDown(self):
+        self.ctx.pop()
+        self.tmp.cleanup()
+
+    def _project_file(self, slug, name='coverage_field.png'):
+        return storage.ensure_storage_structure('user', slug)['assets/coverage'] / name
+
+    def test_identical_bytes_share_one_object(self):
+        first, second = self._project_file('a'), self._project_file('b')
+        self.assertEqual(storage.store_bytes(first, self.blob), (self.sha, len(self.blob)))
+        self.assertEqual(storage.store_bytes(second, self.blob), (self.sha, len(self.blob)))
+        target = storage.object_path(self.sha)
+        self.assertEqual(target.parent.name, self.sha[:2])
+        self.assertTrue(os.path.samefile(first, target))
+        self.assertTrue(os.path.samefile(second, target))
+        self.assertEqual(second.read_bytes(), self.blob)
+        self.assertEqual(storage.object_refcount(self.sha), 2)
+        # nenhum temporário sobra no store
+        self.assertEqual([p.name for p in storage.objects_root().iterdir()], [self.sha[:2]])
+
+    def test_ingest_links_a_file_written_in_place(self):
+        path = self._project_file('a', 'lulc.tif')
+        path.write_bytes(self.blob)
+        inode = path.stat().st_ino
+        self.assertEqual(storage.ingest_file(path), (self.sha, len(self.blob)))
+        # o arquivo novo vira o próprio objeto, sem cópia
+        self.assertEqual(storage.object_path(self.sha).stat().st_ino, inode)
+        self.assertEqual(storage.ingest_file(path), (self.sha, len(self.blob)))
+        self.assertEqual(storage.object_refcount(self.sha), 1)
+
+        other = self._project_file('b', 'lulc.tif')
+        other.write_bytes(self.blob)
+        storage.ingest_file(other)
+        self.assertTrue(os.path.samefile(other, path))
+        self.assertEqual(storage.object_refcount(self.sha), 2)
+
+    def test_replacing_a_path_never_touches_the_shared_object(self):
+        first, second = self._project_file('a'), self._project_file('b')
+        storage.store_bytes(first, self.blob)
+        storage.store_bytes(second, self.blob)
+        storage.store_bytes(second, b'outro conteudo')
+        self.assertEqual(first.read_bytes(), self.blob)
+        self.assertEqual(storage.object_refcount(self.sha), 1)
+
+    def test_ingest_refuses_a_file_written_through_a_link(self):
+        first, second = self._project_file('a'), self._project_file('b')
+        storage.store_bytes(first, self.blob)
+        storage.store_bytes(second, self.blob)
+        # gravar por cima de um link reescreve o objeto (e o caminho de 'a')
+        os.chmod(second, 0o644)
+        second.write_bytes(b'reescrito')
+        with self.assertRaises(ValueError):
+            storage.ingest_file(second)
+        self.assertIsNone(next(storage.objects_root().glob(f'*/{hashlib.sha256(b"reescrito").hexdigest()}'), None))
+
+    def test_garbage_collection_follows_project_removal(self):
+        storage.store_bytes(self._project_file('a'), self.blob)
+        storage.store_bytes(self._project_file('b'), self.blob)
+        storage.store_bytes(self._project_file('b', 'only_b.json'), b'{}')
+        only_b = hashlib.sha256(b'{}').hexdigest()
+
+        storage.remove_project_storage('user', 'b')
+        # objetos recém-gravados ficam protegidos pela carência
+        self.assertTrue(storage.object_path(only_b).exists())
+
+        stats = storage.collect_garbage(grace_seconds=0)
+        self.assertEqual((stats['removed'], stats['freed_bytes'], stats['kept']), (1, 2, 1))
+        self.assertFalse(storage.object_path(only_b).exists())
+        self.assertEqual(storage.object_refcount(self.sha), 1)
+
+        storage.remove_project_storage('user', 'a')
+        self.assertEqual(storage.collect_garbage(grace_seconds=0, dry_run=True)['removed'], 1)
+        self.assertTrue(storage.object_path(self.sha).exists())
+        storage.collect_garbage(grace_seconds=0)
+        self.assertEqual(storage.object_refcount(self.sha), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from flask import Flask
+
+from app_core import terrain_cache
+
+
+def _fake_hprof(seed=0.0):
+    return {
+        'lon_t': -47.0,
+        'do_cos_delta': 1,
+        'xcoords': np.linspace(-47.1, -46.9, 5) + seed,
+        'path_idx_map': np.arange(20, dtype=np.int32).reshape(4, 5),
+        'height_profs': np.random.default_rng(1).normal(size=(50, 40)),
+    }
+
+
+class TerrainCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config['STORAGE_ROOT'] = self.tmp.name
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        self.key = terrain_cache.make_key(-47.0, -22.9, 0.5, 0.5, 5.0, -1, -1, {'S23W048.hgt': 'abc'})
+
+    def tearDown(self):
+        self.ctx.pop()
+        self.tmp.cleanup()
+
+    def test_round_trip_is_memory_mapped_and_writable(self):
+        terrain_cache.store(self.key, _fake_hprof())
+        data = terrain_cache.load(self.key)
+        self.assertIsInstance(data['lon_t'], float)
+        self.assertIsInstance(data['do_cos_delta'], int)
+        self.assertIsInstance(data['height_profs'], np.memmap)
+        self.assertEqual(data['path_idx_map'].dtype, np.int32)
+        np.testing.assert_array_equal(data['xcoords'], _fake_hprof()['xcoords'])
+        data['height_profs'][0, 0] = 0.0  # pycraf needs writable buffers
+
+    def test_key_depends_on_dem_checksums(self):
+        other = terrain_cache.make_key(-47.0, -22.9, 0.5, 0.5, 5.0, -1, -1, {'S23W048.hgt': None})
+        self.assertNotEqual(self.key, other)
+        same = terrain_cache.make_key(-47.0000001, -22.9, 0.5, 0.5, 5.0, -1, -1, {'S23W048.hgt': 'abc'})
+        self.assertEqual(self.key, same)
+
+    def test_dem_tile_checksums_search_subdirectories(self):
+        tile = Path(self.tmp.name) / 'srtm' / 'F23' / 'S23W048.hgt'
+        tile.parent.mkdir(parents=True)
+        tile.write_bytes(b'\x00\x01' * 10)
+        checksums = terrain_cache.dem_tile_checksums(tile.parents[1], ['S23W048.hgt', 'S24W048.hgt'])
+        self.assertEqual(len(checksums['S23W048.hgt']), 64)
+        self.assertIsNone(checksums['S24W048.hgt'])
+
+    def test_compute_runs_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return _fake_hprof()
+
+        before = terrain_cache.cache_stats()
+        for _ in range(3):
+            terrain_cache.cached_height_map_data(compute, -47.0, -22.9, 0.5, 0.5, 5.0, -1, -1, {})
+        after = terrain_cache.cache_stats()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 2)
+
+    def test_evicts_least_recently_used(self):
+        keys = [terrain_cache.make_key(i, 0, 1, 1, 5, -1, -1, {}) for i in range(3)]
+        for idx, key in enumerate(keys):
+            terrain_cache.store(key, _fake_hprof(idx))
+            os.utime(terrain_cache.cache_dir() / f'{key}.npz', (idx + 1, idx + 1))
+        terrain_cache.load(keys[0])  # most recently used now
+        sizes = {key: terrain_cache._entry_size(terrain_cache.cache_dir() / f'{key}.npz') for key in keys}
+        removed = terrain_cache.evict(max_bytes=sizes[keys[0]] + sizes[keys[2]])
+        self.assertEqual(removed, 1)
+        remaining = {p.stem for p in terrain_cache.cache_dir().glob('*.npz')}
+        self.assertEqual(remaining, {keys[0], keys[2]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,6 +20,7 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128))
     is_active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.text('true'))
     is_email_confirmed = db.Column(db.Boolean, nullable=False, default=False, server_default=db.text('false'))
+    is_admin = db.Column(db.Boolean, nullable=False, default=False, server_default=db.text('false'))
     created_at = db.Column(
         db.DateTime(timezone=True),
         nullable=False,